@@ -3,6 +3,7 @@
 """
 GMTools API 服务入口
 使用 FastAPI 提供 RESTful API 接口
+路由模块按需注册（routes/lazy_routes.py），报表快照服务在启动后加载，导入本模块只加载处理第一个请求所需的部分
 """
 
 import sys
@@ -10,8 +11,9 @@ import os
 import asyncio
 from contextlib import asynccontextmanager
 import argparse
+import importlib
 import logging
-import uvicorn
+from datetime import datetime
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from network.client import GMToolsClient
@@ -21,19 +23,30 @@ from services.equipment_service import EquipmentService
 from services.gift_service import GiftService
 from services.character_service import CharacterService
 from services.game_service import GameService
+from services.reward_delivery_service import RewardDeliveryWorker
+from services.audit_log_writer import AuditLogWriter
+from services.event_hub import event_hub, TOPIC_UNREAD, TOPIC_PARTICIPATION, TOPIC_GAME
+from services.game_connection import ResponseDispatcher, login_gm
+from services.game_broker import GameBrokerClient, DEFAULT_BROKER_ADDRESS, wait_until_ready
+from auth.password_hasher import password_hasher
+from auth.token_cache import token_cache
+from auth.rate_limiter import rate_limit_user, user_action_limiter, get_rate_limit_stats
 from database.activation_code import ActivationCode
 from database.permissions import Permission, LevelPermission
 from api_examples import (
     ACCOUNT_EXAMPLES, PET_EXAMPLES, EQUIPMENT_EXAMPLES, 
     GIFT_EXAMPLES, CHARACTER_EXAMPLES, GAME_EXAMPLES
 )
-from config.settings import SERVER_HOST, SERVER_PORT, GM_ACCOUNT, GM_PASSWORD
+from config.settings import (
+    SERVER_HOST, SERVER_PORT, GM_ACCOUNT, GM_PASSWORD, GAME_BROKER_ADDRESS,
+    RESPONSE_COMPRESSION_MIN_SIZE, RESPONSE_GZIP_LEVEL, RESPONSE_BROTLI_QUALITY
+)
 
 # 配置日志
 from typing import Optional, Dict, Any
 from fastapi import FastAPI, Request, HTTPException, Depends, Body
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
 logging.basicConfig(
     level=logging.INFO,
@@ -43,99 +56,34 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# 全局实例
-client: Optional[GMToolsClient] = None
+# 全局实例（使用游戏连接代理时 client 为 GameBrokerClient）
+client = None
 account_service: Optional[AccountService] = None
 pet_service: Optional[PetService] = None
 equipment_service: Optional[EquipmentService] = None
 gift_service: Optional[GiftService] = None
 character_service: Optional[CharacterService] = None
 game_service: Optional[GameService] = None
+reward_delivery_worker: Optional[RewardDeliveryWorker] = None
+audit_log_writer: Optional[AuditLogWriter] = None
+activity_manager = None
+background_startup: Optional[asyncio.Task] = None
 
 # 导入新的认证依赖
 from auth.dependencies import get_current_active_user
 from auth.level_permissions import require_level
-from database.models import User as AuthUser, AuditLog
+from database.models import User as AuthUser, AuditLog, Message
+from database.activity_models import get_activity_manager
+from routes.lazy_routes import LazyRouterRegistry, LazyRouterMiddleware
+from utils.compression import CompressionMiddleware
+from utils.fast_json import FastJSONResponse
+from utils.response_cache import response_cache, SCOPE_PERMISSIONS, SCOPE_LEVEL_PERMISSIONS, SCOPE_LEVEL_CONFIGS
 
 # 通用请求模型
 class ModuleRequest(BaseModel):
     function: str
     args: Dict[str, Any] = {}
 
-class ResponseDispatcher:
-    """响应分发器 - 支持收集所有响应"""
-    def __init__(self):
-        self.listeners: Dict[int, asyncio.Future] = {}  # 单序号监听器
-        self.collectors: Dict[str, Dict[str, Any]] = {}  # 响应收集器 {request_id: {responses: [], event: Event}}
-        self.lock = asyncio.Lock()
-        self.loop = None
-
-    def register(self, seq_no: int) -> asyncio.Future:
-        """注册等待特定序号的响应（用于登录等特定场景）"""
-        future = self.loop.create_future()
-        self.listeners[seq_no] = future
-        return future
-    
-    def register_collector(self, request_id: str) -> str:
-        """注册响应收集器，返回 request_id"""
-        import time
-        if request_id not in self.collectors:
-            self.collectors[request_id] = {
-                'responses': [],
-                'event': asyncio.Event(),
-                'start_time': time.time()  # 记录创建时间
-            }
-        return request_id
-    
-    def get_collected_responses(self, request_id: str) -> list:
-        """获取收集到的所有响应"""
-        if request_id in self.collectors:
-            responses = self.collectors[request_id]['responses']
-            del self.collectors[request_id]
-            return responses
-        return []
-        
-    def cancel(self, seq_no: int, future: asyncio.Future):
-        """取消等待"""
-        if seq_no in self.listeners and self.listeners[seq_no] is future:
-            del self.listeners[seq_no]
-    
-    def cancel_collector(self, request_id: str):
-        """取消收集器"""
-        if request_id in self.collectors:
-            del self.collectors[request_id]
-
-    def has_active_collectors(self) -> bool:
-        """检查是否有活跃的收集器（表示正在处理API请求）"""
-        return len(self.collectors) > 0
-
-    def get_collector_event(self, request_id: str) -> asyncio.Event:
-        """获取收集器的事件对象"""
-        if request_id in self.collectors:
-            return self.collectors[request_id]['event']
-        return None
-            
-    def dispatch(self, data: dict):
-        """分发收到的数据 (线程安全)"""
-        import time
-        seq_no = data.get("seq_no")
-        current_time = time.time()
-        
-        # 1. 处理单序号监听器（用于登录等）
-        if seq_no in self.listeners:
-            future = self.listeners[seq_no]
-            if not future.done():
-                self.loop.call_soon_threadsafe(future.set_result, data)
-            del self.listeners[seq_no]
-        
-        # 2. 将响应添加到所有活跃的收集器（但只添加到创建时间之后的响应）
-        for request_id, collector in list(self.collectors.items()):
-            # 只添加在收集器创建之后到达的响应（允许0.1秒的缓冲）
-            if current_time >= collector['start_time'] - 0.1:
-                collector['responses'].append(data)
-                # 触发事件通知有新响应
-                self.loop.call_soon_threadsafe(collector['event'].set)
-
 # 全局分发器
 dispatcher = ResponseDispatcher()
 
@@ -147,10 +95,68 @@ def set_shared_client(client):
     global shared_client
     shared_client = client
 
+def _publish_game_event(data: dict):
+    """代理转发的游戏服务器响应推送给在线管理员"""
+    if event_hub.has_admin_subscribers():
+        event_hub.publish_to_admins(TOPIC_GAME, data)
+
+# 通过代理转发的 Token / 响应缓存失效事件主题（不推送给前端）
+TOPIC_TOKEN_INVALIDATION = "token_invalidation"
+TOPIC_RESPONSE_CACHE_INVALIDATION = "response_cache_invalidation"
+
+def _publish_unread(user_ids):
+    """未读数变化按用户合并推送，发送时才查询最新计数"""
+    event_hub.publish_to_users(
+        user_ids, TOPIC_UNREAD,
+        lambda user_id: (lambda: Message.get_counters(user_id)),
+        key=TOPIC_UNREAD
+    )
+
+def _relay_event(event: dict):
+    """使用游戏连接代理（多工作进程）时，把本进程产生的事件转发给其他工作进程"""
+    if isinstance(client, GameBrokerClient):
+        client.publish_event(event)
+
+def _on_counters_changed(user_ids):
+    _publish_unread(user_ids)
+    _relay_event({"topic": TOPIC_UNREAD, "user_ids": list(user_ids)})
+
+def _on_participation(event: dict):
+    event_hub.publish_to_admins(TOPIC_PARTICIPATION, event)
+    _relay_event({"topic": TOPIC_PARTICIPATION, "payload": event})
+
+def _on_token_invalidated(kind: str, value):
+    _relay_event({"topic": TOPIC_TOKEN_INVALIDATION, "kind": kind, "value": value})
+
+def _on_response_cache_invalidated(scope):
+    _relay_event({"topic": TOPIC_RESPONSE_CACHE_INVALIDATION, "scope": scope})
+
+def _on_relay_subscribed():
+    """重新订阅时清空 Token 缓存和响应缓存，避免断开期间漏掉的失效"""
+    token_cache.clear()
+    response_cache.clear()
+
+def _apply_relayed_event(event: dict):
+    """其他工作进程转发的事件：推送给本进程的订阅者，或失效本进程的 Token 缓存 / 响应缓存"""
+    topic = event.get("topic")
+    if topic == TOPIC_UNREAD:
+        _publish_unread(event.get("user_ids") or [])
+    elif topic == TOPIC_PARTICIPATION:
+        event_hub.publish_to_admins(TOPIC_PARTICIPATION, event.get("payload"))
+    elif topic == TOPIC_TOKEN_INVALIDATION:
+        if event.get("kind") == "user":
+            token_cache.invalidate_user(event.get("value"), notify=False)
+        elif event.get("value"):
+            token_cache.invalidate_token(event.get("value"), notify=False)
+    elif topic == TOPIC_RESPONSE_CACHE_INVALIDATION:
+        scope = event.get("scope")
+        # 元组形式的数据范围（如 activity_scope）经 JSON 转发后变为列表
+        response_cache.invalidate(tuple(scope) if isinstance(scope, list) else scope, notify=False)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """服务生命周期管理"""
-    global client, account_service, pet_service, equipment_service, gift_service, character_service, game_service
+    global client, account_service, pet_service, equipment_service, gift_service, character_service, game_service, reward_delivery_worker, audit_log_writer, activity_manager, background_startup
     
     # --- 启动逻辑 ---
     # 初始化数据库
@@ -158,14 +164,37 @@ async def lifespan(app: FastAPI):
     logger.info("正在初始化数据库...")
     database.init_database()
     logger.info("数据库初始化完成")
+    activity_manager = get_activity_manager()
+    
+    # 启动操作日志批量写入（同时按保留期定期删除过期的操作日志分区）
+    audit_log_writer = AuditLogWriter()
+    audit_log_writer.start()
     
     # 确保 dispatcher 获取到正确的 loop
     dispatcher.loop = asyncio.get_running_loop()
+    
+    # 实时推送：未读数变化按用户合并，参与事件推送给管理员
+    # 使用游戏连接代理时同时转发给其他工作进程，由其推送给各自的订阅者
+    event_hub.bind_loop(dispatcher.loop)
+    Message.set_counter_listener(_on_counters_changed)
+    activity_manager.set_participation_listener(_on_participation)
 
     
     logger.info("正在初始化 GMTools API 服务...")
     
-    if shared_client:
+    if GAME_BROKER_ADDRESS:
+        # 多工作进程部署：游戏连接和 GM 登录由代理进程持有
+        logger.info(f"使用游戏连接代理: {GAME_BROKER_ADDRESS}")
+        client = GameBrokerClient(GAME_BROKER_ADDRESS)
+        # 其他工作进程的事件、Token 失效和响应缓存失效经代理转发
+        client.start_event_listener(
+            _publish_game_event,
+            app_callback=_apply_relayed_event,
+            on_subscribed=_on_relay_subscribed
+        )
+        token_cache.set_invalidation_listener(_on_token_invalidated)
+        response_cache.set_invalidation_listener(_on_response_cache_invalidated)
+    elif shared_client:
         logger.info("使用共享的 GameClient 实例")
         client = shared_client
         # 注册分发器到共享客户端
@@ -205,54 +234,75 @@ async def lifespan(app: FastAPI):
         service.set_current_account(GM_ACCOUNT)
         
     # 如果是独立连接，则执行登录
-    if not shared_client:
-        logger.info(f"正在尝试登录 GM 账号: {GM_ACCOUNT}...")
-        
-        # 注册登录响应监听
-        login_future = dispatcher.register(7) # 登录成功
-        login_fail_future = dispatcher.register(999) # 登录失败
-        
-        # 发送登录请求
-        if client.send_login(GM_ACCOUNT, GM_PASSWORD):
-            try:
-                # 等待登录响应，超时时间 10 秒
-                done, pending = await asyncio.wait(
-                    [login_future, login_fail_future], 
-                    return_when=asyncio.FIRST_COMPLETED,
-                    timeout=10.0
-                )
-                
-                if login_future in done:
-                    logger.info(f"GM 账号登录验证通过，API 服务准备就绪")
-                elif login_fail_future in done:
-                    logger.warning(f"警告: GM 账号登录失败")
-                else:
-                    logger.warning("警告: 登录响应超时")
-                    
-            except Exception as e:
-                 logger.error(f"登录过程异常: {e}")
-        else:
-            logger.error("错误: 发送登录请求失败")
-            
-        # 清理未完成的 future
-        dispatcher.cancel(7, login_future)
-        dispatcher.cancel(999, login_fail_future)
+    if GAME_BROKER_ADDRESS:
+        logger.info("使用游戏连接代理，GM 账号由代理登录")
+    elif not shared_client:
+        if await login_gm(client, dispatcher, GM_ACCOUNT, GM_PASSWORD):
+            logger.info("API 服务准备就绪")
     else:
         logger.info("使用共享连接，跳过 API 独立登录")
 
+    # 启动活动奖励异步发放任务
+    reward_delivery_worker = RewardDeliveryWorker(activity_manager)
+    reward_delivery_worker.start()
+
+    # 报表快照服务和其余路由在开始处理请求之后加载
+    background_startup = asyncio.create_task(_background_startup())
+
     yield
 
     # --- 关闭逻辑 ---
-    if client and not shared_client:
+    if background_startup and not background_startup.done():
+        background_startup.cancel()
+    analytics_module = sys.modules.get("services.analytics_snapshot")
+    if analytics_module is not None:
+        await analytics_module.analytics_snapshots.stop()
+    
+    if reward_delivery_worker:
+        await reward_delivery_worker.stop()
+    
+    Message.set_counter_listener(None)
+    activity_manager.set_participation_listener(None)
+    token_cache.set_invalidation_listener(None)
+    response_cache.set_invalidation_listener(None)
+    
+    # 写入缓冲区中剩余的操作日志
+    if audit_log_writer:
+        await audit_log_writer.stop()
+    
+    # 等待进行中的密码哈希完成
+    await asyncio.to_thread(password_hasher.shutdown)
+
+    if isinstance(client, GameBrokerClient):
+        await client.close()
+    elif client and not shared_client:
         print("正在断开与游戏服务器的连接...")
         client.disconnect()
 
+async def _background_startup():
+    """启动报表分析快照定时刷新，并预加载其余路由"""
+    try:
+        analytics_module = await asyncio.to_thread(importlib.import_module, "services.analytics_snapshot")
+        analytics_module.analytics_snapshots.start()
+    except Exception as e:
+        logger.error(f"启动报表分析快照失败: {e}")
+    await lazy_routers.preload()
+
 # 创建 FastAPI 应用
 app = FastAPI(
     title="GMTools API",
     description="梦江南超级GM工具 RESTful API",
     version="2.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
+)
+
+# 响应压缩（按 Accept-Encoding 协商 br / gzip）
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=RESPONSE_COMPRESSION_MIN_SIZE,
+    gzip_level=RESPONSE_GZIP_LEVEL,
+    brotli_quality=RESPONSE_BROTLI_QUALITY
 )
 
 # CORS middleware
@@ -265,22 +315,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-
-# 注册用户管理路由
-from routes.user_routes import router as user_router
-app.include_router(user_router)
-
-# 注册活动管理路由
-from routes.activity_routes import activity_router, activity_manager
-app.include_router(activity_router)
-
-# 注册消息管理路由
-from routes.message_routes import router as message_router
-app.include_router(message_router)
-
-# 注册道具赠送管理路由
-from routes.item_gift_routes import router as item_gift_router
-app.include_router(item_gift_router, prefix="/api", tags=["Item Gift"])
+# 按需注册的路由模块：(路径前缀, 模块, 路由变量名, include_router 参数)
+lazy_routers = LazyRouterRegistry(app)
+# 用户管理
+lazy_routers.register(("/api/users",), "routes.user_routes")
+# 活动管理
+lazy_routers.register(("/api/activity",), "routes.activity_routes", "activity_router")
+# 消息管理
+lazy_routers.register(("/api/messages",), "routes.message_routes")
+# 道具赠送管理
+lazy_routers.register(
+    ("/api/item-configs", "/api/item-level-limits", "/api/items"), "routes.item_gift_routes",
+    prefix="/api", tags=["Item Gift"]
+)
+# 实时推送
+lazy_routers.register(("/api/events",), "routes.event_routes")
+# 报表统计
+lazy_routers.register(("/api/analytics",), "routes.analytics_routes")
+# 权限管理
+lazy_routers.register(("/api/permissions", "/api/levels"), "routes.permission_routes")
+# 等级配置管理
+lazy_routers.register(("/api/level-configs",), "routes.level_config_routes")
+app.add_middleware(LazyRouterMiddleware, registry=lazy_routers)
 
 @app.middleware("http")
 
@@ -336,7 +392,8 @@ async def activation_codes():
 
 async def handle_service_request(service, request: ModuleRequest):
     """通用服务请求处理"""
-    if not client or not client.connected:
+    # 代理客户端按需连接，连接失败时 send_command 返回 False
+    if not isinstance(client, GameBrokerClient) and (not client or not client.connected):
         if not client.connect(SERVER_HOST, SERVER_PORT):
             raise HTTPException(status_code=503, detail="Game server not connected")
     if not hasattr(service, request.function):
@@ -367,18 +424,6 @@ async def handle_service_request(service, request: ModuleRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-# 注册权限管理路由
-from routes.permission_routes import router as permission_router
-app.include_router(permission_router)
-
-# 注册等级配置管理路由
-from routes.level_config_routes import router as level_config_router
-app.include_router(level_config_router)
-
-# 注册活动管理路由
-from routes.activity_routes import activity_router
-app.include_router(activity_router)
-
 # 导入权限检查
 from auth.permission_checker import require_permission, has_permission
 
@@ -614,6 +659,8 @@ async def generate_activation_codes(
         raise HTTPException(status_code=403, detail="权限不足")
     
     codes = ActivationCode.create(level, expires_days, count)
+    # 等级配置列表中包含激活码数量统计
+    response_cache.invalidate(SCOPE_LEVEL_CONFIGS)
     return {
         "status": "success",
         "data": [code.to_dict() for code in codes],
@@ -621,6 +668,50 @@ async def generate_activation_codes(
     }
 
 
+# 单次批量生成激活码的数量上限
+ACTIVATION_BULK_MAX = 1000000
+
+
+@app.post("/api/activation/generate/csv")
+async def generate_activation_codes_csv(
+    level: int = Body(..., embed=True),
+    count: int = Body(default=1, embed=True),
+    expires_days: int = Body(default=30, embed=True),
+    current_user: AuthUser = Depends(get_current_active_user)
+):
+    """
+    批量生成激活码并以 CSV 文件流式下载
+    """
+    if current_user.role not in ["admin", "super_admin"]:
+        raise HTTPException(status_code=403, detail="权限不足")
+    if count < 1 or count > ACTIVATION_BULK_MAX:
+        raise HTTPException(status_code=400, detail=f"生成数量必须在 1 到 {ACTIVATION_BULK_MAX} 之间")
+    
+    created, batch_id = await asyncio.to_thread(ActivationCode.create_bulk, level, expires_days, count)
+    response_cache.invalidate(SCOPE_LEVEL_CONFIGS)
+    AuditLog.create(
+        user_id=current_user.id,
+        action="ACTIVATION_CODES_GENERATE",
+        resource="activation_codes",
+        details=f"批量生成 {created} 个等级 {level} 的激活码"
+    )
+    
+    def csv_rows():
+        yield "code,level,expires_days\n"
+        for codes in ActivationCode.iter_batch_codes(batch_id):
+            yield "".join(f"{code},{level},{expires_days}\n" for code in codes)
+    
+    filename = f"activation_codes_L{level}_{datetime.now().strftime('%Y-%m-%d_%H%M%S')}.csv"
+    return StreamingResponse(
+        csv_rows(),
+        media_type="text/csv",
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Generated-Count": str(created)
+        }
+    )
+
+
 @app.get("/api/activation/list")
 async def get_activation_codes(
     page: int = 1,
@@ -678,10 +769,10 @@ async def get_activation_codes(
 @app.post("/api/activation/use")
 async def use_activation_code(
     code: str = Body(..., embed=True),
-    current_user: AuthUser = Depends(get_current_active_user)
+    current_user: AuthUser = Depends(rate_limit_user(user_action_limiter))
 ):
     """
-    使用激活码
+    使用激活码（按用户限流，防止穷举激活码）
     """
     # 禁止管理员使用激活码，避免权限被意外降低
     if current_user.role in ["admin", "super_admin"]:
@@ -693,10 +784,11 @@ async def use_activation_code(
         raise HTTPException(status_code=400, detail="激活码无效或已过期")
     
     # 更新用户等级
-    user = User.get_by_id(current_user.id)
+    user = AuthUser.get_by_id(current_user.id)
     if user:
         user.level = new_level
         user.update()
+    response_cache.invalidate(SCOPE_LEVEL_CONFIGS)
     
     return {
         "status": "success",
@@ -720,6 +812,7 @@ async def delete_activation_code(
     success = ActivationCode.delete(code)
     if not success:
         raise HTTPException(status_code=400, detail="删除失败")
+    response_cache.invalidate(SCOPE_LEVEL_CONFIGS)
     
     return {
         "status": "success",
@@ -727,22 +820,43 @@ async def delete_activation_code(
     }
 
 
+@app.get("/api/rate-limits")
+async def get_rate_limits(
+    current_user: AuthUser = Depends(get_current_active_user)
+):
+    """
+    获取各限流器的放行/拒绝计数（管理员）
+    """
+    if current_user.role not in ["admin", "super_admin"]:
+        raise HTTPException(status_code=403, detail="权限不足")
+    
+    return {
+        "status": "success",
+        "data": {
+            "rate_limits": get_rate_limit_stats(),
+            "password_hasher": password_hasher.get_stats(),
+            "response_cache": response_cache.get_stats()
+        }
+    }
+
+
 @app.get("/api/permissions/all")
 async def get_all_permissions(
+    request: Request,
     current_user: AuthUser = Depends(get_current_active_user)
 ):
     """
     获取所有权限列表
     """
-    permissions = Permission.get_all()
-    return {
+    return response_cache.respond(request, SCOPE_PERMISSIONS, lambda: {
         "status": "success",
-        "data": [perm.to_dict() for perm in permissions]
-    }
+        "data": [perm.to_dict() for perm in Permission.get_all()]
+    })
 
 
 @app.get("/api/permissions/level/{level}")
 async def get_level_permissions(
+    request: Request,
     level: int,
     current_user: AuthUser = Depends(get_current_active_user)
 ):
@@ -753,16 +867,49 @@ async def get_level_permissions(
     if level < 1 or level > 10:
         raise HTTPException(status_code=400, detail="level必须在1-10之间")
     
-    permissions = LevelPermission.get_level_permissions(level)
-    return {
+    return response_cache.respond(request, SCOPE_LEVEL_PERMISSIONS, lambda: {
         "status": "success",
-        "data": permissions
-    }
+        "data": LevelPermission.get_level_permissions(level)
+    })
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="GMTools API Service")
     parser.add_argument("--host", type=str, default="0.0.0.0", help="Host to bind")
     parser.add_argument("--port", type=int, default=8000, help="Port to bind")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes")
+    parser.add_argument(
+        "--broker", type=str, default=GAME_BROKER_ADDRESS,
+        help="Game broker address (unix socket path or host:port); started automatically when --workers > 1"
+    )
     args = parser.parse_args()
     
-    uvicorn.run("api_main:app", host=args.host, port=args.port, reload=False, log_level="info")
+    broker_address = args.broker
+    broker_process = None
+    if args.workers > 1 and not broker_address:
+        # 多工作进程时启动游戏连接代理，由代理持有唯一的游戏服务器连接
+        import subprocess
+        broker_address = DEFAULT_BROKER_ADDRESS
+        broker_process = subprocess.Popen(
+            [sys.executable, "-m", "services.game_broker", "--address", broker_address],
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        if not wait_until_ready(broker_address, timeout=30.0):
+            broker_process.terminate()
+            sys.exit(f"游戏连接代理启动失败: {broker_address}")
+    
+    if broker_address:
+        # 工作进程通过环境变量读取代理地址（单进程时直接修改已加载的配置）
+        os.environ["GMTOOLS_GAME_BROKER"] = broker_address
+        import config.settings
+        config.settings.GAME_BROKER_ADDRESS = broker_address
+    
+    import uvicorn
+    try:
+        uvicorn.run(
+            "api_main:app", host=args.host, port=args.port,
+            workers=args.workers, reload=False, log_level="info"
+        )
+    finally:
+        if broker_process:
+            broker_process.terminate()
+            broker_process.wait(timeout=10)
@@ -9,6 +9,7 @@ from typing import Optional, Dict, Any
 import jwt
 import bcrypt
 import logging
+from config.settings import BCRYPT_ROUNDS
 
 logger = logging.getLogger(__name__)
 
@@ -23,8 +24,8 @@ class AuthUtils:
     
     @staticmethod
     def hash_password(password: str) -> str:
-        """哈希密码"""
-        salt = bcrypt.gensalt()
+        """哈希密码（耗时与成本因子成指数关系，在线程池中调用，见 auth.password_hasher）"""
+        salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
         hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
         return hashed.decode('utf-8')
     
@@ -40,6 +41,14 @@ class AuthUtils:
             logger.error(f"密码验证失败: {e}")
             return False
     
+    @staticmethod
+    def needs_rehash(hashed_password: str) -> bool:
+        """密码哈希的成本因子与当前配置不一致时需要重新哈希"""
+        try:
+            return int(hashed_password.split('$')[2]) != BCRYPT_ROUNDS
+        except (AttributeError, IndexError, ValueError):
+            return False
+    
     @staticmethod
     def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
         """创建 JWT Token"""
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+密码哈希线程池
+bcrypt 计算放到专用线程池执行（bcrypt 计算期间释放 GIL），不占用事件循环线程；
+排队数量和单个 IP 同时进行的计算数量都有上限，超出时直接拒绝而不是无限排队
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Callable
+
+from auth import AuthUtils
+from config.settings import PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING, PASSWORD_HASH_PER_IP
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHasherBusy(Exception):
+    """哈希任务被拒绝（排队已满或单个 IP 并发超限）"""
+
+    def __init__(self, message: str, per_ip: bool, retry_after: int = 1):
+        super().__init__(message)
+        self.per_ip = per_ip
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """有界的密码哈希线程池"""
+
+    def __init__(
+        self,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_pending: int = PASSWORD_HASH_MAX_PENDING,
+        per_ip_limit: int = PASSWORD_HASH_PER_IP
+    ):
+        """
+        :param workers: 线程数
+        :param max_pending: 正在计算和排队的任务总数上限
+        :param per_ip_limit: 单个 IP 正在计算和排队的任务数上限，0 表示不限制
+        """
+        self.workers = workers
+        self.max_pending = max_pending
+        self.per_ip_limit = per_ip_limit
+
+        self.completed_count = 0
+        self.rejected_busy = 0
+        self.rejected_ip = 0
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        self._per_ip: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    async def hash(self, password: str, client_ip: Optional[str] = None) -> str:
+        """哈希密码"""
+        return await self._submit(client_ip, AuthUtils.hash_password, password)
+
+    async def verify(self, password: str, hashed_password: str, client_ip: Optional[str] = None) -> bool:
+        """验证密码"""
+        return await self._submit(client_ip, AuthUtils.verify_password, password, hashed_password)
+
+    def shutdown(self):
+        """关闭线程池（等待已提交的任务完成）"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "pending": self._pending,
+                "active_ips": len(self._per_ip),
+                "completed": self.completed_count,
+                "rejected_busy": self.rejected_busy,
+                "rejected_ip": self.rejected_ip
+            }
+
+    async def _submit(self, client_ip: Optional[str], func: Callable, *args):
+        with self._lock:
+            if client_ip and self.per_ip_limit and self._per_ip.get(client_ip, 0) >= self.per_ip_limit:
+                self.rejected_ip += 1
+                raise PasswordHasherBusy("请求过于频繁，请稍后再试", per_ip=True)
+            if self._pending >= self.max_pending:
+                self.rejected_busy += 1
+                raise PasswordHasherBusy("服务器繁忙，请稍后再试", per_ip=False)
+            self._pending += 1
+            if client_ip:
+                self._per_ip[client_ip] = self._per_ip.get(client_ip, 0) + 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+            executor = self._executor
+
+        def job():
+            # 在工作线程中释放名额：请求被取消时已排队的任务仍会执行，名额需一直占用到执行结束
+            try:
+                return func(*args)
+            finally:
+                self._release(client_ip)
+
+        try:
+            future = executor.submit(job)
+        except RuntimeError:
+            self._release(client_ip)
+            raise
+        return await asyncio.wrap_future(future)
+
+    def _release(self, client_ip: Optional[str]):
+        with self._lock:
+            self._pending -= 1
+            self.completed_count += 1
+            if client_ip:
+                remaining = self._per_ip.get(client_ip, 1) - 1
+                if remaining > 0:
+                    self._per_ip[client_ip] = remaining
+                else:
+                    self._per_ip.pop(client_ip, None)
+
+
+# 全局密码哈希线程池
+password_hasher = PasswordHasher()
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+令牌桶限流
+按 IP、账号、用户、游戏 ID 等维度限制请求频率，以 FastAPI 依赖项的形式挂在热点路由上。
+限流检查在任何数据库查询和密码哈希之前执行，被拒绝的请求几乎没有开销。
+
+状态存储：
+- memory: 进程内分片字典，空闲的桶（已补满）在访问分片时顺带清理
+- sqlite: rate_limit_buckets 表，多个工作进程共享，每次检查一条 UPSERT 语句
+"""
+
+import logging
+import threading
+import time
+import zlib
+from typing import Optional, Dict, Any, List, Tuple, Callable, Awaitable
+
+from fastapi import Depends, HTTPException, Request, status
+
+from auth.dependencies import get_client_ip, get_current_active_user
+from config.settings import (
+    RATE_LIMIT_LOGIN_IP, RATE_LIMIT_LOGIN_ACCOUNT, RATE_LIMIT_PARTICIPATE_IP,
+    RATE_LIMIT_PARTICIPATE_GAME_ID, RATE_LIMIT_USER_ACTION, RATE_LIMIT_BACKEND
+)
+from database.connection import db
+from database.models import User
+
+logger = logging.getLogger(__name__)
+
+# 分片数量（每个分片一把锁）
+SHARD_COUNT = 16
+# 每个分片每处理多少次请求清理一次空闲的桶
+SWEEP_INTERVAL = 1024
+
+
+class TokenBucketLimiter:
+    """令牌桶限流器：容量 burst，每秒补充 rate 个令牌"""
+
+    def __init__(self, name: str, burst: float, rate: float, backend: str = RATE_LIMIT_BACKEND):
+        self.name = name
+        self.burst = burst
+        self.rate = rate
+        self.backend = backend
+        # 桶从空到满所需时间，超过该时间未访问的桶与新桶等价，可以删除
+        self.idle_seconds = burst / rate if rate > 0 else 3600
+
+        self.allowed_count = 0
+        self.rejected_count = 0
+        self._sqlite_calls = 0
+
+        self._shards: List[Tuple[threading.Lock, Dict[str, List[float]]]] = [
+            (threading.Lock(), {}) for _ in range(SHARD_COUNT)
+        ]
+        self._shard_calls = [0] * SHARD_COUNT
+
+    @property
+    def enabled(self) -> bool:
+        return self.burst > 0
+
+    def acquire(self, key: str, cost: float = 1) -> Tuple[bool, int]:
+        """
+        消耗令牌
+        返回: (是否放行, 建议重试等待秒数)
+        """
+        if not self.enabled:
+            return True, 0
+        now = time.time()
+        if self.backend == "sqlite":
+            allowed = self._acquire_sqlite(key, cost, now)
+        else:
+            allowed = self._acquire_memory(key, cost, now)
+
+        # 计数不加锁：只用于统计，少量竞争误差可以接受
+        if allowed:
+            self.allowed_count += 1
+            return True, 0
+        self.rejected_count += 1
+        return False, max(1, int(cost / self.rate + 0.999)) if self.rate > 0 else 60
+
+    def _acquire_memory(self, key: str, cost: float, now: float) -> bool:
+        index = zlib.crc32(key.encode('utf-8')) % SHARD_COUNT
+        lock, buckets = self._shards[index]
+        with lock:
+            self._shard_calls[index] += 1
+            if self._shard_calls[index] % SWEEP_INTERVAL == 0:
+                self._sweep(buckets, now)
+
+            bucket = buckets.get(key)
+            if bucket is None:
+                tokens = self.burst
+            else:
+                tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            if tokens < cost:
+                return False
+            if bucket is None:
+                buckets[key] = [tokens - cost, now]
+            else:
+                bucket[0] = tokens - cost
+                bucket[1] = now
+            return True
+
+    def _sweep(self, buckets: Dict[str, List[float]], now: float):
+        # 调用方持有分片锁
+        deadline = now - self.idle_seconds
+        for key in [key for key, bucket in buckets.items() if bucket[1] <= deadline]:
+            del buckets[key]
+
+    def _acquire_sqlite(self, key: str, cost: float, now: float) -> bool:
+        """
+        一条 UPSERT 完成补充和扣减：令牌不足时 WHERE 不成立，不更新也不返回行
+        数据库异常时放行（限流不应导致服务不可用）
+        """
+        bucket = f"{self.name}:{key}"
+        try:
+            with db.get_cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO rate_limit_buckets (bucket, tokens, updated_at)
+                    VALUES (:bucket, :burst - :cost, :now)
+                    ON CONFLICT(bucket) DO UPDATE SET
+                        tokens = MIN(:burst, tokens + (:now - updated_at) * :rate) - :cost,
+                        updated_at = :now
+                    WHERE MIN(:burst, tokens + (:now - updated_at) * :rate) >= :cost
+                    RETURNING tokens
+                """, {"bucket": bucket, "burst": self.burst, "rate": self.rate, "cost": cost, "now": now})
+                allowed = cursor.fetchone() is not None
+
+                self._sqlite_calls += 1
+                if self._sqlite_calls % SWEEP_INTERVAL == 0:
+                    cursor.execute(
+                        "DELETE FROM rate_limit_buckets WHERE updated_at <= ? AND bucket >= ? AND bucket < ?",
+                        (now - self.idle_seconds, f"{self.name}:", f"{self.name};")
+                    )
+                return allowed
+        except Exception as e:
+            logger.error(f"限流检查失败 ({self.name}): {e}")
+            return True
+
+    def refund(self, key: str, cost: float = 1):
+        """
+        退还已消耗的令牌（不超过桶容量），用于只对失败的请求计数的场景（如登录成功后退还）
+        """
+        if not self.enabled:
+            return
+        if self.backend == "sqlite":
+            try:
+                with db.get_cursor() as cursor:
+                    cursor.execute(
+                        "UPDATE rate_limit_buckets SET tokens = MIN(?, tokens + ?) WHERE bucket = ?",
+                        (self.burst, cost, f"{self.name}:{key}")
+                    )
+            except Exception as e:
+                logger.error(f"退还令牌失败 ({self.name}): {e}")
+            return
+        index = zlib.crc32(key.encode('utf-8')) % SHARD_COUNT
+        lock, buckets = self._shards[index]
+        with lock:
+            bucket = buckets.get(key)
+            if bucket is not None:
+                bucket[0] = min(self.burst, bucket[0] + cost)
+
+    def reset(self, key: Optional[str] = None):
+        """清除限流状态（key 为空时清除全部）"""
+        if self.backend == "sqlite":
+            try:
+                with db.get_cursor() as cursor:
+                    if key is None:
+                        cursor.execute(
+                            "DELETE FROM rate_limit_buckets WHERE bucket >= ? AND bucket < ?",
+                            (f"{self.name}:", f"{self.name};")
+                        )
+                    else:
+                        cursor.execute("DELETE FROM rate_limit_buckets WHERE bucket = ?", (f"{self.name}:{key}",))
+            except Exception as e:
+                logger.error(f"清除限流状态失败 ({self.name}): {e}")
+            return
+        for lock, buckets in self._shards:
+            with lock:
+                if key is None:
+                    buckets.clear()
+                else:
+                    buckets.pop(key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = {
+            "name": self.name,
+            "burst": self.burst,
+            "rate": self.rate,
+            "backend": self.backend,
+            "allowed": self.allowed_count,
+            "rejected": self.rejected_count
+        }
+        if self.backend == "memory":
+            stats["buckets"] = sum(len(buckets) for _, buckets in self._shards)
+        return stats
+
+
+def _too_many_requests(retry_after: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="请求过于频繁，请稍后再试",
+        headers={"Retry-After": str(retry_after)}
+    )
+
+
+# ==================== 限流键 ====================
+
+async def ip_key(request: Request) -> Optional[str]:
+    """按客户端 IP 限流"""
+    return get_client_ip(request)
+
+
+def body_key(field: str) -> Callable[[Request], Awaitable[Optional[str]]]:
+    """
+    按 JSON 请求体中的字段限流（如登录用户名、游戏 ID）
+    请求体已由 FastAPI 解析并缓存在 request 上，这里不会重复读取
+    """
+    async def key(request: Request) -> Optional[str]:
+        try:
+            data = await request.json()
+        except Exception:
+            return None
+        value = data.get(field) if isinstance(data, dict) else None
+        if value is None or value == "":
+            return None
+        return str(value).strip().lower()
+
+    return key
+
+
+def ip_body_key(field: str) -> Callable[[Request], Awaitable[Optional[str]]]:
+    """
+    按 (客户端 IP, JSON 请求体字段) 限流（如登录用户名）
+    只按字段限流时任何人都能用错误密码耗尽他人账号的令牌，加上 IP 后只影响发起请求的客户端
+    """
+    field_key = body_key(field)
+
+    async def key(request: Request) -> Optional[str]:
+        value = await field_key(request)
+        if value is None:
+            return None
+        return f"{get_client_ip(request)}:{value}"
+
+    return key
+
+
+# ==================== 依赖项 ====================
+
+def rate_limit(limiter: TokenBucketLimiter, key_func: Callable[[Request], Awaitable[Optional[str]]]) -> Callable:
+    """
+    限流依赖项工厂
+
+    Usage:
+        @router.post("/login", dependencies=[Depends(rate_limit(login_ip_limiter, ip_key))])
+    """
+    async def limit_checker(request: Request):
+        key = await key_func(request)
+        if key is None:
+            return
+        allowed, retry_after = limiter.acquire(key)
+        if not allowed:
+            raise _too_many_requests(retry_after)
+
+    return limit_checker
+
+
+def rate_limit_user(limiter: TokenBucketLimiter) -> Callable:
+    """
+    按当前登录用户限流的依赖项工厂，返回当前用户，可替代 get_current_active_user
+
+    Usage:
+        current_user: User = Depends(rate_limit_user(user_action_limiter))
+    """
+    async def user_limit_checker(
+        current_user: User = Depends(get_current_active_user)
+    ) -> User:
+        allowed, retry_after = limiter.acquire(str(current_user.id))
+        if not allowed:
+            raise _too_many_requests(retry_after)
+        return current_user
+
+    return user_limit_checker
+
+
+# ==================== 全局限流器 ====================
+
+login_ip_limiter = TokenBucketLimiter("login_ip", *RATE_LIMIT_LOGIN_IP)
+login_account_limiter = TokenBucketLimiter("login_account", *RATE_LIMIT_LOGIN_ACCOUNT)
+participate_ip_limiter = TokenBucketLimiter("participate_ip", *RATE_LIMIT_PARTICIPATE_IP)
+participate_game_id_limiter = TokenBucketLimiter("participate_game_id", *RATE_LIMIT_PARTICIPATE_GAME_ID)
+user_action_limiter = TokenBucketLimiter("user_action", *RATE_LIMIT_USER_ACTION)
+
+rate_limiters = [
+    login_ip_limiter,
+    login_account_limiter,
+    participate_ip_limiter,
+    participate_game_id_limiter,
+    user_action_limiter
+]
+
+
+def get_rate_limit_stats() -> List[Dict[str, Any]]:
+    """所有限流器的计数"""
+    return [limiter.get_stats() for limiter in rate_limiters]
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+已验证 Token 缓存
+同一个 Token 在有效期内会被前端反复携带，缓存 Token 摘要 -> (解码后的 payload, 用户信息)，
+命中时跳过 JWT 签名校验和用户查询；用户信息变化（修改密码、禁用、删除等）时按用户失效。
+多个工作进程时由 api_main 设置失效回调，通过游戏连接代理把失效转发给其他进程
+"""
+
+import copy
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple, Set, Callable
+
+from config.settings import TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL
+from database.models import User
+
+logger = logging.getLogger(__name__)
+
+
+class TokenCache:
+    """有界 LRU 缓存，条目在 Token 过期或缓存有效期到期时失效"""
+
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE, ttl: int = TOKEN_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+
+        # 摘要 -> (失效时间戳, payload, 用户)
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any], User]]" = OrderedDict()
+        self._by_user: Dict[int, Set[str]] = {}
+        # 用户失效代数：查询用户期间发生失效时，不缓存查询到的旧数据
+        self._generations: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        # 本进程发起失效时的回调 listener(kind, value)，kind 为 "user" 或 "token"
+        self._invalidation_listener: Optional[Callable[[str, Any], None]] = None
+
+    @staticmethod
+    def digest(token: str) -> str:
+        """Token 的 SHA-256 摘要（缓存键和会话表中只保存摘要）"""
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def get(self, digest: str) -> Optional[Tuple[Dict[str, Any], User]]:
+        """返回 (payload, 用户副本)，未命中或已失效返回 None"""
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, payload, user = entry
+            if expires_at <= time.time():
+                self._remove(digest)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+        # 返回副本，路由修改当前用户对象时不影响缓存
+        return payload, copy.copy(user)
+
+    def generation(self, user_id: int) -> int:
+        """读取用户失效代数，在查询用户之前调用，并在 put 时传回"""
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def put(self, digest: str, payload: Dict[str, Any], user: User, generation: int):
+        """缓存已验证的 Token；查询期间用户已失效（代数变化）时不缓存"""
+        if self.max_size <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, exp)
+        with self._lock:
+            if self._generations.get(user.id, 0) != generation:
+                return
+            if digest in self._entries:
+                self._remove(digest)
+            self._entries[digest] = (expires_at, payload, copy.copy(user))
+            self._by_user.setdefault(user.id, set()).add(digest)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def set_invalidation_listener(self, listener: Optional[Callable[[str, Any], None]]):
+        """设置失效回调（转发给其他工作进程）"""
+        self._invalidation_listener = listener
+
+    def invalidate_token(self, digest: str, notify: bool = True):
+        """失效单个 Token；notify=False 用于应用其他进程转发的失效"""
+        with self._lock:
+            if digest in self._entries:
+                self._remove(digest)
+        if notify:
+            self._notify("token", digest)
+
+    def invalidate_user(self, user_id: int, notify: bool = True):
+        """失效用户的全部 Token；notify=False 用于应用其他进程转发的失效"""
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            for digest in self._by_user.pop(user_id, ()):
+                self._entries.pop(digest, None)
+        if notify:
+            self._notify("user", user_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+            self._generations.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0
+            }
+
+    def _notify(self, kind: str, value: Any):
+        listener = self._invalidation_listener
+        if listener:
+            try:
+                listener(kind, value)
+            except Exception as e:
+                logger.error(f"Token 缓存失效回调失败: {e}")
+
+    def _remove(self, digest: str):
+        # 调用方持有锁
+        _, _, user = self._entries.pop(digest)
+        digests = self._by_user.get(user.id)
+        if digests is not None:
+            digests.discard(digest)
+            if not digests:
+                del self._by_user[user.id]
+
+
+# 全局已验证 Token 缓存
+token_cache = TokenCache()
+User.set_change_listener(token_cache.invalidate_user)
@@ -5,9 +5,12 @@
 """
 
 from typing import Optional, Tuple
-from datetime import timedelta
-from database.models import User, AuditLog
-from auth import AuthUtils
+from datetime import datetime, timedelta
+from database.models import User, AuditLog, UserSession
+from auth import AuthUtils, ACCESS_TOKEN_EXPIRE_MINUTES
+from auth.password_hasher import password_hasher, PasswordHasherBusy
+from auth.token_cache import token_cache
+from config.settings import TOKEN_SESSION_REVOCATION, EVENT_STREAM_TICKET_TTL
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,16 +20,18 @@ class UserAuthService:
     """用户认证服务"""
     
     @staticmethod
-    def register(
+    async def register(
         username: str,
         email: str,
         password: str,
         level: int = 1,
-        role: str = "user"
+        role: str = "user",
+        client_ip: Optional[str] = None
     ) -> Tuple[bool, Optional[User], Optional[str]]:
         """
         注册新用户
         返回: (成功标志, 用户对象, 错误消息)
+        密码哈希繁忙时抛出 PasswordHasherBusy
         """
         # 验证用户名是否已存在
         if User.get_by_username(username):
@@ -41,7 +46,7 @@ class UserAuthService:
             return False, None, "密码长度至少为 6 位"
         
         # 哈希密码
-        password_hash = AuthUtils.hash_password(password)
+        password_hash = await password_hasher.hash(password, client_ip)
         
         # 创建用户
         user = User.create(
@@ -65,10 +70,15 @@ class UserAuthService:
             return False, None, "创建用户失败"
     
     @staticmethod
-    def login(username: str, password: str) -> Tuple[bool, Optional[str], Optional[User], Optional[str]]:
+    async def login(
+        username: str,
+        password: str,
+        client_ip: Optional[str] = None
+    ) -> Tuple[bool, Optional[str], Optional[User], Optional[str]]:
         """
         用户登录
         返回: (成功标志, JWT Token, 用户对象, 错误消息)
+        密码哈希繁忙时抛出 PasswordHasherBusy
         """
         # 获取用户
         user = User.get_by_username(username)
@@ -81,9 +91,17 @@ class UserAuthService:
             return False, None, None, "账号已被禁用"
         
         # 验证密码
-        if not AuthUtils.verify_password(password, user.password_hash):
+        if not await password_hasher.verify(password, user.password_hash, client_ip):
             return False, None, None, "用户名或密码错误"
         
+        # 成本因子配置变化后，用本次登录的明文密码按新成本重新哈希
+        if AuthUtils.needs_rehash(user.password_hash):
+            try:
+                user.update_password(await password_hasher.hash(password))
+            except PasswordHasherBusy:
+                # 繁忙时跳过，下次登录再升级
+                pass
+        
         # 生成 JWT Token
         token_data = {
             "sub": user.username,
@@ -92,6 +110,12 @@ class UserAuthService:
         }
         access_token = AuthUtils.create_access_token(token_data)
         
+        # 启用会话撤销时记录会话，之后只有存在会话的 Token 才能通过验证
+        if TOKEN_SESSION_REVOCATION:
+            expires_at = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+            if not UserSession.create(user.id, token_cache.digest(access_token), expires_at):
+                return False, None, None, "登录失败，请稍后再试"
+        
         # 更新最后登录时间
         user.update_last_login()
         
@@ -104,16 +128,29 @@ class UserAuthService:
         """
         验证 Token
         返回: (成功标志, 用户对象, 错误消息)
+        已验证的 Token 缓存在 token_cache 中，命中时不再校验签名和查询用户
         """
+        digest = token_cache.digest(token)
+        cached = token_cache.get(digest)
+        if cached:
+            return True, cached[1], None
+        
         payload = AuthUtils.verify_token(token)
         
         if not payload:
             return False, None, "Token 无效或已过期"
         
         username = payload.get("sub")
-        if not username:
+        # 带 scope 的是专用票据（如事件流票据），不能当作访问令牌使用
+        if not username or payload.get("scope"):
             return False, None, "Token 格式错误"
         
+        # 先取失效代数再查询，查询期间用户被修改时不缓存旧数据
+        generation = token_cache.generation(payload.get("user_id"))
+        
+        if TOKEN_SESSION_REVOCATION and not UserSession.exists(digest):
+            return False, None, "会话已失效，请重新登录"
+        
         user = User.get_by_username(username)
         if not user:
             return False, None, "用户不存在"
@@ -121,17 +158,66 @@ class UserAuthService:
         if not user.is_active:
             return False, None, "账号已被禁用"
         
+        if user.id == payload.get("user_id"):
+            token_cache.put(digest, payload, user, generation)
+        
+        return True, user, None
+    
+    @staticmethod
+    def create_stream_ticket(user: User) -> str:
+        """签发实时事件流票据：仅能用于 /api/events/stream，有效期 EVENT_STREAM_TICKET_TTL 秒"""
+        return AuthUtils.create_access_token(
+            {"user_id": user.id, "scope": "event_stream"},
+            expires_delta=timedelta(seconds=EVENT_STREAM_TICKET_TTL)
+        )
+    
+    @staticmethod
+    def verify_stream_ticket(ticket: str) -> Tuple[bool, Optional[User], Optional[str]]:
+        """
+        验证实时事件流票据
+        返回: (成功标志, 用户对象, 错误消息)
+        """
+        payload = AuthUtils.verify_token(ticket)
+        if not payload or payload.get("scope") != "event_stream":
+            return False, None, "票据无效或已过期"
+        
+        user = User.get_by_id(payload.get("user_id"))
+        if not user:
+            return False, None, "用户不存在"
+        
+        if not user.is_active:
+            return False, None, "账号已被禁用"
+        
         return True, user, None
     
     @staticmethod
-    def change_password(
+    def logout(token: str) -> bool:
+        """退出登录：删除会话并失效 Token 缓存（未启用会话撤销时 Token 在过期前仍然有效）"""
+        digest = token_cache.digest(token)
+        token_cache.invalidate_token(digest)
+        if not TOKEN_SESSION_REVOCATION:
+            return False
+        return UserSession.delete_by_token(digest) > 0
+    
+    @staticmethod
+    def revoke_sessions(user_id: int) -> int:
+        """撤销用户的全部会话，返回撤销数量"""
+        token_cache.invalidate_user(user_id)
+        if not TOKEN_SESSION_REVOCATION:
+            return 0
+        return UserSession.delete_by_user(user_id)
+    
+    @staticmethod
+    async def change_password(
         user_id: int,
         old_password: str,
-        new_password: str
+        new_password: str,
+        client_ip: Optional[str] = None
     ) -> Tuple[bool, Optional[str]]:
         """
         修改密码
         返回: (成功标志, 错误消息)
+        密码哈希繁忙时抛出 PasswordHasherBusy
         """
         user = User.get_by_id(user_id)
         
@@ -139,7 +225,7 @@ class UserAuthService:
             return False, "用户不存在"
         
         # 验证旧密码
-        if not AuthUtils.verify_password(old_password, user.password_hash):
+        if not await password_hasher.verify(old_password, user.password_hash, client_ip):
             return False, "原密码错误"
         
         # 验证新密码强度
@@ -147,8 +233,9 @@ class UserAuthService:
             return False, "新密码长度至少为 6 位"
         
         # 更新密码
-        new_password_hash = AuthUtils.hash_password(new_password)
+        new_password_hash = await password_hasher.hash(new_password, client_ip)
         if user.update_password(new_password_hash):
+            UserAuthService.revoke_sessions(user.id)
             # 记录审计日志
             AuditLog.create(
                 user_id=user.id,
@@ -161,10 +248,15 @@ class UserAuthService:
             return False, "密码更新失败"
     
     @staticmethod
-    def reset_password(user_id: int, new_password: str) -> Tuple[bool, Optional[str]]:
+    async def reset_password(
+        user_id: int,
+        new_password: str,
+        client_ip: Optional[str] = None
+    ) -> Tuple[bool, Optional[str]]:
         """
         重置密码（管理员操作）
         返回: (成功标志, 错误消息)
+        密码哈希繁忙时抛出 PasswordHasherBusy
         """
         user = User.get_by_id(user_id)
         
@@ -176,8 +268,9 @@ class UserAuthService:
             return False, "新密码长度至少为 6 位"
         
         # 更新密码
-        new_password_hash = AuthUtils.hash_password(new_password)
+        new_password_hash = await password_hasher.hash(new_password, client_ip)
         if user.update_password(new_password_hash):
+            UserAuthService.revoke_sessions(user.id)
             # 记录审计日志
             AuditLog.create(
                 user_id=user.id,
@@ -2,6 +2,8 @@
 GMTools Python移植版 - 配置文件
 """
 
+import os
+
 # 服务器配置
 SERVER_HOST = "127.0.0.1"
 SERVER_PORT = 8080
@@ -18,3 +20,51 @@ LOGIN_SEQ_NO = 1
 
 # API 认证 Token
 AUTH_TOKEN = "my_secret_token"
+
+# 操作日志保留月数（含当月），服务启动时及之后每隔 AUDIT_LOG_RETENTION_INTERVAL 秒删除更早的月度分区；0 表示不清理
+AUDIT_LOG_RETENTION_MONTHS = 0
+AUDIT_LOG_RETENTION_INTERVAL = 24 * 3600
+
+# 分析快照目录（相对项目根目录）和定时刷新间隔（秒），间隔为 0 表示只在启动时生成一次
+ANALYTICS_SNAPSHOT_DIR = "analytics_snapshot"
+ANALYTICS_SNAPSHOT_INTERVAL = 600
+
+# bcrypt 成本因子；修改后已有用户在下次登录时自动按新成本重新哈希
+BCRYPT_ROUNDS = 12
+# 密码哈希线程池大小、最大排队数量和单个 IP 同时进行的哈希数量上限
+PASSWORD_HASH_WORKERS = 4
+PASSWORD_HASH_MAX_PENDING = 64
+PASSWORD_HASH_PER_IP = 4
+
+# 已验证 Token 缓存：最多缓存的 Token 数量和单条缓存有效期（秒，不超过 Token 本身的过期时间）
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_TTL = 300
+# 是否启用会话撤销：登录时在 user_sessions 记录会话，退出登录、修改/重置密码、禁用账号后 Token 立即失效
+TOKEN_SESSION_REVOCATION = False
+# 实时事件流 (SSE) 连接票据有效期（秒）：EventSource 无法设置请求头，用一次性短期票据代替 URL 中的 JWT
+EVENT_STREAM_TICKET_TTL = 30
+
+# 限流（令牌桶）：(桶容量, 每秒补充令牌数)，容量为 0 表示不限制
+RATE_LIMIT_LOGIN_IP = (20, 0.5)          # 单个 IP 登录/注册
+RATE_LIMIT_LOGIN_ACCOUNT = (5, 1 / 30)   # 单个 IP 登录单个账号（防密码猜测，登录成功退还令牌）
+RATE_LIMIT_PARTICIPATE_IP = (30, 2)      # 单个 IP 参与活动
+RATE_LIMIT_PARTICIPATE_GAME_ID = (5, 0.5)  # 单个游戏 ID 参与活动
+RATE_LIMIT_USER_ACTION = (10, 1)         # 单个用户发送道具、使用激活码
+# 限流状态存储：memory（进程内）或 sqlite（多个工作进程共享，每次检查一次数据库写入）
+RATE_LIMIT_BACKEND = "memory"
+
+# 响应压缩：超过该字节数的响应按 Accept-Encoding 使用 br（需要安装 brotli）或 gzip 压缩
+RESPONSE_COMPRESSION_MIN_SIZE = 1024
+RESPONSE_GZIP_LEVEL = 6
+RESPONSE_BROTLI_QUALITY = 4
+# 读多写少接口（权限、等级配置、道具目录、活动公开信息）的响应缓存：
+# 本进程的写入立即失效，其他工作进程的写入经游戏连接代理转发后失效，转发丢失时最多延迟 TTL 秒生效
+RESPONSE_CACHE_TTL = 30
+RESPONSE_CACHE_MAX_ENTRIES = 256
+
+# 游戏命令排队等待上限（秒）：同一游戏连接上的命令逐条发送，排队超过该时间的命令不再发送并返回失败（可安全重试）
+GAME_COMMAND_QUEUE_TIMEOUT = 10.0
+
+# 游戏连接代理地址：Unix socket 路径或 "127.0.0.1:端口"（Windows）
+# 为空时 API 服务在进程内直接连接游戏服务器；多工作进程部署时由 api_main --workers 自动设置
+GAME_BROKER_ADDRESS = os.environ.get("GMTOOLS_GAME_BROKER", "")
@@ -5,15 +5,26 @@
 """
 
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterator, Tuple
 from database.connection import DatabaseConnection
 import logging
-import random
+import secrets
 import string
+import uuid
 
 logger = logging.getLogger(__name__)
 db = DatabaseConnection()
 
+# 激活码字符集
+CODE_ALPHABET = string.ascii_uppercase + string.digits
+
+# 随机字节 -> 字符映射表：小于 252 (36 的整数倍) 的字节取模映射，其余字节丢弃以避免取模偏差
+_BYTE_LIMIT = 256 - 256 % len(CODE_ALPHABET)
+_BYTE_TABLE = bytes(
+    ord(CODE_ALPHABET[b % len(CODE_ALPHABET)]) if b < _BYTE_LIMIT else 0 for b in range(256)
+)
+_BYTE_REJECT = bytes(range(_BYTE_LIMIT, 256))
+
 
 class ActivationCode:
     """激活码模型"""
@@ -27,7 +38,8 @@ class ActivationCode:
         used_by: Optional[int] = None,
         used_at: Optional[datetime] = None,
         created_at: Optional[datetime] = None,
-        expires_at: Optional[datetime] = None
+        expires_at: Optional[datetime] = None,
+        batch_id: Optional[str] = None
     ):
         self.id = id
         self.code = code
@@ -37,6 +49,7 @@ class ActivationCode:
         self.used_at = used_at
         self.created_at = created_at
         self.expires_at = expires_at
+        self.batch_id = batch_id
     
     @staticmethod
     def from_row(row) -> 'ActivationCode':
@@ -51,7 +64,8 @@ class ActivationCode:
             used_by=row['used_by'],
             used_at=row['used_at'],
             created_at=row['created_at'],
-            expires_at=row['expires_at']
+            expires_at=row['expires_at'],
+            batch_id=row['batch_id']
         )
     
     def to_dict(self) -> Dict[str, Any]:
@@ -64,43 +78,102 @@ class ActivationCode:
             'used_by': self.used_by,
             'used_at': str(self.used_at) if self.used_at else None,
             'created_at': str(self.created_at) if self.created_at else None,
-            'expires_at': str(self.expires_at) if self.expires_at else None
+            'expires_at': str(self.expires_at) if self.expires_at else None,
+            'batch_id': self.batch_id
         }
     
+    # 批量生成时每次 executemany 的行数
+    BULK_BATCH_SIZE = 10000
+    
     @staticmethod
     def generate_code(length: int = 16) -> str:
         """生成随机激活码"""
-        characters = string.ascii_uppercase + string.digits
-        return ''.join(random.choice(characters) for _ in range(length))
+        return ActivationCode.generate_codes(1, length)[0]
+    
+    @staticmethod
+    def generate_codes(count: int, length: int = 16) -> List[str]:
+        """
+        批量生成随机激活码（secrets 随机源，整块字节转换，不逐字符循环）
+        
+        Returns:
+            去重后的激活码列表（数量等于 count）
+        """
+        codes: set = set()
+        while len(codes) < count:
+            need = count - len(codes)
+            # 约 1.6% 的字节会被拒绝，多取一些减少循环次数
+            raw = secrets.token_bytes(need * length * 103 // 100 + length)
+            chars = raw.translate(_BYTE_TABLE, _BYTE_REJECT).decode('ascii')
+            usable = len(chars) // length
+            codes.update(chars[i * length:(i + 1) * length] for i in range(min(usable, need)))
+        return list(codes)
+    
+    @staticmethod
+    def create_bulk(level: int, expires_days: int = 30, count: int = 1) -> Tuple[int, str]:
+        """
+        批量创建激活码
+        
+        激活码排序后用 executemany + INSERT OR IGNORE 分批写入（顺序写入唯一索引更快），
+        与已有激活码冲突而被忽略的部分重新生成补足。每 BULK_BATCH_SIZE 条单独提交一个事务，
+        避免长时间持有写锁导致其他写入报 database is locked；中途失败时已提交的部分保留。
+        同一批次的激活码写入相同的 batch_id (UUID)，created_at 使用数据库默认的 UTC 时间。
+        
+        Returns:
+            (创建数量, 批次标识)，可通过 iter_batch_codes(批次标识) 读取本批激活码
+        """
+        # 与 sqlite3 默认的 datetime 适配格式一致，便于 activate 中比较
+        expires_at = (datetime.now() + timedelta(days=expires_days)).isoformat(' ')
+        batch_id = uuid.uuid4().hex
+        created = 0
+        
+        while created < count:
+            codes = sorted(ActivationCode.generate_codes(count - created))
+            for start in range(0, len(codes), ActivationCode.BULK_BATCH_SIZE):
+                with db.get_cursor() as cursor:
+                    cursor.executemany("""
+                        INSERT OR IGNORE INTO activation_codes (code, level, is_used, batch_id, expires_at)
+                        VALUES (?, ?, 0, ?, ?)
+                    """, [
+                        (code, level, batch_id, expires_at)
+                        for code in codes[start:start + ActivationCode.BULK_BATCH_SIZE]
+                    ])
+                    created += cursor.rowcount
+        
+        logger.info(f"批量创建激活码成功: {created} 个，等级: {level}")
+        return created, batch_id
+    
+    @staticmethod
+    def iter_batch_codes(batch_id: str, chunk_size: int = 5000) -> Iterator[List[str]]:
+        """
+        按批次标识分块读取激活码字符串
+        每块按 id 键集分页单独查询，块之间不持有读事务，下载期间不阻塞写入
+        """
+        last_id = 0
+        while True:
+            with db.get_cursor() as cursor:
+                cursor.execute(
+                    "SELECT id, code FROM activation_codes WHERE batch_id = ? AND id > ? ORDER BY id LIMIT ?",
+                    (batch_id, last_id, chunk_size)
+                )
+                rows = cursor.fetchall()
+            if not rows:
+                break
+            yield [row['code'] for row in rows]
+            if len(rows) < chunk_size:
+                break
+            last_id = rows[-1]['id']
     
     @staticmethod
     def create(level: int, expires_days: int = 30, count: int = 1) -> List['ActivationCode']:
         """创建激活码"""
         try:
+            _, batch_id = ActivationCode.create_bulk(level, expires_days, count)
             with db.get_cursor() as cursor:
-                activation_codes = []
-                expires_at = datetime.now() + timedelta(days=expires_days)
-                
-                for _ in range(count):
-                    code = ActivationCode.generate_code()
-                    
-                    cursor.execute("""
-                        INSERT INTO activation_codes (code, level, is_used, expires_at)
-                        VALUES (?, ?, ?, ?)
-                    """, (code, level, False, expires_at))
-                    
-                    code_id = cursor.lastrowid
-                    activation_codes.append(ActivationCode(
-                        id=code_id,
-                        code=code,
-                        level=level,
-                        is_used=False,
-                        expires_at=expires_at,
-                        created_at=datetime.now()
-                    ))
-                
-                logger.info(f"创建激活码成功: {count} 个，等级: {level}")
-                return activation_codes
+                cursor.execute(
+                    "SELECT * FROM activation_codes WHERE batch_id = ? ORDER BY id",
+                    (batch_id,)
+                )
+                return [ActivationCode.from_row(row) for row in cursor.fetchall()]
         except Exception as e:
             logger.error(f"创建激活码失败: {e}")
             return []
@@ -6,10 +6,13 @@
 import sqlite3
 import json
 import logging
+import bisect
+import random
+import threading
+import time
 from datetime import datetime
-from typing import List, Optional, Dict, Any, Tuple
+from typing import List, Optional, Dict, Any, Tuple, Iterator
 from dataclasses import dataclass, asdict
-from services.gift_service import GiftService
 
 logger = logging.getLogger(__name__)
 
@@ -42,6 +45,7 @@ class Activity:
     config: str = ""  # JSON配置
     created_at: Optional[str] = None
     updated_at: Optional[str] = None
+    reward_version: int = 0  # 奖项版本号，奖项增删改时递增
     
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典"""
@@ -74,7 +78,7 @@ class ActivityParticipation:
     game_id: str = ""
     reward_id: Optional[int] = None  # 中奖的奖项ID
     reward_name: str = ""  # 中奖名称
-    status: int = 1  # 1: 成功, 2: 失败/待补发
+    status: int = 1  # 0: 待发放, 1: 成功, 2: 失败/待补发
     ip_address: str = ""
     user_agent: str = ""
     created_at: Optional[str] = None
@@ -82,91 +86,160 @@ class ActivityParticipation:
     def to_dict(self) -> Dict[str, Any]:
         return {k: v for k, v in asdict(self).items() if v is not None}
 
+# 奖励发放结果
+DELIVERY_DELIVERED = "delivered"
+DELIVERY_RETRY = "retry"
+DELIVERY_FAILED = "failed"
+
+@dataclass
+class DrawTable:
+    """预计算的抽奖累积概率表"""
+    reward_ids: List[int]
+    cumulative: List[float]
+    total_probability: float = 0.0
+    
+    @classmethod
+    def build(cls, rewards: List[Tuple[int, float]]) -> 'DrawTable':
+        """根据 (奖项ID, 概率) 列表构建累积概率表"""
+        reward_ids = []
+        cumulative = []
+        total = 0.0
+        for reward_id, probability in rewards:
+            if probability <= 0:
+                continue
+            total += probability
+            reward_ids.append(reward_id)
+            cumulative.append(total)
+        return cls(reward_ids=reward_ids, cumulative=cumulative, total_probability=total)
+    
+    def pick(self, rand_val: float) -> Optional[int]:
+        """根据 0-100 的随机数选择奖项，未中奖返回 None"""
+        # 只有当随机数在总概率范围内时才可能中奖
+        if not self.reward_ids or rand_val > self.total_probability:
+            return None
+        index = bisect.bisect_left(self.cumulative, rand_val)
+        if index >= len(self.reward_ids):
+            return None
+        return self.reward_ids[index]
+
 class ActivityManager:
     """活动管理器"""
     
     def __init__(self):
         self.gift_service = None
+        self._draw_tables: Dict[int, Tuple[int, DrawTable]] = {}  # {活动ID: (奖项版本号, 概率表)}
+        self._draw_lock = threading.Lock()
+        self._delivery_listener = None
+        self._participation_listener = None
         self.init_tables()
         
     def set_gift_service(self, service):
         """设置礼包服务"""
         self.gift_service = service
     
+    def set_delivery_listener(self, listener):
+        """设置奖励发放队列的新任务通知回调"""
+        self._delivery_listener = listener
+    
+    def set_participation_listener(self, listener):
+        """设置参与成功后的事件回调 listener(event: dict)，在事务提交后调用"""
+        self._participation_listener = listener
+    
     def init_tables(self):
-        """初始化数据表"""
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        """确保数据表结构为最新（表结构定义见 database/migrations.py）"""
+        from database.migrations import ensure_schema
+        ensure_schema()
+    
+    def _apply_participation_stats(self, cursor, activity_id: int, game_id: str,
+                                   reward_id: Optional[int], delta: int):
+        """增量更新统计计数（delta 为 1 表示新增参与，-1 表示删除参与）"""
+        user_delta = 0
+        if delta > 0:
+            cursor.execute('''
+            INSERT OR IGNORE INTO activity_user_stats (activity_id, game_id, participation_count)
+            VALUES (?, ?, 0)
+            ''', (activity_id, game_id))
+            if cursor.rowcount > 0:
+                user_delta = 1
+            cursor.execute('''
+            UPDATE activity_user_stats SET participation_count = participation_count + 1
+            WHERE activity_id=? AND game_id=?
+            ''', (activity_id, game_id))
+        else:
+            cursor.execute('''
+            UPDATE activity_user_stats SET participation_count = participation_count - 1
+            WHERE activity_id=? AND game_id=?
+            ''', (activity_id, game_id))
+            cursor.execute('''
+            DELETE FROM activity_user_stats
+            WHERE activity_id=? AND game_id=? AND participation_count <= 0
+            ''', (activity_id, game_id))
+            if cursor.rowcount > 0:
+                user_delta = -1
         
-        # 活动表
+        win_delta = delta if reward_id else 0
+        cursor.execute('INSERT OR IGNORE INTO activity_stats (activity_id) VALUES (?)', (activity_id,))
         cursor.execute('''
-        CREATE TABLE IF NOT EXISTS activities (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            type TEXT NOT NULL,
-            description TEXT DEFAULT '',
-            game_id_required INTEGER DEFAULT 1,
-            max_participations INTEGER DEFAULT 0,
-            start_time DATETIME,
-            end_time DATETIME,
-            is_active INTEGER DEFAULT 1,
-            config TEXT DEFAULT '{}',
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
+        UPDATE activity_stats
+        SET total_participations = MAX(total_participations + ?, 0),
+            unique_users = MAX(unique_users + ?, 0),
+            winning_count = MAX(winning_count + ?, 0)
+        WHERE activity_id=?
+        ''', (delta, user_delta, win_delta, activity_id))
         
-        # 活动奖项表
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS activity_rewards (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            activity_id INTEGER NOT NULL,
-            name TEXT NOT NULL,
-            description TEXT DEFAULT '',
-            type TEXT DEFAULT 'item',
-            value TEXT DEFAULT '{}',
-            probability REAL DEFAULT 0.0,
-            total_quantity INTEGER DEFAULT 0,
-            remaining_quantity INTEGER DEFAULT 0,
-            icon TEXT DEFAULT '',
-            order_index INTEGER DEFAULT 0,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (activity_id) REFERENCES activities (id) ON DELETE CASCADE
-        )
-        ''')
+        if reward_id:
+            cursor.execute('''
+            INSERT OR IGNORE INTO activity_reward_stats (reward_id, activity_id) VALUES (?, ?)
+            ''', (reward_id, activity_id))
+            cursor.execute('''
+            UPDATE activity_reward_stats SET won_count = MAX(won_count + ?, 0) WHERE reward_id=?
+            ''', (delta, reward_id))
+    
+    def _rebuild_statistics(self, cursor, activity_id: Optional[int] = None):
+        """根据参与记录重建统计计数表"""
+        where_clause = "WHERE activity_id=?" if activity_id is not None else ""
+        params = (activity_id,) if activity_id is not None else ()
         
-        # 活动参与记录表
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS activity_participations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            activity_id INTEGER NOT NULL,
-            game_id TEXT NOT NULL,
-            reward_id INTEGER,
-            reward_name TEXT DEFAULT '',
-            status INTEGER DEFAULT 1,
-            ip_address TEXT,
-            user_agent TEXT,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (activity_id) REFERENCES activities (id) ON DELETE CASCADE,
-            FOREIGN KEY (reward_id) REFERENCES activity_rewards (id) ON DELETE SET NULL
-        )
-        ''')
+        cursor.execute(f'DELETE FROM activity_stats {where_clause}', params)
+        cursor.execute(f'DELETE FROM activity_reward_stats {where_clause}', params)
+        cursor.execute(f'DELETE FROM activity_user_stats {where_clause}', params)
         
-        # 检查是否需要添加 status 字段 (针对已有表)
-        try:
-            cursor.execute('SELECT status FROM activity_participations LIMIT 1')
-        except sqlite3.OperationalError:
-            cursor.execute('ALTER TABLE activity_participations ADD COLUMN status INTEGER DEFAULT 1')
+        cursor.execute(f'''
+        INSERT INTO activity_user_stats (activity_id, game_id, participation_count)
+        SELECT activity_id, game_id, COUNT(*) FROM activity_participations
+        {where_clause}
+        GROUP BY activity_id, game_id
+        ''', params)
         
-        # 索引
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_activities_type ON activities(type)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_activities_active ON activities(is_active)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_activity_rewards_activity ON activity_rewards(activity_id)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_participations_activity ON activity_participations(activity_id)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_participations_game_id ON activity_participations(game_id)')
+        cursor.execute(f'''
+        INSERT INTO activity_stats (activity_id, total_participations, unique_users, winning_count)
+        SELECT activity_id, COUNT(*), COUNT(DISTINCT game_id),
+               SUM(CASE WHEN reward_id IS NOT NULL THEN 1 ELSE 0 END)
+        FROM activity_participations
+        {where_clause}
+        GROUP BY activity_id
+        ''', params)
         
-        conn.commit()
-        conn.close()
+        cursor.execute(f'''
+        INSERT INTO activity_reward_stats (reward_id, activity_id, won_count)
+        SELECT reward_id, activity_id, COUNT(*) FROM activity_participations
+        {where_clause}{" AND" if where_clause else "WHERE"} reward_id IS NOT NULL
+        GROUP BY reward_id
+        ''', params)
+    
+    def rebuild_statistics(self, activity_id: Optional[int] = None):
+        """重建统计计数（用于修复或迁移）"""
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        try:
+            self._rebuild_statistics(cursor, activity_id)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
     
     def create_activity(self, activity: Activity) -> int:
         """创建活动"""
@@ -256,8 +329,10 @@ class ActivityManager:
               reward.remaining_quantity, reward.icon, reward.order_index))
         
         reward_id = cursor.lastrowid
+        self._bump_reward_version(cursor, reward.activity_id)
         conn.commit()
         conn.close()
+        self._invalidate_draw_table(reward.activity_id)
         return reward_id
     
     def get_rewards(self, activity_id: int) -> List[ActivityReward]:
@@ -274,144 +349,169 @@ class ActivityManager:
         
         return [ActivityReward(**row) for row in rows]
     
+    @staticmethod
+    def _bump_reward_version(cursor, activity_id: int):
+        """在当前事务中递增活动的奖项版本号，其他进程缓存的抽奖概率表随之失效"""
+        cursor.execute('UPDATE activities SET reward_version = reward_version + 1 WHERE id=?', (activity_id,))
+    
+    def _invalidate_draw_table(self, activity_id: Optional[int] = None):
+        """使抽奖概率表缓存失效（奖项变更或库存耗尽时调用）"""
+        with self._draw_lock:
+            if activity_id is None:
+                self._draw_tables.clear()
+            else:
+                self._draw_tables.pop(activity_id, None)
+    
+    def _get_draw_table(self, cursor, activity_id: int, reward_version: int) -> DrawTable:
+        """
+        获取活动的抽奖概率表，未缓存或奖项版本号已变化时在当前事务内构建
+        版本号与抽奖在同一事务中读取，其他进程修改奖项后这里会重新构建
+        """
+        with self._draw_lock:
+            cached = self._draw_tables.get(activity_id)
+        if cached is not None and cached[0] == reward_version:
+            return cached[1]
+        
+        # 只有剩余数量>0的奖项才参与抽奖
+        cursor.execute('''
+        SELECT id, probability FROM activity_rewards
+        WHERE activity_id=? AND remaining_quantity > 0
+        ORDER BY order_index ASC
+        ''', (activity_id,))
+        rows = cursor.fetchall()
+        table = DrawTable.build([(row['id'], row['probability']) for row in rows])
+        
+        logger.info(f"活动 {activity_id} 的可用奖项: {len(table.reward_ids)}个，总概率: {table.total_probability}%")
+        if not table.reward_ids:
+            logger.warning(f"活动 {activity_id} 没有可用奖项（所有奖品剩余数量为0）")
+        
+        with self._draw_lock:
+            self._draw_tables[activity_id] = (reward_version, table)
+        return table
+    
+    def _draw_in_transaction(self, cursor, activity_id: int, game_id: str, ip_address: str,
+                             user_agent: str) -> Dict[str, Any]:
+        """在已开启的写事务中完成资格检查、抽奖、扣减库存和记录参与"""
+        cursor.execute('SELECT * FROM activities WHERE id=?', (activity_id,))
+        row = cursor.fetchone()
+        if not row or not row['is_active']:
+            return {"success": False, "message": "活动不存在或未激活"}
+        
+        # 检查时间（简化版，避免时区问题，只比较字符串）
+        now = str(datetime.now())
+        if row['start_time'] and now < row['start_time']:
+            return {"success": False, "message": "活动尚未开始"}
+        if row['end_time'] and now > row['end_time']:
+            return {"success": False, "message": "活动已结束"}
+        
+        # 检查参与次数限制（读取计数表，与插入处于同一事务，不会并发超限）
+        max_participations = row['max_participations']
+        if max_participations > 0:
+            cursor.execute('''
+            SELECT participation_count FROM activity_user_stats
+            WHERE activity_id=? AND game_id=?
+            ''', (activity_id, game_id))
+            count_row = cursor.fetchone()
+            participated_count = count_row['participation_count'] if count_row else 0
+            if participated_count >= max_participations:
+                return {"success": False, "message": f"已达到最大参与次数({max_participations})"}
+        
+        # 加权随机选择 (基于100%)
+        table = self._get_draw_table(cursor, activity_id, row['reward_version'] or 0)
+        reward_id = table.pick(random.uniform(0, 100))
+        
+        selected_reward = None
+        if reward_id is not None:
+            # 条件扣减库存，库存已被抢光时 rowcount 为 0
+            cursor.execute('''
+            UPDATE activity_rewards SET remaining_quantity = remaining_quantity - 1
+            WHERE id=? AND remaining_quantity > 0
+            ''', (reward_id,))
+            if cursor.rowcount > 0:
+                cursor.execute('SELECT * FROM activity_rewards WHERE id=?', (reward_id,))
+                selected_reward = ActivityReward(**cursor.fetchone())
+                if selected_reward.remaining_quantity <= 0:
+                    self._invalidate_draw_table(activity_id)
+            else:
+                logger.info(f"奖品 {reward_id} 已无剩余，当作谢谢参与")
+                self._invalidate_draw_table(activity_id)
+        
+        # 有奖励配置的奖品先记为待发放，提交后异步发放
+        status = 0 if selected_reward and selected_reward.value else 1
+        participation = ActivityParticipation(
+            activity_id=activity_id,
+            game_id=game_id,
+            reward_id=selected_reward.id if selected_reward else None,
+            reward_name=selected_reward.name if selected_reward else "谢谢参与",
+            status=status,
+            ip_address=ip_address,
+            user_agent=user_agent
+        )
+        
+        cursor.execute('''
+        INSERT INTO activity_participations (activity_id, game_id, reward_id, reward_name, status, ip_address, user_agent)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (participation.activity_id, participation.game_id, participation.reward_id,
+              participation.reward_name, participation.status, participation.ip_address, participation.user_agent))
+        participation.id = cursor.lastrowid
+        
+        if status == 0:
+            self._enqueue_delivery(cursor, participation.id, game_id, selected_reward.value)
+        
+        # 在同一事务中更新统计计数
+        self._apply_participation_stats(cursor, activity_id, game_id, participation.reward_id, 1)
+        
+        return {"success": True, "participation": participation, "reward": selected_reward}
+    
     def participate(self, activity_id: int, game_id: str, ip_address: str = "", 
                    user_agent: str = "") -> Dict[str, Any]:
-        """参与活动"""
-        import random
+        """
+        参与活动
         
+        参与次数检查、抽奖和扣减库存在同一个 BEGIN IMMEDIATE 事务中完成，
+        并发抽奖不会超发奖品；奖励在事务提交后异步发放。
+        """
         try:
-            activity = self.get_activity(activity_id)
-            if not activity or not activity.is_active:
-                return {"success": False, "message": "活动不存在或未激活"}
-            
-            # 检查时间（简化版，避免时区问题）
-            now = datetime.now()
-            
-            if activity.start_time:
-                try:
-                    # 简化时间比较，只比较字符串
-                    if str(now) < activity.start_time:
-                        return {"success": False, "message": "活动尚未开始"}
-                except Exception as e:
-                    logger.error(f"时间比较失败: {str(e)}")
-                    # 忽略时间比较错误，继续执行
-
-            if activity.end_time:
-                try:
-                    # 简化时间比较，只比较字符串
-                    if str(now) > activity.end_time:
-                        return {"success": False, "message": "活动已结束"}
-                except Exception as e:
-                    logger.error(f"时间比较失败: {str(e)}")
-                    # 忽略时间比较错误，继续执行
-            
-            # 检查参与次数限制
-            if activity.max_participations > 0:
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                SELECT COUNT(*) as count FROM activity_participations 
-                WHERE activity_id=? AND game_id=?
-                ''', (activity_id, game_id))
-                
-                participated_count = cursor.fetchone()['count']
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            try:
+                cursor.execute('BEGIN IMMEDIATE')
+                outcome = self._draw_in_transaction(cursor, activity_id, game_id, ip_address, user_agent)
+                if outcome["success"]:
+                    conn.commit()
+                else:
+                    conn.rollback()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
                 conn.close()
-                
-                if participated_count >= activity.max_participations:
-                    return {"success": False, "message": f"已达到最大参与次数({activity.max_participations})"}
             
-            # 获取奖项
-            rewards = self.get_rewards(activity_id)
-            # 只有剩余数量>0的奖项才参与抽奖
-            available_rewards = [r for r in rewards if r.remaining_quantity > 0]
-
-            logger.info(f"活动 {activity_id} 的可用奖项: {len(available_rewards)}个，总概率: {sum(r.probability for r in available_rewards)}%")
-
-            # 如果没有可用奖项，记录警告
-            if not available_rewards:
-                logger.warning(f"活动 {activity_id} 没有可用奖项（所有奖品剩余数量为0）")
+            if not outcome["success"]:
+                return {"success": False, "message": outcome["message"], "reward": None}
             
-            # 随机抽奖
-            total_probability = sum(r.probability for r in available_rewards)
-
-            # 加权随机选择 (基于100%)
-            rand_val = random.uniform(0, 100)
-            cumulative = 0
-            selected_reward = None
-
-            # 只有当随机数在总概率范围内时才可能中奖
-            if rand_val <= total_probability:
-                for reward in available_rewards:
-                    cumulative += reward.probability
-                    if rand_val <= cumulative:
-                        selected_reward = reward
-                        break
+            participation = outcome["participation"]
+            selected_reward = outcome["reward"]
+            if participation.status == 0 and self._delivery_listener:
+                self._delivery_listener()
             
-            # 记录参与
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # 尝试发放奖励
-            status = 1 # 1: 成功, 2: 失败/待补发
-            reward_message = selected_reward.name if selected_reward else "谢谢参与"
-
-            if selected_reward:
+            if self._participation_listener:
                 try:
-                    # 检查奖品是否可以发放
-                    if selected_reward.remaining_quantity > 0:
-                        # 有剩余数量，尝试发放
-                        success = self.distribute_reward(game_id, selected_reward)
-                        status = 1 if success else 2
-                        logger.info(f"发放奖品 {selected_reward.name}: success={success}")
-                    elif selected_reward.remaining_quantity == -1:
-                        # 特殊奖项（无限数量），直接标记为成功
-                        status = 1
-                        logger.info(f"特殊奖项 {selected_reward.name} 中奖")
-                    else:
-                        # 奖品已无剩余，但仍按概率中奖，当作谢谢参与
-                        status = 1
-                        reward_message = "谢谢参与"
-                        logger.info(f"奖品 {selected_reward.name} 已无剩余，当作谢谢参与")
+                    self._participation_listener({
+                        "activity_id": activity_id,
+                        "game_id": game_id,
+                        "is_winning": selected_reward is not None,
+                        "reward_name": selected_reward.name if selected_reward else None,
+                        "status": participation.status
+                    })
                 except Exception as e:
-                    logger.error(f"自动发奖失败: {str(e)}")
-                    status = 2
-            
-            participation = ActivityParticipation(
-                activity_id=activity_id,
-                game_id=game_id,
-                reward_id=selected_reward.id if selected_reward else None,
-                reward_name=reward_message,
-                status=status,
-                ip_address=ip_address,
-                user_agent=user_agent
-            )
-            
-            cursor.execute('''
-            INSERT INTO activity_participations (activity_id, game_id, reward_id, reward_name, status, ip_address, user_agent)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (participation.activity_id, participation.game_id, participation.reward_id,
-                  participation.reward_name, participation.status, participation.ip_address, participation.user_agent))
-            
-            # 减少剩余数量（只对有剩余数量的奖项）
-            if selected_reward and selected_reward.remaining_quantity > 0:
-                cursor.execute('''
-                UPDATE activity_rewards SET remaining_quantity = remaining_quantity - 1 
-                WHERE id=?
-                ''', (selected_reward.id,))
+                    logger.error(f"参与事件回调失败: {e}")
             
-            conn.commit()
-            conn.close()
-            
-            # 根据实际发放结果返回消息
             if selected_reward:
-                if reward_message == "谢谢参与":
-                    message = "谢谢参与，下次再来！"
-                else:
-                    message = f"恭喜获得：{reward_message}"
+                message = f"恭喜获得：{selected_reward.name}"
             else:
                 message = "谢谢参与，下次再来！"
-
+            
             return {
                 "success": True,
                 "message": message,
@@ -440,27 +540,9 @@ class ActivityManager:
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # 构建查询条件
-        conditions = ["p.activity_id=?"]
-        params = [activity_id]
-        
-        if game_id:
-            conditions.append("p.game_id LIKE ?")
-            params.append(f"%{game_id}%")
-            
-        if reward_name:
-            conditions.append("p.reward_name LIKE ?")
-            params.append(f"%{reward_name}%")
-            
-        if status:
-            conditions.append("p.status=?")
-            params.append(status)
-            
-        if activity_type:
-            conditions.append("a.type=?")
-            params.append(activity_type)
-            
-        where_clause = " AND ".join(conditions)
+        where_clause, params = self._participation_filters(
+            activity_id, game_id, reward_name, status, activity_type
+        )
         
         # 查询总数
         count_sql = f'''
@@ -493,6 +575,79 @@ class ActivityManager:
             
         return result, total
 
+    @staticmethod
+    def _participation_filters(
+        activity_id: int,
+        game_id: Optional[str] = None,
+        reward_name: Optional[str] = None,
+        status: Optional[int] = None,
+        activity_type: Optional[str] = None
+    ) -> Tuple[str, list]:
+        """构建参与记录的筛选条件"""
+        conditions = ["p.activity_id=?"]
+        params = [activity_id]
+        
+        if game_id:
+            conditions.append("p.game_id LIKE ?")
+            params.append(f"%{game_id}%")
+            
+        if reward_name:
+            conditions.append("p.reward_name LIKE ?")
+            params.append(f"%{reward_name}%")
+            
+        if status is not None:
+            conditions.append("p.status=?")
+            params.append(status)
+            
+        if activity_type:
+            conditions.append("a.type=?")
+            params.append(activity_type)
+            
+        return " AND ".join(conditions), params
+
+    def iter_participations(
+        self,
+        activity_id: int,
+        game_id: Optional[str] = None,
+        reward_name: Optional[str] = None,
+        status: Optional[int] = None,
+        activity_type: Optional[str] = None,
+        chunk_size: int = 1000
+    ) -> Iterator[List[sqlite3.Row]]:
+        """
+        按筛选条件分块读取参与记录（用于导出，不一次性载入内存）
+        每块按 (created_at, id) 键集分页在单独的连接中查询，块之间不持有读事务，导出期间不阻塞抽奖写入
+        """
+        where_clause, params = self._participation_filters(
+            activity_id, game_id, reward_name, status, activity_type
+        )
+        last = None
+        while True:
+            chunk_where, chunk_params = where_clause, list(params)
+            if last is not None:
+                chunk_where += " AND (p.created_at < ? OR (p.created_at = ? AND p.id < ?))"
+                chunk_params += [last['created_at'], last['created_at'], last['id']]
+            conn = get_db_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                SELECT p.*, a.type as activity_type
+                FROM activity_participations p
+                JOIN activities a ON p.activity_id = a.id
+                WHERE {chunk_where}
+                ORDER BY p.created_at DESC, p.id DESC
+                LIMIT ?
+                ''', chunk_params + [chunk_size])
+                rows = cursor.fetchall()
+            finally:
+                conn.close()
+            if not rows:
+                break
+            yield rows
+            if len(rows) < chunk_size:
+                break
+            last = rows[-1]
+
     def get_user_participations(self, activity_id: int, game_id: str) -> List[ActivityParticipation]:
         """获取指定用户的参与记录"""
         conn = get_db_connection()
@@ -509,45 +664,70 @@ class ActivityManager:
         
         return [ActivityParticipation(**row) for row in rows]
     
-    def distribute_reward(self, game_id: str, reward: Any) -> bool:
-        """发放奖励"""
-        if not reward.value:
-            return True
-            
+    async def send_reward(self, game_id: str, reward_value: str) -> str:
+        """
+        向游戏服务器发送奖励
+        
+        Returns:
+            DELIVERY_DELIVERED: 已发放
+            DELIVERY_RETRY: 命令未发出，可以安全重试
+            DELIVERY_FAILED: 配置错误或结果未知，需要人工补发
+        """
+        if not reward_value:
+            return DELIVERY_DELIVERED
+        
+        try:
+            reward_config = json.loads(reward_value)
+        except (TypeError, ValueError):
+            logger.warning(f"奖励配置不是合法的JSON: {reward_value}")
+            return DELIVERY_FAILED
+        
+        if not self.gift_service:
+            logger.error("GiftService未初始化，无法自动发奖")
+            return DELIVERY_RETRY
+        
+        # 根据配置发放奖励
+        # 格式示例: {"item_name": "屠龙刀", "quantity": 1, "category": "default"}
+        # 或者: {"gem_name": "红宝石", "min_level": 1, "max_level": 1}
         try:
-            reward_config = json.loads(reward.value)
-            
-            if not self.gift_service:
-                logger.error("GiftService未初始化，无法自动发奖")
-                return False
-            
-            # 根据配置发放奖励
-            # 格式示例: {"item_name": "屠龙刀", "quantity": 1, "category": "default"}
-            # 或者: {"gem_name": "红宝石", "min_level": 1, "max_level": 1}
-            
             if "item_name" in reward_config:
-                return self.gift_service.give_item(
+                result = await self.gift_service.give_item(
                     game_id, 
                     reward_config["item_name"], 
                     reward_config.get("quantity", 1),
                     reward_config.get("category", "default")
                 )
             elif "gem_name" in reward_config:
-                return self.gift_service.give_gem(
+                result = await self.gift_service.give_gem(
                     game_id,
                     reward_config["gem_name"],
                     reward_config.get("min_level", 1),
                     reward_config.get("max_level", 1)
                 )
             else:
-                logger.warning(f"未知的奖励配置格式: {reward.value}")
-                return False
-                
+                logger.warning(f"未知的奖励配置格式: {reward_value}")
+                return DELIVERY_FAILED
+        except ValueError as e:
+            # 参数校验失败，重试也不会成功
+            logger.error(f"发放奖励参数无效: {str(e)}")
+            return DELIVERY_FAILED
         except Exception as e:
             logger.error(f"发放奖励异常: {str(e)}")
-            return False
+            return DELIVERY_RETRY
+        
+        if result is False:
+            return DELIVERY_RETRY
+        if isinstance(result, dict) and result.get("status") in ("no_response", "error"):
+            # 命令已发出但未确认，自动重试可能重复发放
+            logger.warning(f"发放奖励未收到确认: game_id={game_id}, result={result}")
+            return DELIVERY_FAILED
+        return DELIVERY_DELIVERED
+    
+    async def distribute_reward(self, game_id: str, reward: Any) -> bool:
+        """发放奖励"""
+        return await self.send_reward(game_id, reward.value) == DELIVERY_DELIVERED
 
-    def resend_reward(self, participation_id: int) -> Tuple[bool, str]:
+    async def resend_reward(self, participation_id: int) -> Tuple[bool, str]:
         """补发奖励"""
         try:
             conn = get_db_connection()
@@ -576,6 +756,11 @@ class ActivityManager:
                 logger.warning(f"记录没有奖品: {participation_id}")
                 return False, "该记录没有奖品"
 
+            # 待发放的记录仍在发放队列中，由后台任务发放，手动补发会重复发放
+            if row['status'] == 0:
+                logger.warning(f"记录正在自动发放中: {participation_id}")
+                return False, "奖励正在自动发放中，请稍后再试"
+
             # 构造临时 reward 对象用于发放
             @dataclass
             class TempReward:
@@ -584,7 +769,7 @@ class ActivityManager:
             reward = TempReward(value=row['reward_value'])
             logger.info(f"准备发放奖励: game_id={row['game_id']}, reward_value={row['reward_value']}")
 
-            success = self.distribute_reward(row['game_id'], reward)
+            success = await self.distribute_reward(row['game_id'], reward)
 
             # 更新状态
             new_status = 1 if success else 2
@@ -602,6 +787,142 @@ class ActivityManager:
             except Exception as status_error:
                 logger.error(f"更新状态也失败: {str(status_error)}")
             return False, f"补发异常: {str(e)}"
+    
+    def _enqueue_delivery(self, cursor, participation_id: int, game_id: str, reward_value: str):
+        """在当前事务中写入一条待发放奖励"""
+        cursor.execute('''
+        INSERT OR IGNORE INTO activity_reward_deliveries (participation_id, game_id, reward_value)
+        VALUES (?, ?, ?)
+        ''', (participation_id, game_id, reward_value))
+    
+    def claim_deliveries(self, limit: int = 20, lease_seconds: float = 60.0) -> List[Dict[str, Any]]:
+        """
+        领取一批到期的待发放奖励
+        
+        领取的记录在 lease_seconds 内不会被再次领取，进程崩溃后租约过期即可被重新领取。
+        返回记录中的 locked_until 即本次租约的到期时间，续约和回写结果时作为租约凭证。
+        """
+        now = time.time()
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('''
+            SELECT * FROM activity_reward_deliveries
+            WHERE next_attempt_at <= ? AND locked_until <= ?
+            ORDER BY next_attempt_at, id
+            LIMIT ?
+            ''', (now, now, limit))
+            rows = [dict(row) for row in cursor.fetchall()]
+            for row in rows:
+                row['locked_until'] = now + lease_seconds
+            if rows:
+                cursor.executemany(
+                    'UPDATE activity_reward_deliveries SET locked_until=? WHERE id=?',
+                    [(row['locked_until'], row['id']) for row in rows]
+                )
+            conn.commit()
+            return rows
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    def renew_delivery(self, delivery_id: int, lease: float, lease_seconds: float = 60.0) -> Optional[float]:
+        """
+        发送前续约
+
+        仅当记录仍由 lease 对应的租约持有时延长租约并返回新的租约凭证；
+        租约已被其他进程重新领取或记录已处理时返回 None，调用方不应再发送。
+        """
+        new_lease = time.time() + lease_seconds
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                'UPDATE activity_reward_deliveries SET locked_until=? WHERE id=? AND locked_until=?',
+                (new_lease, delivery_id, lease)
+            )
+            conn.commit()
+            return new_lease if cursor.rowcount > 0 else None
+        finally:
+            conn.close()
+
+    def complete_delivery(self, delivery_id: int, participation_id: int,
+                          lease: Optional[float] = None) -> bool:
+        """
+        发放成功：移出队列并将参与记录标记为成功
+
+        指定 lease 时仅在租约仍由调用方持有时回写，租约已失效返回 False 且不修改参与记录。
+        """
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            if not self._delete_delivery(cursor, delivery_id, lease):
+                conn.rollback()
+                logger.warning(f"发放租约已失效，忽略发放成功结果: delivery_id={delivery_id}")
+                return False
+            cursor.execute('UPDATE activity_participations SET status=1 WHERE id=?', (participation_id,))
+            conn.commit()
+            return True
+        finally:
+            conn.close()
+
+    def fail_delivery(self, delivery_id: int, participation_id: int, error: str,
+                      retry_after: Optional[float] = None, lease: Optional[float] = None) -> bool:
+        """
+        发放失败
+
+        retry_after 为 None 时放弃自动发放并将参与记录标记为待补发，否则在指定秒数后重试。
+        指定 lease 时仅在租约仍由调用方持有时回写，租约已失效返回 False。
+        """
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            if retry_after is None:
+                updated = self._delete_delivery(cursor, delivery_id, lease)
+                if updated:
+                    cursor.execute('UPDATE activity_participations SET status=2 WHERE id=?', (participation_id,))
+            else:
+                sql = '''
+                UPDATE activity_reward_deliveries
+                SET attempts = attempts + 1, next_attempt_at=?, locked_until=0, last_error=?
+                WHERE id=?
+                '''
+                params = [time.time() + retry_after, error, delivery_id]
+                if lease is not None:
+                    sql += ' AND locked_until=?'
+                    params.append(lease)
+                cursor.execute(sql, params)
+                updated = cursor.rowcount > 0
+            if not updated:
+                conn.rollback()
+                logger.warning(f"发放租约已失效，忽略发放失败结果: delivery_id={delivery_id}")
+                return False
+            conn.commit()
+            return True
+        finally:
+            conn.close()
+
+    def _delete_delivery(self, cursor, delivery_id: int, lease: Optional[float]) -> bool:
+        """删除队列记录，指定 lease 时要求租约仍由调用方持有"""
+        if lease is None:
+            cursor.execute('DELETE FROM activity_reward_deliveries WHERE id=?', (delivery_id,))
+        else:
+            cursor.execute(
+                'DELETE FROM activity_reward_deliveries WHERE id=? AND locked_until=?', (delivery_id, lease)
+            )
+        return cursor.rowcount > 0
+    
+    def count_pending_deliveries(self) -> int:
+        """统计队列中待发放的奖励数量"""
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM activity_reward_deliveries')
+        count = cursor.fetchone()[0]
+        conn.close()
+        return count
 
     def update_participation_status(self, participation_id: int, status: int) -> bool:
         """更新参与记录状态"""
@@ -621,8 +942,18 @@ class ActivityManager:
         
         cursor.execute('DELETE FROM activities WHERE id=?', (activity_id,))
         success = cursor.rowcount > 0
+        if success:
+            cursor.execute('''
+            DELETE FROM activity_reward_deliveries WHERE participation_id IN (
+                SELECT id FROM activity_participations WHERE activity_id=?
+            )
+            ''', (activity_id,))
+            cursor.execute('DELETE FROM activity_stats WHERE activity_id=?', (activity_id,))
+            cursor.execute('DELETE FROM activity_reward_stats WHERE activity_id=?', (activity_id,))
+            cursor.execute('DELETE FROM activity_user_stats WHERE activity_id=?', (activity_id,))
         conn.commit()
         conn.close()
+        self._invalidate_draw_table(activity_id)
         return success
     
     def delete_reward(self, reward_id: int) -> bool:
@@ -630,10 +961,15 @@ class ActivityManager:
         conn = get_db_connection()
         cursor = conn.cursor()
         
+        cursor.execute('SELECT activity_id FROM activity_rewards WHERE id=?', (reward_id,))
+        row = cursor.fetchone()
         cursor.execute('DELETE FROM activity_rewards WHERE id=?', (reward_id,))
         success = cursor.rowcount > 0
+        if success and row:
+            self._bump_reward_version(cursor, row['activity_id'])
         conn.commit()
         conn.close()
+        self._invalidate_draw_table()
         return success
     
     def update_reward(self, reward_id: int, reward: ActivityReward) -> bool:
@@ -652,8 +988,15 @@ class ActivityManager:
                 reward.probability, reward.total_quantity, reward.remaining_quantity,
                 reward.icon, reward.order_index, reward_id
             ))
+            success = cursor.rowcount > 0
+            if success:
+                cursor.execute('''
+                UPDATE activities SET reward_version = reward_version + 1
+                WHERE id=(SELECT activity_id FROM activity_rewards WHERE id=?)
+                ''', (reward_id,))
             conn.commit()
-            return cursor.rowcount > 0
+            self._invalidate_draw_table()
+            return success
         except Exception as e:
             print(f"Error updating reward: {e}")
             return False
@@ -661,36 +1004,26 @@ class ActivityManager:
             conn.close()
     
     def get_statistics(self, activity_id: int) -> Dict[str, Any]:
-        """获取活动统计"""
+        """获取活动统计（读取增量维护的计数表）"""
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # 总参与次数
-        cursor.execute('''
-        SELECT COUNT(*) as total_participations FROM activity_participations WHERE activity_id=?
-        ''', (activity_id,))
-        total_participations = cursor.fetchone()['total_participations']
-        
-        # 唯一用户数
         cursor.execute('''
-        SELECT COUNT(DISTINCT game_id) as unique_users FROM activity_participations WHERE activity_id=?
+        SELECT total_participations, unique_users, winning_count
+        FROM activity_stats WHERE activity_id=?
         ''', (activity_id,))
-        unique_users = cursor.fetchone()['unique_users']
-        
-        # 中奖次数
-        cursor.execute('''
-        SELECT COUNT(*) as winning_count FROM activity_participations WHERE activity_id=? AND reward_id IS NOT NULL
-        ''', (activity_id,))
-        winning_count = cursor.fetchone()['winning_count']
+        row = cursor.fetchone()
+        total_participations = row['total_participations'] if row else 0
+        unique_users = row['unique_users'] if row else 0
+        winning_count = row['winning_count'] if row else 0
         
         # 奖项统计
         cursor.execute('''
-        SELECT ar.name, ar.total_quantity, ar.remaining_quantity, 
-               COUNT(ap.id) as won_count
+        SELECT ar.name, ar.total_quantity, ar.remaining_quantity,
+               COALESCE(rs.won_count, 0) as won_count
         FROM activity_rewards ar
-        LEFT JOIN activity_participations ap ON ar.id = ap.reward_id
+        LEFT JOIN activity_reward_stats rs ON ar.id = rs.reward_id
         WHERE ar.activity_id=?
-        GROUP BY ar.id
         ORDER BY ar.order_index
         ''', (activity_id,))
         
@@ -719,8 +1052,16 @@ class ActivityManager:
         conn = get_db_connection()
         cursor = conn.cursor()
         
+        cursor.execute('''
+        SELECT activity_id, game_id, reward_id FROM activity_participations WHERE id=?
+        ''', (participation_id,))
+        row = cursor.fetchone()
+        
+        cursor.execute('DELETE FROM activity_reward_deliveries WHERE participation_id=?', (participation_id,))
         cursor.execute('DELETE FROM activity_participations WHERE id=?', (participation_id,))
         success = cursor.rowcount > 0
+        if success and row:
+            self._apply_participation_stats(cursor, row['activity_id'], row['game_id'], row['reward_id'], -1)
         conn.commit()
         conn.close()
         return success
@@ -730,7 +1071,32 @@ class ActivityManager:
         conn = get_db_connection()
         cursor = conn.cursor()
         
+        cursor.execute('''
+        DELETE FROM activity_reward_deliveries WHERE participation_id IN (
+            SELECT id FROM activity_participations WHERE activity_id=?
+        )
+        ''', (activity_id,))
         cursor.execute('DELETE FROM activity_participations WHERE activity_id=?', (activity_id,))
+        cursor.execute('DELETE FROM activity_stats WHERE activity_id=?', (activity_id,))
+        cursor.execute('DELETE FROM activity_reward_stats WHERE activity_id=?', (activity_id,))
+        cursor.execute('DELETE FROM activity_user_stats WHERE activity_id=?', (activity_id,))
         conn.commit()
         conn.close()
-        return True
\ No newline at end of file
+        return True
+
+
+_activity_manager: Optional[ActivityManager] = None
+_activity_manager_lock = threading.Lock()
+
+
+def get_activity_manager() -> ActivityManager:
+    """
+    全局活动管理器（API 服务和活动路由共用）
+    第一次调用时创建，导入本模块不会访问数据库
+    """
+    global _activity_manager
+    if _activity_manager is None:
+        with _activity_manager_lock:
+            if _activity_manager is None:
+                _activity_manager = ActivityManager()
+    return _activity_manager
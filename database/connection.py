@@ -57,151 +57,13 @@ class DatabaseConnection:
             conn.close()
     
     def init_database(self):
-        """初始化数据库表结构"""
-        with self.get_cursor() as cursor:
-            # 创建用户表
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username VARCHAR(50) UNIQUE NOT NULL,
-                    email VARCHAR(100) UNIQUE NOT NULL,
-                    password_hash VARCHAR(255) NOT NULL,
-                    level INTEGER DEFAULT 1,
-                    role VARCHAR(20) DEFAULT 'user',
-                    is_active BOOLEAN DEFAULT 1,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_login TIMESTAMP
-                )
-            """)
-            
-            # 创建用户会话表
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS user_sessions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    token VARCHAR(500) NOT NULL,
-                    expires_at TIMESTAMP NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-                )
-            """)
-            
-            # 创建操作日志表
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS audit_logs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    action VARCHAR(100) NOT NULL,
-                    resource VARCHAR(100),
-                    details TEXT,
-                    ip_address VARCHAR(45),
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL
-                )
-            """)
-            
-            # 创建权限表
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS permissions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    code VARCHAR(50) UNIQUE NOT NULL,
-                    name VARCHAR(100) NOT NULL,
-                    category VARCHAR(50) NOT NULL,
-                    description TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # 创建 Level 权限关联表
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS level_permissions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    level INTEGER NOT NULL,
-                    permission_id INTEGER NOT NULL,
-                    UNIQUE(level, permission_id),
-                    FOREIGN KEY (permission_id) REFERENCES permissions(id) ON DELETE CASCADE
-                )
-            """)
-            
-            # 创建激活码表
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS activation_codes (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    code VARCHAR(50) UNIQUE NOT NULL,
-                    level INTEGER NOT NULL,
-                    is_used BOOLEAN DEFAULT 0,
-                    used_by INTEGER,
-                    used_at TIMESTAMP,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    expires_at TIMESTAMP,
-                    FOREIGN KEY (used_by) REFERENCES users(id) ON DELETE SET NULL
-                )
-            """)
-            
-            # 创建消息表
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS messages (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    sender_id INTEGER,
-                    sender_name VARCHAR(50) NOT NULL,
-                    recipient_id INTEGER NOT NULL,
-                    title VARCHAR(100) NOT NULL,
-                    content TEXT NOT NULL,
-                    is_read BOOLEAN DEFAULT 0,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (sender_id) REFERENCES users(id) ON DELETE SET NULL,
-                    FOREIGN KEY (recipient_id) REFERENCES users(id) ON DELETE CASCADE
-                )
-            """)
-            
-            # 创建索引
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_users_username 
-                ON users(username)
-            """)
-            
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_users_email 
-                ON users(email)
-            """)
-            
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_sessions_token 
-                ON user_sessions(token)
-            """)
-            
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_sessions_user_id 
-                ON user_sessions(user_id)
-            """)
-            
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_audit_user_id 
-                ON audit_logs(user_id)
-            """)
-            
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_activation_codes_code 
-                ON activation_codes(code)
-            """)
-            
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_activation_codes_level 
-                ON activation_codes(level)
-            """)
-            
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_activation_codes_used_by 
-                ON activation_codes(used_by)
-            """)
-            
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_activation_codes_is_used 
-                ON activation_codes(is_used)
-            """)
-            
-            logger.info("数据库表结构初始化完成")
+        """
+        初始化/升级数据库表结构
+        结构变更由 database/migrations.py 按版本执行，已是最新版本时只读取一次 PRAGMA user_version
+        """
+        from database.migrations import migrate
+        version = migrate(self)
+        logger.info(f"数据库表结构初始化完成 (版本 {version})")
 
 
 # 全局数据库实例
@@ -7,11 +7,17 @@
 1. ItemConfig - 道具配置模型
 2. ItemLevelLimit - 道具等级限制模型
 3. ItemGiftLog - 道具发送记录模型
+4. ItemGiftUsage - 按小时分桶的周期配额计数
+5. ItemCatalog - 道具配置和等级限制的内存快照
 """
 
-from typing import Optional, List, Dict
-from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Tuple, Iterator
 from database.connection import db
+import hashlib
+import sqlite3
+import json
+import threading
+import time
 import logging
 
 logger = logging.getLogger(__name__)
@@ -59,7 +65,8 @@ class ItemConfig:
                 """, (item_name, display_name, description, icon_url))
                 
                 logger.info(f"创建道具配置: {display_name} ({item_name})")
-                return ItemConfig.get_by_name(item_name)
+            ItemCatalog.reload()
+            return ItemConfig.get_by_name(item_name)
         except Exception as e:
             logger.error(f"创建道具配置失败: {e}")
             return None
@@ -67,43 +74,18 @@ class ItemConfig:
     @staticmethod
     def get_by_name(item_name: str) -> Optional['ItemConfig']:
         """根据道具名称获取配置"""
-        try:
-            with db.get_cursor() as cursor:
-                cursor.execute("""
-                    SELECT * FROM item_configs WHERE item_name = ?
-                """, (item_name,))
-                row = cursor.fetchone()
-                return ItemConfig(dict(row)) if row else None
-        except Exception as e:
-            logger.error(f"获取道具配置失败: {e}")
-            return None
+        row = ItemCatalog.get().items.get(item_name)
+        return ItemConfig(row) if row else None
     
     @staticmethod
     def get_all_active() -> List['ItemConfig']:
         """获取所有启用的道具配置"""
-        try:
-            with db.get_cursor() as cursor:
-                cursor.execute("""
-                    SELECT * FROM item_configs WHERE is_active = 1
-                    ORDER BY item_name
-                """)
-                rows = cursor.fetchall()
-                return [ItemConfig(dict(row)) for row in rows]
-        except Exception as e:
-            logger.error(f"获取道具配置列表失败: {e}")
-            return []
+        return [ItemConfig(row) for row in ItemCatalog.get().items.values() if row.get('is_active')]
     
     @staticmethod
     def get_all() -> List['ItemConfig']:
         """获取所有道具配置（包括禁用的）"""
-        try:
-            with db.get_cursor() as cursor:
-                cursor.execute("SELECT * FROM item_configs ORDER BY item_name")
-                rows = cursor.fetchall()
-                return [ItemConfig(dict(row)) for row in rows]
-        except Exception as e:
-            logger.error(f"获取道具配置列表失败: {e}")
-            return []
+        return [ItemConfig(row) for row in ItemCatalog.get().items.values()]
     
     def update(self, display_name: str = None, description: str = None,
                icon_url: str = None, is_active: bool = None) -> bool:
@@ -134,6 +116,7 @@ class ItemConfig:
             with db.get_cursor() as cursor:
                 sql = f"UPDATE item_configs SET {', '.join(updates)} WHERE item_name = ?"
                 cursor.execute(sql, tuple(params))
+            ItemCatalog.reload()
                 
             logger.info(f"更新道具配置: {self.item_name}")
             return True
@@ -170,7 +153,15 @@ class ItemConfig:
                         WHERE item_name = ?
                     """, (new_item_name, self.item_name))
                     
+                    # 4. 更新配额计数
+                    cursor.execute("""
+                        UPDATE item_gift_usage_buckets SET item_name = ? 
+                        WHERE item_name = ?
+                    """, (new_item_name, self.item_name))
+                    
                     cursor.execute("COMMIT")
+                    ItemGiftUsage.clear_cache()
+                    ItemCatalog.reload()
                     self.item_name = new_item_name
                     logger.info(f"道具重命名成功: {self.item_name} -> {new_item_name}")
                     return True
@@ -193,6 +184,7 @@ class ItemConfig:
                     SET is_active = 0, updated_at = CURRENT_TIMESTAMP
                     WHERE item_name = ?
                 """, (item_name,))
+            ItemCatalog.reload()
                 
             logger.info(f"删除道具配置: {item_name}")
             return True
@@ -245,7 +237,8 @@ class ItemLevelLimit:
                 """, (item_name, user_level, min_quantity, max_quantity, reset_period_hours, period_total_limit))
                 
                 logger.info(f"创建等级限制: {item_name} - Level {user_level}")
-                return ItemLevelLimit.get_limit(item_name, user_level)
+            ItemCatalog.reload()
+            return ItemLevelLimit.get_limit(item_name, user_level)
         except Exception as e:
             logger.error(f"创建等级限制失败: {e}")
             return None
@@ -271,10 +264,11 @@ class ItemLevelLimit:
                             data.get('period_total_limit', 999)
                         ))
                     cursor.execute("COMMIT")
-                    return True
                 except Exception as e:
                     cursor.execute("ROLLBACK")
                     raise e
+            ItemCatalog.reload()
+            return True
         except Exception as e:
             logger.error(f"批量创建等级限制失败: {e}")
             return False
@@ -282,79 +276,29 @@ class ItemLevelLimit:
     @staticmethod
     def get_limit(item_name: str, user_level: int) -> Optional['ItemLevelLimit']:
         """获取指定道具和等级的限制（包括禁用的，用于管理）"""
-        try:
-            with db.get_cursor() as cursor:
-                cursor.execute("""
-                    SELECT * FROM item_level_limits 
-                    WHERE item_name = ? AND user_level = ?
-                """, (item_name, user_level))
-                row = cursor.fetchone()
-                return ItemLevelLimit(dict(row)) if row else None
-        except Exception as e:
-            logger.error(f"获取等级限制失败: {e}")
-            return None
+        row = ItemCatalog.get().limits.get((item_name, user_level))
+        return ItemLevelLimit(row) if row else None
     
     @staticmethod
     def get_active_limit(item_name: str, user_level: int) -> Optional['ItemLevelLimit']:
         """获取有效的限制（用于检查）"""
-        try:
-            with db.get_cursor() as cursor:
-                cursor.execute("""
-                    SELECT * FROM item_level_limits 
-                    WHERE item_name = ? AND user_level = ? AND is_active = 1
-                """, (item_name, user_level))
-                row = cursor.fetchone()
-                return ItemLevelLimit(dict(row)) if row else None
-        except Exception as e:
-            logger.error(f"获取有效等级限制失败: {e}")
-            return None
+        row = ItemCatalog.get().limits.get((item_name, user_level))
+        return ItemLevelLimit(row) if row and row.get('is_active') else None
 
     @staticmethod
     def get_all_by_level(user_level: int) -> List['ItemLevelLimit']:
         """获取某等级的所有限制（包括禁用的）"""
-        try:
-            with db.get_cursor() as cursor:
-                cursor.execute("""
-                    SELECT * FROM item_level_limits 
-                    WHERE user_level = ?
-                    ORDER BY item_name
-                """, (user_level,))
-                rows = cursor.fetchall()
-                return [ItemLevelLimit(dict(row)) for row in rows]
-        except Exception as e:
-            logger.error(f"获取等级限制列表失败: {e}")
-            return []
+        return [ItemLevelLimit(row) for row in ItemCatalog.get().limits_by_level.get(user_level, [])]
     
     @staticmethod
     def get_all_by_item(item_name: str) -> List['ItemLevelLimit']:
         """获取某道具的所有等级限制（包括禁用的）"""
-        try:
-            with db.get_cursor() as cursor:
-                cursor.execute("""
-                    SELECT * FROM item_level_limits 
-                    WHERE item_name = ?
-                    ORDER BY user_level
-                """, (item_name,))
-                rows = cursor.fetchall()
-                return [ItemLevelLimit(dict(row)) for row in rows]
-        except Exception as e:
-            logger.error(f"获取等级限制列表失败: {e}")
-            return []
+        return [ItemLevelLimit(row) for row in ItemCatalog.get().limits_by_item.get(item_name, [])]
     
     @staticmethod
     def get_all() -> List['ItemLevelLimit']:
         """获取所有限制（包括禁用的）"""
-        try:
-            with db.get_cursor() as cursor:
-                cursor.execute("""
-                    SELECT * FROM item_level_limits
-                    ORDER BY item_name, user_level
-                """)
-                rows = cursor.fetchall()
-                return [ItemLevelLimit(dict(row)) for row in rows]
-        except Exception as e:
-            logger.error(f"获取限制列表失败: {e}")
-            return []
+        return [ItemLevelLimit(row) for row in ItemCatalog.get().limits.values()]
     
     def update(self, min_quantity: int = None, max_quantity: int = None,
                reset_period_hours: int = None, period_total_limit: int = None,
@@ -395,6 +339,7 @@ class ItemLevelLimit:
             with db.get_cursor() as cursor:
                 sql = f"UPDATE item_level_limits SET {', '.join(updates)} WHERE id = ?"
                 cursor.execute(sql, tuple(params))
+            ItemCatalog.reload()
                 
             logger.info(f"更新等级限制: ID {self.id}")
             return True
@@ -412,6 +357,7 @@ class ItemLevelLimit:
                     SET is_active = 0, updated_at = CURRENT_TIMESTAMP
                     WHERE item_name = ? AND user_level = ?
                 """, (item_name, user_level))
+            ItemCatalog.reload()
                 
             logger.info(f"删除等级限制: {item_name} - Level {user_level}")
             return True
@@ -429,6 +375,7 @@ class ItemLevelLimit:
                     SET is_active = 0, updated_at = CURRENT_TIMESTAMP
                     WHERE id = ?
                 """, (limit_id,))
+            ItemCatalog.reload()
                 
             logger.info(f"删除等级限制 ID: {limit_id}")
             return True
@@ -471,42 +418,69 @@ class ItemGiftLog:
                is_admin_send: bool = False) -> Optional['ItemGiftLog']:
         """创建发送记录"""
         try:
+            sent_ts = time.time()
             with db.get_cursor() as cursor:
-                cursor.execute("""
-                    INSERT INTO item_gift_logs 
-                    (sender_username, sender_level, recipient_username, item_name, quantity, reset_period_hours, is_admin_send)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (sender_username, sender_level, recipient_username, item_name, quantity, reset_period_hours, int(is_admin_send)))
-                
-                log_id = cursor.lastrowid
-                logger.info(f"记录道具发送: {sender_username} -> {recipient_username}, {item_name} x{quantity}")
-                
-                cursor.execute("SELECT * FROM item_gift_logs WHERE id = ?", (log_id,))
-                row = cursor.fetchone()
-                return ItemGiftLog(dict(row)) if row else None
+                log = ItemGiftLog._insert(
+                    cursor, sender_username, sender_level, recipient_username,
+                    item_name, quantity, reset_period_hours, is_admin_send, sent_ts
+                )
+            if log and not is_admin_send:
+                ItemGiftUsage.cache_add(sender_username, item_name, log.id, sent_ts, quantity)
+            return log
         except Exception as e:
             logger.error(f"创建发送记录失败: {e}")
             return None
     
+    @staticmethod
+    def create_within_quota(sender_username: str, sender_level: int, recipient_username: str,
+                            item_name: str, quantity: int, reset_period_hours: int,
+                            period_total_limit: int) -> Tuple[Optional['ItemGiftLog'], int]:
+        """
+        在配额内创建发送记录（检查与记录在同一个写事务中完成，并发发送不会超出配额）
+        
+        Returns:
+            (发送记录, 周期内已使用量)，超出配额时发送记录为 None
+        """
+        sent_ts = time.time()
+        with db.get_cursor() as cursor:
+            cursor.execute("BEGIN IMMEDIATE")
+            used = ItemGiftUsage.sum_usage(cursor, sender_username, item_name, reset_period_hours, sent_ts)
+            if used + quantity > period_total_limit:
+                return None, used
+            
+            log = ItemGiftLog._insert(
+                cursor, sender_username, sender_level, recipient_username,
+                item_name, quantity, reset_period_hours, False, sent_ts
+            )
+        if log:
+            ItemGiftUsage.cache_add(sender_username, item_name, log.id, sent_ts, quantity)
+        return log, used
+    
+    @staticmethod
+    def _insert(cursor, sender_username: str, sender_level: int, recipient_username: str,
+                item_name: str, quantity: int, reset_period_hours: int,
+                is_admin_send: bool, sent_ts: float) -> Optional['ItemGiftLog']:
+        """写入发送记录，并在同一事务中累加配额计数"""
+        cursor.execute("""
+            INSERT INTO item_gift_logs 
+            (sender_username, sender_level, recipient_username, item_name, quantity, reset_period_hours, is_admin_send)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (sender_username, sender_level, recipient_username, item_name, quantity, reset_period_hours, int(is_admin_send)))
+        
+        log_id = cursor.lastrowid
+        logger.info(f"记录道具发送: {sender_username} -> {recipient_username}, {item_name} x{quantity}")
+        
+        if not is_admin_send:
+            ItemGiftUsage.record(cursor, sender_username, item_name, sent_ts, quantity)
+        
+        cursor.execute("SELECT * FROM item_gift_logs WHERE id = ?", (log_id,))
+        row = cursor.fetchone()
+        return ItemGiftLog(dict(row)) if row else None
+    
     @staticmethod
     def get_period_usage(sender_username: str, item_name: str, period_hours: int) -> int:
         """获取周期内已发送的数量（不含管理员发送）"""
-        try:
-            cutoff_time = datetime.now() - timedelta(hours=period_hours)
-            
-            with db.get_cursor() as cursor:
-                cursor.execute("""
-                    SELECT SUM(quantity) as total 
-                    FROM item_gift_logs 
-                    WHERE sender_username = ? AND item_name = ? AND sent_at > ? AND is_admin_send = 0
-                """, (sender_username, item_name, cutoff_time.strftime('%Y-%m-%d %H:%M:%S')))
-                
-                row = cursor.fetchone()
-                total = row['total'] if row and row['total'] else 0
-                return int(total)
-        except Exception as e:
-            logger.error(f"获取周期使用量失败: {e}")
-            return 0
+        return ItemGiftUsage.get_period_usage(sender_username, item_name, period_hours)
     
     @staticmethod
     def get_recent_logs(sender_username: str, limit: int = 50) -> List['ItemGiftLog']:
@@ -543,3 +517,240 @@ class ItemGiftLog:
         except Exception as e:
             logger.error(f"获取发送记录失败: {e}")
             return []
+    
+    @staticmethod
+    def iter_logs(sender_username: Optional[str] = None, item_name: Optional[str] = None,
+                  start: Optional[str] = None, end: Optional[str] = None,
+                  chunk_size: int = 1000) -> Iterator[List[sqlite3.Row]]:
+        """
+        按条件分块读取发送记录（用于导出，不一次性载入内存）
+        每块按 (sent_at, id) 键集分页单独查询，块之间不持有读事务，导出期间不阻塞发送记录写入
+        """
+        conditions = []
+        params = []
+        if sender_username:
+            conditions.append("sender_username = ?")
+            params.append(sender_username)
+        if item_name:
+            conditions.append("item_name = ?")
+            params.append(item_name)
+        if start:
+            conditions.append("sent_at >= ?")
+            params.append(start)
+        if end:
+            conditions.append("sent_at <= ?")
+            params.append(end)
+        
+        last = None
+        while True:
+            chunk_conditions, chunk_params = list(conditions), list(params)
+            if last is not None:
+                chunk_conditions.append("(sent_at < ? OR (sent_at = ? AND id < ?))")
+                chunk_params += [last['sent_at'], last['sent_at'], last['id']]
+            where = f"WHERE {' AND '.join(chunk_conditions)}" if chunk_conditions else ""
+            with db.get_cursor() as cursor:
+                cursor.execute(
+                    f"SELECT * FROM item_gift_logs {where} ORDER BY sent_at DESC, id DESC LIMIT ?",
+                    chunk_params + [chunk_size]
+                )
+                rows = cursor.fetchall()
+            if not rows:
+                break
+            yield rows
+            if len(rows) < chunk_size:
+                break
+            last = rows[-1]
+
+
+class ItemGiftUsage:
+    """
+    道具赠送周期配额计数
+    
+    按 (发送者, 道具, 小时) 分桶累加发送数量，随发送记录在同一事务中维护，
+    查询周期用量只需累加周期内的桶。窗口按整小时对齐，包含截止时间所在的桶，
+    因此计算出的用量不会低于实际用量。计数表的创建和首次回填见 database/migrations.py。
+    """
+    
+    BUCKET_SECONDS = 3600
+    CACHE_MAX_KEYS = 10000
+    
+    _lock = threading.Lock()
+    # {(sender_username, item_name): (已加载的起始桶, 加载时的最大发送记录ID, {桶起始时间: 数量})}
+    _cache: Dict[Tuple[str, str], Tuple[int, int, Dict[int, int]]] = {}
+    # 正在从数据库加载的 key -> [加载期间提交的 (发送记录ID, 桶, 数量)]，以及加载中的请求数
+    _loading: Dict[Tuple[str, str], List[Tuple[int, int, int]]] = {}
+    _loaders: Dict[Tuple[str, str], int] = {}
+    
+    @classmethod
+    def bucket_of(cls, ts: float) -> int:
+        """时间戳所在桶的起始时间"""
+        return int(ts) // cls.BUCKET_SECONDS * cls.BUCKET_SECONDS
+    
+    @classmethod
+    def record(cls, cursor, sender_username: str, item_name: str, sent_ts: float, quantity: int):
+        """在当前事务中累加计数（提交后需调用 cache_add 同步缓存）"""
+        cursor.execute("""
+            INSERT INTO item_gift_usage_buckets (sender_username, item_name, bucket_start, quantity)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(sender_username, item_name, bucket_start)
+            DO UPDATE SET quantity = quantity + excluded.quantity
+        """, (sender_username, item_name, cls.bucket_of(sent_ts), quantity))
+    
+    @classmethod
+    def sum_usage(cls, cursor, sender_username: str, item_name: str, period_hours: int,
+                  now: Optional[float] = None) -> int:
+        """在当前事务中统计周期内用量"""
+        first_bucket = cls.bucket_of((now or time.time()) - period_hours * 3600)
+        cursor.execute("""
+            SELECT SUM(quantity) as total FROM item_gift_usage_buckets
+            WHERE sender_username = ? AND item_name = ? AND bucket_start >= ?
+        """, (sender_username, item_name, first_bucket))
+        row = cursor.fetchone()
+        return int(row['total']) if row and row['total'] else 0
+    
+    @classmethod
+    def _load(cls, sender_username: str, item_name: str, first_bucket: int) -> Tuple[int, Dict[int, int]]:
+        """
+        读取周期内的桶和当前最大发送记录ID
+        两者由同一条语句读取（同一快照）；发送记录在写事务中按提交顺序分配递增的ID，
+        因此 ID 不大于返回值的发送已计入桶中，更大的尚未计入
+        """
+        with db.get_cursor() as cursor:
+            cursor.execute("""
+                SELECT (SELECT MAX(id) FROM item_gift_logs) AS last_log_id, b.bucket_start, b.quantity
+                FROM (SELECT 1) LEFT JOIN item_gift_usage_buckets b
+                  ON b.sender_username = ? AND b.item_name = ? AND b.bucket_start >= ?
+            """, (sender_username, item_name, first_bucket))
+            rows = cursor.fetchall()
+        last_log_id = rows[0]['last_log_id'] or 0
+        buckets = {row['bucket_start']: row['quantity'] for row in rows if row['bucket_start'] is not None}
+        return last_log_id, buckets
+    
+    @staticmethod
+    def _total(entry: Tuple[int, int, Dict[int, int]], first_bucket: int) -> int:
+        return sum(qty for bucket, qty in entry[2].items() if bucket >= first_bucket)
+    
+    @classmethod
+    def get_period_usage(cls, sender_username: str, item_name: str, period_hours: int) -> int:
+        """
+        获取周期内用量（优先读取内存缓存）
+        未缓存时在锁外读取数据库，加载期间提交的发送按发送记录ID合并，既不遗漏也不重复计数
+        """
+        key = (sender_username, item_name)
+        first_bucket = cls.bucket_of(time.time() - period_hours * 3600)
+        with cls._lock:
+            entry = cls._cache.get(key)
+            if entry is not None and entry[0] <= first_bucket:
+                return cls._total(entry, first_bucket)
+            cls._loading.setdefault(key, [])
+            cls._loaders[key] = cls._loaders.get(key, 0) + 1
+        
+        loaded = None
+        try:
+            loaded = cls._load(sender_username, item_name, first_bucket)
+        except Exception as e:
+            logger.error(f"获取周期使用量失败: {e}")
+        
+        with cls._lock:
+            committed = cls._loading.get(key, [])
+            cls._loaders[key] -= 1
+            if cls._loaders[key] <= 0:
+                cls._loaders.pop(key, None)
+                cls._loading.pop(key, None)
+            
+            if loaded is None:
+                return 0
+            last_log_id, buckets = loaded
+            for log_id, bucket, quantity in committed:
+                if log_id > last_log_id:
+                    buckets[bucket] = buckets.get(bucket, 0) + quantity
+            
+            entry = cls._cache.get(key)
+            if entry is None or entry[0] > first_bucket:
+                # 其他请求已先加载了同一窗口时沿用其结果
+                if entry is None and len(cls._cache) >= cls.CACHE_MAX_KEYS:
+                    cls._cache.pop(next(iter(cls._cache)))
+                entry = (first_bucket, last_log_id, buckets)
+                cls._cache[key] = entry
+            return cls._total(entry, first_bucket)
+    
+    @classmethod
+    def cache_add(cls, sender_username: str, item_name: str, log_id: int, sent_ts: float, quantity: int):
+        """写穿缓存：发送记录提交后同步累加已缓存的计数（已包含在缓存快照中的发送记录跳过）"""
+        key = (sender_username, item_name)
+        bucket = cls.bucket_of(sent_ts)
+        with cls._lock:
+            committed = cls._loading.get(key)
+            if committed is not None:
+                committed.append((log_id, bucket, quantity))
+            entry = cls._cache.get(key)
+            if entry is None or log_id <= entry[1]:
+                return
+            buckets = entry[2]
+            buckets[bucket] = buckets.get(bucket, 0) + quantity
+    
+    @classmethod
+    def clear_cache(cls):
+        """清空缓存"""
+        with cls._lock:
+            cls._cache.clear()
+
+
+class ItemCatalog:
+    """
+    道具目录快照
+    
+    缓存全部道具配置和 (道具, 等级) -> 限制 矩阵，读接口不再访问数据库。
+    管理端写入后整体重建并替换快照；TTL 用于兜底其他进程的写入。
+    """
+    
+    TTL_SECONDS = 60
+    
+    _snapshot: Optional['ItemCatalog'] = None
+    _reload_failed = False  # 上次重建失败，下次访问时重试
+    _lock = threading.Lock()
+    
+    def __init__(self, item_rows: List[dict], limit_rows: List[dict]):
+        self.items: Dict[str, dict] = {row['item_name']: row for row in item_rows}
+        self.limits: Dict[Tuple[str, int], dict] = {}
+        self.limits_by_level: Dict[int, List[dict]] = {}
+        self.limits_by_item: Dict[str, List[dict]] = {}
+        for row in limit_rows:
+            self.limits[(row['item_name'], row['user_level'])] = row
+            self.limits_by_level.setdefault(row['user_level'], []).append(row)
+            self.limits_by_item.setdefault(row['item_name'], []).append(row)
+        
+        content = json.dumps([item_rows, limit_rows], sort_keys=True, default=str)
+        self.version = hashlib.sha1(content.encode('utf-8')).hexdigest()[:16]
+        self.loaded_at = time.time()
+    
+    @classmethod
+    def get(cls) -> 'ItemCatalog':
+        """获取当前快照，不存在或过期时重建"""
+        snapshot = cls._snapshot
+        if snapshot is None or cls._reload_failed or time.time() - snapshot.loaded_at > cls.TTL_SECONDS:
+            snapshot = cls.reload()
+        return snapshot
+    
+    @classmethod
+    def reload(cls) -> 'ItemCatalog':
+        """
+        从数据库重建快照并原子替换
+        加载失败时保留上一个快照（没有时返回空目录但不缓存），下次访问时重试
+        """
+        with cls._lock:
+            try:
+                with db.get_cursor() as cursor:
+                    cursor.execute("SELECT * FROM item_configs ORDER BY item_name")
+                    item_rows = [dict(row) for row in cursor.fetchall()]
+                    cursor.execute("SELECT * FROM item_level_limits ORDER BY item_name, user_level")
+                    limit_rows = [dict(row) for row in cursor.fetchall()]
+            except Exception as e:
+                logger.error(f"加载道具目录失败，继续使用上一个快照: {e}")
+                cls._reload_failed = True
+                return cls._snapshot if cls._snapshot is not None else cls([], [])
+            
+            cls._reload_failed = False
+            snapshot = cls(item_rows, limit_rows)
+            cls._snapshot = snapshot
+            return snapshot
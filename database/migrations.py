@@ -0,0 +1,748 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库结构版本迁移
+
+schema_version 表记录已执行的迁移版本。启动时只查询一次当前版本，已是最新时不执行任何 DDL；
+否则按版本顺序执行尚未执行的迁移。修改表结构时在 MIGRATIONS 末尾追加新版本，
+不要修改已发布的迁移。
+
+大表上的操作通过 MigrationContext 分步执行，避免启动时长时间锁库：
+- 每个索引在单独的短事务中创建
+- 计数表回填按主键范围分段提交，进度记录在 schema_backfill_progress 中，中断后从断点继续
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 回填时每个事务处理的源表行数
+BACKFILL_CHUNK_SIZE = 20000
+
+
+class MigrationContext:
+    """迁移执行上下文，提供分步执行的建表、建索引和回填操作"""
+
+    def __init__(self, database, chunk_size: int = BACKFILL_CHUNK_SIZE):
+        self.database = database
+        self.chunk_size = chunk_size
+
+    @contextmanager
+    def transaction(self):
+        """写事务（BEGIN IMMEDIATE，退出时提交）"""
+        with self.database.get_cursor() as cursor:
+            cursor.execute("BEGIN IMMEDIATE")
+            yield cursor
+
+    def table_exists(self, cursor, name: str) -> bool:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,))
+        return cursor.fetchone() is not None
+
+    def column_exists(self, cursor, table: str, column: str) -> bool:
+        cursor.execute(f"PRAGMA table_info({table})")
+        return any(row['name'] == column for row in cursor.fetchall())
+
+    def create_index(self, name: str, table: str, columns: str, unique: bool = False):
+        """
+        在单独的事务中创建索引（已存在时跳过）
+        SQLite 的索引只能由一条语句建完，单独提交可以避免与其他迁移步骤一起长时间持有写锁
+        """
+        with self.database.get_cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (name,))
+            if cursor.fetchone():
+                return
+        started = time.perf_counter()
+        with self.transaction() as cursor:
+            cursor.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table}({columns})")
+        logger.info(f"创建索引 {name}，耗时 {time.perf_counter() - started:.2f}s")
+
+    def drop_index(self, name: str):
+        with self.transaction() as cursor:
+            cursor.execute(f"DROP INDEX IF EXISTS {name}")
+
+    def create_table_with_backfill(self, name: str, ddl: str) -> bool:
+        """
+        创建需要从已有数据回填的表（如计数表）
+        建表与登记回填任务在同一事务中完成；返回是否有待执行的回填
+        """
+        with self.transaction() as cursor:
+            if not self.table_exists(cursor, name):
+                cursor.execute(ddl)
+                cursor.execute(
+                    "INSERT OR IGNORE INTO schema_backfill_progress (task, last_key) VALUES (?, 0)",
+                    (name,)
+                )
+            cursor.execute("SELECT 1 FROM schema_backfill_progress WHERE task = ?", (name,))
+            return cursor.fetchone() is not None
+
+    def backfill(self, task: str, source_table: str, statements: Sequence[str],
+                 finalize: Sequence[str] = (), key: str = "id"):
+        """
+        按主键范围分段回填
+        - statements 中的 SQL 使用 :lo / :hi 参数限定源表主键范围 (lo, hi]，应为可累加的写入
+        - 每段与进度更新在同一事务中提交，中断后从上次提交的位置继续
+        - finalize 中的 SQL 在全部分段完成后执行一次
+        """
+        started = time.perf_counter()
+        chunks = 0
+        while True:
+            with self.transaction() as cursor:
+                cursor.execute("SELECT last_key FROM schema_backfill_progress WHERE task = ?", (task,))
+                row = cursor.fetchone()
+                if row is None:
+                    # 已由其他进程完成
+                    return
+                lo = row['last_key']
+                cursor.execute(
+                    f"SELECT {key} FROM {source_table} WHERE {key} > ? ORDER BY {key} LIMIT 1 OFFSET ?",
+                    (lo, self.chunk_size - 1)
+                )
+                boundary = cursor.fetchone()
+                if boundary is None:
+                    cursor.execute(f"SELECT MAX({key}) FROM {source_table}")
+                    hi = cursor.fetchone()[0]
+                else:
+                    hi = boundary[0]
+
+                if hi is None or hi <= lo:
+                    for sql in finalize:
+                        cursor.execute(sql)
+                    cursor.execute("DELETE FROM schema_backfill_progress WHERE task = ?", (task,))
+                    logger.info(
+                        f"回填 {task} 完成: {chunks} 段，耗时 {time.perf_counter() - started:.2f}s"
+                    )
+                    return
+
+                for sql in statements:
+                    cursor.execute(sql, {"lo": lo, "hi": hi})
+                cursor.execute("UPDATE schema_backfill_progress SET last_key = ? WHERE task = ?", (hi, task))
+            chunks += 1
+
+
+# ---------------------------------------------------------------------------
+# 迁移定义
+# ---------------------------------------------------------------------------
+
+def _v1_core_tables(ctx: MigrationContext):
+    """用户、会话、权限、等级配置和激活码"""
+    with ctx.transaction() as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username VARCHAR(50) UNIQUE NOT NULL,
+                email VARCHAR(100) UNIQUE NOT NULL,
+                password_hash VARCHAR(255) NOT NULL,
+                level INTEGER DEFAULT 1,
+                role VARCHAR(20) DEFAULT 'user',
+                is_active BOOLEAN DEFAULT 1,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_login TIMESTAMP
+            )
+        """)
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS user_sessions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                token VARCHAR(500) NOT NULL,
+                expires_at TIMESTAMP NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+        """)
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS permissions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                code VARCHAR(50) UNIQUE NOT NULL,
+                name VARCHAR(100) NOT NULL,
+                category VARCHAR(50) NOT NULL,
+                description TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS level_permissions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                level INTEGER NOT NULL,
+                permission_id INTEGER NOT NULL,
+                UNIQUE(level, permission_id),
+                FOREIGN KEY (permission_id) REFERENCES permissions(id) ON DELETE CASCADE
+            )
+        """)
+
+        # 等级配置表首次创建时写入默认的 Level 1-10
+        if not ctx.table_exists(cursor, "level_configs"):
+            cursor.execute("""
+                CREATE TABLE level_configs (
+                    level_value INTEGER PRIMARY KEY,
+                    display_name VARCHAR(50) NOT NULL,
+                    description TEXT DEFAULT '',
+                    sort_order INTEGER NOT NULL,
+                    is_active BOOLEAN DEFAULT 1,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cursor.executemany("""
+                INSERT INTO level_configs (level_value, display_name, description, sort_order, is_active)
+                VALUES (?, ?, ?, ?, 1)
+            """, [
+                (1, 'Level 1', '初级用户 - 基础权限', 1),
+                (2, 'Level 2', '进阶用户 - 扩展权限', 2),
+                (3, 'Level 3', '中级用户 - 中等权限', 3),
+                (4, 'Level 4', '高级用户 - 较高权限', 4),
+                (5, 'Level 5', '专业用户 - 专业权限', 5),
+                (6, 'Level 6', '精英用户 - 精英权限', 6),
+                (7, 'Level 7', '大师用户 - 大师权限', 7),
+                (8, 'Level 8', '宗师用户 - 宗师权限', 8),
+                (9, 'Level 9', '传奇用户 - 传奇权限', 9),
+                (10, 'Level 10', '至尊用户 - 所有权限', 10),
+            ])
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS activation_codes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                code VARCHAR(50) UNIQUE NOT NULL,
+                level INTEGER NOT NULL,
+                is_used BOOLEAN DEFAULT 0,
+                used_by INTEGER,
+                used_at TIMESTAMP,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                expires_at TIMESTAMP,
+                FOREIGN KEY (used_by) REFERENCES users(id) ON DELETE SET NULL
+            )
+        """)
+
+    ctx.create_index("idx_users_username", "users", "username")
+    ctx.create_index("idx_users_email", "users", "email")
+    ctx.create_index("idx_sessions_token", "user_sessions", "token")
+    ctx.create_index("idx_sessions_user_id", "user_sessions", "user_id")
+    ctx.create_index("idx_level_configs_sort_order", "level_configs", "sort_order")
+    # code 列的 UNIQUE 约束已自带索引，额外的索引只会拖慢批量写入
+    ctx.drop_index("idx_activation_codes_code")
+    ctx.create_index("idx_activation_codes_level", "activation_codes", "level")
+    ctx.create_index("idx_activation_codes_used_by", "activation_codes", "used_by")
+    ctx.create_index("idx_activation_codes_is_used", "activation_codes", "is_used")
+
+
+def _v2_messages(ctx: MigrationContext):
+    """消息正文表 + 投递表 + 计数表"""
+    with ctx.transaction() as cursor:
+        # 群发时所有收件人共享同一条正文
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS message_bodies (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                sender_id INTEGER,
+                sender_name VARCHAR(50) NOT NULL,
+                title VARCHAR(100) NOT NULL,
+                content TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (sender_id) REFERENCES users(id) ON DELETE SET NULL
+            )
+        """)
+
+        # 每个收件人一行，消息ID即投递ID
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS message_deliveries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                body_id INTEGER NOT NULL,
+                recipient_id INTEGER NOT NULL,
+                is_read BOOLEAN DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (body_id) REFERENCES message_bodies(id) ON DELETE CASCADE,
+                FOREIGN KEY (recipient_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+        """)
+
+        _migrate_legacy_messages(cursor)
+
+    # 收件总数、未读数、发件总数，随写入同步维护
+    if ctx.create_table_with_backfill("message_counters", """
+        CREATE TABLE message_counters (
+            user_id INTEGER PRIMARY KEY,
+            inbox_total INTEGER NOT NULL DEFAULT 0,
+            unread_count INTEGER NOT NULL DEFAULT 0,
+            sent_total INTEGER NOT NULL DEFAULT 0
+        )
+    """):
+        ctx.backfill("message_counters", "message_deliveries", [
+            """
+            INSERT INTO message_counters (user_id, inbox_total, unread_count)
+            SELECT recipient_id, COUNT(*), SUM(CASE WHEN is_read = 0 THEN 1 ELSE 0 END)
+            FROM message_deliveries
+            WHERE id > :lo AND id <= :hi
+            GROUP BY recipient_id
+            ON CONFLICT(user_id) DO UPDATE SET
+                inbox_total = inbox_total + excluded.inbox_total,
+                unread_count = unread_count + excluded.unread_count
+            """,
+            """
+            INSERT INTO message_counters (user_id, sent_total)
+            SELECT b.sender_id, COUNT(*)
+            FROM message_deliveries d
+            JOIN message_bodies b ON b.id = d.body_id
+            WHERE d.id > :lo AND d.id <= :hi AND b.sender_id IS NOT NULL
+            GROUP BY b.sender_id
+            ON CONFLICT(user_id) DO UPDATE SET sent_total = sent_total + excluded.sent_total
+            """
+        ])
+
+    # 收件箱按 (created_at, id) 游标分页
+    ctx.drop_index("idx_message_deliveries_recipient")
+    ctx.create_index("idx_message_deliveries_inbox", "message_deliveries", "recipient_id, created_at DESC, id DESC")
+    ctx.create_index("idx_message_deliveries_body", "message_deliveries", "body_id")
+    ctx.create_index("idx_message_bodies_sender", "message_bodies", "sender_id")
+
+
+def _migrate_legacy_messages(cursor):
+    """
+    将旧版 messages 表（每个收件人一份标题和正文）迁移为共享正文结构
+
+    同一发送者发送的标题、正文完全相同的消息合并为一条正文，
+    投递记录沿用原消息ID，迁移后旧表重命名为 messages_legacy 备份。
+    """
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'messages'")
+    if not cursor.fetchone():
+        return
+
+    cursor.execute("SELECT COUNT(*) FROM messages")
+    total = cursor.fetchone()[0]
+
+    # 每组重复正文取最小消息ID作为正文ID
+    cursor.execute("""
+        INSERT INTO message_bodies (id, sender_id, sender_name, title, content, created_at)
+        SELECT MIN(id), sender_id, sender_name, title, content, MIN(created_at)
+        FROM messages
+        GROUP BY sender_id, sender_name, title, content
+    """)
+    body_count = cursor.rowcount
+
+    cursor.execute("""
+        INSERT INTO message_deliveries (id, body_id, recipient_id, is_read, created_at)
+        SELECT id,
+               MIN(id) OVER (PARTITION BY sender_id, sender_name, title, content),
+               recipient_id, is_read, created_at
+        FROM messages
+    """)
+
+    backup_name = "messages_legacy"
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?", (backup_name,))
+    if cursor.fetchone():
+        backup_name = f"messages_legacy_{time.strftime('%Y%m%d%H%M%S')}"
+    cursor.execute(f"ALTER TABLE messages RENAME TO {backup_name}")
+    logger.info(f"消息表迁移完成: {total} 条消息，去重后 {body_count} 条正文，旧表备份为 {backup_name}")
+
+
+def _v3_audit_log_partitions(ctx: MigrationContext):
+    """操作日志按月分区（见 AuditLog）"""
+    from database.models import AuditLog
+
+    with ctx.transaction() as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS audit_log_partitions (
+                month VARCHAR(6) PRIMARY KEY,
+                table_name VARCHAR(50) NOT NULL,
+                row_count INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        # 旧版 audit_logs 单表迁移到按月分区
+        AuditLog.migrate_legacy_table(cursor)
+
+
+def _v4_activity_tables(ctx: MigrationContext):
+    """活动、奖项、参与记录、奖励发放队列和统计计数"""
+    with ctx.transaction() as cursor:
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS activities (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            type TEXT NOT NULL,
+            description TEXT DEFAULT '',
+            game_id_required INTEGER DEFAULT 1,
+            max_participations INTEGER DEFAULT 0,
+            start_time DATETIME,
+            end_time DATETIME,
+            is_active INTEGER DEFAULT 1,
+            config TEXT DEFAULT '{}',
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS activity_rewards (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            activity_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            description TEXT DEFAULT '',
+            type TEXT DEFAULT 'item',
+            value TEXT DEFAULT '{}',
+            probability REAL DEFAULT 0.0,
+            total_quantity INTEGER DEFAULT 0,
+            remaining_quantity INTEGER DEFAULT 0,
+            icon TEXT DEFAULT '',
+            order_index INTEGER DEFAULT 0,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (activity_id) REFERENCES activities (id) ON DELETE CASCADE
+        )
+        ''')
+
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS activity_participations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            activity_id INTEGER NOT NULL,
+            game_id TEXT NOT NULL,
+            reward_id INTEGER,
+            reward_name TEXT DEFAULT '',
+            status INTEGER DEFAULT 1,
+            ip_address TEXT,
+            user_agent TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (activity_id) REFERENCES activities (id) ON DELETE CASCADE,
+            FOREIGN KEY (reward_id) REFERENCES activity_rewards (id) ON DELETE SET NULL
+        )
+        ''')
+
+        # 早期版本的参与记录表没有 status 字段
+        if not ctx.column_exists(cursor, "activity_participations", "status"):
+            cursor.execute('ALTER TABLE activity_participations ADD COLUMN status INTEGER DEFAULT 1')
+
+        # 奖励发放队列（outbox，与参与记录在同一事务中写入，由后台任务发放）
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS activity_reward_deliveries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            participation_id INTEGER NOT NULL UNIQUE,
+            game_id TEXT NOT NULL,
+            reward_value TEXT NOT NULL,
+            attempts INTEGER DEFAULT 0,
+            next_attempt_at REAL DEFAULT 0,
+            locked_until REAL DEFAULT 0,
+            last_error TEXT DEFAULT '',
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS activity_reward_stats (
+            reward_id INTEGER PRIMARY KEY,
+            activity_id INTEGER NOT NULL,
+            won_count INTEGER DEFAULT 0
+        )
+        ''')
+
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS activity_user_stats (
+            activity_id INTEGER NOT NULL,
+            game_id TEXT NOT NULL,
+            participation_count INTEGER DEFAULT 0,
+            PRIMARY KEY (activity_id, game_id)
+        )
+        ''')
+
+    # 统计计数表（随参与记录在同一事务中增量维护），首次创建时从已有参与记录回填；
+    # 去重人数不能分段累加，在全部分段完成后由 activity_user_stats 统计
+    if ctx.create_table_with_backfill("activity_stats", '''
+        CREATE TABLE activity_stats (
+            activity_id INTEGER PRIMARY KEY,
+            total_participations INTEGER DEFAULT 0,
+            unique_users INTEGER DEFAULT 0,
+            winning_count INTEGER DEFAULT 0
+        )
+    '''):
+        ctx.backfill("activity_stats", "activity_participations", [
+            '''
+            INSERT INTO activity_user_stats (activity_id, game_id, participation_count)
+            SELECT activity_id, game_id, COUNT(*) FROM activity_participations
+            WHERE id > :lo AND id <= :hi
+            GROUP BY activity_id, game_id
+            ON CONFLICT(activity_id, game_id) DO UPDATE SET
+                participation_count = participation_count + excluded.participation_count
+            ''',
+            '''
+            INSERT INTO activity_stats (activity_id, total_participations, winning_count)
+            SELECT activity_id, COUNT(*), SUM(CASE WHEN reward_id IS NOT NULL THEN 1 ELSE 0 END)
+            FROM activity_participations
+            WHERE id > :lo AND id <= :hi
+            GROUP BY activity_id
+            ON CONFLICT(activity_id) DO UPDATE SET
+                total_participations = total_participations + excluded.total_participations,
+                winning_count = winning_count + excluded.winning_count
+            ''',
+            '''
+            INSERT INTO activity_reward_stats (reward_id, activity_id, won_count)
+            SELECT reward_id, activity_id, COUNT(*) FROM activity_participations
+            WHERE id > :lo AND id <= :hi AND reward_id IS NOT NULL
+            GROUP BY reward_id
+            ON CONFLICT(reward_id) DO UPDATE SET won_count = won_count + excluded.won_count
+            '''
+        ], finalize=[
+            '''
+            UPDATE activity_stats SET unique_users = (
+                SELECT COUNT(*) FROM activity_user_stats u WHERE u.activity_id = activity_stats.activity_id
+            )
+            '''
+        ])
+
+    ctx.create_index("idx_reward_deliveries_next", "activity_reward_deliveries", "next_attempt_at")
+    ctx.create_index("idx_activities_type", "activities", "type")
+    ctx.create_index("idx_activities_active", "activities", "is_active")
+    ctx.create_index("idx_activity_rewards_activity", "activity_rewards", "activity_id")
+    ctx.create_index("idx_participations_activity", "activity_participations", "activity_id")
+    ctx.create_index("idx_participations_game_id", "activity_participations", "game_id")
+    ctx.create_index("idx_activity_reward_stats_activity", "activity_reward_stats", "activity_id")
+
+
+def _v5_item_gift_tables(ctx: MigrationContext):
+    """道具配置、等级限制、发送记录和周期配额分桶计数"""
+    with ctx.transaction() as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS item_configs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                item_name TEXT NOT NULL UNIQUE,
+                display_name TEXT NOT NULL,
+                description TEXT,
+                icon_url TEXT,
+                is_active BOOLEAN DEFAULT 1,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS item_level_limits (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                item_name TEXT NOT NULL,
+                user_level INTEGER NOT NULL,
+                min_quantity INTEGER DEFAULT 1,
+                max_quantity INTEGER DEFAULT 99,
+                reset_period_hours INTEGER DEFAULT 24,
+                period_total_limit INTEGER DEFAULT 999,
+                is_active BOOLEAN DEFAULT 1,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(item_name, user_level),
+                FOREIGN KEY (item_name) REFERENCES item_configs(item_name) ON DELETE CASCADE
+            )
+        """)
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS item_gift_logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                sender_username TEXT NOT NULL,
+                sender_level INTEGER NOT NULL,
+                recipient_username TEXT NOT NULL,
+                item_name TEXT NOT NULL,
+                quantity INTEGER NOT NULL,
+                reset_period_hours INTEGER,
+                is_admin_send BOOLEAN DEFAULT 0,
+                sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (item_name) REFERENCES item_configs(item_name)
+            )
+        """)
+
+    # 按 (发送者, 道具, 小时) 分桶的配额计数，首次创建时从发送记录回填（不含管理员发送）
+    if ctx.create_table_with_backfill("item_gift_usage_buckets", """
+        CREATE TABLE item_gift_usage_buckets (
+            sender_username TEXT NOT NULL,
+            item_name TEXT NOT NULL,
+            bucket_start INTEGER NOT NULL,
+            quantity INTEGER DEFAULT 0,
+            PRIMARY KEY (sender_username, item_name, bucket_start)
+        )
+    """):
+        ctx.backfill("item_gift_usage_buckets", "item_gift_logs", [
+            """
+            INSERT INTO item_gift_usage_buckets (sender_username, item_name, bucket_start, quantity)
+            SELECT sender_username, item_name,
+                   CAST(strftime('%s', sent_at) AS INTEGER) / 3600 * 3600,
+                   SUM(quantity)
+            FROM item_gift_logs
+            WHERE id > :lo AND id <= :hi AND is_admin_send = 0
+            GROUP BY 1, 2, 3
+            ON CONFLICT(sender_username, item_name, bucket_start)
+            DO UPDATE SET quantity = quantity + excluded.quantity
+            """
+        ])
+
+    ctx.create_index("idx_item_configs_name", "item_configs", "item_name", unique=True)
+    ctx.create_index("idx_item_configs_is_active", "item_configs", "is_active")
+    ctx.create_index("idx_item_level_limits_level", "item_level_limits", "user_level")
+    ctx.create_index("idx_item_level_limits_item", "item_level_limits", "item_name")
+    ctx.create_index("idx_item_level_limits_active", "item_level_limits", "is_active")
+    ctx.create_index("idx_item_gift_logs_sender", "item_gift_logs", "sender_username, sent_at")
+    ctx.create_index("idx_item_gift_logs_item_sender", "item_gift_logs", "item_name, sender_username, sent_at")
+    ctx.create_index("idx_item_gift_logs_recipient", "item_gift_logs", "recipient_username, sent_at")
+
+
+def _v6_report_indexes(ctx: MigrationContext):
+    """参与记录和发送记录按时间倒序查询/导出的索引"""
+    ctx.create_index("idx_participations_activity_created", "activity_participations", "activity_id, created_at")
+    # 新索引以 activity_id 开头，可以替代单列索引
+    ctx.drop_index("idx_participations_activity")
+    ctx.create_index("idx_item_gift_logs_sent", "item_gift_logs", "sent_at")
+
+
+def _v7_rate_limit_buckets(ctx: MigrationContext):
+    """限流令牌桶状态（多个工作进程共享限流状态时使用）"""
+    with ctx.transaction() as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                bucket TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+    ctx.create_index("idx_rate_limit_buckets_updated", "rate_limit_buckets", "updated_at")
+
+
+def _v8_activity_reward_version(ctx: MigrationContext):
+    """活动的奖项版本号（奖项变更时递增，各进程据此失效缓存的抽奖概率表）"""
+    with ctx.transaction() as cursor:
+        if not ctx.column_exists(cursor, "activities", "reward_version"):
+            cursor.execute("ALTER TABLE activities ADD COLUMN reward_version INTEGER DEFAULT 0")
+
+
+def _v9_message_broadcast_jobs(ctx: MigrationContext):
+    """群发任务状态（多个工作进程时，任何进程都能查询任务进度和结果）"""
+    with ctx.transaction() as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS message_broadcast_jobs (
+                job_id TEXT PRIMARY KEY,
+                sender_id INTEGER,
+                status TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                processed INTEGER DEFAULT 0,
+                sent_count INTEGER DEFAULT 0,
+                failed_user_ids TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                finished_at REAL
+            ) WITHOUT ROWID
+        """)
+    ctx.create_index("idx_message_broadcast_jobs_finished", "message_broadcast_jobs", "finished_at")
+
+
+def _v10_activation_code_batches(ctx: MigrationContext):
+    """激活码批次标识（批量生成的激活码按 batch_id 读取，created_at 只记录创建时间）"""
+    with ctx.transaction() as cursor:
+        if not ctx.column_exists(cursor, "activation_codes", "batch_id"):
+            cursor.execute("ALTER TABLE activation_codes ADD COLUMN batch_id TEXT")
+    ctx.create_index("idx_activation_codes_batch", "activation_codes", "batch_id")
+    # 批次改用 batch_id 标识后不再按 created_at 查询，该索引只会拖慢批量写入
+    ctx.drop_index("idx_activation_codes_created")
+
+
+# (版本号, 说明, 迁移函数)，版本号必须递增
+MIGRATIONS: List[Tuple[int, str, Callable[[MigrationContext], None]]] = [
+    (1, "用户、权限、等级配置和激活码", _v1_core_tables),
+    (2, "消息正文表、投递表和计数表", _v2_messages),
+    (3, "操作日志按月分区", _v3_audit_log_partitions),
+    (4, "活动相关表和统计计数", _v4_activity_tables),
+    (5, "道具赠送相关表和配额计数", _v5_item_gift_tables),
+    (6, "参与记录和发送记录的时间索引", _v6_report_indexes),
+    (7, "限流令牌桶状态表", _v7_rate_limit_buckets),
+    (8, "活动奖项版本号", _v8_activity_reward_version),
+    (9, "群发任务状态表", _v9_message_broadcast_jobs),
+    (10, "激活码批次标识", _v10_activation_code_batches),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+_lock = threading.Lock()
+_schema_ready = False
+
+
+def get_version(database) -> int:
+    """
+    当前数据库结构版本，未初始化返回 0
+    迁移完成后版本号同时写入 PRAGMA user_version（数据库文件头），已是最新版本时只读这一个值
+    """
+    version = _get_user_version(database)
+    if version >= LATEST_VERSION:
+        return version
+    with database.get_cursor() as cursor:
+        # 早于记录 user_version 的数据库，以 schema_version 表为准
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'")
+        if not cursor.fetchone():
+            return 0
+        cursor.execute("SELECT MAX(version) FROM schema_version")
+        return cursor.fetchone()[0] or 0
+
+
+def _get_user_version(database) -> int:
+    with database.get_cursor() as cursor:
+        cursor.execute("PRAGMA user_version")
+        return cursor.fetchone()[0]
+
+
+def _set_user_version(database, version: int):
+    with database.get_cursor() as cursor:
+        cursor.execute(f"PRAGMA user_version = {int(version)}")
+
+
+def migrate(database, target: Optional[int] = None) -> int:
+    """
+    执行尚未执行的迁移，返回执行后的版本
+    每个迁移执行完成后记录版本；迁移步骤均可重复执行，中断后重启会从该迁移重新开始
+    """
+    global _schema_ready
+    target = LATEST_VERSION if target is None else target
+    with _lock:
+        current = get_version(database)
+        if current >= target:
+            # 由 schema_version 表得出的最新版本（旧数据库），补写 user_version
+            if current >= LATEST_VERSION and _get_user_version(database) < current:
+                _set_user_version(database, current)
+            _schema_ready = True
+            return current
+
+        with database.get_cursor() as cursor:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_backfill_progress (
+                    task TEXT PRIMARY KEY,
+                    last_key INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+
+        ctx = MigrationContext(database)
+        for version, description, apply in MIGRATIONS:
+            if version <= current or version > target:
+                continue
+            started = time.perf_counter()
+            logger.info(f"执行数据库迁移 v{version}: {description}")
+            apply(ctx)
+            with database.get_cursor() as cursor:
+                cursor.execute(
+                    "INSERT OR IGNORE INTO schema_version (version, description) VALUES (?, ?)",
+                    (version, description)
+                )
+            logger.info(f"数据库迁移 v{version} 完成，耗时 {time.perf_counter() - started:.2f}s")
+            current = version
+
+        _set_user_version(database, current)
+        _schema_ready = current >= LATEST_VERSION
+        return current
+
+
+def ensure_schema(database=None):
+    """确保数据库结构为最新（进程内只检查一次）"""
+    if _schema_ready:
+        return
+    if database is None:
+        from database.connection import db as database
+    migrate(database)
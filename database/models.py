@@ -4,10 +4,11 @@
 用户数据模型
 """
 
-from datetime import datetime
-from typing import Optional, List, Dict, Any
+from datetime import datetime, timezone
+from typing import Optional, List, Dict, Any, Callable, Tuple, Iterator
 from database.connection import db
 from database.permissions import LevelPermission
+import threading
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,6 +17,9 @@ logger = logging.getLogger(__name__)
 class User:
     """用户模型"""
     
+    # 用户信息变化回调（用于失效已验证 Token 缓存），参数为用户 ID
+    _change_listener: Optional[Callable[[int], None]] = None
+    
     def __init__(
         self,
         id: Optional[int] = None,
@@ -158,6 +162,21 @@ class User:
             logger.error(f"获取用户数量失败: {e}")
             return 0
     
+    @staticmethod
+    def set_change_listener(listener: Optional[Callable[[int], None]]):
+        """设置用户信息变化回调"""
+        User._change_listener = listener
+    
+    @staticmethod
+    def _notify_changed(user_id: int):
+        # 在事务提交后调用，避免回调方在提交前重新读到旧数据
+        listener = User._change_listener
+        if listener and user_id:
+            try:
+                listener(user_id)
+            except Exception as e:
+                logger.error(f"用户变化回调失败: {e}")
+    
     def update(self) -> bool:
         """更新用户信息"""
         try:
@@ -170,7 +189,8 @@ class User:
                 """, (self.email, self.level, self.role, self.is_active, self.id))
                 
                 logger.info(f"更新用户成功: {self.username}")
-                return True
+            User._notify_changed(self.id)
+            return True
         except Exception as e:
             logger.error(f"更新用户失败: {e}")
             return False
@@ -187,7 +207,8 @@ class User:
                 
                 self.password_hash = new_password_hash
                 logger.info(f"更新密码成功: {self.username}")
-                return True
+            User._notify_changed(self.id)
+            return True
         except Exception as e:
             logger.error(f"更新密码失败: {e}")
             return False
@@ -212,114 +233,521 @@ class User:
         try:
             with db.get_cursor() as cursor:
                 cursor.execute("DELETE FROM users WHERE id = ?", (self.id,))
+                cursor.execute("DELETE FROM user_sessions WHERE user_id = ?", (self.id,))
                 logger.info(f"删除用户成功: {self.username}")
-                return True
+            User._notify_changed(self.id)
+            return True
         except Exception as e:
             logger.error(f"删除用户失败: {e}")
             return False
 
 
-class AuditLog:
-    """操作日志模型"""
+class UserSession:
+    """
+    登录会话（用于撤销 Token）
+    token 列保存 Token 的 SHA-256 摘要，不保存原文
+    """
     
     @staticmethod
-    def create(user_id: Optional[int], action: str, resource: Optional[str] = None,
-               details: Optional[str] = None, ip_address: Optional[str] = None) -> bool:
-        """创建操作日志"""
+    def create(user_id: int, token_digest: str, expires_at: datetime) -> bool:
+        """记录会话，并顺带清理该用户已过期的会话"""
         try:
             with db.get_cursor() as cursor:
+                cursor.execute(
+                    "DELETE FROM user_sessions WHERE user_id = ? AND expires_at < ?",
+                    (user_id, datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'))
+                )
                 cursor.execute("""
-                    INSERT INTO audit_logs (user_id, action, resource, details, ip_address)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (user_id, action, resource, details, ip_address))
-                
+                    INSERT INTO user_sessions (user_id, token, expires_at)
+                    VALUES (?, ?, ?)
+                """, (user_id, token_digest, expires_at.strftime('%Y-%m-%d %H:%M:%S')))
                 return True
         except Exception as e:
-            logger.error(f"创建审计日志失败: {e}")
+            logger.error(f"记录会话失败 (user_id: {user_id}): {e}")
             return False
     
     @staticmethod
-    def get_by_user(user_id: int, limit: int = 50) -> List[Dict[str, Any]]:
-        """获取用户的操作日志"""
+    def exists(token_digest: str) -> bool:
+        """会话是否存在且未过期"""
         try:
             with db.get_cursor() as cursor:
-                cursor.execute("""
-                    SELECT * FROM audit_logs 
-                    WHERE user_id = ? 
-                    ORDER BY created_at DESC 
-                    LIMIT ?
-                """, (user_id, limit))
+                cursor.execute(
+                    "SELECT 1 FROM user_sessions WHERE token = ? AND expires_at >= ? LIMIT 1",
+                    (token_digest, datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'))
+                )
+                return cursor.fetchone() is not None
+        except Exception as e:
+            logger.error(f"查询会话失败: {e}")
+            return False
+    
+    @staticmethod
+    def delete_by_token(token_digest: str) -> int:
+        """删除单个会话"""
+        try:
+            with db.get_cursor() as cursor:
+                cursor.execute("DELETE FROM user_sessions WHERE token = ?", (token_digest,))
+                return cursor.rowcount
+        except Exception as e:
+            logger.error(f"删除会话失败: {e}")
+            return 0
+    
+    @staticmethod
+    def delete_by_user(user_id: int) -> int:
+        """删除用户的全部会话"""
+        try:
+            with db.get_cursor() as cursor:
+                cursor.execute("DELETE FROM user_sessions WHERE user_id = ?", (user_id,))
+                return cursor.rowcount
+        except Exception as e:
+            logger.error(f"删除会话失败 (user_id: {user_id}): {e}")
+            return 0
+
+
+class AuditLog:
+    """操作日志模型"""
+    
+    # 异步批量写入器（由服务启动时设置），未设置时同步写入
+    _writer = None
+    
+    @staticmethod
+    def set_writer(writer):
+        """设置异步批量写入器，传入 None 恢复同步写入"""
+        AuditLog._writer = writer
+    
+    @staticmethod
+    def create(user_id: Optional[int], action: str, resource: Optional[str] = None,
+               details: Optional[str] = None, ip_address: Optional[str] = None) -> bool:
+        """创建操作日志（设置了写入器时只入队，由后台批量提交）"""
+        # 入队时记录时间，保证批量写入后的时间与操作发生时间一致
+        row = (user_id, action, resource, details, ip_address,
+               datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'))
+        writer = AuditLog._writer
+        if writer and writer.enqueue(row):
+            return True
+        return AuditLog.insert_many([row]) > 0
+    
+    # ==================== 按月分区存储 ====================
+    # 日志按 created_at 所在月份写入 audit_logs_YYYYMM 表，分区登记在 audit_log_partitions。
+    # 日志ID = 月份(YYYYMM) * ID_SPAN + 分区内自增序号，可直接由ID定位分区。
+    
+    ID_SPAN = 10 ** 10
+    
+    # 已确认存在的分区月份（进程内缓存，避免重复执行 DDL）
+    _known_partitions: set = set()
+    _partition_lock = threading.Lock()
+    
+    @staticmethod
+    def partition_table(month: str) -> str:
+        """月份 YYYYMM 对应的分区表名"""
+        return f"audit_logs_{month}"
+    
+    @staticmethod
+    def month_of(created_at: str) -> str:
+        """'YYYY-MM-DD HH:MM:SS' -> 'YYYYMM'"""
+        return created_at[:4] + created_at[5:7]
+    
+    @staticmethod
+    def _ensure_partition(cursor, month: str) -> str:
+        """创建月份分区（如不存在），返回表名"""
+        table = AuditLog.partition_table(month)
+        if month in AuditLog._known_partitions:
+            return table
+        
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                action VARCHAR(100) NOT NULL,
+                resource VARCHAR(100),
+                details TEXT,
+                ip_address VARCHAR(45),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL
+            )
+        """)
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_created ON {table}(created_at)")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_user ON {table}(user_id, created_at)")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_action ON {table}(action, created_at)")
+        
+        # 设置自增起点，使ID带上月份前缀
+        cursor.execute("SELECT 1 FROM sqlite_sequence WHERE name = ?", (table,))
+        if not cursor.fetchone():
+            cursor.execute(
+                "INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)",
+                (table, int(month) * AuditLog.ID_SPAN)
+            )
+        cursor.execute(
+            "INSERT OR IGNORE INTO audit_log_partitions (month, table_name) VALUES (?, ?)",
+            (month, table)
+        )
+        with AuditLog._partition_lock:
+            AuditLog._known_partitions.add(month)
+        return table
+    
+    @staticmethod
+    def _partitions(cursor, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict[str, Any]]:
+        """获取与时间范围相交的分区（按月份倒序）"""
+        conditions = []
+        params = []
+        if start:
+            conditions.append("month >= ?")
+            params.append(AuditLog.month_of(start))
+        if end:
+            conditions.append("month <= ?")
+            params.append(AuditLog.month_of(end))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        cursor.execute(f"SELECT * FROM audit_log_partitions {where} ORDER BY month DESC", params)
+        return [dict(row) for row in cursor.fetchall()]
+    
+    @staticmethod
+    def _filters(user_id: Optional[int], action: Optional[str],
+                 start: Optional[str], end: Optional[str]) -> Tuple[str, list]:
+        conditions = []
+        params = []
+        if user_id is not None:
+            conditions.append("al.user_id = ?")
+            params.append(user_id)
+        if action:
+            conditions.append("al.action = ?")
+            params.append(action)
+        if start:
+            conditions.append("al.created_at >= ?")
+            params.append(start)
+        if end:
+            conditions.append("al.created_at <= ?")
+            params.append(end)
+        return (f"WHERE {' AND '.join(conditions)}" if conditions else ""), params
+    
+    @staticmethod
+    def insert_many(rows: List[tuple]) -> int:
+        """
+        批量写入操作日志（按月份写入对应分区）
+        
+        Args:
+            rows: [(user_id, action, resource, details, ip_address, created_at)]
+        
+        Returns:
+            写入数量，失败返回 0
+        """
+        by_month: Dict[str, List[tuple]] = {}
+        for row in rows:
+            by_month.setdefault(AuditLog.month_of(row[5]), []).append(row)
+        
+        try:
+            with db.get_cursor() as cursor:
+                for month, month_rows in by_month.items():
+                    table = AuditLog._ensure_partition(cursor, month)
+                    cursor.executemany(f"""
+                        INSERT INTO {table} (user_id, action, resource, details, ip_address, created_at)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    """, month_rows)
+                    cursor.execute(
+                        "UPDATE audit_log_partitions SET row_count = row_count + ? WHERE month = ?",
+                        (len(month_rows), month)
+                    )
                 
-                rows = cursor.fetchall()
-                return [dict(row) for row in rows]
+                return len(rows)
         except Exception as e:
-            logger.error(f"获取审计日志失败: {e}")
-            return []
+            # 分区可能在事务回滚中被撤销，清空缓存以便下次重新确认
+            with AuditLog._partition_lock:
+                AuditLog._known_partitions.clear()
+            logger.error(f"创建审计日志失败: {e}")
+            return 0
     
     @staticmethod
-    def get_all(limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
-        """获取所有操作日志"""
+    def query(user_id: Optional[int] = None, action: Optional[str] = None,
+              start: Optional[str] = None, end: Optional[str] = None,
+              limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        按条件查询操作日志（按时间倒序），只访问与时间范围相交的分区
+        
+        Args:
+            start / end: 'YYYY-MM-DD HH:MM:SS' 格式的时间范围（包含边界）
+        """
         try:
             with db.get_cursor() as cursor:
-                cursor.execute("""
-                    SELECT al.*, u.username 
-                    FROM audit_logs al
-                    LEFT JOIN users u ON al.user_id = u.id
-                    ORDER BY al.created_at DESC 
-                    LIMIT ? OFFSET ?
-                """, (limit, offset))
+                where, params = AuditLog._filters(user_id, action, start, end)
+                has_filters = bool(params)
+                result: List[Dict[str, Any]] = []
+                skip = offset
                 
-                rows = cursor.fetchall()
-                return [dict(row) for row in rows]
+                for partition in AuditLog._partitions(cursor, start, end):
+                    table = partition['table_name']
+                    # 整个分区都在 offset 之内时直接跳过
+                    if skip > 0:
+                        if has_filters:
+                            cursor.execute(f"SELECT COUNT(*) as count FROM {table} al {where}", params)
+                            matched = cursor.fetchone()['count']
+                        else:
+                            matched = partition['row_count']
+                        if matched <= skip:
+                            skip -= matched
+                            continue
+                    
+                    cursor.execute(f"""
+                        SELECT al.*, u.username 
+                        FROM {table} al
+                        LEFT JOIN users u ON al.user_id = u.id
+                        {where}
+                        ORDER BY al.created_at DESC, al.id DESC 
+                        LIMIT ? OFFSET ?
+                    """, params + [limit - len(result), skip])
+                    result.extend(dict(row) for row in cursor.fetchall())
+                    skip = 0
+                    if len(result) >= limit:
+                        break
+                
+                return result
         except Exception as e:
             logger.error(f"获取审计日志失败: {e}")
             return []
     
     @staticmethod
-    def count_all() -> int:
-        """获取日志总数"""
+    def iter_logs(user_id: Optional[int] = None, action: Optional[str] = None,
+                  start: Optional[str] = None, end: Optional[str] = None,
+                  chunk_size: int = 1000) -> Iterator[List[Any]]:
+        """
+        按条件分块读取操作日志（按时间倒序逐个分区读取，用于导出）
+        每块按 (created_at, id) 键集分页单独查询，块之间不持有读事务，导出期间不阻塞写入
+        """
+        where, params = AuditLog._filters(user_id, action, start, end)
+        keyset = "(al.created_at < ? OR (al.created_at = ? AND al.id < ?))"
+        with db.get_cursor() as cursor:
+            partitions = AuditLog._partitions(cursor, start, end)
+        for partition in partitions:
+            last = None
+            while True:
+                if last is None:
+                    chunk_where, chunk_params = where, params
+                else:
+                    chunk_where = f"{where} AND {keyset}" if where else f"WHERE {keyset}"
+                    chunk_params = params + [last['created_at'], last['created_at'], last['id']]
+                with db.get_cursor() as cursor:
+                    cursor.execute(f"""
+                        SELECT al.*, u.username 
+                        FROM {partition['table_name']} al
+                        LEFT JOIN users u ON al.user_id = u.id
+                        {chunk_where}
+                        ORDER BY al.created_at DESC, al.id DESC
+                        LIMIT ?
+                    """, chunk_params + [chunk_size])
+                    rows = cursor.fetchall()
+                if not rows:
+                    break
+                yield rows
+                if len(rows) < chunk_size:
+                    break
+                last = rows[-1]
+    
+    @staticmethod
+    def count(user_id: Optional[int] = None, action: Optional[str] = None,
+              start: Optional[str] = None, end: Optional[str] = None,
+              exact: bool = False) -> int:
+        """
+        统计操作日志数量
+        
+        Args:
+            exact: False 时无筛选条件直接使用分区登记的行数（按整月计算时间范围）；
+                   True 时逐个分区精确统计
+        """
         try:
             with db.get_cursor() as cursor:
-                cursor.execute("SELECT COUNT(*) as count FROM audit_logs")
-                row = cursor.fetchone()
-                return row['count'] if row else 0
+                where, params = AuditLog._filters(user_id, action, start, end)
+                partitions = AuditLog._partitions(cursor, start, end)
+                if not exact and user_id is None and not action:
+                    return sum(partition['row_count'] for partition in partitions)
+                
+                total = 0
+                for partition in partitions:
+                    cursor.execute(f"SELECT COUNT(*) as count FROM {partition['table_name']} al {where}", params)
+                    total += cursor.fetchone()['count']
+                return total
         except Exception as e:
             logger.error(f"获取日志数量失败: {e}")
             return 0
     
+    @staticmethod
+    def get_by_user(user_id: int, limit: int = 50) -> List[Dict[str, Any]]:
+        """获取用户的操作日志"""
+        return AuditLog.query(user_id=user_id, limit=limit)
+    
+    @staticmethod
+    def get_all(limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
+        """获取所有操作日志"""
+        return AuditLog.query(limit=limit, offset=offset)
+    
+    @staticmethod
+    def count_all() -> int:
+        """获取日志总数"""
+        return AuditLog.count()
+    
     @staticmethod
     def delete_by_ids(log_ids: List[int]) -> int:
-        """删除指定ID的日志"""
+        """删除指定ID的日志（按ID前缀定位分区）"""
+        by_month: Dict[str, List[int]] = {}
+        for log_id in log_ids:
+            by_month.setdefault(str(log_id // AuditLog.ID_SPAN), []).append(log_id)
+        
         try:
+            deleted_count = 0
             with db.get_cursor() as cursor:
-                placeholders = ','.join('?' * len(log_ids))
-                cursor.execute(
-                    f"DELETE FROM audit_logs WHERE id IN ({placeholders})",
-                    log_ids
-                )
-                deleted_count = cursor.rowcount
-                logger.info(f"删除了 {deleted_count} 条审计日志")
-                return deleted_count
+                known = {partition['month'] for partition in AuditLog._partitions(cursor)}
+                for month, ids in by_month.items():
+                    if month not in known:
+                        continue
+                    placeholders = ','.join('?' * len(ids))
+                    cursor.execute(
+                        f"DELETE FROM {AuditLog.partition_table(month)} WHERE id IN ({placeholders})",
+                        ids
+                    )
+                    month_deleted = cursor.rowcount
+                    cursor.execute(
+                        "UPDATE audit_log_partitions SET row_count = MAX(row_count - ?, 0) WHERE month = ?",
+                        (month_deleted, month)
+                    )
+                    deleted_count += month_deleted
+            logger.info(f"删除了 {deleted_count} 条审计日志")
+            return deleted_count
         except Exception as e:
             logger.error(f"删除审计日志失败: {e}")
             return 0
     
     @staticmethod
-    def delete_all() -> int:
-        """删除所有日志"""
+    def drop_partitions(before_month: Optional[str] = None) -> int:
+        """
+        整表删除分区
+        
+        Args:
+            before_month: 删除早于该月份(YYYYMM，不含)的分区；为空时删除全部
+        
+        Returns:
+            删除的日志数量
+        """
         try:
             with db.get_cursor() as cursor:
-                cursor.execute("DELETE FROM audit_logs")
-                deleted_count = cursor.rowcount
-                logger.info(f"清空了所有审计日志（共 {deleted_count} 条）")
-                return deleted_count
+                if before_month:
+                    cursor.execute(
+                        "SELECT * FROM audit_log_partitions WHERE month < ?", (before_month,)
+                    )
+                else:
+                    cursor.execute("SELECT * FROM audit_log_partitions")
+                partitions = [dict(row) for row in cursor.fetchall()]
+                
+                deleted_count = 0
+                for partition in partitions:
+                    cursor.execute(f"SELECT COUNT(*) as count FROM {partition['table_name']}")
+                    deleted_count += cursor.fetchone()['count']
+                    cursor.execute(f"DROP TABLE IF EXISTS {partition['table_name']}")
+                    cursor.execute("DELETE FROM sqlite_sequence WHERE name = ?", (partition['table_name'],))
+                    cursor.execute("DELETE FROM audit_log_partitions WHERE month = ?", (partition['month'],))
+            
+            with AuditLog._partition_lock:
+                AuditLog._known_partitions.difference_update(partition['month'] for partition in partitions)
+            if partitions:
+                logger.info(f"删除了 {len(partitions)} 个日志分区（共 {deleted_count} 条）")
+            return deleted_count
         except Exception as e:
-            logger.error(f"清空审计日志失败: {e}")
+            logger.error(f"删除日志分区失败: {e}")
+            return 0
+    
+    @staticmethod
+    def apply_retention(keep_months: int) -> int:
+        """
+        保留最近 keep_months 个月（含当月）的日志，更早的分区整表删除
+        
+        Returns:
+            删除的日志数量
+        """
+        if keep_months <= 0:
             return 0
+        now = datetime.now(timezone.utc)
+        month_index = now.year * 12 + now.month - 1 - (keep_months - 1)
+        cutoff = f"{month_index // 12:04d}{month_index % 12 + 1:02d}"
+        return AuditLog.drop_partitions(before_month=cutoff)
+    
+    @staticmethod
+    def delete_all() -> int:
+        """删除所有日志"""
+        deleted_count = AuditLog.drop_partitions()
+        logger.info(f"清空了所有审计日志（共 {deleted_count} 条）")
+        return deleted_count
+    
+    @staticmethod
+    def migrate_legacy_table(cursor):
+        """
+        将旧版 audit_logs 单表按月迁移到分区表，旧表重命名为 audit_logs_legacy 备份
+        created_at 为空或无法解析的行写入迁移当月的分区，created_at 记为迁移时间（原值保留在备份表中）
+        """
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'audit_logs'")
+        if not cursor.fetchone():
+            return
+        
+        cursor.execute("""
+            SELECT DISTINCT strftime('%Y%m', created_at) as month 
+            FROM audit_logs 
+            WHERE strftime('%Y%m', created_at) IS NOT NULL
+        """)
+        months = [row['month'] for row in cursor.fetchall()]
+        
+        cursor.execute("SELECT COUNT(*) as count FROM audit_logs WHERE strftime('%Y%m', created_at) IS NULL")
+        undated = cursor.fetchone()['count']
+        if undated:
+            migrated_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+            fallback_month = AuditLog.month_of(migrated_at)
+            fallback_table = AuditLog._ensure_partition(cursor, fallback_month)
+            cursor.execute(f"""
+                INSERT INTO {fallback_table} (user_id, action, resource, details, ip_address, created_at)
+                SELECT user_id, action, resource, details, ip_address, ?
+                FROM audit_logs
+                WHERE strftime('%Y%m', created_at) IS NULL
+                ORDER BY id
+            """, (migrated_at,))
+            cursor.execute(
+                "UPDATE audit_log_partitions SET row_count = row_count + ? WHERE month = ?",
+                (undated, fallback_month)
+            )
+            logger.warning(f"{undated} 条操作日志缺少有效的 created_at，已迁移到 {fallback_month} 分区")
+        
+        for month in months:
+            table = AuditLog._ensure_partition(cursor, month)
+            cursor.execute(f"""
+                INSERT INTO {table} (user_id, action, resource, details, ip_address, created_at)
+                SELECT user_id, action, resource, details, ip_address, created_at
+                FROM audit_logs
+                WHERE strftime('%Y%m', created_at) = ?
+                ORDER BY id
+            """, (month,))
+            cursor.execute(
+                "UPDATE audit_log_partitions SET row_count = row_count + ? WHERE month = ?",
+                (cursor.rowcount, month)
+            )
+        
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'audit_logs_legacy'")
+        backup_name = "audit_logs_legacy"
+        if cursor.fetchone():
+            backup_name = f"audit_logs_legacy_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        cursor.execute(f"ALTER TABLE audit_logs RENAME TO {backup_name}")
+        logger.info(f"操作日志已迁移到 {len(months)} 个月度分区，旧表备份为 {backup_name}")
 
 
 class Message:
-    """消息模型"""
+    """
+    消息模型
+    
+    正文保存在 message_bodies（群发时共享一份），每个收件人一行 message_deliveries，
+    消息ID即投递ID。收件总数、未读数和发件总数由 message_counters 随写入同步维护。
+    """
+    
+    # 投递记录关联正文的查询
+    _SELECT = """
+        SELECT d.id, d.body_id, d.recipient_id, d.is_read, d.created_at,
+               b.sender_id, b.sender_name, b.title, b.content
+        FROM message_deliveries d
+        JOIN message_bodies b ON b.id = d.body_id
+    """
+    
+    # 消息计数变化回调 listener(user_ids)，在事务提交后调用
+    _counter_listener: Optional[Callable[[List[int]], None]] = None
     
     def __init__(
         self,
@@ -330,7 +758,8 @@ class Message:
         title: str = "",
         content: str = "",
         is_read: bool = False,
-        created_at: Optional[datetime] = None
+        created_at: Optional[datetime] = None,
+        body_id: Optional[int] = None
     ):
         self.id = id
         self.sender_id = sender_id
@@ -340,6 +769,7 @@ class Message:
         self.content = content
         self.is_read = is_read
         self.created_at = created_at
+        self.body_id = body_id
     
     @staticmethod
     def from_row(row) -> 'Message':
@@ -354,7 +784,8 @@ class Message:
             title=row['title'],
             content=row['content'],
             is_read=bool(row['is_read']),
-            created_at=row['created_at']
+            created_at=row['created_at'],
+            body_id=row['body_id']
         )
     
     def to_dict(self) -> Dict[str, Any]:
@@ -376,16 +807,18 @@ class Message:
         """创建新消息"""
         try:
             with db.get_cursor() as cursor:
+                body_id = Message._insert_body(cursor, sender_id, sender_name, title, content)
                 cursor.execute("""
-                    INSERT INTO messages (sender_id, sender_name, recipient_id, title, content)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (sender_id, sender_name, recipient_id, title, content))
+                    INSERT INTO message_deliveries (body_id, recipient_id)
+                    VALUES (?, ?)
+                """, (body_id, recipient_id))
                 
                 message_id = cursor.lastrowid
+                changed_users = Message._bump_counters(cursor, [(recipient_id, 1, 1, 0), (sender_id, 0, 0, 1)])
                 logger.info(f"创建消息成功: ID {message_id}")
                 
                 # 直接创建Message对象返回，避免重新查询数据库
-                return Message(
+                message = Message(
                     id=message_id,
                     sender_id=sender_id,
                     sender_name=sender_name,
@@ -393,18 +826,128 @@ class Message:
                     title=title,
                     content=content,
                     is_read=False,
-                    created_at=datetime.now()
+                    created_at=datetime.now(),
+                    body_id=body_id
                 )
+            Message._notify_counters(changed_users)
+            return message
         except Exception as e:
             logger.error(f"创建消息失败: {e}")
             return None
     
+    @staticmethod
+    def _insert_body(cursor, sender_id: Optional[int], sender_name: str, title: str, content: str) -> int:
+        """写入一条消息正文，返回正文ID"""
+        cursor.execute("""
+            INSERT INTO message_bodies (sender_id, sender_name, title, content)
+            VALUES (?, ?, ?, ?)
+        """, (sender_id, sender_name, title, content))
+        return cursor.lastrowid
+    
+    @staticmethod
+    def set_counter_listener(listener: Optional[Callable[[List[int]], None]]):
+        """设置消息计数变化回调（用于实时推送未读数）"""
+        Message._counter_listener = listener
+    
+    @staticmethod
+    def _notify_counters(user_ids: List[int]):
+        listener = Message._counter_listener
+        if listener and user_ids:
+            try:
+                listener(user_ids)
+            except Exception as e:
+                logger.error(f"消息计数回调失败: {e}")
+    
+    @staticmethod
+    def _bump_counters(cursor, deltas: List[Tuple[Optional[int], int, int, int]]) -> List[int]:
+        """
+        增减用户消息计数
+        
+        Args:
+            deltas: [(用户ID, 收件总数增量, 未读数增量, 发件总数增量)]，用户ID为空的忽略
+        
+        Returns:
+            计数发生变化的用户ID列表
+        """
+        params = [
+            {'user_id': user_id, 'inbox': inbox, 'unread': unread, 'sent': sent}
+            for user_id, inbox, unread, sent in deltas
+            if user_id is not None and (inbox or unread or sent)
+        ]
+        if not params:
+            return []
+        cursor.executemany("""
+            INSERT INTO message_counters (user_id, inbox_total, unread_count, sent_total)
+            VALUES (:user_id, MAX(:inbox, 0), MAX(:unread, 0), MAX(:sent, 0))
+            ON CONFLICT(user_id) DO UPDATE SET
+                inbox_total = MAX(inbox_total + :inbox, 0),
+                unread_count = MAX(unread_count + :unread, 0),
+                sent_total = MAX(sent_total + :sent, 0)
+        """, params)
+        return [param['user_id'] for param in params]
+
+    # 批量发送时每批校验/插入的收件人数量（低于 SQLite 参数上限）
+    BULK_CHUNK_SIZE = 500
+
+    @staticmethod
+    def create_bulk(sender_id: Optional[int], sender_name: str, recipient_ids: List[int],
+                    title: str, content: str,
+                    progress: Optional[Callable[[int, int], None]] = None) -> Tuple[int, List[int]]:
+        """
+        批量创建消息（群发）
+
+        在同一个连接和事务中按批用 IN 查询校验收件人是否存在，
+        正文只写入一次，再用 executemany 插入投递记录，整个群发只提交一次。
+
+        Args:
+            recipient_ids: 收件人用户ID列表（重复ID只发送一次）
+            progress: 进度回调 progress(已处理数, 总数)
+
+        Returns:
+            (成功发送数量, 不存在的用户ID列表)；失败时整批回滚并抛出异常
+        """
+        unique_ids = list(dict.fromkeys(recipient_ids))
+        total = len(unique_ids)
+        sent_count = 0
+        missing_ids: List[int] = []
+        changed_users: List[int] = []
+        body_id = None
+
+        with db.get_cursor() as cursor:
+            for start in range(0, total, Message.BULK_CHUNK_SIZE):
+                chunk = unique_ids[start:start + Message.BULK_CHUNK_SIZE]
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f"SELECT id FROM users WHERE id IN ({placeholders})", chunk)
+                existing = {row['id'] for row in cursor.fetchall()}
+
+                valid_ids = [user_id for user_id in chunk if user_id in existing]
+                missing_ids.extend(user_id for user_id in chunk if user_id not in existing)
+
+                if valid_ids and body_id is None:
+                    body_id = Message._insert_body(cursor, sender_id, sender_name, title, content)
+                cursor.executemany("""
+                    INSERT INTO message_deliveries (body_id, recipient_id)
+                    VALUES (?, ?)
+                """, [(body_id, user_id) for user_id in valid_ids])
+                changed_users.extend(Message._bump_counters(cursor, [(user_id, 1, 1, 0) for user_id in valid_ids]))
+                sent_count += len(valid_ids)
+
+                if progress:
+                    progress(start + len(chunk), total)
+
+            changed_users.extend(Message._bump_counters(cursor, [(sender_id, 0, 0, sent_count)]))
+
+        Message._notify_counters(changed_users)
+
+        logger.info(f"批量创建消息成功: {sent_count} 条，{len(missing_ids)} 个用户不存在")
+        return sent_count, missing_ids
+
     @staticmethod
     def get_by_id(message_id: int) -> Optional['Message']:
         """通过 ID 获取消息"""
         try:
             with db.get_cursor() as cursor:
-                cursor.execute("SELECT * FROM messages WHERE id = ?", (message_id,))
+                cursor.execute(f"{Message._SELECT} WHERE d.id = ?", (message_id,))
                 row = cursor.fetchone()
                 return Message.from_row(row)
         except Exception as e:
@@ -412,53 +955,98 @@ class Message:
             return None
     
     @staticmethod
-    def get_by_recipient(recipient_id: int, limit: int = 50, offset: int = 0) -> List['Message']:
-        """获取收件人的消息"""
+    def get_by_recipient(recipient_id: int, limit: int = 50, offset: int = 0,
+                         before: Optional[Tuple[str, int]] = None) -> List['Message']:
+        """
+        获取收件人的消息
+        
+        Args:
+            before: 游标 (created_at, id)，只返回排在该消息之后的记录；传入时忽略 offset
+        """
         try:
             with db.get_cursor() as cursor:
-                cursor.execute("""
-                    SELECT * FROM messages 
-                    WHERE recipient_id = ? 
-                    ORDER BY created_at DESC 
-                    LIMIT ? OFFSET ?
-                """, (recipient_id, limit, offset))
-                
-                rows = cursor.fetchall()
-                return [Message.from_row(row) for row in rows]
+                return Message._fetch_page(cursor, "d.recipient_id = ?", recipient_id, limit, offset, before)
         except Exception as e:
             logger.error(f"获取收件人消息失败: {e}")
             return []
     
     @staticmethod
-    def get_by_sender(sender_id: int, limit: int = 50, offset: int = 0) -> List['Message']:
-        """获取发件人的消息"""
+    def get_by_sender(sender_id: int, limit: int = 50, offset: int = 0,
+                      before: Optional[Tuple[str, int]] = None) -> List['Message']:
+        """
+        获取发件人的消息
+        
+        Args:
+            before: 游标 (created_at, id)，只返回排在该消息之后的记录；传入时忽略 offset
+        """
         try:
             with db.get_cursor() as cursor:
-                cursor.execute("""
-                    SELECT * FROM messages 
-                    WHERE sender_id = ? 
-                    ORDER BY created_at DESC 
-                    LIMIT ? OFFSET ?
-                """, (sender_id, limit, offset))
-                
-                rows = cursor.fetchall()
-                return [Message.from_row(row) for row in rows]
+                return Message._fetch_page(cursor, "b.sender_id = ?", sender_id, limit, offset, before)
         except Exception as e:
             logger.error(f"获取发件人消息失败: {e}")
             return []
     
+    @staticmethod
+    def get_page_with_counters(user_id: int, box: str = "inbox", limit: int = 50, offset: int = 0,
+                               before: Optional[Tuple[str, int]] = None) -> Tuple[List['Message'], Dict[str, int]]:
+        """
+        在同一个连接中获取一页消息和用户消息计数
+        
+        Args:
+            box: inbox 收件箱 / sent 已发送
+        
+        Returns:
+            (消息列表, 计数字典)
+        """
+        condition = "d.recipient_id = ?" if box == "inbox" else "b.sender_id = ?"
+        with db.get_cursor() as cursor:
+            messages = Message._fetch_page(cursor, condition, user_id, limit, offset, before)
+            counters = Message._read_counters(cursor, user_id)
+        return messages, counters
+    
+    @staticmethod
+    def _fetch_page(cursor, condition: str, user_id: int, limit: int, offset: int,
+                    before: Optional[Tuple[str, int]]) -> List['Message']:
+        """按 (created_at, id) 倒序取一页；有游标时走索引定位而不是 OFFSET 跳过"""
+        if before:
+            cursor.execute(f"""
+                {Message._SELECT}
+                WHERE {condition} AND (d.created_at, d.id) < (?, ?)
+                ORDER BY d.created_at DESC, d.id DESC
+                LIMIT ?
+            """, (user_id, before[0], before[1], limit))
+        else:
+            cursor.execute(f"""
+                {Message._SELECT}
+                WHERE {condition}
+                ORDER BY d.created_at DESC, d.id DESC
+                LIMIT ? OFFSET ?
+            """, (user_id, limit, offset))
+        return [Message.from_row(row) for row in cursor.fetchall()]
+    
     @staticmethod
     def update_read_status(message_id: int, is_read: bool) -> bool:
         """更新消息阅读状态"""
         try:
+            changed_users = []
             with db.get_cursor() as cursor:
                 cursor.execute("""
-                    UPDATE messages 
+                    UPDATE message_deliveries 
                     SET is_read = ? 
-                    WHERE id = ?
-                """, (is_read, message_id))
+                    WHERE id = ? AND is_read != ?
+                """, (is_read, message_id, is_read))
                 
-                return True
+                # 状态实际发生变化时才调整未读数
+                if cursor.rowcount:
+                    cursor.execute("SELECT recipient_id FROM message_deliveries WHERE id = ?", (message_id,))
+                    row = cursor.fetchone()
+                    if row:
+                        changed_users = Message._bump_counters(
+                            cursor, [(row['recipient_id'], 0, -1 if is_read else 1, 0)]
+                        )
+            
+            Message._notify_counters(changed_users)
+            return True
         except Exception as e:
             logger.error(f"更新消息状态失败: {e}")
             return False
@@ -468,10 +1056,11 @@ class Message:
         """删除消息"""
         try:
             with db.get_cursor() as cursor:
-                cursor.execute("DELETE FROM messages WHERE id = ?", (message_id,))
+                _, changed_users = Message._delete_deliveries(cursor, [message_id])
                 
                 logger.info(f"删除消息成功: ID {message_id}")
-                return True
+            Message._notify_counters(changed_users)
+            return True
         except Exception as e:
             logger.error(f"删除消息失败: {e}")
             return False
@@ -481,62 +1070,95 @@ class Message:
         """删除指定ID的消息"""
         try:
             with db.get_cursor() as cursor:
-                placeholders = ','.join('?' * len(message_ids))
-                cursor.execute(
-                    f"DELETE FROM messages WHERE id IN ({placeholders})",
-                    message_ids
-                )
-                deleted_count = cursor.rowcount
+                deleted_count, changed_users = Message._delete_deliveries(cursor, message_ids)
                 logger.info(f"删除了 {deleted_count} 条消息")
-                return deleted_count
+            Message._notify_counters(changed_users)
+            return deleted_count
         except Exception as e:
             logger.error(f"批量删除消息失败: {e}")
             return 0
     
     @staticmethod
-    def count_unread(recipient_id: int) -> int:
-        """统计未读消息数量"""
+    def _delete_deliveries(cursor, message_ids: List[int]) -> Tuple[int, List[int]]:
+        """
+        删除投递记录，并清理不再被任何收件人引用的正文
+        
+        Returns:
+            (删除数量, 计数发生变化的用户ID列表)
+        """
+        placeholders = ','.join('?' * len(message_ids))
+        cursor.execute(
+            f"SELECT DISTINCT body_id FROM message_deliveries WHERE id IN ({placeholders})",
+            message_ids
+        )
+        body_ids = [row['body_id'] for row in cursor.fetchall()]
+        
+        cursor.execute(f"""
+            SELECT recipient_id, COUNT(*) as total,
+                   SUM(CASE WHEN is_read = 0 THEN 1 ELSE 0 END) as unread
+            FROM message_deliveries
+            WHERE id IN ({placeholders})
+            GROUP BY recipient_id
+        """, message_ids)
+        deltas = [(row['recipient_id'], -row['total'], -row['unread'], 0) for row in cursor.fetchall()]
+        cursor.execute(f"""
+            SELECT b.sender_id, COUNT(*) as total
+            FROM message_deliveries d
+            JOIN message_bodies b ON b.id = d.body_id
+            WHERE d.id IN ({placeholders}) AND b.sender_id IS NOT NULL
+            GROUP BY b.sender_id
+        """, message_ids)
+        deltas.extend((row['sender_id'], 0, 0, -row['total']) for row in cursor.fetchall())
+        changed_users = Message._bump_counters(cursor, deltas)
+        
+        cursor.execute(
+            f"DELETE FROM message_deliveries WHERE id IN ({placeholders})",
+            message_ids
+        )
+        deleted_count = cursor.rowcount
+        
+        if body_ids:
+            body_placeholders = ','.join('?' * len(body_ids))
+            cursor.execute(f"""
+                DELETE FROM message_bodies
+                WHERE id IN ({body_placeholders})
+                  AND NOT EXISTS (SELECT 1 FROM message_deliveries WHERE body_id = message_bodies.id)
+            """, body_ids)
+        return deleted_count, changed_users
+    
+    @staticmethod
+    def _read_counters(cursor, user_id: int) -> Dict[str, int]:
+        cursor.execute("""
+            SELECT inbox_total, unread_count, sent_total
+            FROM message_counters
+            WHERE user_id = ?
+        """, (user_id,))
+        row = cursor.fetchone()
+        if not row:
+            return {'inbox_total': 0, 'unread_count': 0, 'sent_total': 0}
+        return dict(row)
+    
+    @staticmethod
+    def get_counters(user_id: int) -> Dict[str, int]:
+        """获取用户消息计数 {inbox_total, unread_count, sent_total}"""
         try:
             with db.get_cursor() as cursor:
-                cursor.execute("""
-                    SELECT COUNT(*) as count 
-                    FROM messages 
-                    WHERE recipient_id = ? AND is_read = 0
-                """, (recipient_id,))
-                row = cursor.fetchone()
-                return row['count'] if row else 0
+                return Message._read_counters(cursor, user_id)
         except Exception as e:
-            logger.error(f"统计未读消息失败: {e}")
-            return 0
+            logger.error(f"获取消息计数失败: {e}")
+            return {'inbox_total': 0, 'unread_count': 0, 'sent_total': 0}
+    
+    @staticmethod
+    def count_unread(recipient_id: int) -> int:
+        """统计未读消息数量"""
+        return Message.get_counters(recipient_id)['unread_count']
     
     @staticmethod
     def count_by_recipient(recipient_id: int) -> int:
         """统计收件人消息总数"""
-        try:
-            with db.get_cursor() as cursor:
-                cursor.execute("""
-                    SELECT COUNT(*) as count 
-                    FROM messages 
-                    WHERE recipient_id = ?
-                """, (recipient_id,))
-                row = cursor.fetchone()
-                return row['count'] if row else 0
-        except Exception as e:
-            logger.error(f"统计收件人消息总数失败: {e}")
-            return 0
+        return Message.get_counters(recipient_id)['inbox_total']
     
     @staticmethod
     def count_by_sender(sender_id: int) -> int:
         """统计发件人消息总数"""
-        try:
-            with db.get_cursor() as cursor:
-                cursor.execute("""
-                    SELECT COUNT(*) as count 
-                    FROM messages 
-                    WHERE sender_id = ?
-                """, (sender_id,))
-                row = cursor.fetchone()
-                return row['count'] if row else 0
-        except Exception as e:
-            logger.error(f"统计发件人消息总数失败: {e}")
-            return 0
+        return Message.get_counters(sender_id)['sent_total']
@@ -0,0 +1,68 @@
+import request from './request'
+import { useAuthStore } from '@/stores/auth'
+
+// 连接断开后重新获取票据的等待时间（毫秒）
+const RECONNECT_DELAY = 5000
+
+// 订阅服务端实时事件 (SSE)
+// handlers: { unread: (data) => {}, participation: (data) => {}, game: (data) => {} }
+// EventSource 无法设置请求头：先用访问令牌换取短期票据，再通过查询参数连接，URL 中不出现 JWT
+// 返回关闭函数
+export function subscribeEvents(handlers) {
+    const authStore = useAuthStore()
+    if (!authStore.token) {
+        return () => {}
+    }
+
+    let source = null
+    let timer = null
+    let closed = false
+
+    const connect = async () => {
+        timer = null
+        let ticket
+        try {
+            ticket = (await request.post('/api/events/ticket')).ticket
+        } catch (error) {
+            scheduleReconnect()
+            return
+        }
+        if (closed) {
+            return
+        }
+
+        source = new EventSource(`/api/events/stream?ticket=${encodeURIComponent(ticket)}`)
+        Object.entries(handlers).forEach(([topic, handler]) => {
+            source.addEventListener(topic, event => {
+                try {
+                    handler(JSON.parse(event.data))
+                } catch (error) {
+                    console.error(`处理实时事件失败 (${topic}):`, error)
+                }
+            })
+        })
+        // 票据过期后浏览器自动重连会被拒绝（连接关闭），此时换新票据重新连接
+        source.onerror = () => {
+            if (source.readyState === EventSource.CLOSED) {
+                source = null
+                scheduleReconnect()
+            }
+        }
+    }
+
+    const scheduleReconnect = () => {
+        if (!closed && !timer && useAuthStore().token) {
+            timer = setTimeout(connect, RECONNECT_DELAY)
+        }
+    }
+
+    connect()
+
+    return () => {
+        closed = true
+        clearTimeout(timer)
+        if (source) {
+            source.close()
+        }
+    }
+}
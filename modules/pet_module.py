@@ -20,6 +20,7 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QFont
 from .base_module import BaseModule
+from ui.list_models import KeyedListModel, PetListModel
 
 
 class DiscordButton(QPushButton):
@@ -232,6 +233,7 @@ class PetModule(BaseModule):
         super().__init__(client)
         self.main_window = None
         self.pet_data = {}
+        self.mount_data = {}
         self.ui_inputs = {}  # 集中管理所有UI输入控件
         self._updating_attrs = False  # 防止无限递归的标志位
 
@@ -320,79 +322,38 @@ class PetModule(BaseModule):
         Args:
             pet_list: 宝宝数据列表，每个元素是一个宝宝的属性字典
         """
-        print(f"[DEBUG] PetModule.set_pet_data被调用，收到 {len(pet_list)} 个宝宝")
-
-        self.pet_data = {}
-
-        # 存储所有宝宝数据
-        for i, pet_info in enumerate(pet_list):
-            pet_index = i + 1  # 使用1-based索引
-
-            # 清理字符串值中的引号
-            cleaned_pet_info = {}
-            for key, value in pet_info.items():
-                if isinstance(value, str):
-                    cleaned_value = value.strip("\"'")
-                    cleaned_pet_info[key] = cleaned_value
-                else:
-                    cleaned_pet_info[key] = value
-
-            self.pet_data[pet_index] = cleaned_pet_info
-            pet_name = cleaned_pet_info.get("名称", "未知名称")
-            pet_level = cleaned_pet_info.get("等级", 0)
-            pet_model = cleaned_pet_info.get("模型", "")
-            print(
-                f"[DEBUG] 保存宝宝 {pet_index}: {pet_name} (Lv.{pet_level}, {pet_model})"
-            )
-
-        # 检查UI是否存在
-        print(f"[DEBUG] 检查UI组件存在情况:")
-        print(
-            f"  - 'pet_selector' in self.ui_inputs: {'pet_selector' in self.ui_inputs}"
-        )
-        if "pet_selector" in self.ui_inputs:
-            pet_selector = self.ui_inputs["pet_selector"]
-            print(f"  - pet_selector类型: {type(pet_selector)}")
-            print(f"  - pet_selector状态: {pet_selector.isVisible()}")
-
-        # 触发UI更新显示宝宝列表
-        self._update_pet_list_display()
-
-        print(f"[DEBUG] PetModule.set_pet_data完成，已保存 {len(self.pet_data)} 只宝宝")
-
-    def _update_pet_list_display(self):
-        """更新宝宝列表显示"""
-        print(f"[DEBUG] _update_pet_list_display被调用")
+        self.set_pet_model(PetListModel.from_pet_list(pet_list))
 
+    def set_pet_model(self, model: PetListModel):
+        """
+        用构造好的列表模型更新宝宝选择器
+        模型的全部行在构造时已生成（响应流水线在工作线程中构造）；选择器已有宝宝列表时按索引增量更新，
+        保留当前选择，只有当前宝宝的数据变化时才重新加载
+        """
         if "pet_selector" not in self.ui_inputs:
             print(f"[DEBUG] 未找到pet_selector组件")
+            self.pet_data = model.pet_data
+            model.deleteLater()
             return
 
-        # 获取宝宝选择器
-        pet_selector = self.ui_inputs["pet_selector"]
-        print(f"[DEBUG] 找到pet_selector: {type(pet_selector)}")
-
         try:
-            # 清空现有列表
-            pet_selector.clear()
-            print(f"[DEBUG] 已清空选择器")
-
-            # 添加每个宝宝的选项
-            added_count = 0
-            for pet_index, pet_info in self.pet_data.items():
-                pet_name = pet_info.get("名称", f"宝宝{pet_index}")
-                pet_level = pet_info.get("等级", 0)
-                pet_model = pet_info.get("模型", "")
-                display_text = f"{pet_name} - Lv.{pet_level} ({pet_model})"
-                pet_selector.addItem(display_text, pet_index)  # 使用索引作为用户数据
-                added_count += 1
-                print(
-                    f"[DEBUG] 添加选项 {added_count}: {display_text} (索引: {pet_index})"
+            pet_selector = self.ui_inputs["pet_selector"]
+            current_model = pet_selector.model()
+            if isinstance(current_model, PetListModel):
+                previous_index = pet_selector.currentData()
+                previous_info = self.pet_data.get(previous_index)
+                self.pet_data = model.pet_data
+                current_model.update_from(model)
+                model.deleteLater()
+                self._sync_selection(
+                    pet_selector, previous_index, previous_info, self.pet_data, self.on_pet_selected
                 )
-
-            print(
-                f"[DEBUG] 已更新宝宝选择器，成功添加 {added_count} 只宝宝，当前选择器项目数: {pet_selector.count()}"
-            )
+            else:
+                self.pet_data = model.pet_data
+                # 模型以选择器为父对象，选择器销毁时一并释放；setModel 会选中第一项
+                model.setParent(pet_selector)
+                pet_selector.setModel(model)
+            print(f"[DEBUG] 已更新宝宝选择器，共 {pet_selector.count()} 只宝宝")
 
         except Exception as e:
             print(f"[ERROR] 更新宝宝选择器失败: {e}")
@@ -400,6 +361,19 @@ class PetModule(BaseModule):
 
             traceback.print_exc()
 
+    @staticmethod
+    def _sync_selection(selector, previous_key, previous_info, data: dict, on_selected):
+        """
+        列表增量更新后整理当前选择
+        当前行被删除或切换时 Qt 已发出 currentIndexChanged；这里只补充两种情况：
+        原来没有选择时选中第一项，当前行未变但数据变化时重新加载一次
+        """
+        if selector.currentIndex() < 0:
+            if selector.count() > 0:
+                selector.setCurrentIndex(0)
+        elif selector.currentData() == previous_key and data.get(previous_key) != previous_info:
+            on_selected(selector.currentIndex())
+
     def get_character_id(self) -> str:
         if self.main_window and hasattr(self.main_window, "get_player_id"):
             return self.main_window.get_player_id()
@@ -464,7 +438,7 @@ class PetModule(BaseModule):
         self.ui_inputs["pet_selector"].setEditable(False)
         self.ui_inputs["pet_selector"].setPlaceholderText("请先获取宝宝信息")
         self.ui_inputs["pet_selector"].setMinimumWidth(250)
-        self.ui_inputs["pet_selector"].currentTextChanged.connect(self.on_pet_selected)
+        self.ui_inputs["pet_selector"].currentIndexChanged.connect(self.on_pet_selected)
         select_widgets_layout.addWidget(self.ui_inputs["pet_selector"])
 
         self.get_pet_btn = DiscordButton("📥 获取宝宝", "secondary")
@@ -910,6 +884,8 @@ class PetModule(BaseModule):
         self.ui_inputs["mount_selector"].setEditable(False)
         self.ui_inputs["mount_selector"].setPlaceholderText("获取坐骑后操作")
         self.ui_inputs["mount_selector"].setMinimumWidth(200)
+        self.ui_inputs["mount_selector"].setModel(KeyedListModel(parent=self.ui_inputs["mount_selector"]))
+        self.ui_inputs["mount_selector"].currentIndexChanged.connect(self.on_mount_selected)
         mount_action_row_layout.addWidget(self.ui_inputs["mount_selector"])
 
         self.get_mount_btn = DiscordButton("📥 获取坐骑", "secondary")
@@ -979,37 +955,23 @@ class PetModule(BaseModule):
         self.send_command(8, "获取宝宝信息", {"玩家id": char_id})
         self.add_log(f"已发送获取宝宝信息请求: {char_id}")
 
-    def on_pet_selected(self, pet_name: str):
+    def on_pet_selected(self, index: int):
         """当选择宝宝时触发的事件"""
-        if not pet_name:
+        if index < 0:
             return
 
-        # 获取选择框
-        pet_selector = self.ui_inputs["pet_selector"]
-        current_index = pet_selector.currentIndex()
-
-        if current_index >= 0:
-            # 获取用户数据（pet_index）
-            pet_index = pet_selector.itemData(current_index)
-            if pet_index:
-                print(f"[DEBUG] 选择宝宝: {pet_name}, 索引: {pet_index}")
-                self.load_pet_data(pet_index)
-        else:
-            # 兼容旧版本：通过文本解析索引
-            if "-" in pet_name:
-                try:
-                    pet_index = int(pet_name.split("-")[0])
-                    self.load_pet_data(pet_index)
-                except ValueError:
-                    pass  # 忽略无效的宠物选择格式
+        # 获取用户数据（pet_index）
+        pet_index = self.ui_inputs["pet_selector"].itemData(index)
+        if pet_index:
+            print(f"[DEBUG] 选择宝宝: {self.ui_inputs['pet_selector'].itemText(index)}, 索引: {pet_index}")
+            self.load_pet_data(pet_index)
 
     def set_mount_data(self, data: dict):
-        """设置坐骑数据"""
-        self.mount_data = data
-        self.ui_inputs["mount_selector"].clear()
-        
-        if not data:
-            return
+        """设置坐骑数据（按坐骑键增量更新下拉框，保留当前选择）"""
+        mount_selector = self.ui_inputs["mount_selector"]
+        previous_key = mount_selector.currentData()
+        previous_info = self.mount_data.get(previous_key)
+        self.mount_data = data or {}
 
         # 排序坐骑数据 - 提取[1], [2]等格式的键
         def get_sort_key(k):
@@ -1018,18 +980,14 @@ class PetModule(BaseModule):
                 s = s[1:-1]
             return int(s) if s.isdigit() else 0
 
-        sorted_keys = sorted(data.keys(), key=get_sort_key)
-        
-        for key in sorted_keys:
-            mount_info = data[key]
-            name = self._clean_value(mount_info.get("名称", "未知坐骑"))
-            self.ui_inputs["mount_selector"].addItem(f"{name}", key)
+        rows = [
+            (key, f"{self._clean_value(self.mount_data[key].get('名称', '未知坐骑'))}")
+            for key in sorted(self.mount_data.keys(), key=get_sort_key)
+        ]
+        mount_selector.model().update_rows(rows)
 
         # 默认选中第一个并填充数据
-        if self.ui_inputs["mount_selector"].count() > 0:
-            self.ui_inputs["mount_selector"].setCurrentIndex(0)
-            self.ui_inputs["mount_selector"].currentIndexChanged.connect(self.on_mount_selected)
-            self.on_mount_selected(0)
+        self._sync_selection(mount_selector, previous_key, previous_info, self.mount_data, self.on_mount_selected)
 
     def on_mount_selected(self, index):
         """当选择坐骑时触发"""
@@ -8,16 +8,22 @@
 from fastapi import APIRouter, HTTPException, Depends, Request
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
-from database.activity_models import ActivityManager, Activity, ActivityReward
+from database.activity_models import Activity, ActivityReward, get_activity_manager
 from auth.dependencies import get_current_active_user, get_current_admin_user
+from auth.rate_limiter import (
+    rate_limit, ip_key, body_key, participate_ip_limiter, participate_game_id_limiter
+)
 from database.models import User as AuthUser
+from utils.export_stream import check_format, export_response
+from utils.response_cache import response_cache, activity_scope
+import asyncio
 import json
 import logging
 
 logger = logging.getLogger(__name__)
 
-# 创建活动管理器
-activity_manager = ActivityManager()
+# 全局活动管理器
+activity_manager = get_activity_manager()
 
 # 创建路由
 activity_router = APIRouter(prefix="/api/activity", tags=["activity"])
@@ -192,6 +198,7 @@ async def update_activity(
         if not success:
             raise HTTPException(status_code=500, detail="更新失败")
         
+        response_cache.invalidate(activity_scope(activity_id))
         return {
             "success": True,
             "message": "活动更新成功"
@@ -244,6 +251,7 @@ async def add_reward(
         # 添加奖项
         reward_id = activity_manager.add_reward(reward)
         
+        response_cache.invalidate(activity_scope(activity_id))
         return {
             "success": True,
             "message": "奖项添加成功",
@@ -311,6 +319,7 @@ async def update_reward(
         if not success:
             raise HTTPException(status_code=500, detail="更新失败")
             
+        response_cache.invalidate(activity_scope(activity_id))
         return {
             "success": True,
             "message": "奖项更新成功"
@@ -340,6 +349,7 @@ async def delete_reward(
         if not success:
             raise HTTPException(status_code=400, detail="删除失败")
         
+        response_cache.invalidate(activity_scope(activity_id))
         return {
             "success": True,
             "message": "奖项删除成功"
@@ -351,7 +361,13 @@ async def delete_reward(
         logger.error(f"删除奖项失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"删除失败: {str(e)}")
 
-@activity_router.post("/{activity_id}/participate")
+@activity_router.post(
+    "/{activity_id}/participate",
+    dependencies=[
+        Depends(rate_limit(participate_ip_limiter, ip_key)),
+        Depends(rate_limit(participate_game_id_limiter, body_key("game_id")))
+    ]
+)
 async def participate_in_activity(
     activity_id: int,
     request: ParticipateRequest
@@ -363,10 +379,11 @@ async def participate_in_activity(
         if not activity:
             raise HTTPException(status_code=404, detail="活动不存在")
         
-        # 参与活动
-        result = activity_manager.participate(activity_id, request.game_id)
+        # 参与活动（写事务可能等待数据库锁，在线程中执行，不阻塞事件循环）
+        result = await asyncio.to_thread(activity_manager.participate, activity_id, request.game_id)
         
         if result["success"]:
+            response_cache.invalidate(activity_scope(activity_id))
             return {
                 "success": True,
                 "message": "参与成功",
@@ -408,41 +425,47 @@ async def get_user_history(
         raise HTTPException(status_code=500, detail=f"获取记录失败: {str(e)}")
 
 @activity_router.get("/{activity_id}/public-info")
-async def get_activity_public_info(activity_id: int):
-    """获取活动公开信息（无需登录）"""
+async def get_activity_public_info(activity_id: int, http_request: Request):
+    """获取活动公开信息（无需登录），活动、奖项或参与数据变化前返回缓存的响应"""
     try:
-        activity = activity_manager.get_activity(activity_id)
-        if not activity:
-            raise HTTPException(status_code=404, detail="活动不存在")
-        
-        # 获取奖项
-        rewards = activity_manager.get_rewards(activity_id)
-        rewards_data = [reward.to_dict() for reward in rewards]
-        
-        # 获取统计数据（仅用于显示剩余名额）
-        stats = activity_manager.get_statistics(activity_id)
-        
-        activity_dict = activity.to_dict()
-        if activity.config:
-            activity_dict['config_parsed'] = json.loads(activity.config)
-        else:
-            activity_dict['config_parsed'] = {}
-        
-        return {
-            "success": True,
-            "data": {
-                "activity": activity_dict,
-                "rewards": rewards_data,
-                "statistics": stats
-            }
-        }
-        
+        return response_cache.respond(
+            http_request, activity_scope(activity_id), lambda: _build_public_info(activity_id)
+        )
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"获取活动公开信息失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"获取失败: {str(e)}")
 
+
+def _build_public_info(activity_id: int) -> dict:
+    activity = activity_manager.get_activity(activity_id)
+    if not activity:
+        raise HTTPException(status_code=404, detail="活动不存在")
+    
+    # 获取奖项
+    rewards = activity_manager.get_rewards(activity_id)
+    rewards_data = [reward.to_dict() for reward in rewards]
+    
+    # 获取统计数据（仅用于显示剩余名额）
+    stats = activity_manager.get_statistics(activity_id)
+    
+    activity_dict = activity.to_dict()
+    if activity.config:
+        activity_dict['config_parsed'] = json.loads(activity.config)
+    else:
+        activity_dict['config_parsed'] = {}
+    
+    return {
+        "success": True,
+        "data": {
+            "activity": activity_dict,
+            "rewards": rewards_data,
+            "statistics": stats
+        }
+    }
+
+
 @activity_router.delete("/{activity_id}")
 async def delete_activity(
     activity_id: int,
@@ -460,6 +483,7 @@ async def delete_activity(
         if not success:
             raise HTTPException(status_code=500, detail="删除失败")
         
+        response_cache.invalidate(activity_scope(activity_id))
         return {
             "success": True,
             "message": "活动删除成功"
@@ -533,6 +557,37 @@ async def get_activity_participations(
         logger.error(f"获取参与记录失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"获取记录失败: {str(e)}")
 
+# 参与记录导出列
+PARTICIPATION_EXPORT_COLUMNS = [
+    "id", "activity_id", "activity_type", "game_id", "reward_id", "reward_name",
+    "status", "ip_address", "user_agent", "created_at"
+]
+
+@activity_router.get("/{activity_id}/participations/export")
+async def export_activity_participations(
+    activity_id: int,
+    format: str = "csv",
+    gzip: bool = False,
+    game_id: Optional[str] = None,
+    reward_name: Optional[str] = None,
+    status: Optional[int] = None,
+    activity_type: Optional[str] = None,
+    current_user: AuthUser = Depends(get_current_admin_user)
+):
+    """流式导出活动参与记录（管理员），format 为 csv 或 ndjson，gzip=true 时下载压缩文件"""
+    fmt = check_format(format)
+    existing_activity = activity_manager.get_activity(activity_id)
+    if not existing_activity:
+        raise HTTPException(status_code=404, detail="活动不存在")
+    
+    chunks = activity_manager.iter_participations(
+        activity_id, game_id, reward_name, status, activity_type
+    )
+    return export_response(
+        chunks, PARTICIPATION_EXPORT_COLUMNS, fmt,
+        f"activity_{activity_id}_participations", compress=gzip
+    )
+
 @activity_router.post("/{activity_id}/participations/{record_id}/resend")
 async def resend_reward(
     activity_id: int,
@@ -544,7 +599,7 @@ async def resend_reward(
         logger.info(f"开始补发奖励，记录ID: {record_id}")
 
         # 调用补发逻辑
-        success, message = activity_manager.resend_reward(record_id)
+        success, message = await activity_manager.resend_reward(record_id)
 
         logger.info(f"补发结果: success={success}, message={message}")
 
@@ -559,6 +614,8 @@ async def resend_reward(
                 status_code = 404
             elif "没有奖品" in message:
                 status_code = 400
+            elif "自动发放中" in message:
+                status_code = 409
             else:
                 status_code = 500
 
@@ -589,6 +646,7 @@ async def delete_participation(
         if not success:
             raise HTTPException(status_code=404, detail="记录不存在")
         
+        response_cache.invalidate(activity_scope(activity_id))
         return {
             "success": True,
             "message": "记录删除成功"
@@ -615,6 +673,7 @@ async def clear_participations(
         # 清空记录
         activity_manager.clear_participations(activity_id)
         
+        response_cache.invalidate(activity_scope(activity_id))
         return {
             "success": True,
             "message": "记录清空成功"
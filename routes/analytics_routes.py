@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+报表统计 API 路由
+统计基于定期生成的列式分析快照，不直接扫描线上数据库
+"""
+
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, status
+from auth.dependencies import get_current_admin_user
+from database.models import User
+from services.analytics_snapshot import analytics_snapshots, available, parse_time, AnalyticsSnapshot
+
+router = APIRouter(prefix="/api/analytics", tags=["报表统计"])
+
+
+def _require_available():
+    if not available():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="服务器未安装 numpy，报表统计不可用"
+        )
+
+
+def _require_snapshot() -> AnalyticsSnapshot:
+    _require_available()
+    snapshot = analytics_snapshots.get()
+    if not snapshot:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="分析快照尚未生成，请稍后再试"
+        )
+    return snapshot
+
+
+def _time_range(start: Optional[str], end: Optional[str]):
+    try:
+        return parse_time(start), parse_time(end)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="时间格式应为 YYYY-MM-DD HH:MM:SS"
+        )
+
+
+@router.get("/snapshot")
+async def get_snapshot_status(
+    current_user: User = Depends(get_current_admin_user)
+):
+    """获取分析快照状态（生成时间、行数、存储格式）"""
+    return {
+        "status": "success",
+        "data": analytics_snapshots.get_status()
+    }
+
+
+@router.post("/snapshot/refresh")
+async def refresh_snapshot(
+    current_user: User = Depends(get_current_admin_user)
+):
+    """立即重新生成分析快照"""
+    _require_available()
+    snapshot = await asyncio.to_thread(analytics_snapshots.refresh)
+    if not snapshot:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"生成分析快照失败: {analytics_snapshots.get_status()['last_error']}"
+        )
+    return {
+        "status": "success",
+        "data": snapshot.info()
+    }
+
+
+@router.get("/activity/win-rate-by-hour")
+async def get_win_rate_by_hour(
+    activity_id: Optional[int] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    tz_offset: int = 0,
+    current_user: User = Depends(get_current_admin_user)
+):
+    """
+    按小时统计参与次数和中奖率
+    - start / end: 时间范围（YYYY-MM-DD HH:MM:SS，UTC）
+    - tz_offset: 按该时区（相对 UTC 的小时数）划分小时
+    """
+    snapshot = _require_snapshot()
+    start_ts, end_ts = _time_range(start, end)
+    return {
+        "status": "success",
+        "data": snapshot.win_rate_by_hour(activity_id, start_ts, end_ts, tz_offset),
+        "snapshot_at": snapshot.built_at
+    }
+
+
+@router.get("/gifts/top-senders")
+async def get_top_senders(
+    limit: int = 20,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    item_name: Optional[str] = None,
+    include_admin: bool = False,
+    current_user: User = Depends(get_current_admin_user)
+):
+    """按发送总数量排名的发送者（默认不含管理员发送）"""
+    snapshot = _require_snapshot()
+    start_ts, end_ts = _time_range(start, end)
+    return {
+        "status": "success",
+        "data": snapshot.top_senders(limit, start_ts, end_ts, item_name, include_admin),
+        "snapshot_at": snapshot.built_at
+    }
+
+
+@router.get("/gifts/item-volumes")
+async def get_item_volumes(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    include_admin: bool = False,
+    current_user: User = Depends(get_current_admin_user)
+):
+    """按道具统计发送次数、总数量和发送人数"""
+    snapshot = _require_snapshot()
+    start_ts, end_ts = _time_range(start, end)
+    return {
+        "status": "success",
+        "data": snapshot.item_volumes(start_ts, end_ts, include_admin),
+        "snapshot_at": snapshot.built_at
+    }
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+实时事件推送 API 路由 (Server-Sent Events)
+"""
+
+import asyncio
+import json
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from auth.dependencies import get_current_active_user
+from auth.user_service import UserAuthService
+from config.settings import EVENT_STREAM_TICKET_TTL
+from database.models import Message, User
+from services.event_hub import event_hub, TOPIC_UNREAD
+
+router = APIRouter(prefix="/api", tags=["实时推送"])
+
+# 无事件时的心跳间隔（秒），防止代理断开空闲连接
+HEARTBEAT_SECONDS = 15.0
+
+
+def _format_event(topic: str, payload) -> str:
+    data = json.dumps(payload, ensure_ascii=False, default=str)
+    return f"event: {topic}\ndata: {data}\n\n"
+
+
+@router.post("/events/ticket")
+async def create_event_ticket(current_user: User = Depends(get_current_active_user)):
+    """
+    获取实时事件流票据
+    - EventSource 无法设置请求头，先用访问令牌换取短期票据，再通过查询参数连接事件流
+    - 票据只能用于事件流，不能代替访问令牌调用其他接口
+    """
+    return {
+        "ticket": UserAuthService.create_stream_ticket(current_user),
+        "expires_in": EVENT_STREAM_TICKET_TTL
+    }
+
+
+@router.get("/events/stream")
+async def stream_events(request: Request, ticket: str):
+    """
+    订阅实时事件
+    - 通过 POST /api/events/ticket 获取的票据认证（只在建立连接时校验）
+    - unread: 未读消息数变化（合并为最新值）
+    - participation / game: 活动参与事件和游戏服务器响应（仅管理员）
+    """
+    success, user, error = UserAuthService.verify_stream_ticket(ticket)
+    if not success or not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=error or "Invalid authentication credentials"
+        )
+
+    subscription = event_hub.subscribe(user.id, is_admin=user.role in ["admin", "super_admin"])
+    # 连接建立后先推送一次当前未读数
+    subscription.put(TOPIC_UNREAD, lambda: Message.get_counters(user.id), key=TOPIC_UNREAD)
+
+    async def event_generator():
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                batch = await subscription.get_batch(timeout=HEARTBEAT_SECONDS)
+                if not batch:
+                    yield ": ping\n\n"
+                    continue
+                for topic, payload in batch:
+                    # 延迟求值的事件（如未读数）在发送时才查询，合并后只查一次
+                    if callable(payload):
+                        payload = await asyncio.to_thread(payload)
+                    yield _format_event(topic, payload)
+        finally:
+            event_hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -6,13 +6,16 @@
 提供道具配置、等级限制、发送操作的 REST API
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from pydantic import BaseModel, Field
 from typing import Optional, List
 from auth.dependencies import get_current_user, get_current_admin_user, get_current_super_admin
+from auth.rate_limiter import rate_limit_user, user_action_limiter
 from database.models import User
-from database.item_gift import ItemConfig, ItemLevelLimit, ItemGiftLog
+from database.item_gift import ItemConfig, ItemLevelLimit, ItemGiftLog, ItemCatalog
 from services.item_gift_service import ItemGiftService
+from utils.export_stream import check_format, export_response
+from utils.response_cache import response_cache, SCOPE_ITEM_CATALOG
 import logging
 
 logger = logging.getLogger(__name__)
@@ -82,19 +85,23 @@ class SendGiftRequest(BaseModel):
     quantity: int = Field(..., ge=1)
 
 
+# 道具配置和等级限制的读接口缓存以目录快照版本为准：写入后快照重建，内容变化时版本随之变化
+response_cache.register_version(SCOPE_ITEM_CATALOG, lambda: ItemCatalog.get().version)
+
+
 # ==================== 道具配置管理 API（超级管理员）====================
 
 @router.get("/item-configs", response_model=dict)
 async def get_item_configs(
+    request: Request,
     super_admin: User = Depends(get_current_super_admin)
 ):
     """获取所有道具配置"""
     try:
-        configs = ItemConfig.get_all()
-        return {
+        return response_cache.respond(request, SCOPE_ITEM_CATALOG, lambda: {
             "status": "success",
-            "data": [config.to_dict() for config in configs]
-        }
+            "data": [config.to_dict() for config in ItemConfig.get_all()]
+        }, super_admin.level)
     except Exception as e:
         logger.error(f"获取道具配置失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -102,18 +109,21 @@ async def get_item_configs(
 
 @router.get("/item-configs/{item_name}", response_model=dict)
 async def get_item_config(
+    request: Request,
     item_name: str,
     super_admin: User = Depends(get_current_super_admin)
 ):
     """获取单个道具配置"""
-    config = ItemConfig.get_by_name(item_name)
-    if not config:
-        raise HTTPException(status_code=404, detail=f"道具 '{item_name}' 不存在")
+    def build():
+        config = ItemConfig.get_by_name(item_name)
+        if not config:
+            raise HTTPException(status_code=404, detail=f"道具 '{item_name}' 不存在")
+        return {
+            "status": "success",
+            "data": config.to_dict()
+        }
     
-    return {
-        "status": "success",
-        "data": config.to_dict()
-    }
+    return response_cache.respond(request, SCOPE_ITEM_CATALOG, build, super_admin.level)
 
 
 @router.post("/item-configs", response_model=dict, status_code=status.HTTP_201_CREATED)
@@ -217,15 +227,15 @@ async def delete_item_config(
 
 @router.get("/item-level-limits", response_model=dict)
 async def get_all_limits(
+    request: Request,
     super_admin: User = Depends(get_current_super_admin)
 ):
     """获取所有等级限制"""
     try:
-        limits = ItemLevelLimit.get_all()
-        return {
+        return response_cache.respond(request, SCOPE_ITEM_CATALOG, lambda: {
             "status": "success",
-            "data": [limit.to_dict() for limit in limits]
-        }
+            "data": [limit.to_dict() for limit in ItemLevelLimit.get_all()]
+        }, super_admin.level)
     except Exception as e:
         logger.error(f"获取等级限制失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -233,28 +243,28 @@ async def get_all_limits(
 
 @router.get("/item-level-limits/level/{level}", response_model=dict)
 async def get_limits_by_level(
+    request: Request,
     level: int,
     super_admin: User = Depends(get_current_super_admin)
 ):
     """获取某等级的所有限制"""
-    limits = ItemLevelLimit.get_all_by_level(level)
-    return {
+    return response_cache.respond(request, SCOPE_ITEM_CATALOG, lambda: {
         "status": "success",
-        "data": [limit.to_dict() for limit in limits]
-    }
+        "data": [limit.to_dict() for limit in ItemLevelLimit.get_all_by_level(level)]
+    }, super_admin.level)
 
 
 @router.get("/item-level-limits/item/{item_name}", response_model=dict)
 async def get_limits_by_item(
+    request: Request,
     item_name: str,
     super_admin: User = Depends(get_current_super_admin)
 ):
     """获取某道具的所有等级限制"""
-    limits = ItemLevelLimit.get_all_by_item(item_name)
-    return {
+    return response_cache.respond(request, SCOPE_ITEM_CATALOG, lambda: {
         "status": "success",
-        "data": [limit.to_dict() for limit in limits]
-    }
+        "data": [limit.to_dict() for limit in ItemLevelLimit.get_all_by_item(item_name)]
+    }, super_admin.level)
 
 
 @router.post("/item-level-limits", response_model=dict, status_code=status.HTTP_201_CREATED)
@@ -440,7 +450,7 @@ async def check_gift(
 @router.post("/items/send-gift", response_model=dict)
 async def send_gift(
     data: SendGiftRequest,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(rate_limit_user(user_action_limiter))
 ):
     """执行道具发送"""
     is_admin = current_user.role in ['admin', 'super_admin']
@@ -465,14 +475,14 @@ async def send_gift(
 
 @router.get("/items/my-limits", response_model=dict)
 async def get_my_limits(
+    request: Request,
     current_user: User = Depends(get_current_user)
 ):
     """获取当前用户的所有道具限制"""
-    limits = ItemGiftService.get_user_limits(current_user.level)
-    return {
+    return response_cache.respond(request, SCOPE_ITEM_CATALOG, lambda: {
         "status": "success",
-        "data": limits
-    }
+        "data": ItemGiftService.get_user_limits(current_user.level)
+    }, current_user.level)
 
 
 @router.get("/items/my-usage", response_model=dict)
@@ -489,14 +499,14 @@ async def get_my_usage(
 
 @router.get("/items/available", response_model=dict)
 async def get_available_items(
+    request: Request,
     current_user: User = Depends(get_current_user)
 ):
     """获取当前用户可发送的道具列表"""
-    items = ItemGiftService.get_available_items(current_user.level)
-    return {
+    return response_cache.respond(request, SCOPE_ITEM_CATALOG, lambda: {
         "status": "success",
-        "data": items
-    }
+        "data": ItemGiftService.get_available_items(current_user.level)
+    }, current_user.level)
 
 
 @router.get("/items/send-history", response_model=dict)
@@ -510,3 +520,31 @@ async def get_send_history(
         "status": "success",
         "data": [log.to_dict() for log in logs]
     }
+
+
+# 发送记录导出列
+GIFT_LOG_EXPORT_COLUMNS = [
+    "id", "sender_username", "sender_level", "recipient_username", "item_name",
+    "quantity", "reset_period_hours", "is_admin_send", "sent_at"
+]
+
+
+@router.get("/items/gift-logs/export")
+async def export_gift_logs(
+    current_user: User = Depends(get_current_admin_user),
+    format: str = "csv",
+    gzip: bool = False,
+    sender_username: Optional[str] = None,
+    item_name: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None
+):
+    """
+    流式导出道具发送记录（管理员）
+    - format: csv 或 ndjson
+    - gzip: 是否下载 gzip 压缩文件
+    - start / end: 发送时间范围（YYYY-MM-DD HH:MM:SS）
+    """
+    fmt = check_format(format)
+    chunks = ItemGiftLog.iter_logs(sender_username, item_name, start, end)
+    return export_response(chunks, GIFT_LOG_EXPORT_COLUMNS, fmt, "item_gift_logs", compress=gzip)
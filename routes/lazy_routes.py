@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+路由按需注册
+路由模块（及其依赖的模型、服务）不在导入 api_main 时加载：第一次请求落在某个路由模块的路径前缀下时，
+在线程池中导入该模块并注册到应用，之后的请求直接由已注册的路由处理。
+服务启动后在后台依次预加载全部路由，访问 /docs、/redoc、/openapi.json 时立即加载全部路由。
+"""
+
+import asyncio
+import importlib
+import logging
+import time
+from typing import Optional, Dict, Any, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 需要完整路由表的路径（接口文档）
+FULL_SCHEMA_PATHS = ("/docs", "/redoc", "/openapi.json")
+
+
+class LazyRouter:
+    """一个按需加载的路由模块"""
+
+    def __init__(self, prefixes: Tuple[str, ...], module: str, attr: str = "router",
+                 include_kwargs: Optional[Dict[str, Any]] = None):
+        self.prefixes = prefixes
+        self.module = module
+        self.attr = attr
+        self.include_kwargs = include_kwargs or {}
+        self.loaded = False
+        self.load_ms: Optional[float] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    def matches(self, path: str) -> bool:
+        return any(path == prefix or path.startswith(prefix + "/") for prefix in self.prefixes)
+
+
+class LazyRouterRegistry:
+    """
+    路由模块登记表，配合 LazyRouterMiddleware 使用：
+        registry = LazyRouterRegistry(app)
+        registry.register(("/api/users",), "routes.user_routes")
+        app.add_middleware(LazyRouterMiddleware, registry=registry)
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.routers: List[LazyRouter] = []
+
+    def register(self, prefixes: Tuple[str, ...], module: str, attr: str = "router", **include_kwargs):
+        self.routers.append(LazyRouter(prefixes, module, attr, include_kwargs))
+
+    def pending(self) -> List[LazyRouter]:
+        return [router for router in self.routers if not router.loaded]
+
+    async def ensure_for_path(self, path: str):
+        """加载路径所属的路由模块"""
+        if path in FULL_SCHEMA_PATHS:
+            await self.ensure_all()
+            return
+        for router in self.routers:
+            if not router.loaded and router.matches(path):
+                await self._load(router)
+
+    async def ensure_all(self):
+        for router in self.pending():
+            await self._load(router)
+
+    async def preload(self):
+        """后台预加载全部路由（服务启动后调用，失败的模块在第一次请求时重试）"""
+        for router in self.pending():
+            try:
+                await self._load(router)
+            except Exception as e:
+                logger.error(f"预加载路由 {router.module} 失败: {e}")
+
+    async def _load(self, router: LazyRouter):
+        if router._lock is None:
+            router._lock = asyncio.Lock()
+        async with router._lock:
+            if router.loaded:
+                return
+            started = time.perf_counter()
+            # 模块导入可能需要上百毫秒，放到线程池中，不阻塞其他请求
+            module = await asyncio.to_thread(importlib.import_module, router.module)
+            # 注册路由在事件循环线程中进行
+            self._include(router, module)
+            router.load_ms = round((time.perf_counter() - started) * 1000, 1)
+            logger.info(f"已加载路由 {router.module}，耗时 {router.load_ms}ms")
+
+    def _include(self, router: LazyRouter, module):
+        if router.loaded:
+            return
+        self.app.include_router(getattr(module, router.attr), **router.include_kwargs)
+        router.loaded = True
+        # 路由表变化后重新生成接口文档
+        self.app.openapi_schema = None
+
+
+class LazyRouterMiddleware:
+    """请求进入路由匹配之前，确保所属的路由模块已注册"""
+
+    def __init__(self, app, registry: LazyRouterRegistry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket") and self.registry.pending():
+            await self.registry.ensure_for_path(scope["path"])
+        await self.app(scope, receive, send)
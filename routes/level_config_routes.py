@@ -5,11 +5,12 @@
 """
 
 from typing import List, Optional
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Request, status
 from pydantic import BaseModel, Field
 from database.level_config import LevelConfig
 from database.models import User
 from auth.dependencies import get_current_super_admin
+from utils.response_cache import response_cache, SCOPE_LEVEL_CONFIGS
 import logging
 
 logger = logging.getLogger(__name__)
@@ -72,6 +73,7 @@ class LevelConfigUpdateRequest(BaseModel):
 
 @router.get("/level-configs", response_model=dict)
 async def get_all_level_configs(
+    request: Request,
     include_inactive: bool = False,
     include_stats: bool = True,
     super_admin: User = Depends(get_current_super_admin)
@@ -82,6 +84,13 @@ async def get_all_level_configs(
     - **include_inactive**: 是否包含已停用的等级
     - **include_stats**: 是否包含使用统计
     """
+    return response_cache.respond(
+        request, SCOPE_LEVEL_CONFIGS,
+        lambda: _build_level_configs(include_inactive, include_stats), super_admin.level
+    )
+
+
+def _build_level_configs(include_inactive: bool, include_stats: bool) -> dict:
     configs = LevelConfig.get_all(active_only=not include_inactive)
     
     result = []
@@ -104,6 +113,7 @@ async def get_all_level_configs(
 
 @router.get("/level-configs/{level_value}", response_model=dict)
 async def get_level_config(
+    request: Request,
     level_value: int,
     super_admin: User = Depends(get_current_super_admin)
 ):
@@ -112,6 +122,12 @@ async def get_level_config(
     
     - **level_value**: 等级值
     """
+    return response_cache.respond(
+        request, SCOPE_LEVEL_CONFIGS, lambda: _build_level_config(level_value), super_admin.level
+    )
+
+
+def _build_level_config(level_value: int) -> dict:
     config = LevelConfig.get_by_level(level_value)
     
     if not config:
@@ -167,6 +183,7 @@ async def create_level_config(
             detail="创建等级配置失败"
         )
     
+    response_cache.invalidate(SCOPE_LEVEL_CONFIGS)
     logger.info(f"超级管理员 {super_admin.username} 创建了新等级: Level {data.level_value} - {data.display_name}")
     
     return {
@@ -216,6 +233,7 @@ async def update_level_config(
             detail="更新等级配置失败"
         )
     
+    response_cache.invalidate(SCOPE_LEVEL_CONFIGS)
     logger.info(f"超级管理员 {super_admin.username} 更新了等级配置: Level {level_value}")
     
     return {
@@ -263,6 +281,7 @@ async def delete_level_config(
             detail="删除等级配置失败"
         )
     
+    response_cache.invalidate(SCOPE_LEVEL_CONFIGS)
     logger.info(f"超级管理员 {super_admin.username} 删除了等级配置: Level {level_value} (force={force})")
     
     return {
@@ -4,11 +4,14 @@
 消息管理 API 路由
 """
 
-from typing import Optional, List
+import asyncio
+import base64
+from typing import Optional, List, Tuple
 from fastapi import APIRouter, HTTPException, Depends, status, Body
 from pydantic import BaseModel, Field
 from database.models import Message, User
 from auth.dependencies import get_current_active_user, get_current_admin_user
+from services.message_broadcast_service import MessageBroadcastJobs
 
 router = APIRouter(prefix="/api", tags=["消息管理"])
 
@@ -19,6 +22,7 @@ class MessageCreateRequest(BaseModel):
     user_ids: Optional[List[int]] = Field(None, description="收件人用户ID列表（仅管理员可用）")
     title: str = Field(..., min_length=1, max_length=100, description="消息标题")
     content: str = Field(..., min_length=1, description="消息内容")
+    background: bool = Field(False, description="是否以后台任务方式群发（仅对用户ID列表生效）")
     
     class Config:
         json_schema_extra = {
@@ -94,33 +98,44 @@ async def create_messages(
                     detail="只有管理员可以发送消息给多个用户"
                 )
             
-            success_count = 0
-            failed_users = []
-            
-            for user_id in request.user_ids:
-                # 检查用户是否存在
-                recipient = User.get_by_id(user_id)
-                if not recipient:
-                    failed_users.append(user_id)
-                    continue
-                
-                # 创建消息
-                message = Message.create(
+            # 后台任务：立即返回任务ID，前端轮询进度
+            if request.background:
+                job = MessageBroadcastJobs.submit(
                     sender_id=current_user.id,
                     sender_name=current_user.username,
-                    recipient_id=user_id,
+                    recipient_ids=request.user_ids,
                     title=request.title,
                     content=request.content
                 )
-                
-                if message:
-                    created_messages.append(message.to_dict())
-                    success_count += 1
+                return {
+                    "status": "success",
+                    "message": f"群发任务已提交，共 {job['total']} 位收件人",
+                    "data": job
+                }
+            
+            # 批量校验收件人并在同一事务中写入
+            success_count, failed_users = await asyncio.to_thread(
+                Message.create_bulk,
+                current_user.id,
+                current_user.username,
+                request.user_ids,
+                request.title,
+                request.content
+            )
+            
+            # 群发只返回统计信息，不逐条回传消息内容
+            created_messages = {
+                "sent_count": success_count,
+                "failed_user_ids": failed_users
+            }
             
             # 添加成功和失败的统计信息
             result_message = f"消息已成功发送给 {success_count} 位用户"
             if failed_users:
-                result_message += f"，{len(failed_users)} 位用户发送失败（用户ID不存在：{', '.join(map(str, failed_users))}）"
+                shown = ', '.join(map(str, failed_users[:20]))
+                if len(failed_users) > 20:
+                    shown += ' 等'
+                result_message += f"，{len(failed_users)} 位用户发送失败（用户ID不存在：{shown}）"
         
         return {
             "status": "success",
@@ -136,42 +151,56 @@ async def create_messages(
         )
 
 
+def _encode_cursor(message: Message) -> str:
+    """将 (created_at, id) 编码为不透明的分页游标"""
+    raw = f"{message.created_at}|{message.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        created_at, message_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").rsplit("|", 1)
+        return created_at, int(message_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="无效的分页游标"
+        )
+
+
 @router.get("/messages")
 async def get_messages(
     type: str = "inbox",  # inbox 或 sent
     limit: int = 50,
     offset: int = 0,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_active_user)
 ):
     """
     获取当前用户的消息
+    - 传入上一页返回的 next_cursor 按游标翻页，不再使用 offset
     """
     try:
-        if type == "inbox":
-            # 获取收件箱消息
-            messages = Message.get_by_recipient(current_user.id, limit=limit, offset=offset)
-        elif type == "sent":
-            # 获取已发送消息
-            messages = Message.get_by_sender(current_user.id, limit=limit, offset=offset)
-        else:
+        if type not in ("inbox", "sent"):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="type 参数只能是 'inbox' 或 'sent'"
             )
         
-        # 获取真实的总数
-        if type == "inbox":
-            total = Message.count_by_recipient(current_user.id)
-        elif type == "sent":
-            total = Message.count_by_sender(current_user.id)
-        else:
-            total = 0
+        before = _decode_cursor(cursor) if cursor else None
+        messages, counters = Message.get_page_with_counters(
+            current_user.id, type, limit=limit, offset=offset, before=before
+        )
+        
+        # 取满一页时返回下一页游标
+        next_cursor = _encode_cursor(messages[-1]) if len(messages) >= limit > 0 else None
         
         return {
             "status": "success",
             "data": [message.to_dict() for message in messages],
-            "total": total,
-            "unread_count": Message.count_unread(current_user.id) if type == "inbox" else 0
+            "total": counters['inbox_total'] if type == "inbox" else counters['sent_total'],
+            "unread_count": counters['unread_count'] if type == "inbox" else 0,
+            "next_cursor": next_cursor
         }
     except HTTPException:
         raise
@@ -182,6 +211,27 @@ async def get_messages(
         )
 
 
+@router.get("/messages/broadcast-jobs/{job_id}")
+async def get_broadcast_job(
+    job_id: str,
+    current_user: User = Depends(get_current_admin_user)
+):
+    """
+    查询群发任务进度（仅任务发起人可查）
+    """
+    job = MessageBroadcastJobs.get(job_id)
+    if not job or job['sender_id'] != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="群发任务不存在"
+        )
+    
+    return {
+        "status": "success",
+        "data": job
+    }
+
+
 @router.get("/messages/unread-count")
 async def get_unread_count(
     current_user: User = Depends(get_current_active_user)
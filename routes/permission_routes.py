@@ -5,11 +5,12 @@
 """
 
 from typing import List
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Request, status
 from pydantic import BaseModel, Field
 from database.permissions import Permission, LevelPermission
 from database.models import User
 from auth.dependencies import get_current_admin_user
+from utils.response_cache import response_cache, SCOPE_PERMISSIONS, SCOPE_LEVEL_PERMISSIONS
 import logging
 
 logger = logging.getLogger(__name__)
@@ -42,15 +43,7 @@ class LevelPermissionsUpdateRequest(BaseModel):
 
 # ==================== API 路由 ====================
 
-@router.get("/permissions", response_model=dict)
-async def get_all_permissions(
-    admin_user: User = Depends(get_current_admin_user)
-):
-    """
-    获取所有权限列表（按分类分组）
-    
-    需要管理员权限
-    """
+def _build_permission_catalog() -> dict:
     permissions_by_category = Permission.get_by_category()
     
     result = {}
@@ -71,8 +64,22 @@ async def get_all_permissions(
     }
 
 
+@router.get("/permissions", response_model=dict)
+async def get_all_permissions(
+    request: Request,
+    admin_user: User = Depends(get_current_admin_user)
+):
+    """
+    获取所有权限列表（按分类分组）
+    
+    需要管理员权限
+    """
+    return response_cache.respond(request, SCOPE_PERMISSIONS, _build_permission_catalog)
+
+
 @router.get("/levels/{level}/permissions", response_model=dict)
 async def get_level_permissions(
+    request: Request,
     level: int,
     admin_user: User = Depends(get_current_admin_user)
 ):
@@ -87,6 +94,12 @@ async def get_level_permissions(
             detail="Level 必须在 1-10 之间"
         )
     
+    return response_cache.respond(
+        request, SCOPE_LEVEL_PERMISSIONS, lambda: _build_level_permissions(level)
+    )
+
+
+def _build_level_permissions(level: int) -> dict:
     permission_codes = LevelPermission.get_level_permissions(level)
     permission_ids = LevelPermission.get_level_permission_ids(level)
     
@@ -145,6 +158,7 @@ async def update_level_permissions(
     success = LevelPermission.set_level_permissions(level, data.permission_codes)
     
     if success:
+        response_cache.invalidate(SCOPE_LEVEL_PERMISSIONS)
         logger.info(f"管理员 {admin_user.username} 更新了 Level {level} 的权限")
         return {
             "status": "success",
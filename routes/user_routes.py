@@ -6,15 +6,21 @@
 
 from typing import Optional, List
 from fastapi import APIRouter, HTTPException, Depends, status, Request, Body
+from fastapi.security import HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr, Field
 from database.models import User, AuditLog
 from auth.user_service import UserAuthService
+from auth.password_hasher import PasswordHasherBusy
+from auth.rate_limiter import rate_limit, ip_key, ip_body_key, login_ip_limiter, login_account_limiter
 from auth.dependencies import (
+    security,
     get_current_active_user,
     get_current_admin_user,
     get_client_ip
 )
 from utils.password_generator import generate_secure_password
+from utils.export_stream import check_format, export_response
+from utils.response_cache import response_cache, SCOPE_LEVEL_CONFIGS
 
 class UserCreateRequest(BaseModel):
     """创建用户请求（管理员）"""
@@ -157,9 +163,27 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# 登录账号限流键：(客户端 IP, 用户名)
+login_account_key = ip_body_key("username")
+
+
+def _password_busy(e: PasswordHasherBusy) -> HTTPException:
+    """密码哈希繁忙：单个 IP 超限返回 429，整体排队已满返回 503"""
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS if e.per_ip else status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+
 # ==================== 公开路由 ====================
 
-@router.post("/register", response_model=dict, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/register",
+    response_model=dict,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(rate_limit(login_ip_limiter, ip_key))]
+)
 async def register(
     request: Request,
     user_data: UserRegisterRequest
@@ -172,12 +196,17 @@ async def register(
     - **password**: 密码（至少6位）
     - **full_name**: 全名（可选）
     """
-    success, user, error = UserAuthService.register(
-        username=user_data.username,
-        email=user_data.email,
-        password=user_data.password,
-        level=user_data.level
-    )
+    ip_address = get_client_ip(request)
+    try:
+        success, user, error = await UserAuthService.register(
+            username=user_data.username,
+            email=user_data.email,
+            password=user_data.password,
+            level=user_data.level,
+            client_ip=ip_address
+        )
+    except PasswordHasherBusy as e:
+        raise _password_busy(e)
     
     if not success:
         raise HTTPException(
@@ -185,8 +214,10 @@ async def register(
             detail=error
         )
     
+    # 等级配置列表中包含各等级的用户数
+    response_cache.invalidate(SCOPE_LEVEL_CONFIGS)
+    
     # 记录 IP
-    ip_address = get_client_ip(request)
     AuditLog.create(
         user_id=user.id,
         action="USER_REGISTER",
@@ -202,7 +233,14 @@ async def register(
     }
 
 
-@router.post("/login", response_model=UserLoginResponse)
+@router.post(
+    "/login",
+    response_model=UserLoginResponse,
+    dependencies=[
+        Depends(rate_limit(login_ip_limiter, ip_key)),
+        Depends(rate_limit(login_account_limiter, login_account_key))
+    ]
+)
 async def login(
     request: Request,
     credentials: UserLoginRequest
@@ -215,10 +253,15 @@ async def login(
     
     返回 JWT Token
     """
-    success, token, user, error = UserAuthService.login(
-        username=credentials.username,
-        password=credentials.password
-    )
+    ip_address = get_client_ip(request)
+    try:
+        success, token, user, error = await UserAuthService.login(
+            username=credentials.username,
+            password=credentials.password,
+            client_ip=ip_address
+        )
+    except PasswordHasherBusy as e:
+        raise _password_busy(e)
     
     if not success:
         raise HTTPException(
@@ -227,8 +270,12 @@ async def login(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # 账号限流只对失败的登录计数，登录成功退还令牌
+    account_key = await login_account_key(request)
+    if account_key is not None:
+        login_account_limiter.refund(account_key)
+    
     # 记录 IP
-    ip_address = get_client_ip(request)
     AuditLog.create(
         user_id=user.id,
         action="USER_LOGIN",
@@ -320,11 +367,16 @@ async def change_password(
     - **old_password**: 旧密码
     - **new_password**: 新密码（至少6位）
     """
-    success, error = UserAuthService.change_password(
-        user_id=current_user.id,
-        old_password=password_data.old_password,
-        new_password=password_data.new_password
-    )
+    ip_address = get_client_ip(request)
+    try:
+        success, error = await UserAuthService.change_password(
+            user_id=current_user.id,
+            old_password=password_data.old_password,
+            new_password=password_data.new_password,
+            client_ip=ip_address
+        )
+    except PasswordHasherBusy as e:
+        raise _password_busy(e)
     
     if not success:
         raise HTTPException(
@@ -333,7 +385,6 @@ async def change_password(
         )
     
     # 记录审计日志
-    ip_address = get_client_ip(request)
     AuditLog.create(
         user_id=current_user.id,
         action="PASSWORD_CHANGE",
@@ -348,6 +399,34 @@ async def change_password(
     }
 
 
+@router.post("/me/logout", response_model=dict)
+async def logout(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    退出登录
+    
+    启用会话撤销（TOKEN_SESSION_REVOCATION）时当前 Token 立即失效，否则在过期前仍然有效
+    """
+    revoked = UserAuthService.logout(credentials.credentials)
+    
+    AuditLog.create(
+        user_id=current_user.id,
+        action="USER_LOGOUT",
+        resource="users",
+        details=f"用户退出登录: {current_user.username}",
+        ip_address=get_client_ip(request)
+    )
+    
+    return {
+        "status": "success",
+        "message": "已退出登录",
+        "revoked": revoked
+    }
+
+
 @router.get("/me/logs", response_model=dict)
 async def get_current_user_logs(
     current_user: User = Depends(get_current_active_user),
@@ -495,6 +574,7 @@ async def update_user_level(
     user.level = level_data.level
     
     if user.update():
+        response_cache.invalidate(SCOPE_LEVEL_CONFIGS)
         # 记录审计日志
         ip_address = get_client_ip(request)
         AuditLog.create(
@@ -549,6 +629,9 @@ async def update_user_status(
     user.is_active = status_data.is_active
     
     if user.update():
+        if not user.is_active:
+            UserAuthService.revoke_sessions(user.id)
+        
         # 记录审计日志
         ip_address = get_client_ip(request)
         action = "USER_ACTIVATE" if status_data.is_active else "USER_DEACTIVATE"
@@ -591,13 +674,18 @@ async def create_user(
     # 自动生成密码
     password = generate_secure_password()
     
-    success, user, error = UserAuthService.register(
-        username=user_data.username,
-        email=user_data.email,
-        password=password,
-        level=user_data.level,
-        role=user_data.role
-    )
+    ip_address = get_client_ip(request)
+    try:
+        success, user, error = await UserAuthService.register(
+            username=user_data.username,
+            email=user_data.email,
+            password=password,
+            level=user_data.level,
+            role=user_data.role,
+            client_ip=ip_address
+        )
+    except PasswordHasherBusy as e:
+        raise _password_busy(e)
     
     if not success:
         raise HTTPException(
@@ -605,8 +693,9 @@ async def create_user(
             detail=error
         )
     
+    response_cache.invalidate(SCOPE_LEVEL_CONFIGS)
+    
     # 记录审计日志
-    ip_address = get_client_ip(request)
     AuditLog.create(
         user_id=admin_user.id,
         action="USER_CREATE",
@@ -649,10 +738,15 @@ async def reset_user_password(
     if not new_password:
         new_password = generate_secure_password()
     
-    success, error = UserAuthService.reset_password(
-        user_id=user_id,
-        new_password=new_password
-    )
+    ip_address = get_client_ip(request)
+    try:
+        success, error = await UserAuthService.reset_password(
+            user_id=user_id,
+            new_password=new_password,
+            client_ip=ip_address
+        )
+    except PasswordHasherBusy as e:
+        raise _password_busy(e)
     
     if not success:
         raise HTTPException(
@@ -661,7 +755,6 @@ async def reset_user_password(
         )
     
     # 记录审计日志
-    ip_address = get_client_ip(request)
     AuditLog.create(
         user_id=admin_user.id,
         action="PASSWORD_RESET_ADMIN",
@@ -675,18 +768,41 @@ async def reset_user_password(
         "message": "密码重置成功",
         "temp_password": new_password
     }
-    ip_address = get_client_ip(request)
+
+
+@router.post("/{user_id}/revoke-sessions", response_model=dict)
+async def revoke_user_sessions(
+    request: Request,
+    user_id: int,
+    admin_user: User = Depends(get_current_admin_user)
+):
+    """
+    撤销用户的全部登录会话（管理员，需要启用 TOKEN_SESSION_REVOCATION）
+    
+    - **user_id**: 用户ID
+    """
+    user = User.get_by_id(user_id)
+    
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="用户不存在"
+        )
+    
+    revoked = UserAuthService.revoke_sessions(user.id)
+    
     AuditLog.create(
         user_id=admin_user.id,
-        action="PASSWORD_RESET_ADMIN",
+        action="USER_SESSIONS_REVOKE",
         resource="users",
-        details=f"管理员 {admin_user.username} 重置用户 {user.username} 的密码",
-        ip_address=ip_address
+        details=f"管理员 {admin_user.username} 撤销用户 {user.username} 的 {revoked} 个会话",
+        ip_address=get_client_ip(request)
     )
     
     return {
         "status": "success",
-        "message": "密码重置成功"
+        "message": f"已撤销 {revoked} 个会话",
+        "revoked": revoked
     }
 
 
@@ -719,6 +835,7 @@ async def delete_user(
     username = user.username
     
     if user.delete():
+        response_cache.invalidate(SCOPE_LEVEL_CONFIGS)
         # 记录审计日志
         ip_address = get_client_ip(request)
         AuditLog.create(
@@ -744,25 +861,62 @@ async def delete_user(
 async def get_all_logs(
     admin_user: User = Depends(get_current_admin_user),
     limit: int = 100,
-    offset: int = 0
+    offset: int = 0,
+    user_id: Optional[int] = None,
+    action: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    exact: bool = False
 ):
     """
     获取所有操作日志（管理员）
     
     - **limit**: 每页数量（默认100）
     - **offset**: 偏移量（默认0）
+    - **user_id** / **action**: 按用户、操作类型筛选
+    - **start** / **end**: 时间范围（YYYY-MM-DD HH:MM:SS，UTC），只查询相关月份分区
+    - **exact**: 是否精确统计总数（默认使用分区登记的行数）
     """
-    logs = AuditLog.get_all(limit=limit, offset=offset)
+    logs = AuditLog.query(user_id=user_id, action=action, start=start, end=end, limit=limit, offset=offset)
+    total = AuditLog.count(user_id=user_id, action=action, start=start, end=end, exact=exact)
     
     return {
         "status": "success",
         "logs": logs,
-        "total": len(logs),
+        "total": total,
         "limit": limit,
         "offset": offset
     }
 
 
+# 操作日志导出列
+AUDIT_LOG_EXPORT_COLUMNS = [
+    "id", "user_id", "username", "action", "resource", "details", "ip_address", "created_at"
+]
+
+
+@router.get("/logs/export")
+async def export_logs(
+    admin_user: User = Depends(get_current_admin_user),
+    format: str = "csv",
+    gzip: bool = False,
+    user_id: Optional[int] = None,
+    action: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None
+):
+    """
+    流式导出操作日志（管理员）
+    
+    - **format**: csv 或 ndjson
+    - **gzip**: 是否下载 gzip 压缩文件
+    - **user_id** / **action** / **start** / **end**: 筛选条件，同 /logs/all
+    """
+    fmt = check_format(format)
+    chunks = AuditLog.iter_logs(user_id=user_id, action=action, start=start, end=end)
+    return export_response(chunks, AUDIT_LOG_EXPORT_COLUMNS, fmt, "audit_logs", compress=gzip)
+
+
 @router.delete("/logs", response_model=dict)
 async def delete_logs(
     request: Request,
@@ -832,3 +986,38 @@ async def clear_all_logs(
         "deleted_count": deleted_count
     }
 
+
+@router.delete("/logs/retention", response_model=dict)
+async def apply_logs_retention(
+    request: Request,
+    keep_months: int,
+    admin_user: User = Depends(get_current_admin_user)
+):
+    """
+    按保留期清理操作日志（管理员）
+    
+    - **keep_months**: 保留最近几个月（含当月），更早的月度分区整表删除
+    """
+    if keep_months < 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="至少保留 1 个月的日志"
+        )
+    
+    deleted_count = AuditLog.apply_retention(keep_months)
+    
+    ip_address = get_client_ip(request)
+    AuditLog.create(
+        user_id=admin_user.id,
+        action="LOGS_RETENTION",
+        resource="audit_logs",
+        details=f"保留最近 {keep_months} 个月日志，删除了 {deleted_count} 条",
+        ip_address=ip_address
+    )
+    
+    return {
+        "status": "success",
+        "message": f"成功删除 {deleted_count} 条过期日志",
+        "deleted_count": deleted_count
+    }
+
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API 服务冷启动基准测试
+
+在子进程中测量以下指标，超出预算时返回非零退出码，可以放在提交前检查或 CI 中阻止启动变慢：
+1. 导入耗时 - python -X importtime 导入 api_main 的累计耗时，并列出自身耗时最多的模块
+2. 首个请求 - 从进程启动到 GET / 第一次返回 200 的时间（包括导入、数据库初始化和服务启动），
+   同时检查此时是否已经导入了路由模块
+3. 按需注册 - 第一次访问某个路由模块下的接口时，加载并注册该模块的额外延迟
+
+    python scripts/bench_api_cold_start.py
+    python scripts/bench_api_cold_start.py --import-budget-ms 500 --first-request-budget-ms 1500
+    python scripts/bench_api_cold_start.py --db /tmp/bench.db    # 指定数据库文件（默认使用临时复制的 gmtools.db）
+"""
+
+import time
+
+PROCESS_START = time.perf_counter()
+
+import argparse  # noqa: E402
+import json  # noqa: E402
+import os  # noqa: E402
+import shutil  # noqa: E402
+import socket  # noqa: E402
+import subprocess  # noqa: E402
+import sys  # noqa: E402
+import tempfile  # noqa: E402
+import threading  # noqa: E402
+import urllib.error  # noqa: E402
+import urllib.request  # noqa: E402
+from pathlib import Path  # noqa: E402
+from typing import Dict, Any, List, Tuple  # noqa: E402
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+IMPORT_TARGET = "api_main"
+# 第一次访问时触发按需注册的接口（未登录返回 401，同样需要先注册路由）
+LAZY_PROBE_PATH = "/api/users/me"
+
+
+# ==================== 导入耗时 ====================
+
+def measure_imports(top: int) -> Tuple[float, List[Tuple[str, float]]]:
+    """
+    返回 (api_main 的累计导入耗时 ms, 自身耗时最多的模块列表)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {IMPORT_TARGET}"],
+        cwd=str(project_root),
+        capture_output=True,
+        text=True,
+        env=os.environ.copy()
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入失败:\n{result.stderr[-2000:]}")
+
+    total_us = 0
+    self_times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            self_us, cumulative_us = int(self_us), int(cumulative_us)
+        except ValueError:
+            continue  # 表头
+        depth = len(name) - len(name.lstrip())
+        if name.strip() == IMPORT_TARGET and depth == 1:
+            total_us += cumulative_us
+        self_times.append((name.strip(), self_us / 1000))
+
+    self_times.sort(key=lambda item: item[1], reverse=True)
+    return total_us / 1000, self_times[:top]
+
+
+# ==================== 首个请求 ====================
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _get_status(url: str) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def first_request_child(db_path: str):
+    """子进程：启动 API 服务并记录第一个请求成功的时间，结果以 JSON 输出到 stdout"""
+    from database.connection import db
+    db.db_path = db_path
+
+    import api_main
+    imported = time.perf_counter()
+    routes_at_import = sorted(name for name in sys.modules if name.startswith("routes.") and name != "routes.lazy_routes")
+
+    import uvicorn
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(api_main.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.perf_counter() + 30
+    while True:
+        try:
+            if _get_status(base_url + "/") == 200:
+                break
+        except OSError:
+            pass
+        if time.perf_counter() > deadline:
+            raise RuntimeError("API 服务 30 秒内未响应")
+        time.sleep(0.005)
+    first_request = time.perf_counter()
+
+    # 第一次访问路由模块时的按需注册延迟（后台预加载可能已经完成）
+    probe_loaded = any(
+        router.loaded for router in api_main.lazy_routers.routers if router.matches(LAZY_PROBE_PATH)
+    )
+    started = time.perf_counter()
+    probe_status = _get_status(base_url + LAZY_PROBE_PATH)
+    probe_ms = round((time.perf_counter() - started) * 1000, 1)
+    started = time.perf_counter()
+    _get_status(base_url + LAZY_PROBE_PATH)
+    warm_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    print(json.dumps({
+        "import_ms": round((imported - PROCESS_START) * 1000, 1),
+        "first_request_ms": round((first_request - PROCESS_START) * 1000, 1),
+        "routes_at_import": routes_at_import,
+        "probe_status": probe_status,
+        "probe_preloaded": probe_loaded,
+        "probe_ms": probe_ms,
+        "warm_ms": warm_ms,
+    }))
+    sys.stdout.flush()
+    # 不等待服务关闭（关闭时会断开游戏连接、写入日志缓冲区）
+    os._exit(0)
+
+
+def measure_first_request(db_path: str) -> Dict[str, Any]:
+    command = [sys.executable, str(Path(__file__).resolve()), "--child-first-request", "--db", db_path]
+    result = subprocess.run(command, cwd=str(project_root), capture_output=True, text=True)
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith("{"):
+            return json.loads(line)
+    raise RuntimeError(f"首个请求测量失败:\n{result.stderr[-2000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API 服务冷启动时间基准测试")
+    parser.add_argument("--import-budget-ms", type=float, default=500, help="导入耗时预算")
+    parser.add_argument("--first-request-budget-ms", type=float, default=1500, help="首个请求时间预算")
+    parser.add_argument("--db", type=str, default=None, help="数据库文件（默认复制 gmtools.db 到临时目录）")
+    parser.add_argument("--top", type=int, default=10, help="列出自身耗时最多的模块数量")
+    parser.add_argument("--child-first-request", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_first_request:
+        first_request_child(args.db)
+        return 0
+
+    failures = []
+
+    import_ms, slowest = measure_imports(args.top)
+    print(f"导入耗时 ({IMPORT_TARGET}): {import_ms:.1f}ms (预算 {args.import_budget_ms:.0f}ms)")
+    for name, self_ms in slowest:
+        print(f"  {self_ms:8.1f}ms  {name}")
+    if import_ms > args.import_budget_ms:
+        failures.append(f"导入耗时 {import_ms:.1f}ms 超出预算")
+
+    temp_dir = None
+    db_path = args.db
+    if db_path is None:
+        # 不修改仓库中的数据库文件
+        temp_dir = tempfile.mkdtemp(prefix="gmtools_bench_")
+        db_path = os.path.join(temp_dir, "gmtools.db")
+        source = project_root / "gmtools.db"
+        if source.exists():
+            shutil.copyfile(source, db_path)
+    try:
+        # 第一次启动可能需要执行迁移，测量第二次启动（表结构已是最新）
+        measure_first_request(db_path)
+        result = measure_first_request(db_path)
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    print(
+        f"首个请求: {result['first_request_ms']}ms (预算 {args.first_request_budget_ms:.0f}ms), "
+        f"其中导入 {result['import_ms']}ms"
+    )
+    print(f"导入时已加载的路由模块: {', '.join(result['routes_at_import']) or '无'}")
+    print(
+        f"按需注册 {LAZY_PROBE_PATH}: 首次 {result['probe_ms']}ms (状态码 {result['probe_status']}, "
+        f"{'已由后台预加载' if result['probe_preloaded'] else '请求时加载'}), 再次 {result['warm_ms']}ms"
+    )
+    if result["first_request_ms"] > args.first_request_budget_ms:
+        failures.append(f"首个请求 {result['first_request_ms']}ms 超出预算")
+    if result["routes_at_import"]:
+        failures.append("导入 api_main 时加载了路由模块")
+
+    if failures:
+        print("未通过: " + "; ".join(failures))
+        return 1
+    print("通过")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+操作日志批量写入基准测试
+
+在临时数据库上用多个线程并发调用 AuditLog.create()（模拟登录高峰时各请求记录日志），对比：
+1. 同步写入 - 未启动 AuditLogWriter，每条日志一个事务
+2. 批量写入 - 启动 AuditLogWriter，请求路径只入队，后台按 batch_size / flush_interval 批量提交
+输出调用延迟分布 (p50/p95/p99)、全部写入完成的耗时和每秒写入条数，
+并检查写入数据库的条数与调用次数一致（drop 策略下扣除丢弃数量）。任一检查失败时返回非零退出码。
+
+    python scripts/bench_audit_log_writer.py
+    python scripts/bench_audit_log_writer.py --logs 50000 --threads 16 --batch-size 500 --flush-interval 0.1
+    python scripts/bench_audit_log_writer.py --max-buffer 1000 --overflow drop   # 缓冲区溢出策略
+    python scripts/bench_audit_log_writer.py --db /tmp/bench.db    # 指定数据库文件（默认使用临时复制的 gmtools.db）
+"""
+
+import argparse
+import asyncio
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Tuple
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """毫秒为单位的延迟分位数"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000, 3)
+
+    return {"count": len(ordered), "p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": pick(1.0)}
+
+
+def produce(action: str, count: int, threads: int) -> List[float]:
+    """多个线程并发记录 count 条日志，返回每次调用的耗时"""
+    from database.models import AuditLog
+
+    def worker(indexes: range) -> List[float]:
+        latencies = []
+        for index in indexes:
+            started = time.perf_counter()
+            AuditLog.create(
+                user_id=None, action=action, resource="bench",
+                details=f"基准测试日志 {index}", ip_address="127.0.0.1"
+            )
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = pool.map(worker, [range(index, count, threads) for index in range(threads)])
+        return [latency for latencies in results for latency in latencies]
+
+
+def count_written(action: str) -> int:
+    from database.models import AuditLog
+    return AuditLog.count(action=action, exact=True)
+
+
+def run_sync(args) -> Tuple[str, List[str]]:
+    """同步写入：每条日志一个事务"""
+    action = f"BENCH_SYNC_{uuid.uuid4().hex[:8]}"
+    started = time.perf_counter()
+    latencies = produce(action, args.sync_logs, args.threads)
+    elapsed = time.perf_counter() - started
+
+    errors = []
+    written = count_written(action)
+    if written != args.sync_logs:
+        errors.append(f"同步写入条数不一致: 写入 {written}，调用 {args.sync_logs}")
+    print(f"同步写入: {args.sync_logs} 条，{args.threads} 线程，耗时 {elapsed:.2f}s，"
+          f"{args.sync_logs / elapsed:.0f} 条/秒，调用延迟(ms) {percentiles(latencies)}")
+    return action, errors
+
+
+async def run_batched(args) -> Tuple[str, List[str]]:
+    """批量写入：请求路径只入队，后台任务批量提交"""
+    from services.audit_log_writer import AuditLogWriter, OVERFLOW_DROP
+
+    action = f"BENCH_BATCH_{uuid.uuid4().hex[:8]}"
+    writer = AuditLogWriter(
+        flush_interval=args.flush_interval, batch_size=args.batch_size,
+        max_buffer=args.max_buffer, overflow=args.overflow
+    )
+    writer.start()
+    started = time.perf_counter()
+    latencies = await asyncio.to_thread(produce, action, args.logs, args.threads)
+    enqueued = time.perf_counter() - started
+    # stop() 会写入缓冲区中剩余的日志
+    await writer.stop()
+    elapsed = time.perf_counter() - started
+
+    stats = writer.get_stats()
+    errors = []
+    written = await asyncio.to_thread(count_written, action)
+    expected = args.logs - stats["dropped"]
+    if written != expected:
+        errors.append(f"批量写入条数不一致: 写入 {written}，应为 {expected}（调用 {args.logs}，丢弃 {stats['dropped']}）")
+    if stats["dropped"] and args.overflow != OVERFLOW_DROP:
+        errors.append(f"sync 策略下丢弃了 {stats['dropped']} 条日志")
+
+    print(f"批量写入: {args.logs} 条，{args.threads} 线程，批量 {args.batch_size}，间隔 {args.flush_interval}s，"
+          f"缓冲区 {args.max_buffer} ({args.overflow})")
+    print(f"  入队耗时 {enqueued:.2f}s，全部写入耗时 {elapsed:.2f}s，{args.logs / elapsed:.0f} 条/秒，"
+          f"调用延迟(ms) {percentiles(latencies)}")
+    print(f"  写入统计 {stats}")
+    return action, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="操作日志批量写入基准测试")
+    parser.add_argument("--logs", type=int, default=20000, help="批量写入模式的日志条数")
+    parser.add_argument("--sync-logs", type=int, default=2000, help="同步写入模式的日志条数（0 表示跳过）")
+    parser.add_argument("--threads", type=int, default=8, help="并发记录日志的线程数")
+    parser.add_argument("--batch-size", type=int, default=200, help="攒够多少条立即提交")
+    parser.add_argument("--flush-interval", type=float, default=0.2, help="定时提交间隔（秒）")
+    parser.add_argument("--max-buffer", type=int, default=10000, help="缓冲区上限")
+    parser.add_argument("--overflow", choices=["sync", "drop"], default="sync", help="缓冲区满时的策略")
+    parser.add_argument("--db", help="数据库文件（默认使用临时复制的 gmtools.db）")
+    args = parser.parse_args()
+
+    temp_dir = None
+    db_path = args.db
+    if not db_path:
+        temp_dir = tempfile.mkdtemp(prefix="bench_audit_log_")
+        db_path = str(Path(temp_dir) / "gmtools.db")
+        shutil.copyfile(project_root / "gmtools.db", db_path)
+
+    from database.connection import db
+    db.db_path = db_path
+    db.init_database()
+
+    errors: List[str] = []
+    try:
+        if args.sync_logs > 0:
+            errors += run_sync(args)[1]
+        errors += asyncio.run(run_batched(args))[1]
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    for error in errors:
+        print(f"失败: {error}")
+    print("全部检查通过" if not errors else f"{len(errors)} 项检查失败")
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+桌面端启动基准测试
+
+在子进程中测量两项指标，超出预算时返回非零退出码，可以放在提交前检查或 CI 中阻止启动变慢：
+1. 导入耗时 - python -X importtime 导入 main 和主窗口模块的累计耗时，并列出自身耗时最多的模块
+2. 首帧时间 - 从进程启动到主窗口第一次绘制的时间，同时检查此时是否已经导入了 API 服务 (api_main)
+
+    python scripts/bench_desktop_startup.py
+    python scripts/bench_desktop_startup.py --import-budget-ms 200 --paint-budget-ms 500
+    python scripts/bench_desktop_startup.py --eager     # 对比：启动时创建全部页面和 API 服务（旧实现）
+（无显示环境时设置 QT_QPA_PLATFORM=offscreen）
+"""
+
+import time
+
+PROCESS_START = time.perf_counter()
+
+import argparse  # noqa: E402
+import json  # noqa: E402
+import os  # noqa: E402
+import subprocess  # noqa: E402
+import sys  # noqa: E402
+from pathlib import Path  # noqa: E402
+from typing import Dict, Any, List, Tuple  # noqa: E402
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+IMPORT_TARGETS = ["main", "ui.discord_main_window"]
+
+
+# ==================== 导入耗时 ====================
+
+def measure_imports(top: int) -> Tuple[float, List[Tuple[str, float]]]:
+    """
+    返回 (目标模块的累计导入耗时 ms, 自身耗时最多的模块列表)
+    """
+    code = "; ".join(f"import {name}" for name in IMPORT_TARGETS)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=str(project_root),
+        capture_output=True,
+        text=True,
+        env=os.environ.copy()
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入失败:\n{result.stderr[-2000:]}")
+
+    total_us = 0
+    self_times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            self_us, cumulative_us = int(self_us), int(cumulative_us)
+        except ValueError:
+            continue  # 表头
+        # 顶层导入（缩进最少）的累计耗时之和
+        depth = len(name) - len(name.lstrip())
+        if name.strip() in IMPORT_TARGETS and depth == 1:
+            total_us += cumulative_us
+        self_times.append((name.strip(), self_us / 1000))
+
+    self_times.sort(key=lambda item: item[1], reverse=True)
+    return total_us / 1000, self_times[:top]
+
+
+# ==================== 首帧时间 ====================
+
+def first_paint_child(eager: bool):
+    """子进程：创建主窗口并记录第一次绘制的时间，结果以 JSON 输出到 stdout"""
+    from PyQt6.QtCore import QObject, QEvent, QTimer
+    from PyQt6.QtWidgets import QApplication
+
+    imported = time.perf_counter()
+    from ui.discord_main_window import DiscordMainWindow
+
+    app = QApplication(sys.argv)
+    window = DiscordMainWindow(None)
+    if eager:
+        # 旧实现：启动时创建全部页面和 API 服务
+        for index in range(len(window._module_pages) - 1):
+            window._ensure_module(index)
+        window._ensure_api_manager()
+    constructed = time.perf_counter()
+
+    qt_import_ms = round((imported - PROCESS_START) * 1000, 1)
+    window_ms = round((constructed - imported) * 1000, 1)
+
+    class PaintWatcher(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Type.Paint:
+                # 直接输出并退出：关闭主窗口会触发 closeEvent 中的 os._exit
+                print(json.dumps({
+                    "first_paint_ms": round((time.perf_counter() - PROCESS_START) * 1000, 1),
+                    "api_loaded": "api_main" in sys.modules,
+                    "qt_import_ms": qt_import_ms,
+                    "window_ms": window_ms,
+                }))
+                sys.stdout.flush()
+                os._exit(0)
+            return False
+
+    watcher = PaintWatcher()
+    window.installEventFilter(watcher)
+    window.centralWidget().installEventFilter(watcher)
+    window.show()
+    QTimer.singleShot(10000, lambda: os._exit(1))
+    app.exec()
+
+
+def measure_first_paint(eager: bool) -> Dict[str, Any]:
+    command = [sys.executable, str(Path(__file__).resolve()), "--child-first-paint"]
+    if eager:
+        command.append("--eager")
+    result = subprocess.run(command, cwd=str(project_root), capture_output=True, text=True)
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith("{"):
+            return json.loads(line)
+    raise RuntimeError(f"首帧测量失败:\n{result.stderr[-2000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="桌面端启动时间基准测试")
+    parser.add_argument("--import-budget-ms", type=float, default=200, help="导入耗时预算")
+    parser.add_argument("--paint-budget-ms", type=float, default=500, help="首帧时间预算")
+    parser.add_argument("--top", type=int, default=10, help="列出自身耗时最多的模块数量")
+    parser.add_argument("--eager", action="store_true", help="启动时创建全部页面和 API 服务（对比旧实现）")
+    parser.add_argument("--child-first-paint", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_first_paint:
+        first_paint_child(args.eager)
+        return 0
+
+    failures = []
+
+    import_ms, slowest = measure_imports(args.top)
+    print(f"导入耗时 ({', '.join(IMPORT_TARGETS)}): {import_ms:.1f}ms (预算 {args.import_budget_ms:.0f}ms)")
+    for name, self_ms in slowest:
+        print(f"  {self_ms:8.1f}ms  {name}")
+    if import_ms > args.import_budget_ms:
+        failures.append(f"导入耗时 {import_ms:.1f}ms 超出预算")
+
+    paint = measure_first_paint(args.eager)
+    print(
+        f"首帧时间: {paint['first_paint_ms']}ms (预算 {args.paint_budget_ms:.0f}ms), "
+        f"Qt 导入 {paint['qt_import_ms']}ms, 创建主窗口 {paint['window_ms']}ms, "
+        f"首帧时已加载 API 服务: {paint['api_loaded']}"
+    )
+    if paint["first_paint_ms"] > args.paint_budget_ms:
+        failures.append(f"首帧时间 {paint['first_paint_ms']}ms 超出预算")
+    if paint["api_loaded"] and not args.eager:
+        failures.append("首帧之前导入了 API 服务 (api_main)")
+
+    if failures:
+        print("未通过: " + "; ".join(failures))
+        return 1
+    print("通过")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+抽奖并发压力测试
+
+在临时数据库上用多个进程、每个进程多个线程同时调用 ActivityManager.participate()，
+模拟多个 API 工作进程同时抽奖，检查：
+1. 不超发 - 每个奖项的中奖数不超过总数量，剩余数量 = 总数量 - 中奖数，且不为负
+2. 参与次数限制 - 同一游戏ID并发抽奖时参与次数不超过 max_participations
+3. 统计计数 - activity_stats / activity_reward_stats 与参与记录一致
+4. 跨进程奖项修改 - 其他进程修改奖项后，本进程缓存的抽奖概率表随奖项版本号失效
+并输出每秒抽奖次数。任一检查失败时返回非零退出码。
+
+    python scripts/bench_draw_concurrency.py
+    python scripts/bench_draw_concurrency.py --processes 4 --threads 8 --spins 8000 --stock 300
+    python scripts/bench_draw_concurrency.py --db /tmp/bench.db    # 指定数据库文件（默认使用临时复制的 gmtools.db）
+"""
+
+import argparse
+import multiprocessing
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, List
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+
+def _manager(db_path: str):
+    from database.connection import db
+    db.db_path = db_path
+    from database.activity_models import ActivityManager
+    return ActivityManager()
+
+
+def _spin_worker(db_path: str, activity_id: int, game_ids: List[str], threads: int) -> Dict[str, Any]:
+    """子进程：用线程池对给定的游戏ID逐个抽奖"""
+    manager = _manager(db_path)
+    outcome = {"success": 0, "won": 0, "rejected": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def spin(game_id: str):
+        result = manager.participate(activity_id, game_id)
+        if result["success"]:
+            key = "won" if result["reward"] else None
+        elif result["message"].startswith("参与失败"):
+            # 数据库异常（例如等待锁超时）
+            key = "errors"
+        else:
+            key = "rejected"
+        with lock:
+            if result["success"]:
+                outcome["success"] += 1
+            if key:
+                outcome[key] += 1
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(spin, game_ids))
+    return outcome
+
+
+def _edit_rewards_worker(db_path: str, activity_id: int, winner_name: str):
+    """子进程：只保留 winner_name 奖项的中奖率"""
+    manager = _manager(db_path)
+    for reward in manager.get_rewards(activity_id):
+        reward.probability = 100.0 if reward.name == winner_name else 0.0
+        manager.update_reward(reward.id, reward)
+
+
+def run_spins(pool, db_path: str, activity_id: int, game_ids: List[str], processes: int, threads: int):
+    chunks = [game_ids[index::processes] for index in range(processes)]
+    started = time.perf_counter()
+    results = pool.starmap(_spin_worker, [(db_path, activity_id, chunk, threads) for chunk in chunks])
+    elapsed = time.perf_counter() - started
+    total = {key: sum(result[key] for result in results) for key in results[0]}
+    return total, elapsed
+
+
+def check_stock(manager, activity_id: int) -> List[str]:
+    """检查库存和统计计数与参与记录一致，返回错误列表"""
+    from database.connection import db
+
+    errors = []
+    conn = db.get_connection()
+    try:
+        cursor = conn.cursor()
+        for reward in manager.get_rewards(activity_id):
+            cursor.execute(
+                'SELECT COUNT(*) FROM activity_participations WHERE activity_id=? AND reward_id=?',
+                (activity_id, reward.id)
+            )
+            won = cursor.fetchone()[0]
+            if won > reward.total_quantity:
+                errors.append(f"奖项 {reward.name} 超发: 中奖 {won} > 总数量 {reward.total_quantity}")
+            if reward.remaining_quantity < 0 or reward.remaining_quantity != reward.total_quantity - won:
+                errors.append(
+                    f"奖项 {reward.name} 库存不一致: 剩余 {reward.remaining_quantity}，"
+                    f"总数量 {reward.total_quantity}，中奖 {won}"
+                )
+            print(f"  {reward.name}: 总数量 {reward.total_quantity}，中奖 {won}，剩余 {reward.remaining_quantity}")
+
+        cursor.execute('''
+        SELECT COUNT(*), COUNT(DISTINCT game_id), SUM(CASE WHEN reward_id IS NOT NULL THEN 1 ELSE 0 END)
+        FROM activity_participations WHERE activity_id=?
+        ''', (activity_id,))
+        expected = tuple(value or 0 for value in cursor.fetchone())
+    finally:
+        conn.close()
+
+    stats = manager.get_statistics(activity_id)
+    actual = (stats["total_participations"], stats["unique_users"], stats["winning_count"])
+    if actual != expected:
+        errors.append(f"统计计数不一致: 计数表 {actual}，参与记录 {expected}")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="抽奖并发压力测试")
+    parser.add_argument("--processes", type=int, default=4, help="抽奖进程数（模拟 API 工作进程）")
+    parser.add_argument("--threads", type=int, default=8, help="每个进程的并发线程数")
+    parser.add_argument("--spins", type=int, default=4000, help="抽奖总次数")
+    parser.add_argument("--rewards", type=int, default=3, help="奖项数量")
+    parser.add_argument("--stock", type=int, default=200, help="每个奖项的数量（应小于预期中奖数，以验证不超发）")
+    parser.add_argument("--limit", type=int, default=3, help="参与次数限制检查使用的 max_participations")
+    parser.add_argument("--db", help="数据库文件（默认使用临时复制的 gmtools.db）")
+    args = parser.parse_args()
+
+    temp_dir = None
+    db_path = args.db
+    if not db_path:
+        temp_dir = tempfile.mkdtemp(prefix="bench_draw_")
+        db_path = str(Path(temp_dir) / "gmtools.db")
+        shutil.copyfile(project_root / "gmtools.db", db_path)
+
+    from database.activity_models import Activity, ActivityReward
+
+    errors: List[str] = []
+    context = multiprocessing.get_context("spawn")
+    try:
+        manager = _manager(db_path)
+        with context.Pool(args.processes) as pool:
+            # 1. 库存争抢：总中奖率 90%，中奖次数远超库存
+            activity_id = manager.create_activity(Activity(
+                name="并发压力测试", type="roulette",
+                start_time="2000-01-01 00:00:00", end_time="2999-01-01 00:00:00"
+            ))
+            for index in range(args.rewards):
+                manager.add_reward(ActivityReward(
+                    activity_id=activity_id, name=f"奖项{index + 1}", probability=90.0 / args.rewards,
+                    total_quantity=args.stock, remaining_quantity=args.stock, order_index=index
+                ))
+            game_ids = [str(10000000 + index) for index in range(args.spins)]
+            total, elapsed = run_spins(pool, db_path, activity_id, game_ids, args.processes, args.threads)
+            print(f"库存争抢: {args.processes} 进程 x {args.threads} 线程，{args.spins} 次抽奖，"
+                  f"耗时 {elapsed:.2f}s，{args.spins / elapsed:.0f} 次/秒，结果 {total}")
+            errors += check_stock(manager, activity_id)
+            if total["errors"]:
+                errors.append(f"{total['errors']} 次抽奖因数据库异常失败")
+
+            # 2. 参与次数限制：同一游戏ID并发抽奖
+            limited_id = manager.create_activity(Activity(
+                name="参与次数限制测试", type="roulette", max_participations=args.limit,
+                start_time="2000-01-01 00:00:00", end_time="2999-01-01 00:00:00"
+            ))
+            same_ids = ["20000000"] * (args.processes * args.threads * 4)
+            total, _ = run_spins(pool, db_path, limited_id, same_ids, args.processes, args.threads)
+            print(f"参与次数限制: 同一游戏ID并发 {len(same_ids)} 次，限制 {args.limit}，结果 {total}")
+            if total["success"] != args.limit:
+                errors.append(f"参与次数限制失效: 成功 {total['success']} 次，限制 {args.limit}")
+
+            # 3. 跨进程修改奖项：本进程先缓存概率表，其他进程修改中奖率后再抽奖
+            edited_id = manager.create_activity(Activity(
+                name="奖项修改测试", type="roulette",
+                start_time="2000-01-01 00:00:00", end_time="2999-01-01 00:00:00"
+            ))
+            for name, probability in (("旧奖项", 100.0), ("新奖项", 0.0)):
+                manager.add_reward(ActivityReward(
+                    activity_id=edited_id, name=name, probability=probability,
+                    total_quantity=1000, remaining_quantity=1000
+                ))
+            manager.participate(edited_id, "30000000")
+            pool.apply(_edit_rewards_worker, (db_path, edited_id, "新奖项"))
+            names = {manager.participate(edited_id, str(30000001 + index))["reward"]["name"] for index in range(20)}
+            print(f"跨进程修改奖项: 修改后抽中的奖项 {sorted(names)}")
+            if names != {"新奖项"}:
+                errors.append(f"其他进程修改奖项后仍使用旧的概率表: {sorted(names)}")
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    for error in errors:
+        print(f"失败: {error}")
+    print("全部检查通过" if not errors else f"{len(errors)} 项检查失败")
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
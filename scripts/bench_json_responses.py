@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSON 响应序列化和压缩基准测试
+
+对几类较大的响应（角色数据、活动参与记录、可发送道具列表、权限列表）测量：
+1. 序列化耗时 - 标准库 json（FastAPI 默认 JSONResponse）与 utils.fast_json.dumps（安装 orjson 时使用 orjson）
+   以及预序列化缓存命中（PreparedJSONCache）
+2. 响应字节数 - 未压缩、中间件压缩（gzip / br）、预序列化响应的最高级别压缩
+
+    python scripts/bench_json_responses.py
+    python scripts/bench_json_responses.py --scale 5 --repeat 200
+"""
+
+import argparse
+import gzip
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config.settings import RESPONSE_GZIP_LEVEL, RESPONSE_BROTLI_QUALITY  # noqa: E402
+from utils import compression  # noqa: E402
+from utils.fast_json import dumps, orjson, PreparedJSONCache  # noqa: E402
+
+
+# ==================== 测试数据 ====================
+
+def character_payload(scale: int) -> Dict[str, Any]:
+    """/api/character 返回的完整角色数据"""
+    skills = ["必杀", "连击", "吸血", "夜战", "偷袭", "反击", "敏捷", "防御"]
+    return {
+        "status": "success",
+        "data": {
+            "名称": "测试角色", "等级": 175, "门派": "大唐官府",
+            "修炼": {name: [random.randint(0, 25), 25] for name in ["攻击", "防御", "法术", "抗法", "猎术"]},
+            "bb修炼": {name: [random.randint(0, 25), 25] for name in ["攻击", "防御", "法术", "抗法"]},
+            "道具": [
+                {"序号": i, "名称": f"道具{i}", "数量": random.randint(1, 99), "描述": "#Y/可以在商会出售#R/" * 3}
+                for i in range(100 * scale)
+            ],
+            "宝宝": [
+                {
+                    "名称": f"宝宝{i}", "等级": random.randint(0, 180), "模型": "超级神虎",
+                    "气血": random.randint(1000, 9000), "成长": round(random.uniform(1.1, 1.3), 3),
+                    "技能": random.sample(skills, 4)
+                }
+                for i in range(20 * scale)
+            ],
+        }
+    }
+
+
+def participations_payload(scale: int) -> Dict[str, Any]:
+    """get_participations 返回的参与记录"""
+    return {
+        "status": "success",
+        "data": [
+            {
+                "id": i, "activity_id": 1, "game_id": f"{random.randint(10000000, 99999999)}",
+                "reward_id": random.randint(1, 8), "reward_name": f"奖励{random.randint(1, 8)}",
+                "status": 1, "ip_address": f"10.0.{i % 256}.{i % 200}",
+                "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+                "created_at": "2024-06-01 12:00:00"
+            }
+            for i in range(500 * scale)
+        ],
+        "total": 500 * scale
+    }
+
+
+def available_items_payload(scale: int) -> Dict[str, Any]:
+    """/items/available 返回的可发送道具列表"""
+    return {
+        "status": "success",
+        "data": [
+            {
+                "item_name": f"item_{i}", "display_name": f"道具{i}",
+                "description": "使用后获得一定数量的经验和银两，每日限用次数按等级配置",
+                "icon_url": f"/static/icons/item_{i}.png"
+            }
+            for i in range(150 * scale)
+        ]
+    }
+
+
+def permissions_payload(scale: int) -> Dict[str, Any]:
+    """/api/permissions 返回的权限列表（按分类分组）"""
+    categories = ["账号", "宝宝", "装备", "礼包", "角色", "游戏", "活动", "道具"]
+    return {
+        "status": "success",
+        "permissions": {
+            category: [
+                {"id": n * 100 + i, "code": f"{category}.action_{i}", "name": f"{category}操作{i}",
+                 "description": f"允许执行{category}模块的第 {i} 项操作"}
+                for i in range(10 * scale)
+            ]
+            for n, category in enumerate(categories)
+        }
+    }
+
+
+PAYLOADS: Dict[str, Callable[[int], Dict[str, Any]]] = {
+    "character": character_payload,
+    "participations": participations_payload,
+    "items/available": available_items_payload,
+    "permissions": permissions_payload,
+}
+
+
+# ==================== 测量 ====================
+
+def stdlib_dumps(content: Any) -> bytes:
+    """FastAPI 默认 JSONResponse 的序列化方式"""
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def time_per_call_ms(func: Callable[[], Any], repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) * 1000 / repeat
+
+
+def measure(name: str, content: Dict[str, Any], repeat: int) -> Dict[str, Any]:
+    body = dumps(content)
+    cache = PreparedJSONCache()
+    cache.get(name, lambda: content)
+
+    result = {
+        "json_ms": time_per_call_ms(lambda: stdlib_dumps(content), repeat),
+        "fast_ms": time_per_call_ms(lambda: dumps(content), repeat),
+        "prepared_ms": time_per_call_ms(lambda: cache.get(name, lambda: content).body, repeat),
+        "raw": len(body),
+        "gzip": len(gzip.compress(body, compresslevel=RESPONSE_GZIP_LEVEL)),
+        "gzip_ms": time_per_call_ms(lambda: gzip.compress(body, compresslevel=RESPONSE_GZIP_LEVEL), max(1, repeat // 10)),
+        "prepared_gzip": len(cache.get(name, lambda: content).encoded("gzip")),
+    }
+    if compression.brotli is not None:
+        result["br"] = len(compression.compress(body, "br", brotli_quality=RESPONSE_BROTLI_QUALITY))
+        result["br_ms"] = time_per_call_ms(
+            lambda: compression.compress(body, "br", brotli_quality=RESPONSE_BROTLI_QUALITY), max(1, repeat // 10)
+        )
+        result["prepared_br"] = len(cache.get(name, lambda: content).encoded("br"))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON 响应序列化和压缩基准测试")
+    parser.add_argument("--scale", type=int, default=1, help="数据规模倍数")
+    parser.add_argument("--repeat", type=int, default=100, help="每项测量的重复次数")
+    args = parser.parse_args()
+
+    random.seed(0)
+    print(f"序列化: {'orjson ' + orjson.__version__ if orjson is not None else '标准库 json（未安装 orjson）'}, "
+          f"压缩: {', '.join(compression.supported_encodings())}")
+    print(f"{'响应':<16}{'json':>10}{'fast':>10}{'预序列化':>10}   "
+          f"{'原始字节':>10}{'gzip':>16}{'br':>16}{'预压缩 gzip/br':>18}")
+    for name, build in PAYLOADS.items():
+        r = measure(name, build(args.scale), args.repeat)
+        gz = f"{r['gzip']} ({r['gzip_ms']:.2f}ms)"
+        br = f"{r['br']} ({r['br_ms']:.2f}ms)" if "br" in r else "-"
+        prepared = f"{r['prepared_gzip']}/{r.get('prepared_br', '-')}"
+        print(
+            f"{name:<16}{r['json_ms']:>8.3f}ms{r['fast_ms']:>8.3f}ms{r['prepared_ms']:>8.4f}ms   "
+            f"{r['raw']:>10}{gz:>16}{br:>16}{prepared:>18}"
+        )
+
+
+if __name__ == "__main__":
+    main()
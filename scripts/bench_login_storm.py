@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+登录风暴基准测试
+
+测量大量并发登录（bcrypt 校验）期间，其他请求的延迟分布 (p50/p95/p99)。
+
+两种模式：
+1. http - 对运行中的 API 服务发起登录风暴，同时定时请求一个无关接口（默认 GET /）
+       python scripts/bench_login_storm.py http --username admin --password xxx
+2. loop - 不需要启动服务，在进程内模拟事件循环：
+       对比 bcrypt 直接在事件循环线程执行（旧实现）与提交到密码哈希线程池（新实现）时，
+       事件循环调度延迟（即同一进程内其他接口额外等待的时间）
+       python scripts/bench_login_storm.py loop --logins 40
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Dict
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """毫秒为单位的延迟分位数"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000, 2)
+
+    return {"count": len(ordered), "p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": pick(1.0)}
+
+
+# ==================== http 模式 ====================
+
+def _request(url: str, data: dict = None, timeout: float = 30) -> int:
+    body = json.dumps(data).encode("utf-8") if data is not None else None
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def _probe(url: str, interval: float, stop: threading.Event) -> List[float]:
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        _request(url)
+        latencies.append(time.perf_counter() - started)
+        time.sleep(interval)
+    return latencies
+
+
+def run_http(args):
+    base_url = args.base_url.rstrip("/")
+    probe_url = base_url + args.probe_path
+    login_url = base_url + "/api/users/login"
+    credentials = {"username": args.username, "password": args.password}
+
+    # 基线：无登录压力时的延迟
+    stop = threading.Event()
+    timer = threading.Timer(args.baseline_seconds, stop.set)
+    timer.start()
+    baseline = _probe(probe_url, args.probe_interval, stop)
+
+    # 登录风暴期间的延迟
+    stop = threading.Event()
+    statuses: Dict[int, int] = {}
+    with ThreadPoolExecutor(max_workers=args.concurrency + 1) as pool:
+        probe_future = pool.submit(_probe, probe_url, args.probe_interval, stop)
+        started = time.perf_counter()
+        for status in pool.map(lambda _: _request(login_url, credentials), range(args.logins)):
+            statuses[status] = statuses.get(status, 0) + 1
+        elapsed = time.perf_counter() - started
+        stop.set()
+        storm = probe_future.result()
+
+    print(f"登录请求: {args.logins} 次，并发 {args.concurrency}，耗时 {elapsed:.2f}s，状态码 {statuses}")
+    print(f"{args.probe_path} 基线延迟(ms):     {percentiles(baseline)}")
+    print(f"{args.probe_path} 登录风暴延迟(ms): {percentiles(storm)}")
+
+
+# ==================== loop 模式 ====================
+
+async def _measure_loop_lag(interval: float, stop: asyncio.Event) -> List[float]:
+    """事件循环调度延迟：sleep 实际唤醒时间比预期晚多少"""
+    lags = []
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - expected))
+    return lags
+
+
+async def _storm(logins: int, verify):
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(_measure_loop_lag(0.005, stop))
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    await asyncio.gather(*(verify(index) for index in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    return elapsed, await lag_task
+
+
+def run_loop(args):
+    from auth import AuthUtils
+    from auth.password_hasher import PasswordHasher
+
+    password = "benchmark-password"
+    hashed = AuthUtils.hash_password(password)
+
+    async def inline_verify(index):
+        # 旧实现：在 async 路由中同步调用 bcrypt
+        AuthUtils.verify_password(password, hashed)
+        await asyncio.sleep(0)
+
+    hasher = PasswordHasher(workers=args.workers, max_pending=args.logins, per_ip_limit=0)
+
+    async def pooled_verify(index):
+        await hasher.verify(password, hashed, client_ip=None)
+
+    for name, verify in (("事件循环内同步计算", inline_verify), ("密码哈希线程池", pooled_verify)):
+        elapsed, lags = asyncio.run(_storm(args.logins, verify))
+        print(f"{name}: {args.logins} 次校验耗时 {elapsed:.2f}s，事件循环延迟(ms) {percentiles(lags)}")
+    hasher.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="登录风暴期间其他请求的延迟基准测试")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    http_parser = subparsers.add_parser("http", help="对运行中的 API 服务测试")
+    http_parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    http_parser.add_argument("--username", required=True)
+    http_parser.add_argument("--password", required=True)
+    http_parser.add_argument("--logins", type=int, default=200, help="登录请求总数")
+    http_parser.add_argument("--concurrency", type=int, default=20, help="并发登录数")
+    http_parser.add_argument("--probe-path", default="/", help="测量延迟的无关接口")
+    http_parser.add_argument("--probe-interval", type=float, default=0.02)
+    http_parser.add_argument("--baseline-seconds", type=float, default=3.0)
+
+    loop_parser = subparsers.add_parser("loop", help="进程内测量事件循环延迟")
+    loop_parser.add_argument("--logins", type=int, default=40, help="并发校验次数")
+    loop_parser.add_argument("--workers", type=int, default=4, help="线程池大小")
+
+    args = parser.parse_args()
+    if args.mode == "http":
+        run_http(args)
+    else:
+        run_loop(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+宝宝列表帧时间基准测试
+
+构造一个有大量宝宝的账号（默认 500 只）的序号 11 响应，在界面线程上用 16ms 定时器模拟刷新帧，
+测量收到响应期间相邻两帧的间隔 (p50/p99/max)。
+
+两种模式对比：
+1. inline   - 旧实现：在界面线程中解析、清理数据，逐项 addItem 并打印调试信息
+2. pipeline - 新实现：ResponsePipeline 在工作线程中解析并构造 PetListModel，界面线程只做 setModel
+
+    python scripts/bench_pet_list_frame_time.py --pets 500 --responses 5
+（无显示环境时设置 QT_QPA_PLATFORM=offscreen）
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List, Dict
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from PyQt6.QtCore import QTimer
+from PyQt6.QtWidgets import QApplication, QComboBox
+
+from ui.list_models import PetListModel
+from ui.response_pipeline import ResponsePipeline, parse_lua_dict, normalize_pet_list
+
+FRAME_INTERVAL_MS = 16
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """毫秒为单位的帧间隔分位数"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000, 2)
+
+    return {"count": len(ordered), "p50": pick(0.50), "p99": pick(0.99), "max": pick(1.0)}
+
+
+def build_pet_response(pet_count: int) -> str:
+    """生成与游戏服务器格式相同的宝宝数据（Lua 表，键为 [序号]）"""
+    skills = ["必杀", "连击", "吸血", "夜战", "偷袭", "反击", "敏捷", "防御"]
+    pets = []
+    for i in range(1, pet_count + 1):
+        skill_text = ",".join(f'[{n}]="{skill}"' for n, skill in enumerate(random.sample(skills, 4), 1))
+        pets.append(
+            f'[{i}]={{名称="宝宝{i}",等级={random.randint(0, 180)},模型="超级神虎",'
+            f'气血={random.randint(1000, 9000)},魔法={random.randint(500, 3000)},'
+            f'伤害={random.randint(100, 2000)},成长="1.{random.randint(100, 300)}",'
+            f'技能={{{skill_text}}}}}'
+        )
+    return "{" + ",".join(pets) + "}"
+
+
+class FrameRecorder:
+    """记录界面线程定时器相邻两次触发的间隔"""
+
+    def __init__(self):
+        self.gaps: List[float] = []
+        self._last = None
+        self.timer = QTimer()
+        self.timer.setInterval(FRAME_INTERVAL_MS)
+        self.timer.timeout.connect(self._tick)
+
+    def _tick(self):
+        now = time.perf_counter()
+        if self._last is not None:
+            self.gaps.append(now - self._last)
+        self._last = now
+
+    def start(self):
+        self.gaps = []
+        self._last = None
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+
+def _inline_fill(selector: QComboBox, content: str):
+    """旧实现：全部在界面线程完成"""
+    pet_list = normalize_pet_list(parse_lua_dict(content))
+    selector.clear()
+    for i, pet_info in enumerate(pet_list):
+        info = {key: value.strip("\"'") if isinstance(value, str) else value for key, value in pet_info.items()}
+        display_text = f"{info.get('名称', f'宝宝{i + 1}')} - Lv.{info.get('等级', 0)} ({info.get('模型', '')})"
+        print(f"[DEBUG] 添加选项 {i + 1}: {display_text} (索引: {i + 1})", file=sys.stderr)
+        selector.addItem(display_text, i + 1)
+
+
+def run(app: QApplication, mode: str, content: str, responses: int) -> Dict[str, float]:
+    selector = QComboBox()
+    recorder = FrameRecorder()
+    pipeline = ResponsePipeline()
+    pending = {"count": responses}
+
+    def on_model(model: PetListModel):
+        model.setParent(selector)
+        selector.setModel(model)
+        pending["count"] -= 1
+
+    pipeline.pets_ready.connect(on_model)
+
+    def send_one():
+        if mode == "inline":
+            _inline_fill(selector, content)
+            pending["count"] -= 1
+        else:
+            pipeline.submit({"seq_no": 11, "content": content})
+
+    # 预热若干帧后，每 100ms 收到一次响应
+    recorder.start()
+    for n in range(responses):
+        QTimer.singleShot(200 + n * 100, send_one)
+
+    deadline = time.perf_counter() + 60
+    while (pending["count"] > 0 or len(recorder.gaps) < 20) and time.perf_counter() < deadline:
+        app.processEvents()
+        time.sleep(0.001)
+    # 再观察几帧，确保最后一次替换后的绘制也计入
+    settle = time.perf_counter() + 0.2
+    while time.perf_counter() < settle:
+        app.processEvents()
+        time.sleep(0.001)
+    recorder.stop()
+    pipeline.shutdown()
+
+    stats = percentiles(recorder.gaps)
+    stats["items"] = selector.count()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="大账号宝宝列表刷新期间的界面帧时间基准测试")
+    parser.add_argument("--pets", type=int, default=500, help="宝宝数量")
+    parser.add_argument("--responses", type=int, default=5, help="连续收到的响应数量")
+    parser.add_argument("--mode", choices=["inline", "pipeline", "both"], default="both")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    content = build_pet_response(args.pets)
+    print(f"响应长度: {len(content)} 字符, 宝宝数量: {args.pets}, 响应次数: {args.responses}")
+    print(f"帧间隔目标: {FRAME_INTERVAL_MS}ms（调试输出写到 stderr）")
+
+    modes = ["inline", "pipeline"] if args.mode == "both" else [args.mode]
+    for mode in modes:
+        print(f"{mode:>8}: {run(app, mode, content, args.responses)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+活动奖励异步发放基准测试
+
+使用临时数据库和模拟的游戏服务器（按设定的往返延迟和失败率响应给予道具命令），测量：
+1. 抽奖接口耗时 - participate() 的延迟分布（抽奖、扣减库存、写入发放队列，不等待发放）
+2. 发放吞吐量 - RewardDeliveryWorker 清空发放队列的耗时和每秒发放数量
+3. 发放正确性 - 每个中奖记录恰好发放一次，失败的命令按退避重试后仍能发出
+
+    python scripts/bench_reward_delivery.py
+    python scripts/bench_reward_delivery.py --spins 2000 --latency-ms 20 --failure-rate 0.2 --concurrency 8
+    python scripts/bench_reward_delivery.py --db /tmp/bench.db    # 指定数据库文件（默认使用临时复制的 gmtools.db）
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import List, Dict
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """毫秒为单位的延迟分位数"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000, 2)
+
+    return {"count": len(ordered), "p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": pick(1.0)}
+
+
+class FakeGameServer:
+    """
+    模拟的游戏服务器（替代 GiftService）
+    每条命令等待 latency 秒后返回；按 failure_rate 返回 False，表示命令未发出（发放任务会重试）
+    """
+
+    def __init__(self, latency: float, failure_rate: float):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.delivered: Counter = Counter()
+        self.rejected = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def give_item(self, player_id: str, item_name: str, count: int = 1, item_category: str = "default"):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            if random.random() < self.failure_rate:
+                self.rejected += 1
+                return False
+            self.delivered[player_id] += 1
+            return True
+        finally:
+            self.in_flight -= 1
+
+
+async def run(args, manager) -> int:
+    from database.activity_models import Activity, ActivityReward
+    from services.reward_delivery_service import RewardDeliveryWorker
+
+    activity_id = manager.create_activity(Activity(
+        name="发放基准测试", type="roulette",
+        start_time="2000-01-01 00:00:00", end_time="2999-01-01 00:00:00"
+    ))
+    manager.add_reward(ActivityReward(
+        activity_id=activity_id, name="测试道具",
+        value=json.dumps({"item_name": "测试道具", "quantity": 1}, ensure_ascii=False),
+        probability=100, total_quantity=args.spins, remaining_quantity=args.spins
+    ))
+
+    server = FakeGameServer(args.latency_ms / 1000, args.failure_rate)
+    manager.set_gift_service(server)
+    worker = RewardDeliveryWorker(
+        manager, concurrency=args.concurrency, batch_size=args.batch_size,
+        poll_interval=0.05, max_attempts=args.max_attempts, base_backoff=args.backoff, max_backoff=args.backoff * 8
+    )
+    worker.start()
+
+    def spin_all() -> List[float]:
+        latencies = []
+        for index in range(args.spins):
+            started = time.perf_counter()
+            result = manager.participate(activity_id, f"{10000000 + index}")
+            latencies.append(time.perf_counter() - started)
+            if not result["success"] or not result["reward"]:
+                raise RuntimeError(f"抽奖未中奖或失败: {result}")
+        return latencies
+
+    # 抽奖与发放同时进行，发放任务在每次中奖后被唤醒
+    started = time.perf_counter()
+    spin_latencies = await asyncio.to_thread(spin_all)
+    spins_elapsed = time.perf_counter() - started
+    while await asyncio.to_thread(manager.count_pending_deliveries) > 0:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    await worker.stop()
+
+    participations, _ = manager.get_participations(activity_id, limit=args.spins)
+    statuses = Counter(row["status"] for row in participations)
+    duplicates = sum(1 for count in server.delivered.values() if count > 1)
+    # 状态为 1 的记录必须恰好发放一次；状态为 2（超过重试次数）的记录不能被发放
+    missing = sum(
+        1 for row in participations
+        if row["status"] == 1 and server.delivered[row["game_id"]] != 1
+    )
+    unexpected = sum(
+        1 for row in participations
+        if row["status"] != 1 and server.delivered[row["game_id"]] > 0
+    )
+
+    print(f"模拟游戏服务器: 往返 {args.latency_ms}ms，失败率 {args.failure_rate:.0%}；"
+          f"发放并发 {args.concurrency}，批量 {args.batch_size}")
+    print(f"抽奖: {args.spins} 次，耗时 {spins_elapsed:.2f}s，延迟(ms) {percentiles(spin_latencies)}")
+    print(f"发放: 清空队列耗时 {elapsed:.2f}s，{sum(server.delivered.values()) / elapsed:.0f} 个/秒，"
+          f"最大同时发送 {server.max_in_flight}，被拒绝后重试 {server.rejected} 次")
+    print(f"参与记录状态: {dict(statuses)}，worker 统计 {worker.get_stats()}")
+    print(f"重复发放 {duplicates}，已成功但未发放 {missing}，未成功但已发放 {unexpected}")
+    return 1 if duplicates or missing or unexpected or statuses.get(0) else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="活动奖励异步发放基准测试")
+    parser.add_argument("--spins", type=int, default=500, help="抽奖次数（每次都中奖）")
+    parser.add_argument("--latency-ms", type=float, default=10.0, help="模拟游戏服务器的命令往返时间")
+    parser.add_argument("--failure-rate", type=float, default=0.2, help="命令未发出的比例")
+    parser.add_argument("--concurrency", type=int, default=4, help="同时发送的奖励数量")
+    parser.add_argument("--batch-size", type=int, default=20, help="每次从队列领取的数量")
+    parser.add_argument("--max-attempts", type=int, default=10, help="最大自动重试次数")
+    parser.add_argument("--backoff", type=float, default=0.02, help="首次重试等待时间（秒）")
+    parser.add_argument("--db", help="数据库文件（默认使用临时复制的 gmtools.db）")
+    args = parser.parse_args()
+
+    temp_dir = None
+    db_path = args.db
+    if not db_path:
+        temp_dir = tempfile.mkdtemp(prefix="bench_reward_delivery_")
+        db_path = str(Path(temp_dir) / "gmtools.db")
+        shutil.copyfile(project_root / "gmtools.db", db_path)
+
+    from database.connection import db
+    db.db_path = db_path
+    from database.activity_models import ActivityManager
+
+    try:
+        random.seed(0)
+        exit_code = asyncio.run(run(args, ActivityManager()))
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,9 @@
 1. item_configs - 道具配置表
 2. item_level_limits - 道具等级限制表
 3. item_gift_logs - 道具发送记录表
+4. item_gift_usage_buckets - 周期配额分桶计数表
+
+表结构已并入 database/migrations.py，服务启动时会自动创建；本脚本额外写入示例数据。
 """
 
 import sys
@@ -24,87 +27,11 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 logger = logging.getLogger(__name__)
 
 
-def create_item_configs_table():
-    """创建道具配置表"""
-    logger.info("创建 item_configs 表...")
-    
-    with db.get_cursor() as cursor:
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS item_configs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                item_name TEXT NOT NULL UNIQUE,
-                display_name TEXT NOT NULL,
-                description TEXT,
-                icon_url TEXT,
-                is_active BOOLEAN DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # 创建索引
-        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_item_configs_name ON item_configs(item_name)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_item_configs_is_active ON item_configs(is_active)")
-    
-    logger.info("✓ item_configs 表创建成功")
-
-
-def create_item_level_limits_table():
-    """创建道具等级限制表"""
-    logger.info("创建 item_level_limits 表...")
-    
-    with db.get_cursor() as cursor:
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS item_level_limits (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                item_name TEXT NOT NULL,
-                user_level INTEGER NOT NULL,
-                min_quantity INTEGER DEFAULT 1,
-                max_quantity INTEGER DEFAULT 99,
-                reset_period_hours INTEGER DEFAULT 24,
-                period_total_limit INTEGER DEFAULT 999,
-                is_active BOOLEAN DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(item_name, user_level),
-                FOREIGN KEY (item_name) REFERENCES item_configs(item_name) ON DELETE CASCADE
-            )
-        """)
-        
-        # 创建索引
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_item_level_limits_level ON item_level_limits(user_level)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_item_level_limits_item ON item_level_limits(item_name)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_item_level_limits_active ON item_level_limits(is_active)")
-    
-    logger.info("✓ item_level_limits 表创建成功")
-
-
-def create_item_gift_logs_table():
-    """创建道具发送记录表"""
-    logger.info("创建 item_gift_logs 表...")
-    
-    with db.get_cursor() as cursor:
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS item_gift_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                sender_username TEXT NOT NULL,
-                sender_level INTEGER NOT NULL,
-                recipient_username TEXT NOT NULL,
-                item_name TEXT NOT NULL,
-                quantity INTEGER NOT NULL,
-                reset_period_hours INTEGER,
-                is_admin_send BOOLEAN DEFAULT 0,
-                sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (item_name) REFERENCES item_configs(item_name)
-            )
-        """)
-        
-        # 创建索引 - 用于快速查询周期配额
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_item_gift_logs_sender ON item_gift_logs(sender_username, sent_at)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_item_gift_logs_item_sender ON item_gift_logs(item_name, sender_username, sent_at)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_item_gift_logs_recipient ON item_gift_logs(recipient_username, sent_at)")
-    
-    logger.info("✓ item_gift_logs 表创建成功")
+def create_tables():
+    """创建道具赠送相关表（表结构由 database/migrations.py 统一管理）"""
+    logger.info("执行数据库结构迁移...")
+    db.init_database()
+    logger.info("✓ 道具赠送相关表已就绪")
 
 
 def insert_sample_data():
@@ -170,9 +97,7 @@ def main():
     
     try:
         # 创建表
-        create_item_configs_table()
-        create_item_level_limits_table()
-        create_item_gift_logs_table()
+        create_tables()
         
         # 插入示例数据
         insert_sample_data()
@@ -184,6 +109,7 @@ def main():
         logger.info("  1. item_configs - 道具配置表")
         logger.info("  2. item_level_limits - 道具等级限制表")
         logger.info("  3. item_gift_logs - 道具发送记录表")
+        logger.info("  4. item_gift_usage_buckets - 周期配额分桶计数表")
         logger.info("\n下一步：")
         logger.info("  1. 实现数据模型类 (database/item_gift.py)")
         logger.info("  2. 实现业务逻辑 (services/item_gift_service.py)")
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+消息共享正文 - 数据库迁移脚本
+
+将旧版 messages 表拆分为：
+1. message_bodies - 消息正文表（相同发送者、标题、正文的消息共享一条）
+2. message_deliveries - 消息投递表（每个收件人一行，沿用原消息ID）
+
+迁移后旧表重命名为 messages_legacy 备份，确认无误后可手动删除并执行 VACUUM 回收空间。
+服务启动时 init_database 也会自动执行同样的迁移。
+"""
+
+import sys
+import os
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from database.connection import db
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """主函数"""
+    logger.info("=" * 60)
+    logger.info("开始迁移消息表...")
+    logger.info("=" * 60)
+
+    try:
+        db.init_database()
+
+        with db.get_cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) as count FROM message_bodies")
+            body_count = cursor.fetchone()['count']
+            cursor.execute("SELECT COUNT(*) as count FROM message_deliveries")
+            delivery_count = cursor.fetchone()['count']
+
+        logger.info("=" * 60)
+        logger.info("✓ 迁移完成！")
+        logger.info(f"  消息正文: {body_count} 条")
+        logger.info(f"  投递记录: {delivery_count} 条")
+        logger.info("=" * 60)
+
+    except Exception as e:
+        logger.error(f"✗ 迁移失败: {e}", exc_info=True)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
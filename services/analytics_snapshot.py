@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+活动与道具赠送分析快照
+定期把 activity_participations / item_gift_logs 导出为列式快照
+（安装 pyarrow 时写 Arrow IPC 文件，否则每列一个 NumPy .npy 文件），
+报表统计在内存中的列上做向量化分组聚合，不再扫描线上数据库
+
+多个工作进程共享快照目录：生成快照时持有目录下的 LOCK 文件锁，同一时间只有一个进程写入，
+其他进程等待后直接加载刚生成的快照；旧目录只清理到上一代，正在加载上一代的进程不受影响
+
+依赖：numpy（必需），pyarrow（可选）；均未安装时快照功能不可用
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List, Tuple
+
+from config.settings import ANALYTICS_SNAPSHOT_DIR, ANALYTICS_SNAPSHOT_INTERVAL
+from database.connection import db
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+BACKEND_ARROW = "arrow"
+BACKEND_NUMPY = "npy"
+
+# 列类型：int 整数（NULL 记为 -1），str 字典编码字符串，time UTC 秒级时间戳
+_TABLES: Dict[str, Tuple[str, List[Tuple[str, str, str]]]] = {
+    "participations": ("activity_participations", [
+        ("id", "int", "id"),
+        ("activity_id", "int", "activity_id"),
+        ("reward_id", "int", "IFNULL(reward_id, -1)"),
+        ("status", "int", "IFNULL(status, -1)"),
+        ("created_at", "time", "IFNULL(CAST(strftime('%s', created_at) AS INTEGER), 0)"),
+    ]),
+    "gift_logs": ("item_gift_logs", [
+        ("id", "int", "id"),
+        ("sender_username", "str", "sender_username"),
+        ("sender_level", "int", "IFNULL(sender_level, -1)"),
+        ("item_name", "str", "item_name"),
+        ("quantity", "int", "IFNULL(quantity, 0)"),
+        ("is_admin_send", "int", "IFNULL(is_admin_send, 0)"),
+        ("sent_at", "time", "IFNULL(CAST(strftime('%s', sent_at) AS INTEGER), 0)"),
+    ]),
+}
+
+
+def available() -> bool:
+    """当前环境是否支持分析快照"""
+    return np is not None
+
+
+def parse_time(value: Optional[str]) -> Optional[int]:
+    """'YYYY-MM-DD HH:MM:SS'（UTC）转为时间戳，空值返回 None"""
+    if not value:
+        return None
+    return int(datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp())
+
+
+class SnapshotTable:
+    """快照中的一张表：数值列为 int64 数组，字符串列为编码数组 + 字典"""
+
+    def __init__(self, columns: Dict[str, "np.ndarray"], categories: Dict[str, List[str]]):
+        self.columns = columns
+        self.categories = categories
+        self.rows = len(next(iter(columns.values()))) if columns else 0
+
+    def __getitem__(self, name: str) -> "np.ndarray":
+        return self.columns[name]
+
+    def time_mask(self, column: str, start: Optional[int], end: Optional[int]) -> "np.ndarray":
+        """时间范围筛选掩码（包含边界）"""
+        values = self.columns[column]
+        mask = np.ones(self.rows, dtype=bool)
+        if start is not None:
+            mask &= values >= start
+        if end is not None:
+            mask &= values <= end
+        return mask
+
+
+class AnalyticsSnapshot:
+    """一次导出的只读快照"""
+
+    def __init__(self, tables: Dict[str, SnapshotTable], built_at: str, backend: str):
+        self.tables = tables
+        self.built_at = built_at
+        self.backend = backend
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "built_at": self.built_at,
+            "backend": self.backend,
+            "rows": {name: table.rows for name, table in self.tables.items()}
+        }
+
+    def win_rate_by_hour(self, activity_id: Optional[int] = None, start: Optional[int] = None,
+                         end: Optional[int] = None, tz_offset_hours: int = 0) -> List[Dict[str, Any]]:
+        """按一天中的小时统计参与次数、中奖次数和中奖率"""
+        table = self.tables["participations"]
+        mask = table.time_mask("created_at", start, end)
+        if activity_id is not None:
+            mask &= table["activity_id"] == activity_id
+
+        hours = ((table["created_at"][mask] + tz_offset_hours * 3600) // 3600) % 24
+        wins = table["reward_id"][mask] >= 0
+        total_counts = np.bincount(hours, minlength=24)
+        win_counts = np.bincount(hours[wins], minlength=24)
+        rates = np.divide(win_counts, total_counts, out=np.zeros(24), where=total_counts > 0)
+
+        return [
+            {
+                "hour": hour,
+                "participations": int(total_counts[hour]),
+                "wins": int(win_counts[hour]),
+                "win_rate": round(float(rates[hour]), 4)
+            }
+            for hour in range(24)
+        ]
+
+    def top_senders(self, limit: int = 20, start: Optional[int] = None, end: Optional[int] = None,
+                    item_name: Optional[str] = None, include_admin: bool = False) -> List[Dict[str, Any]]:
+        """按发送总数量排名的发送者"""
+        table = self.tables["gift_logs"]
+        mask = self._gift_mask(table, start, end, item_name, include_admin)
+        if mask is None:
+            return []
+
+        senders = table["sender_username"][mask]
+        size = len(table.categories["sender_username"])
+        quantities = np.bincount(senders, weights=table["quantity"][mask], minlength=size)
+        send_counts = np.bincount(senders, minlength=size)
+
+        limit = min(limit, int(np.count_nonzero(send_counts)))
+        if limit <= 0:
+            return []
+        top = np.argpartition(-quantities, limit - 1)[:limit]
+        top = top[np.lexsort((-send_counts[top], -quantities[top]))]
+
+        names = table.categories["sender_username"]
+        return [
+            {
+                "sender_username": names[code],
+                "total_quantity": int(quantities[code]),
+                "send_count": int(send_counts[code])
+            }
+            for code in top
+        ]
+
+    def item_volumes(self, start: Optional[int] = None, end: Optional[int] = None,
+                     include_admin: bool = False) -> List[Dict[str, Any]]:
+        """按道具统计发送次数、总数量和发送人数（按总数量倒序）"""
+        table = self.tables["gift_logs"]
+        mask = self._gift_mask(table, start, end, None, include_admin)
+        if mask is None:
+            return []
+
+        items = table["item_name"][mask]
+        item_size = len(table.categories["item_name"])
+        sender_size = len(table.categories["sender_username"])
+        quantities = np.bincount(items, weights=table["quantity"][mask], minlength=item_size)
+        send_counts = np.bincount(items, minlength=item_size)
+        # (道具, 发送者) 组合去重后按道具计数
+        pairs = np.unique(items.astype(np.int64) * max(sender_size, 1) + table["sender_username"][mask])
+        sender_counts = np.bincount(pairs // max(sender_size, 1), minlength=item_size)
+
+        order = np.lexsort((-send_counts, -quantities))
+        names = table.categories["item_name"]
+        return [
+            {
+                "item_name": names[code],
+                "send_count": int(send_counts[code]),
+                "total_quantity": int(quantities[code]),
+                "sender_count": int(sender_counts[code])
+            }
+            for code in order
+            if send_counts[code]
+        ]
+
+    @staticmethod
+    def _gift_mask(table: SnapshotTable, start: Optional[int], end: Optional[int],
+                   item_name: Optional[str], include_admin: bool) -> Optional["np.ndarray"]:
+        mask = table.time_mask("sent_at", start, end)
+        if not include_admin:
+            mask &= table["is_admin_send"] == 0
+        if item_name:
+            try:
+                mask &= table["item_name"] == table.categories["item_name"].index(item_name)
+            except ValueError:
+                return None
+        return mask
+
+
+class AnalyticsSnapshotService:
+    """分析快照的定时导出与加载"""
+
+    # 每次从数据库读取的行数；按主键分段读取，每段是一个独立的短事务
+    CHUNK_SIZE = 20000
+    CURRENT_FILE = "CURRENT"
+    LOCK_FILE = "LOCK"
+
+    def __init__(self, directory: str = "analytics_snapshot", interval: float = 600):
+        """
+        :param directory: 快照目录（相对路径基于项目根目录）
+        :param interval: 定时刷新间隔（秒），0 表示只在启动时加载/生成一次
+        """
+        if not os.path.isabs(directory):
+            directory = os.path.join(os.path.dirname(os.path.dirname(__file__)), directory)
+        self.directory = directory
+        self.interval = interval
+        self.backend = BACKEND_ARROW if pa is not None else BACKEND_NUMPY
+
+        self._snapshot: Optional[AnalyticsSnapshot] = None
+        self._refresh_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._last_error: Optional[str] = None
+
+    def get(self) -> Optional[AnalyticsSnapshot]:
+        """当前快照，尚未生成时返回 None"""
+        return self._snapshot
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "available": available(),
+            "backend": self.backend if available() else None,
+            "interval": self.interval,
+            "snapshot": self._snapshot.info() if self._snapshot else None,
+            "last_error": self._last_error
+        }
+
+    def start(self):
+        """在当前事件循环中启动定时刷新"""
+        if not available():
+            logger.warning("未安装 numpy，分析快照功能不可用")
+            return
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info(f"分析快照任务已启动，格式: {self.backend}")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def refresh(self, max_age: Optional[float] = None) -> Optional[AnalyticsSnapshot]:
+        """
+        从数据库导出新快照、写入磁盘并替换当前快照
+        :param max_age: 磁盘上的快照（可能由其他工作进程生成）不超过该秒数时直接加载，不重新导出
+        """
+        if not available():
+            return None
+        with self._refresh_lock, self._process_lock():
+            if max_age is not None and self._current_age() <= max_age:
+                snapshot = self.load()
+                if snapshot:
+                    return snapshot
+            try:
+                started = time.perf_counter()
+                built_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+                tables = {name: self._export_table(name) for name in _TABLES}
+                snapshot = AnalyticsSnapshot(tables, built_at, self.backend)
+                self._save(snapshot)
+                self._snapshot = snapshot
+                self._last_error = None
+                logger.info(
+                    f"分析快照已生成: {snapshot.info()['rows']}，耗时 {time.perf_counter() - started:.2f}s"
+                )
+                return snapshot
+            except Exception as e:
+                self._last_error = str(e)
+                logger.error(f"生成分析快照失败: {e}")
+                return None
+
+    def load(self) -> Optional[AnalyticsSnapshot]:
+        """从磁盘加载最近一次快照"""
+        if not available():
+            return None
+        try:
+            with open(os.path.join(self.directory, self.CURRENT_FILE), encoding="utf-8") as f:
+                generation = f.read().strip()
+            path = os.path.join(self.directory, generation)
+            with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["backend"] == BACKEND_ARROW and pa is None:
+                return None
+            tables = {name: self._read_table(path, name, meta["backend"]) for name in _TABLES}
+            self._snapshot = AnalyticsSnapshot(tables, meta["built_at"], meta["backend"])
+            return self._snapshot
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"加载分析快照失败: {e}")
+            return None
+
+    async def _run(self):
+        # 多个工作进程同时启动时只有一个进程导出，其余进程加载它生成的快照
+        max_age = self.interval / 2 if self.interval > 0 else float("inf")
+        if not await asyncio.to_thread(self.load):
+            await asyncio.to_thread(self.refresh, max_age)
+        while self.interval > 0:
+            await asyncio.sleep(self.interval)
+            await asyncio.to_thread(self.refresh, max_age)
+
+    def _current_age(self) -> float:
+        """磁盘上当前快照的生成时间距今的秒数，没有快照时返回无穷大"""
+        try:
+            return time.time() - os.path.getmtime(os.path.join(self.directory, self.CURRENT_FILE))
+        except OSError:
+            return float("inf")
+
+    @contextmanager
+    def _process_lock(self):
+        """跨进程的快照生成锁（快照目录下的 LOCK 文件）"""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, self.LOCK_FILE), "a+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                        break
+                    except OSError:
+                        time.sleep(0.5)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _export_table(self, name: str) -> SnapshotTable:
+        source, columns = _TABLES[name]
+        select = ", ".join(expression for _, _, expression in columns)
+        chunks: Dict[str, List["np.ndarray"]] = {column: [] for column, _, _ in columns}
+        mappings: Dict[str, Dict[str, int]] = {column: {} for column, kind, _ in columns if kind == "str"}
+
+        last_id = 0
+        while True:
+            with db.get_cursor() as cursor:
+                cursor.execute(
+                    f"SELECT {select} FROM {source} WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, self.CHUNK_SIZE)
+                )
+                rows = cursor.fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            for index, (column, kind, _) in enumerate(columns):
+                values = [row[index] for row in rows]
+                if kind == "str":
+                    mapping = mappings[column]
+                    values = [mapping.setdefault(value or "", len(mapping)) for value in values]
+                    chunks[column].append(np.array(values, dtype=np.int32))
+                else:
+                    chunks[column].append(np.array(values, dtype=np.int64))
+            if len(rows) < self.CHUNK_SIZE:
+                break
+
+        arrays = {
+            column: np.concatenate(parts) if parts else np.zeros(0, dtype=np.int32 if kind == "str" else np.int64)
+            for (column, kind, _), parts in zip(columns, chunks.values())
+        }
+        categories = {column: list(mapping) for column, mapping in mappings.items()}
+        return SnapshotTable(arrays, categories)
+
+    def _save(self, snapshot: AnalyticsSnapshot):
+        """
+        写入新一代快照目录，再原子替换 CURRENT 指向，最后清理旧目录
+        调用方持有 _process_lock；保留上一代目录，其他进程可能正在加载
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        generation = f"gen_{int(time.time() * 1000)}_{os.getpid()}"
+        path = os.path.join(self.directory, generation)
+        os.makedirs(path)
+
+        for name, table in snapshot.tables.items():
+            if snapshot.backend == BACKEND_ARROW:
+                self._write_arrow(os.path.join(path, f"{name}.arrow"), table)
+            else:
+                table_path = os.path.join(path, name)
+                os.makedirs(table_path)
+                for column, values in table.columns.items():
+                    np.save(os.path.join(table_path, f"{column}.npy"), values)
+                for column, names in table.categories.items():
+                    np.save(os.path.join(table_path, f"{column}.categories.npy"), np.array(names, dtype=str))
+
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"built_at": snapshot.built_at, "backend": snapshot.backend}, f)
+
+        current = os.path.join(self.directory, self.CURRENT_FILE)
+        try:
+            with open(current, encoding="utf-8") as f:
+                previous = f.read().strip()
+        except FileNotFoundError:
+            previous = None
+        with open(current + ".tmp", "w", encoding="utf-8") as f:
+            f.write(generation)
+        os.replace(current + ".tmp", current)
+
+        for entry in os.listdir(self.directory):
+            if entry.startswith("gen_") and entry not in (generation, previous):
+                shutil.rmtree(os.path.join(self.directory, entry), ignore_errors=True)
+
+    @staticmethod
+    def _write_arrow(path: str, table: SnapshotTable):
+        arrays = []
+        for column, values in table.columns.items():
+            if column in table.categories:
+                arrays.append(pa.DictionaryArray.from_arrays(
+                    pa.array(values, type=pa.int32()),
+                    pa.array(table.categories[column], type=pa.string())
+                ))
+            else:
+                arrays.append(pa.array(values, type=pa.int64()))
+        arrow_table = pa.Table.from_arrays(arrays, names=list(table.columns))
+        with pa.OSFile(path, "wb") as sink:
+            with pa.ipc.new_file(sink, arrow_table.schema) as writer:
+                writer.write_table(arrow_table)
+
+    @staticmethod
+    def _read_table(path: str, name: str, backend: str) -> SnapshotTable:
+        _, columns = _TABLES[name]
+        arrays: Dict[str, "np.ndarray"] = {}
+        categories: Dict[str, List[str]] = {}
+
+        if backend == BACKEND_ARROW:
+            with pa.OSFile(os.path.join(path, f"{name}.arrow"), "rb") as source:
+                arrow_table = pa.ipc.open_file(source).read_all()
+            for column, kind, _ in columns:
+                values = arrow_table.column(column).combine_chunks()
+                if kind == "str":
+                    arrays[column] = values.indices.to_numpy(zero_copy_only=False).astype(np.int32)
+                    categories[column] = values.dictionary.to_pylist()
+                else:
+                    arrays[column] = values.to_numpy(zero_copy_only=False).astype(np.int64)
+        else:
+            table_path = os.path.join(path, name)
+            for column, kind, _ in columns:
+                arrays[column] = np.load(os.path.join(table_path, f"{column}.npy"))
+                if kind == "str":
+                    categories[column] = np.load(os.path.join(table_path, f"{column}.categories.npy")).tolist()
+
+        return SnapshotTable(arrays, categories)
+
+
+# 全局分析快照服务
+analytics_snapshots = AnalyticsSnapshotService(ANALYTICS_SNAPSHOT_DIR, ANALYTICS_SNAPSHOT_INTERVAL)
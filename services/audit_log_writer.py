@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+操作日志异步批量写入服务
+请求路径上只把日志放入内存缓冲区，后台任务每隔一段时间或攒够一批后
+用 executemany 一次提交，避免登录高峰时每条日志一次 fsync；
+同一任务按 AUDIT_LOG_RETENTION_INTERVAL 定期删除超出保留期的月度分区
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Optional, Dict, Any, List
+
+from config.settings import AUDIT_LOG_RETENTION_MONTHS, AUDIT_LOG_RETENTION_INTERVAL
+from database.models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+# 缓冲区满时的处理策略
+OVERFLOW_SYNC = "sync"  # 退化为在调用方同步写入（不丢日志）
+OVERFLOW_DROP = "drop"  # 丢弃新日志并计数
+
+
+class AuditLogWriter:
+    """操作日志批量写入任务"""
+
+    def __init__(
+        self,
+        flush_interval: float = 0.2,
+        batch_size: int = 200,
+        max_buffer: int = 10000,
+        overflow: str = OVERFLOW_SYNC,
+        retention_months: int = AUDIT_LOG_RETENTION_MONTHS,
+        retention_interval: float = AUDIT_LOG_RETENTION_INTERVAL
+    ):
+        """
+        初始化写入任务
+        :param flush_interval: 定时刷新间隔（秒）
+        :param batch_size: 攒够多少条立即刷新
+        :param max_buffer: 缓冲区上限
+        :param overflow: 缓冲区满时的策略，sync 同步写入 / drop 丢弃
+        :param retention_months: 日志保留月数（含当月），0 表示不清理
+        :param retention_interval: 清理过期分区的间隔（秒），启动后立即执行一次
+        """
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_buffer = max_buffer
+        self.overflow = overflow
+        self.retention_months = retention_months
+        self.retention_interval = retention_interval
+
+        self.written_count = 0
+        self.dropped_count = 0
+        self.overflow_count = 0
+
+        self._buffer: deque = deque()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    def start(self):
+        """在当前事件循环中启动写入任务，并接管 AuditLog.create"""
+        if self._task and not self._task.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = self._loop.create_task(self._run())
+        AuditLog.set_writer(self)
+        logger.info("操作日志写入任务已启动")
+
+    async def stop(self):
+        """停止写入任务，并把缓冲区中剩余的日志全部写入"""
+        AuditLog.set_writer(None)
+        self._stopping = True
+        if self._wakeup:
+            self._wakeup.set()
+        if self._task:
+            try:
+                await self._task
+            except Exception as e:
+                logger.error(f"操作日志写入任务退出异常: {e}")
+            self._task = None
+        # 停止后仍可能有并发入队的日志
+        await asyncio.to_thread(self.flush)
+        logger.info(f"操作日志写入任务已停止，共写入 {self.written_count} 条")
+
+    def enqueue(self, row: tuple) -> bool:
+        """
+        日志入队 (线程安全)
+        返回 False 表示调用方需要自行同步写入
+        """
+        with self._lock:
+            if len(self._buffer) >= self.max_buffer:
+                if self.overflow == OVERFLOW_DROP:
+                    self.dropped_count += 1
+                    return True
+                self.overflow_count += 1
+                return False
+            self._buffer.append(row)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._notify()
+        return True
+
+    def flush(self) -> int:
+        """把当前缓冲区写入数据库，返回写入数量"""
+        total = 0
+        while True:
+            with self._lock:
+                batch: List[tuple] = [
+                    self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))
+                ]
+            if not batch:
+                return total
+            written = AuditLog.insert_many(batch)
+            if not written:
+                # 写入失败时放回缓冲区，下次重试
+                with self._lock:
+                    self._buffer.extendleft(reversed(batch))
+                return total
+            total += written
+            self.written_count += written
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取写入统计"""
+        return {
+            "running": bool(self._task and not self._task.done()),
+            "buffered": len(self._buffer),
+            "written": self.written_count,
+            "dropped": self.dropped_count,
+            "overflow_sync": self.overflow_count
+        }
+
+    def _notify(self):
+        if self._loop and self._wakeup and not self._loop.is_closed():
+            try:
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError:
+                pass
+
+    async def _run(self):
+        next_retention = time.monotonic()
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._buffer:
+                try:
+                    await asyncio.to_thread(self.flush)
+                except Exception as e:
+                    logger.error(f"写入操作日志失败: {e}")
+            if self.retention_months > 0 and time.monotonic() >= next_retention:
+                next_retention = time.monotonic() + self.retention_interval
+                try:
+                    await asyncio.to_thread(AuditLog.apply_retention, self.retention_months)
+                except Exception as e:
+                    logger.error(f"清理过期操作日志失败: {e}")
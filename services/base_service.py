@@ -6,9 +6,10 @@
 """
 
 import logging
-import asyncio
 from typing import Dict, Any, Optional, Union
 
+from services.game_connection import send_and_collect
+
 logger = logging.getLogger(__name__)
 
 
@@ -18,7 +19,7 @@ class BaseService:
     def __init__(self, client, dispatcher=None):
         """
         初始化服务
-        :param client: GMToolsClient 实例
+        :param client: GMToolsClient 实例，或游戏连接代理客户端 GameBrokerClient
         :param dispatcher: 响应分发器 (可选)
         """
         self.client = client
@@ -120,62 +121,9 @@ class BaseService:
             data = {}
 
         content = self._build_lua_command(command, data)
-        try:
-            # 生成唯一的请求ID
-            import uuid
-            request_id = str(uuid.uuid4())
-            
-            # 注册响应收集器
-            if self.dispatcher:
-                self.dispatcher.register_collector(request_id)
 
-            # 使用 asyncio.to_thread 将阻塞的 send 调用放入线程池
-            result = await asyncio.to_thread(self.client.send, seq_no, content, self._current_account)
-            
-            if not result:
-                if self.dispatcher:
-                    self.dispatcher.cancel_collector(request_id)
-                return False
-
-            # 等待响应收集
-            if self.dispatcher:
-                try:
-                    # 获取事件对象
-                    event = self.dispatcher.get_collector_event(request_id)
-                    if not event:
-                        logger.error("无法获取收集器事件对象")
-                        return False
-
-                    # 等待第一个响应（带超时）
-                    try:
-                        await asyncio.wait_for(event.wait(), timeout=timeout)
-                        
-                        # 收到第一个响应后，稍微等待一小会儿以收集可能的后续分包（针对多包响应）
-                        # 对于大多数单包响应，这只会增加极小的延迟(0.1s)
-                        await asyncio.sleep(0.1)
-                        
-                    except asyncio.TimeoutError:
-                        # 超时未收到任何响应
-                        logger.warning(f"在 {timeout} 秒内未收到任何响应 (seq_no={seq_no})")
-                        self.dispatcher.cancel_collector(request_id)
-                        return {"status": "no_response", "message": "Command sent but no response received"}
-
-                    # 获取收集到的所有响应
-                    responses = self.dispatcher.get_collected_responses(request_id)
-                    
-                    if responses:
-                        # 返回所有响应
-                        return responses
-                    else:
-                        # 理论上不应执行到这里，除非 event 被错误触发
-                        return {"status": "no_response", "message": "Event triggered but no responses found"}
-                        
-                except Exception as e:
-                    logger.error(f"收集响应异常: {e}")
-                    self.dispatcher.cancel_collector(request_id)
-                    return {"status": "error", "message": str(e)}
-            
-            return True
-        except Exception as e:
-            logger.exception(f"发送命令失败: {e}")
-            return False
+        # 多进程部署时通过游戏连接代理发送，响应由代理进程收集
+        if getattr(self.client, "is_remote", False):
+            return await self.client.request(seq_no, content, self._current_account, timeout)
+
+        return await send_and_collect(self.client, self.dispatcher, seq_no, content, self._current_account, timeout)
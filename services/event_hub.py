@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+实时事件推送中心
+为 SSE 订阅者维护有界的事件队列，相同 key 的事件合并为最新一条，
+用于推送未读消息数、活动参与事件和游戏服务器响应，替代前端定时轮询
+"""
+
+import asyncio
+import itertools
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Callable, List, Iterable
+
+logger = logging.getLogger(__name__)
+
+# 事件主题
+TOPIC_UNREAD = "unread"
+TOPIC_PARTICIPATION = "participation"
+TOPIC_GAME = "game"
+
+
+class Subscription:
+    """单个订阅者的事件队列"""
+
+    def __init__(self, user_id: int, is_admin: bool, max_pending: int):
+        self.user_id = user_id
+        self.is_admin = is_admin
+        self.max_pending = max_pending
+        self.dropped = 0
+        # key -> (topic, payload)；payload 可以是无参函数，在发送时才求值
+        self._pending: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+
+    def put(self, topic: str, payload: Any, key: Optional[str] = None):
+        """加入事件（仅在事件循环线程调用）；相同 key 的事件只保留最新一条"""
+        if key is None:
+            key = (topic, next(self._seq))
+        elif key in self._pending:
+            del self._pending[key]
+        if len(self._pending) >= self.max_pending:
+            # 队列已满时丢弃最旧的事件
+            self._pending.popitem(last=False)
+            self.dropped += 1
+        self._pending[key] = (topic, payload)
+        self._wakeup.set()
+
+    async def get_batch(self, timeout: float) -> List[tuple]:
+        """等待并取出当前积压的全部事件，超时返回空列表"""
+        if not self._pending:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                return []
+        batch = list(self._pending.values())
+        self._pending.clear()
+        return batch
+
+
+class EventHub:
+    """事件推送中心"""
+
+    def __init__(self, max_pending: int = 100):
+        self.max_pending = max_pending
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscriptions: Dict[int, List[Subscription]] = {}
+        self._admin_count = 0
+        self._lock = threading.Lock()
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop):
+        """绑定事件循环（在 lifespan 启动时调用）"""
+        self._loop = loop
+
+    def subscribe(self, user_id: int, is_admin: bool = False) -> Subscription:
+        """新增订阅者（在事件循环中调用）"""
+        subscription = Subscription(user_id, is_admin, self.max_pending)
+        with self._lock:
+            self._subscriptions.setdefault(user_id, []).append(subscription)
+            if is_admin:
+                self._admin_count += 1
+        logger.info(f"事件订阅: user_id={user_id}, admin={is_admin}")
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """移除订阅者"""
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id, [])
+            if subscription in subscriptions:
+                subscriptions.remove(subscription)
+                if subscription.is_admin:
+                    self._admin_count -= 1
+            if not subscriptions:
+                self._subscriptions.pop(subscription.user_id, None)
+        logger.info(f"取消事件订阅: user_id={subscription.user_id}, 丢弃事件 {subscription.dropped} 条")
+
+    def has_admin_subscribers(self) -> bool:
+        return self._admin_count > 0
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    def publish_to_users(self, user_ids: Iterable[int], topic: str,
+                         payload_factory: Callable[[int], Any], key: Optional[str] = None):
+        """
+        向指定用户推送事件 (线程安全)
+        payload_factory(user_id) 的返回值作为事件内容；只为在线用户生成
+        """
+        with self._lock:
+            targets = [
+                subscription
+                for user_id in set(user_ids)
+                for subscription in self._subscriptions.get(user_id, [])
+            ]
+        if targets:
+            self._schedule(targets, topic, payload_factory, key)
+
+    def publish_to_admins(self, topic: str, payload: Any, key: Optional[str] = None):
+        """向所有在线管理员推送事件 (线程安全)"""
+        if not self._admin_count:
+            return
+        with self._lock:
+            targets = [
+                subscription
+                for subscriptions in self._subscriptions.values()
+                for subscription in subscriptions
+                if subscription.is_admin
+            ]
+        if targets:
+            self._schedule(targets, topic, lambda user_id: payload, key)
+
+    def _schedule(self, targets: List[Subscription], topic: str,
+                  payload_factory: Callable[[int], Any], key: Optional[str]):
+        loop = self._loop
+        if not loop or loop.is_closed():
+            return
+
+        def deliver():
+            for subscription in targets:
+                subscription.put(topic, payload_factory(subscription.user_id), key)
+
+        try:
+            loop.call_soon_threadsafe(deliver)
+        except RuntimeError:
+            # 事件循环已关闭
+            pass
+
+
+# 全局事件中心
+event_hub = EventHub()
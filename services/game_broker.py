@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+游戏连接代理
+由单独的进程持有游戏服务器连接和 GM 登录状态，API 工作进程通过本地 IPC（Unix socket，
+Windows 上为本机 TCP）发送命令，这样 API 可以用多个工作进程处理 HTTP 请求，
+而游戏服务器只有一个连接，响应仍由同一个分发器收集。游戏响应不带请求标识，
+各工作进程的命令在代理中逐条发送（见 ResponseDispatcher），每条命令只收到自己的响应。
+
+协议：每帧为 4 字节大端长度 + UTF-8 JSON
+- 请求 {"id": n, "op": "send" | "status" | "ping" | "subscribe" | "publish", ...}
+- 响应 {"id": n, "ok": true, "result": ...} 或 {"id": n, "ok": false, "error": "..."}
+- 订阅连接上推送 {"event": 游戏服务器响应} 和 {"app_event": 应用事件}
+
+publish 把工作进程的应用事件（未读数变化、活动参与、Token 失效）转发给所有订阅连接，
+各工作进程据此推送给本进程的 SSE 订阅者、失效本进程的缓存
+
+启动：python -m services.game_broker [--address 路径或host:port]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import sys
+import tempfile
+import time
+import uuid
+from typing import Optional, Dict, Any, Set, Callable, Tuple, Union
+
+from network.client import GMToolsClient
+from services.game_connection import ResponseDispatcher, send_and_collect, login_gm
+from config.settings import (
+    SERVER_HOST, SERVER_PORT, GM_ACCOUNT, GM_PASSWORD, GAME_BROKER_ADDRESS, GAME_COMMAND_QUEUE_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+# 默认地址：支持 Unix socket 时使用临时目录下的 socket 文件，否则使用本机 TCP 端口
+DEFAULT_BROKER_ADDRESS = (
+    os.path.join(tempfile.gettempdir(), "gmtools_game_broker.sock")
+    if hasattr(socket, "AF_UNIX") else "127.0.0.1:8765"
+)
+# 单帧最大长度
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+# 订阅连接写缓冲超过该大小（消费过慢）时断开
+MAX_SUBSCRIBER_BUFFER = 4 * 1024 * 1024
+# 代理排队和等待游戏响应的时间之外，客户端额外等待的时间（秒）
+REQUEST_TIMEOUT_MARGIN = 5.0
+# 订阅连接断开后的重连间隔（秒）
+RECONNECT_DELAY = 2.0
+
+
+class GameBrokerError(Exception):
+    """代理返回的错误"""
+
+
+def parse_address(address: str) -> Tuple[str, Union[str, Tuple[str, int]]]:
+    """解析地址，返回 ("unix", 路径) 或 ("tcp", (host, port))"""
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and "/" not in address and "\\" not in address:
+        return "tcp", (host or "127.0.0.1", int(port))
+    return "unix", address
+
+
+def encode_frame(message: Dict[str, Any]) -> bytes:
+    payload = json.dumps(message, ensure_ascii=False, default=str).encode("utf-8")
+    return len(payload).to_bytes(4, "big") + payload
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Optional[Dict[str, Any]]:
+    """读取一帧，连接关闭时返回 None"""
+    try:
+        header = await reader.readexactly(4)
+        length = int.from_bytes(header, "big")
+        if length > MAX_FRAME_SIZE:
+            raise ValueError(f"帧长度超出限制: {length}")
+        return json.loads(await reader.readexactly(length))
+    except asyncio.IncompleteReadError:
+        return None
+
+
+async def open_connection(address: str):
+    kind, target = parse_address(address)
+    if kind == "tcp":
+        return await asyncio.open_connection(*target)
+    return await asyncio.open_unix_connection(target)
+
+
+def wait_until_ready(address: str, timeout: float = 15.0) -> bool:
+    """等待代理开始监听（同步，用于启动 API 工作进程之前）"""
+    kind, target = parse_address(address)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        family = socket.AF_INET if kind == "tcp" else socket.AF_UNIX
+        with socket.socket(family, socket.SOCK_STREAM) as sock:
+            try:
+                sock.connect(target)
+                return True
+            except OSError:
+                pass
+        time.sleep(0.2)
+    return False
+
+
+# ==================== 代理进程 ====================
+
+class GameBroker:
+    """持有游戏服务器连接的代理服务"""
+
+    def __init__(
+        self,
+        address: str,
+        host: str = SERVER_HOST,
+        port: int = SERVER_PORT,
+        account: str = GM_ACCOUNT,
+        password: str = GM_PASSWORD
+    ):
+        self.address = address
+        self.host = host
+        self.port = port
+        self.account = account
+        self.password = password
+
+        self.client = GMToolsClient()
+        self.dispatcher = ResponseDispatcher()
+        self.logged_in = False
+        self.command_count = 0
+        self.failed_count = 0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._connect_lock: Optional[asyncio.Lock] = None
+        self._subscribers: Set[asyncio.StreamWriter] = set()
+
+    async def run(self):
+        """连接游戏服务器并开始监听，直到进程退出"""
+        self._loop = asyncio.get_running_loop()
+        self._connect_lock = asyncio.Lock()
+        self.dispatcher.loop = self._loop
+        self.client.on_receive = self._on_receive
+
+        await self._ensure_connected()
+
+        kind, target = parse_address(self.address)
+        if kind == "tcp":
+            server = await asyncio.start_server(self._handle_connection, *target)
+        else:
+            if os.path.exists(target):
+                os.remove(target)
+            server = await asyncio.start_unix_server(self._handle_connection, target)
+            # 只允许当前用户连接
+            os.chmod(target, 0o600)
+        logger.info(f"游戏连接代理已启动: {self.address}")
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.client.disconnect()
+            if kind == "unix" and os.path.exists(target):
+                os.remove(target)
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "connected": self.client.connected,
+            "logged_in": self.logged_in,
+            "commands": self.command_count,
+            "failed": self.failed_count,
+            "active_collectors": len(self.dispatcher.collectors),
+            "subscribers": len(self._subscribers)
+        }
+
+    async def _ensure_connected(self) -> bool:
+        """未连接时重新连接并登录 GM 账号"""
+        async with self._connect_lock:
+            if self.client.connected:
+                return True
+            if not await asyncio.to_thread(self.client.connect, self.host, self.port):
+                logger.error(f"连接游戏服务器失败: {self.host}:{self.port}")
+                return False
+            logger.info(f"成功连接到游戏服务器: {self.host}:{self.port}")
+            self.logged_in = await login_gm(self.client, self.dispatcher, self.account, self.password)
+            return True
+
+    def _on_receive(self, data: dict):
+        # 在游戏连接的接收线程中调用
+        self.dispatcher.dispatch(data)
+        if self._subscribers:
+            self._loop.call_soon_threadsafe(self._publish, {"event": data})
+
+    def _publish(self, message: Dict[str, Any]):
+        frame = encode_frame(message)
+        for writer in list(self._subscribers):
+            if writer.is_closing() or writer.transport.get_write_buffer_size() > MAX_SUBSCRIBER_BUFFER:
+                self._subscribers.discard(writer)
+                writer.close()
+                continue
+            writer.write(frame)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        write_lock = asyncio.Lock()
+        tasks: Set[asyncio.Task] = set()
+        try:
+            while True:
+                request = await read_frame(reader)
+                if request is None:
+                    break
+                if request.get("op") == "subscribe":
+                    self._subscribers.add(writer)
+                    await self._write(writer, write_lock, {"id": request.get("id"), "ok": True, "result": None})
+                    continue
+                # 同一连接上的请求并发执行，响应按 id 对应
+                task = asyncio.create_task(self._serve_request(request, writer, write_lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (ConnectionError, ValueError) as e:
+            logger.warning(f"代理连接异常断开: {e}")
+        finally:
+            self._subscribers.discard(writer)
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def _serve_request(self, request: Dict[str, Any], writer: asyncio.StreamWriter, write_lock: asyncio.Lock):
+        try:
+            response = {"id": request.get("id"), "ok": True, "result": await self._execute(request)}
+        except Exception as e:
+            logger.error(f"代理处理命令失败: {e}")
+            response = {"id": request.get("id"), "ok": False, "error": str(e)}
+        try:
+            await self._write(writer, write_lock, response)
+        except ConnectionError:
+            pass
+
+    async def _execute(self, request: Dict[str, Any]) -> Any:
+        op = request.get("op")
+        if op == "send":
+            self.command_count += 1
+            if not await self._ensure_connected():
+                self.failed_count += 1
+                return False
+            # 排队超过 queue_timeout 的命令不再发送（返回 False），客户端的等待时间据此计算
+            result = await send_and_collect(
+                self.client, self.dispatcher,
+                int(request["seq_no"]), request["content"], request.get("account", ""),
+                float(request.get("timeout", 3.0)),
+                float(request.get("queue_timeout", GAME_COMMAND_QUEUE_TIMEOUT))
+            )
+            if result is False:
+                self.failed_count += 1
+            return result
+        if op == "status":
+            return self.get_status()
+        if op == "ping":
+            return "pong"
+        if op == "publish":
+            self._publish({"app_event": request.get("event")})
+            return None
+        raise GameBrokerError(f"未知命令: {op}")
+
+    @staticmethod
+    async def _write(writer: asyncio.StreamWriter, write_lock: asyncio.Lock, message: Dict[str, Any]):
+        async with write_lock:
+            writer.write(encode_frame(message))
+            await writer.drain()
+
+
+# ==================== API 工作进程使用的客户端 ====================
+
+class GameBrokerClient:
+    """
+    游戏连接代理客户端，代替 GMToolsClient 传给各个服务
+    BaseService.send_command 检测到 is_remote 后调用 request()，返回值与进程内发送一致
+    """
+
+    is_remote = True
+
+    def __init__(self, address: str):
+        self.address = address
+        # 本进程发布的应用事件带上来源标识，订阅连接收到自己发布的事件时跳过
+        self.instance_id = uuid.uuid4().hex
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._publish_tasks: Set[asyncio.Task] = set()
+        self._reader_task: Optional[asyncio.Task] = None
+        self._event_task: Optional[asyncio.Task] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self._connect_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def request(self, seq_no: int, content: str, account: str, timeout: float = 3.0,
+                      queue_timeout: float = GAME_COMMAND_QUEUE_TIMEOUT):
+        """
+        发送命令并返回收集到的响应，返回值与进程内发送一致
+        - 命令未送达代理（连接或写入失败）或代理未发出（排队超时、未连接游戏服务器）时返回 False，可以安全重试
+        - 已送达代理但未在期限内收到结果（或期间连接断开）时返回 no_response 状态，命令可能已经发出
+        """
+        params = {
+            "seq_no": seq_no, "content": content, "account": account,
+            "timeout": timeout, "queue_timeout": queue_timeout
+        }
+        try:
+            request_id, future = await self._submit("send", params)
+        except Exception as e:
+            logger.error(f"通过游戏连接代理发送命令失败: {e}")
+            return False
+        try:
+            # 代理排队 + 发送后等待响应（含 0.1 秒分包等待）之外再留出余量
+            return await asyncio.wait_for(future, queue_timeout + timeout + REQUEST_TIMEOUT_MARGIN)
+        except GameBrokerError as e:
+            logger.error(f"游戏连接代理拒绝命令: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"等待游戏连接代理结果失败，命令可能已发出: {e!r}")
+            return {"status": "no_response", "message": "Command submitted to broker but no result received"}
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def get_status(self) -> Dict[str, Any]:
+        return await self.call("status")
+
+    async def call(self, op: str, params: Optional[Dict[str, Any]] = None, timeout: float = 10.0) -> Any:
+        """发送一条代理命令并等待结果"""
+        request_id, future = await self._submit(op, params)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def _submit(self, op: str, params: Optional[Dict[str, Any]]) -> Tuple[int, asyncio.Future]:
+        """写入一条代理命令，返回 (请求 id, 结果 future)；连接或写入失败时抛出异常"""
+        await self._ensure_connected()
+        self._next_id += 1
+        request_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            self._writer.write(encode_frame({"id": request_id, "op": op, **(params or {})}))
+            await self._writer.drain()
+        except BaseException:
+            self._pending.pop(request_id, None)
+            raise
+        return request_id, future
+
+    def start_event_listener(
+        self,
+        callback: Callable[[dict], None],
+        app_callback: Optional[Callable[[dict], None]] = None,
+        on_subscribed: Optional[Callable[[], None]] = None
+    ):
+        """
+        订阅代理推送的事件，断开后自动重连
+        - callback: 游戏服务器响应（用于推送给在线管理员）
+        - app_callback: 其他工作进程发布的应用事件（见 publish_event）
+        - on_subscribed: 每次（重新）订阅成功后调用；断开期间的应用事件会丢失，调用方可在此清空本地缓存
+        """
+        self._loop = asyncio.get_running_loop()
+        if self._event_task is None:
+            self._event_task = asyncio.create_task(self._event_loop(callback, app_callback, on_subscribed))
+
+    def publish_event(self, event: Dict[str, Any]):
+        """
+        通过代理把应用事件转发给其他工作进程（线程安全，不等待结果）
+        需要先调用 start_event_listener；代理不可用时丢弃事件并记录日志
+        """
+        loop = self._loop
+        if not loop or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(self._start_publish, {**event, "origin": self.instance_id})
+        except RuntimeError:
+            # 事件循环已关闭
+            pass
+
+    def _start_publish(self, event: Dict[str, Any]):
+        task = asyncio.ensure_future(self._publish(event))
+        # 保留任务引用，避免执行中被回收
+        self._publish_tasks.add(task)
+        task.add_done_callback(self._publish_tasks.discard)
+
+    async def _publish(self, event: Dict[str, Any]):
+        try:
+            await self.call("publish", {"event": event}, timeout=REQUEST_TIMEOUT_MARGIN)
+        except Exception as e:
+            logger.warning(f"通过游戏连接代理转发事件失败: {e}")
+
+    async def close(self):
+        for task in (self._event_task, self._reader_task, *self._publish_tasks):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._event_task = None
+        self._reader_task = None
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+
+    async def _ensure_connected(self):
+        if self.connected:
+            return
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self.connected:
+                return
+            reader, self._writer = await open_connection(self.address)
+            self._reader_task = asyncio.create_task(self._read_loop(reader, self._writer))
+
+    async def _read_loop(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                frame = await read_frame(reader)
+                if frame is None:
+                    break
+                future = self._pending.get(frame.get("id"))
+                if future is None or future.done():
+                    continue
+                if frame.get("ok"):
+                    future.set_result(frame.get("result"))
+                else:
+                    future.set_exception(GameBrokerError(frame.get("error")))
+        except (ConnectionError, ValueError) as e:
+            logger.warning(f"与游戏连接代理的连接异常: {e}")
+        finally:
+            writer.close()
+            if self._writer is writer:
+                self._writer = None
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("与游戏连接代理的连接已断开"))
+
+    async def _event_loop(
+        self,
+        callback: Callable[[dict], None],
+        app_callback: Optional[Callable[[dict], None]],
+        on_subscribed: Optional[Callable[[], None]]
+    ):
+        while True:
+            writer = None
+            try:
+                reader, writer = await open_connection(self.address)
+                writer.write(encode_frame({"id": 0, "op": "subscribe"}))
+                await writer.drain()
+                while True:
+                    frame = await read_frame(reader)
+                    if frame is None:
+                        break
+                    if frame.get("id") == 0 and frame.get("ok"):
+                        # 代理已登记订阅
+                        if on_subscribed:
+                            on_subscribed()
+                    elif "event" in frame:
+                        callback(frame["event"])
+                    elif "app_event" in frame and app_callback:
+                        event = frame["app_event"] or {}
+                        if event.get("origin") != self.instance_id:
+                            app_callback(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"游戏事件订阅断开: {e}")
+            finally:
+                if writer:
+                    writer.close()
+            await asyncio.sleep(RECONNECT_DELAY)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GMTools 游戏连接代理")
+    parser.add_argument(
+        "--address", type=str, default=GAME_BROKER_ADDRESS or DEFAULT_BROKER_ADDRESS,
+        help="监听地址：Unix socket 路径或 host:port"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    try:
+        asyncio.run(GameBroker(args.address).run())
+    except KeyboardInterrupt:
+        logger.info("游戏连接代理已停止")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+游戏服务器连接的公共部分
+响应分发器、发送命令并收集响应、GM 账号登录，API 服务进程和游戏连接代理进程共用
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from typing import Dict, Any, Union, Optional
+
+from config.settings import GAME_COMMAND_QUEUE_TIMEOUT
+from services.event_hub import event_hub, TOPIC_GAME
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseDispatcher:
+    """
+    响应分发器 - 支持收集所有响应
+    游戏服务器的响应不带请求标识、账号或命令序号，无法与命令对应，因此同一连接上的命令由
+    send_and_collect 持有 lock 逐条发送，同一时间只有一个收集器，多个请求（或代理进程中多个
+    API 工作进程）的响应不会互相混入。排队时间单独计算并有上限（GAME_COMMAND_QUEUE_TIMEOUT），
+    排队超时的命令不发送，调用方的延迟有界
+    """
+    def __init__(self):
+        self.listeners: Dict[int, asyncio.Future] = {}  # 单序号监听器
+        self.collectors: Dict[str, Dict[str, Any]] = {}  # 响应收集器 {request_id: {responses: [], event: Event}}
+        self.lock = asyncio.Lock()  # 发送命令并收集响应的互斥锁
+        self.loop = None
+
+    def register(self, seq_no: int) -> asyncio.Future:
+        """注册等待特定序号的响应（用于登录等特定场景）"""
+        future = self.loop.create_future()
+        self.listeners[seq_no] = future
+        return future
+
+    def register_collector(self, request_id: str) -> str:
+        """注册响应收集器，返回 request_id"""
+        if request_id not in self.collectors:
+            self.collectors[request_id] = {
+                'responses': [],
+                'event': asyncio.Event(),
+                'start_time': time.time()  # 记录创建时间
+            }
+        return request_id
+
+    def get_collected_responses(self, request_id: str) -> list:
+        """获取收集到的所有响应"""
+        if request_id in self.collectors:
+            responses = self.collectors[request_id]['responses']
+            del self.collectors[request_id]
+            return responses
+        return []
+
+    def cancel(self, seq_no: int, future: asyncio.Future):
+        """取消等待"""
+        if seq_no in self.listeners and self.listeners[seq_no] is future:
+            del self.listeners[seq_no]
+
+    def cancel_collector(self, request_id: str):
+        """取消收集器"""
+        if request_id in self.collectors:
+            del self.collectors[request_id]
+
+    def has_active_collectors(self) -> bool:
+        """检查是否有活跃的收集器（表示正在处理API请求）"""
+        return len(self.collectors) > 0
+
+    def get_collector_event(self, request_id: str) -> asyncio.Event:
+        """获取收集器的事件对象"""
+        if request_id in self.collectors:
+            return self.collectors[request_id]['event']
+        return None
+
+    def dispatch(self, data: dict):
+        """分发收到的数据 (线程安全)"""
+        seq_no = data.get("seq_no")
+        current_time = time.time()
+
+        # 1. 处理单序号监听器（用于登录等）
+        if seq_no in self.listeners:
+            future = self.listeners[seq_no]
+            if not future.done():
+                self.loop.call_soon_threadsafe(future.set_result, data)
+            del self.listeners[seq_no]
+
+        # 2. 将响应添加到所有活跃的收集器（但只添加到创建时间之后的响应）
+        for request_id, collector in list(self.collectors.items()):
+            # 只添加在收集器创建之后到达的响应（允许0.1秒的缓冲）
+            if current_time >= collector['start_time'] - 0.1:
+                collector['responses'].append(data)
+                # 触发事件通知有新响应
+                self.loop.call_soon_threadsafe(collector['event'].set)
+
+        # 3. 推送给在线管理员
+        if event_hub.has_admin_subscribers():
+            event_hub.publish_to_admins(TOPIC_GAME, data)
+
+
+async def send_and_collect(
+    client,
+    dispatcher: ResponseDispatcher,
+    seq_no: int,
+    content: str,
+    account: str,
+    timeout: float = 3.0,
+    queue_timeout: Optional[float] = GAME_COMMAND_QUEUE_TIMEOUT
+) -> Union[bool, Dict[str, Any], list]:
+    """
+    发送命令到服务器并收集所有响应
+    同一分发器上的命令逐条执行（见 ResponseDispatcher），等待前一条命令收集完响应后再发送
+    :param timeout: 发送后等待响应的时间（秒），不含排队时间
+    :param queue_timeout: 排队等待的上限（秒），None 表示不限制
+    :return: 成功返回响应列表，未发出（发送失败或排队超时）返回 False，发出后超时返回 no_response 状态
+    """
+    if dispatcher is None:
+        return await _send_and_collect(client, dispatcher, seq_no, content, account, timeout)
+    try:
+        await asyncio.wait_for(dispatcher.lock.acquire(), timeout=queue_timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"命令排队超过 {queue_timeout} 秒，未发送 (seq_no={seq_no})")
+        return False
+    try:
+        return await _send_and_collect(client, dispatcher, seq_no, content, account, timeout)
+    finally:
+        dispatcher.lock.release()
+
+
+async def _send_and_collect(
+    client,
+    dispatcher: ResponseDispatcher,
+    seq_no: int,
+    content: str,
+    account: str,
+    timeout: float
+) -> Union[bool, Dict[str, Any], list]:
+    try:
+        # 生成唯一的请求ID
+        request_id = str(uuid.uuid4())
+
+        # 注册响应收集器
+        if dispatcher:
+            dispatcher.register_collector(request_id)
+
+        # 使用 asyncio.to_thread 将阻塞的 send 调用放入线程池
+        result = await asyncio.to_thread(client.send, seq_no, content, account)
+
+        if not result:
+            if dispatcher:
+                dispatcher.cancel_collector(request_id)
+            return False
+
+        # 等待响应收集
+        if dispatcher:
+            try:
+                # 获取事件对象
+                event = dispatcher.get_collector_event(request_id)
+                if not event:
+                    logger.error("无法获取收集器事件对象")
+                    return False
+
+                # 等待第一个响应（带超时）
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=timeout)
+
+                    # 收到第一个响应后，稍微等待一小会儿以收集可能的后续分包（针对多包响应）
+                    # 对于大多数单包响应，这只会增加极小的延迟(0.1s)
+                    await asyncio.sleep(0.1)
+
+                except asyncio.TimeoutError:
+                    # 超时未收到任何响应
+                    logger.warning(f"在 {timeout} 秒内未收到任何响应 (seq_no={seq_no})")
+                    dispatcher.cancel_collector(request_id)
+                    return {"status": "no_response", "message": "Command sent but no response received"}
+
+                # 获取收集到的所有响应
+                responses = dispatcher.get_collected_responses(request_id)
+
+                if responses:
+                    # 返回所有响应
+                    return responses
+                else:
+                    # 理论上不应执行到这里，除非 event 被错误触发
+                    return {"status": "no_response", "message": "Event triggered but no responses found"}
+
+            except Exception as e:
+                logger.error(f"收集响应异常: {e}")
+                dispatcher.cancel_collector(request_id)
+                return {"status": "error", "message": str(e)}
+
+        return True
+    except Exception as e:
+        logger.exception(f"发送命令失败: {e}")
+        return False
+
+
+async def login_gm(client, dispatcher: ResponseDispatcher, account: str, password: str) -> bool:
+    """登录 GM 账号并等待登录结果（成功序号 7，失败序号 999）"""
+    logger.info(f"正在尝试登录 GM 账号: {account}...")
+
+    # 注册登录响应监听
+    login_future = dispatcher.register(7) # 登录成功
+    login_fail_future = dispatcher.register(999) # 登录失败
+    success = False
+
+    # 发送登录请求
+    if client.send_login(account, password):
+        try:
+            # 等待登录响应，超时时间 10 秒
+            done, pending = await asyncio.wait(
+                [login_future, login_fail_future],
+                return_when=asyncio.FIRST_COMPLETED,
+                timeout=10.0
+            )
+
+            if login_future in done:
+                logger.info(f"GM 账号登录验证通过")
+                success = True
+            elif login_fail_future in done:
+                logger.warning(f"警告: GM 账号登录失败")
+            else:
+                logger.warning("警告: 登录响应超时")
+
+        except Exception as e:
+             logger.error(f"登录过程异常: {e}")
+    else:
+        logger.error("错误: 发送登录请求失败")
+
+    # 清理未完成的 future
+    dispatcher.cancel(7, login_future)
+    dispatcher.cancel(999, login_fail_future)
+    return success
@@ -9,7 +9,7 @@
 3. 发送执行
 """
 
-from typing import Tuple, Dict, List
+from typing import Tuple, Dict, List, Optional
 from database.item_gift import ItemConfig, ItemLevelLimit, ItemGiftLog
 from database.models import User
 import logging
@@ -20,6 +20,79 @@ logger = logging.getLogger(__name__)
 class ItemGiftService:
     """道具赠送服务"""
     
+    @staticmethod
+    def _evaluate_gift(
+        sender_username: str,
+        sender_level: int,
+        item_name: str,
+        quantity: int,
+        is_admin: bool = False
+    ) -> Tuple[bool, str, Optional[ItemConfig], Optional[ItemLevelLimit]]:
+        """
+        检查道具赠送权限，并返回检查过程中查到的道具配置和等级限制供后续复用
+        
+        Returns:
+            (是否允许, 错误信息或成功提示, 道具配置, 等级限制)
+        """
+        # 1. 管理员豁免所有限制
+        if is_admin:
+            logger.info(f"管理员 {sender_username} 发送 {item_name} x{quantity} - 豁免检查")
+            return True, "管理员无限制", None, None
+        
+        # 2. 检查道具是否在白名单
+        item_config = ItemConfig.get_by_name(item_name)
+        if not item_config:
+            logger.warning(f"道具不存在: {item_name}")
+            return False, f"道具 '{item_name}' 不存在", None, None
+        
+        if not item_config.is_active:
+            logger.warning(f"道具已禁用: {item_name}")
+            return False, f"道具 '{item_name}' 已被禁用，无法发送", item_config, None
+        
+        # 3. 获取等级限制配置
+        limit = ItemLevelLimit.get_limit(item_name, sender_level)
+        if not limit:
+            logger.warning(f"等级 {sender_level} 无权发送道具: {item_name}")
+            return False, f"您的等级 (Level {sender_level}) 无权发送道具 '{item_config.display_name}'", item_config, None
+        
+        # 4. 检查数量范围
+        if quantity < limit.min_quantity:
+            return False, f"发送数量不能少于 {limit.min_quantity} 个", item_config, limit
+        
+        if quantity > limit.max_quantity:
+            return False, f"发送数量不能超过 {limit.max_quantity} 个", item_config, limit
+        
+        # 5. 检查周期配额
+        period_used = ItemGiftLog.get_period_usage(
+            sender_username, 
+            item_name, 
+            limit.reset_period_hours
+        )
+        
+        remaining = limit.period_total_limit - period_used
+        if quantity > remaining:
+            return False, ItemGiftService._quota_message(limit, period_used), item_config, limit
+        
+        # 6. 所有检查通过
+        logger.info(
+            f"权限检查通过: {sender_username} (L{sender_level}) "
+            f"可发送 {item_name} x{quantity}, "
+            f"剩余配额: {remaining - quantity}/{limit.period_total_limit}"
+        )
+        
+        return True, "检查通过", item_config, limit
+    
+    @staticmethod
+    def _quota_message(limit: ItemLevelLimit, period_used: int) -> str:
+        """超出周期配额的提示信息"""
+        return (
+            f"超出周期配额限制。"
+            f"周期：{limit.reset_period_hours}小时，"
+            f"总量限制：{limit.period_total_limit}，"
+            f"已使用：{period_used}，"
+            f"剩余：{limit.period_total_limit - period_used}"
+        )
+    
     @staticmethod
     def check_gift_permission(
         sender_username: str,
@@ -42,59 +115,10 @@ class ItemGiftService:
             (是否允许, 错误信息或成功提示)
         """
         try:
-            # 1. 管理员豁免所有限制
-            if is_admin:
-                logger.info(f"管理员 {sender_username} 发送 {item_name} x{quantity} - 豁免检查")
-                return True, "管理员无限制"
-            
-            # 2. 检查道具是否在白名单
-            item_config = ItemConfig.get_by_name(item_name)
-            if not item_config:
-                logger.warning(f"道具不存在: {item_name}")
-                return False, f"道具 '{item_name}' 不存在"
-            
-            if not item_config.is_active:
-                logger.warning(f"道具已禁用: {item_name}")
-                return False, f"道具 '{item_name}' 已被禁用，无法发送"
-            
-            # 3. 获取等级限制配置
-            limit = ItemLevelLimit.get_limit(item_name, sender_level)
-            if not limit:
-                logger.warning(f"等级 {sender_level} 无权发送道具: {item_name}")
-                return False, f"您的等级 (Level {sender_level}) 无权发送道具 '{item_config.display_name}'"
-            
-            # 4. 检查数量范围
-            if quantity < limit.min_quantity:
-                return False, f"发送数量不能少于 {limit.min_quantity} 个"
-            
-            if quantity > limit.max_quantity:
-                return False, f"发送数量不能超过 {limit.max_quantity} 个"
-            
-            # 5. 检查周期配额
-            period_used = ItemGiftLog.get_period_usage(
-                sender_username, 
-                item_name, 
-                limit.reset_period_hours
+            can_send, message, _, _ = ItemGiftService._evaluate_gift(
+                sender_username, sender_level, item_name, quantity, is_admin
             )
-            
-            remaining = limit.period_total_limit - period_used
-            if quantity > remaining:
-                return False, (
-                    f"超出周期配额限制。"
-                    f"周期：{limit.reset_period_hours}小时，"
-                    f"总量限制：{limit.period_total_limit}，"
-                    f"已使用：{period_used}，"
-                    f"剩余：{remaining}"
-                )
-            
-            # 6. 所有检查通过
-            logger.info(
-                f"权限检查通过: {sender_username} (L{sender_level}) "
-                f"可发送 {item_name} x{quantity}, "
-                f"剩余配额: {remaining - quantity}/{limit.period_total_limit}"
-            )
-            
-            return True, "检查通过"
+            return can_send, message
             
         except Exception as e:
             logger.error(f"权限检查异常: {e}", exc_info=True)
@@ -125,7 +149,7 @@ class ItemGiftService:
         """
         try:
             # 1. 权限检查
-            can_send, message = ItemGiftService.check_gift_permission(
+            can_send, message, item_config, limit = ItemGiftService._evaluate_gift(
                 sender_username, 
                 sender_level, 
                 item_name, 
@@ -136,26 +160,36 @@ class ItemGiftService:
             if not can_send:
                 return False, message
             
-            # 2. 获取限制配置（用于记录周期）
-            limit = ItemLevelLimit.get_limit(item_name, sender_level)
+            # 2. 记录发送日志（非管理员在同一事务中复核配额，避免并发发送超出配额）
             reset_period_hours = limit.reset_period_hours if limit else 24
-            
-            # 3. 记录发送日志
-            log = ItemGiftLog.create(
-                sender_username=sender_username,
-                sender_level=sender_level,
-                recipient_username=recipient_username,
-                item_name=item_name,
-                quantity=quantity,
-                reset_period_hours=reset_period_hours,
-                is_admin_send=is_admin
-            )
+            if limit:
+                log, period_used = ItemGiftLog.create_within_quota(
+                    sender_username=sender_username,
+                    sender_level=sender_level,
+                    recipient_username=recipient_username,
+                    item_name=item_name,
+                    quantity=quantity,
+                    reset_period_hours=reset_period_hours,
+                    period_total_limit=limit.period_total_limit
+                )
+                if not log:
+                    return False, ItemGiftService._quota_message(limit, period_used)
+            else:
+                log = ItemGiftLog.create(
+                    sender_username=sender_username,
+                    sender_level=sender_level,
+                    recipient_username=recipient_username,
+                    item_name=item_name,
+                    quantity=quantity,
+                    reset_period_hours=reset_period_hours,
+                    is_admin_send=is_admin
+                )
             
             if not log:
                 logger.error(f"创建发送记录失败: {sender_username} -> {recipient_username}")
                 return False, "系统错误：记录发送失败"
             
-            # 4. 这里应该调用实际的游戏服务器API发送道具
+            # 3. 这里应该调用实际的游戏服务器API发送道具
             # TODO: 集成游戏服务器API
             # success = game_server.send_item(recipient_username, item_name, quantity)
             
@@ -165,7 +199,8 @@ class ItemGiftService:
                 f"{item_name} x{quantity}"
             )
             
-            item_config = ItemConfig.get_by_name(item_name)
+            if item_config is None:
+                item_config = ItemConfig.get_by_name(item_name)
             display_name = item_config.display_name if item_config else item_name
             
             return True, f"成功发送 {display_name} x{quantity} 给 {recipient_username}"
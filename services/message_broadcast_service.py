@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+消息群发后台任务
+管理员向大量用户群发消息时，在后台线程中执行批量写入，
+前端通过任务ID轮询进度和结果
+
+任务状态保存在 message_broadcast_jobs 表中，多个工作进程时轮询请求落到任何进程都能查到。
+批量写入在一个事务中完成、期间持有写锁，执行中的进度只在执行任务的进程内存中更新，
+其他进程查询时进度停留在开始执行时，任务结束后写入最终结果
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+import uuid
+from typing import Optional, List, Dict, Any
+
+from database.connection import db
+from database.models import Message
+
+logger = logging.getLogger(__name__)
+
+
+class MessageBroadcastJobs:
+    """群发任务登记表"""
+
+    # 已结束任务的保留时间（秒）
+    RETENTION_SECONDS = 3600
+
+    # 本进程执行中的任务（实时进度）
+    _jobs: Dict[str, Dict[str, Any]] = {}
+    _tasks: set = set()
+    _lock = threading.Lock()
+
+    @classmethod
+    def submit(cls, sender_id: Optional[int], sender_name: str, recipient_ids: List[int],
+               title: str, content: str) -> Dict[str, Any]:
+        """
+        提交群发任务，立即返回任务信息
+        必须在事件循环中调用
+        """
+        cls._cleanup()
+        job_id = uuid.uuid4().hex
+        job = {
+            'job_id': job_id,
+            'sender_id': sender_id,
+            'status': 'pending',
+            'total': len(set(recipient_ids)),
+            'processed': 0,
+            'sent_count': 0,
+            'failed_user_ids': [],
+            'error': None,
+            'created_at': time.time(),
+            'finished_at': None
+        }
+        cls._save(job)
+        with cls._lock:
+            cls._jobs[job_id] = job
+
+        task = asyncio.get_running_loop().create_task(
+            cls._run(job_id, sender_id, sender_name, recipient_ids, title, content)
+        )
+        # 保留任务引用，避免执行中被回收
+        cls._tasks.add(task)
+        task.add_done_callback(cls._tasks.discard)
+        logger.info(f"提交群发任务: {job_id}, 收件人 {job['total']} 位")
+        return cls.get(job_id)
+
+    @classmethod
+    def get(cls, job_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务状态快照（本进程执行中的任务取内存中的实时进度，否则查询任务表）"""
+        with cls._lock:
+            job = cls._jobs.get(job_id)
+            snapshot = dict(job) if job else None
+            if snapshot:
+                snapshot['failed_user_ids'] = list(job['failed_user_ids'])
+        if snapshot is None:
+            snapshot = cls._load(job_id)
+            if snapshot is None:
+                return None
+        snapshot['progress'] = round(snapshot['processed'] / snapshot['total'] * 100, 1) if snapshot['total'] else 100.0
+        return snapshot
+
+    @classmethod
+    async def _run(cls, job_id: str, sender_id: Optional[int], sender_name: str,
+                   recipient_ids: List[int], title: str, content: str):
+        def on_progress(processed: int, total: int):
+            with cls._lock:
+                cls._jobs[job_id]['processed'] = processed
+
+        try:
+            await cls._update(job_id, status='running')
+            try:
+                sent_count, missing_ids = await asyncio.to_thread(
+                    Message.create_bulk, sender_id, sender_name, recipient_ids, title, content, on_progress
+                )
+                await cls._update(
+                    job_id, status='completed', sent_count=sent_count,
+                    failed_user_ids=missing_ids, finished_at=time.time()
+                )
+                logger.info(f"群发任务完成: {job_id}, 成功 {sent_count}, 失败 {len(missing_ids)}")
+            except Exception as e:
+                await cls._update(job_id, status='failed', error=str(e), finished_at=time.time())
+                logger.error(f"群发任务失败: {job_id}, {e}")
+        except Exception as e:
+            # 任务表写入失败
+            logger.error(f"保存群发任务状态失败: {job_id}, {e}")
+        finally:
+            with cls._lock:
+                cls._jobs.pop(job_id, None)
+
+    @classmethod
+    async def _update(cls, job_id: str, **fields):
+        with cls._lock:
+            job = cls._jobs[job_id]
+            job.update(fields)
+            snapshot = dict(job)
+        await asyncio.to_thread(cls._save, snapshot)
+
+    @staticmethod
+    def _save(job: Dict[str, Any]):
+        """写入任务状态（新增或覆盖）"""
+        with db.get_cursor() as cursor:
+            cursor.execute("""
+                INSERT OR REPLACE INTO message_broadcast_jobs
+                    (job_id, sender_id, status, total, processed, sent_count, failed_user_ids, error, created_at, finished_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                job['job_id'], job['sender_id'], job['status'], job['total'], job['processed'], job['sent_count'],
+                json.dumps(job['failed_user_ids']), job['error'], job['created_at'], job['finished_at']
+            ))
+
+    @staticmethod
+    def _load(job_id: str) -> Optional[Dict[str, Any]]:
+        """从任务表读取任务状态"""
+        try:
+            with db.get_cursor() as cursor:
+                cursor.execute("SELECT * FROM message_broadcast_jobs WHERE job_id = ?", (job_id,))
+                row = cursor.fetchone()
+        except Exception as e:
+            logger.error(f"查询群发任务失败: {e}")
+            return None
+        if not row:
+            return None
+        job = dict(row)
+        job['failed_user_ids'] = json.loads(job['failed_user_ids'] or '[]')
+        return job
+
+    @classmethod
+    def _cleanup(cls):
+        """清理过期的已结束任务"""
+        try:
+            with db.get_cursor() as cursor:
+                cursor.execute(
+                    "DELETE FROM message_broadcast_jobs WHERE finished_at < ?",
+                    (time.time() - cls.RETENTION_SECONDS,)
+                )
+        except Exception as e:
+            logger.error(f"清理群发任务失败: {e}")
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+活动奖励异步发放服务
+从 activity_reward_deliveries 队列中批量领取待发放奖励，
+通过游戏连接发送，失败时按指数退避重试并回写参与记录状态
+"""
+
+import asyncio
+import logging
+from typing import Optional, Dict, Any
+
+from database.activity_models import DELIVERY_DELIVERED, DELIVERY_RETRY
+
+logger = logging.getLogger(__name__)
+
+
+class RewardDeliveryWorker:
+    """奖励发放后台任务"""
+
+    def __init__(
+        self,
+        activity_manager,
+        concurrency: int = 4,
+        batch_size: int = 20,
+        poll_interval: float = 2.0,
+        max_attempts: int = 5,
+        base_backoff: float = 2.0,
+        max_backoff: float = 300.0,
+        lease_seconds: float = 60.0
+    ):
+        """
+        初始化发放任务
+        :param activity_manager: ActivityManager 实例
+        :param concurrency: 同时发送的奖励数量
+        :param batch_size: 每次从队列领取的数量
+        :param poll_interval: 队列为空时的轮询间隔（秒）
+        :param max_attempts: 最大自动重试次数，超过后标记为待补发
+        :param base_backoff: 首次重试等待时间（秒），之后按指数增长
+        :param max_backoff: 最长重试等待时间（秒）
+        :param lease_seconds: 租约时间（秒），领取时和每次发送前设置，需大于单次发送的最长耗时（含排队）
+        """
+        self.activity_manager = activity_manager
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.lease_seconds = lease_seconds
+
+        self.delivered_count = 0
+        self.failed_count = 0
+        self.retry_count = 0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    def start(self):
+        """在当前事件循环中启动发放任务"""
+        if self._task and not self._task.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = self._loop.create_task(self._run())
+        self.activity_manager.set_delivery_listener(self.notify)
+        logger.info("奖励发放任务已启动")
+
+    async def stop(self):
+        """停止发放任务，等待当前批次完成"""
+        self._stopping = True
+        self.activity_manager.set_delivery_listener(None)
+        if self._wakeup:
+            self._wakeup.set()
+        if self._task:
+            try:
+                await self._task
+            except Exception as e:
+                logger.error(f"奖励发放任务退出异常: {e}")
+            self._task = None
+        logger.info("奖励发放任务已停止")
+
+    def notify(self):
+        """通知有新的待发放奖励 (线程安全)"""
+        if self._loop and self._wakeup and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取发放统计"""
+        return {
+            "running": bool(self._task and not self._task.done()),
+            "delivered": self.delivered_count,
+            "failed": self.failed_count,
+            "retried": self.retry_count
+        }
+
+    async def _run(self):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                batch = await asyncio.to_thread(
+                    self.activity_manager.claim_deliveries, self.batch_size, self.lease_seconds
+                )
+            except Exception as e:
+                logger.error(f"领取待发放奖励失败: {e}")
+                batch = []
+
+            if batch:
+                await asyncio.gather(*(self._deliver(item, semaphore) for item in batch))
+                # 满批说明可能还有积压，立即继续
+                if len(batch) >= self.batch_size:
+                    continue
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _deliver(self, item: Dict[str, Any], semaphore: asyncio.Semaphore):
+        async with semaphore:
+            # 在信号量上等待期间租约可能已过期并被其他进程重新领取，发送前续约，续约失败则不再发送
+            try:
+                lease = await asyncio.to_thread(
+                    self.activity_manager.renew_delivery, item['id'], item['locked_until'], self.lease_seconds
+                )
+            except Exception as e:
+                logger.error(f"续约待发放奖励失败: {e}")
+                return
+            if lease is None:
+                logger.warning(f"发放租约已失效，跳过发送: participation_id={item['participation_id']}")
+                return
+
+            try:
+                outcome = await self.activity_manager.send_reward(item['game_id'], item['reward_value'])
+            except Exception as e:
+                logger.error(f"发放奖励异常: {e}")
+                outcome = DELIVERY_RETRY
+
+        try:
+            if outcome == DELIVERY_DELIVERED:
+                if not await asyncio.to_thread(
+                    self.activity_manager.complete_delivery, item['id'], item['participation_id'], lease
+                ):
+                    return
+                self.delivered_count += 1
+                logger.info(f"奖励发放成功: participation_id={item['participation_id']}, game_id={item['game_id']}")
+                return
+
+            attempts = item['attempts'] + 1
+            if outcome == DELIVERY_RETRY and attempts < self.max_attempts:
+                retry_after = min(self.base_backoff * (2 ** (attempts - 1)), self.max_backoff)
+                if not await asyncio.to_thread(
+                    self.activity_manager.fail_delivery, item['id'], item['participation_id'],
+                    outcome, retry_after, lease
+                ):
+                    return
+                self.retry_count += 1
+                logger.warning(
+                    f"奖励发放失败，{retry_after:.0f} 秒后重试 ({attempts}/{self.max_attempts}): "
+                    f"participation_id={item['participation_id']}"
+                )
+            else:
+                if not await asyncio.to_thread(
+                    self.activity_manager.fail_delivery, item['id'], item['participation_id'],
+                    outcome, None, lease
+                ):
+                    return
+                self.failed_count += 1
+                logger.error(f"奖励发放失败，已标记为待补发: participation_id={item['participation_id']}")
+        except Exception as e:
+            logger.error(f"更新发放状态失败: {e}")
@@ -8,8 +8,12 @@ GMTools - Discord风格主窗口（精简版）
 - 优化自定义标题栏
 - 支持在顶部栏和服务器栏拖动移动窗口
 - 玩家ID历史记录支持单项删除和全部清空
+- 功能页面在第一次打开时才导入和创建，API 服务（FastAPI）在首次使用或窗口显示后才加载
 """
 
+import importlib
+import sys
+
 from PyQt6.QtWidgets import (
     QMainWindow,
     QWidget,
@@ -24,8 +28,7 @@ from PyQt6.QtWidgets import (
     QComboBox,
     QListView,
     QStyledItemDelegate,
-    QListWidget,
-    QListWidgetItem,
+    QStyle,
     QSizePolicy,
     QMenu,
 )
@@ -38,17 +41,22 @@ from PyQt6.QtCore import (
     QRect,
     QAbstractListModel,
     QSize,
+    QTimer,
 )
-from PyQt6.QtGui import QFont, QColor, QPen, QPainter
+from PyQt6.QtGui import QFont, QColor, QPen, QPainter, QCursor
+
+from ui.list_models import KeyedListModel
+from ui.response_pipeline import ResponsePipeline
 
-from modules.account_recharge_module import AccountRechargeModule
-from modules.game_module import GameModule
-from modules.character_module import CharacterModule
-from modules.pet_module import PetModule
-from modules.gift_module import GiftModule
-from modules.equipment_module import EquipmentModule
-from modules.api_manager import APIManager
-from ui.api_service_page import APIServicePage
+# 功能页面：(面包屑名称, 模块路径, 类名)，顺序与服务器栏按钮一致
+MODULE_PAGES = [
+    ("账号充值", "modules.account_recharge_module", "AccountRechargeModule"),
+    ("游戏管理", "modules.game_module", "GameModule"),
+    ("角色管理", "modules.character_module", "CharacterModule"),
+    ("宝宝管理", "modules.pet_module", "PetModule"),
+    ("赠送道具", "modules.gift_module", "GiftModule"),
+    ("定制装备", "modules.equipment_module", "EquipmentModule"),
+]
 
 
 class ServerButton(QPushButton):
@@ -330,56 +338,78 @@ class WindowControls(QFrame):
         self.is_maximized = not self.is_maximized
 
 
-class HistoryItemWidget(QWidget):
-    """历史记录项Widget - 包含文本和删除按钮"""
+class HistoryItemDelegate(QStyledItemDelegate):
+    """历史记录项绘制 - 左侧玩家ID，右侧删除按钮"""
 
     delete_clicked = pyqtSignal(str)
     item_clicked = pyqtSignal(str)
 
-    def __init__(self, text, parent=None):
-        super().__init__(parent)
-        self.text = text
-        self.setup_ui()
+    ROW_HEIGHT = 28
+    DELETE_SIZE = 20
 
-    def setup_ui(self):
-        layout = QHBoxLayout(self)
-        layout.setContentsMargins(8, 4, 4, 4)
-        layout.setSpacing(4)
+    def _delete_rect(self, rect: QRect) -> QRect:
+        return QRect(
+            rect.right() - 4 - self.DELETE_SIZE,
+            rect.center().y() - self.DELETE_SIZE // 2,
+            self.DELETE_SIZE,
+            self.DELETE_SIZE,
+        )
 
-        # ID文本
-        self.label = QLabel(self.text)
-        self.label.setStyleSheet("color: white; padding: 2px;")
-        self.label.setCursor(Qt.CursorShape.PointingHandCursor)
-        layout.addWidget(self.label, 1)
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), self.ROW_HEIGHT)
 
-        # 删除按钮
-        self.delete_btn = QPushButton("×")
-        self.delete_btn.setFixedSize(20, 20)
-        self.delete_btn.setCursor(Qt.CursorShape.PointingHandCursor)
-        self.delete_btn.setStyleSheet(
-            """
-            QPushButton {
-                background-color: transparent;
-                color: #72767D;
-                border: none;
-                font-size: 16px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                color: #ED4245;
-                background-color: rgba(237, 66, 69, 0.1);
-                border-radius: 4px;
-            }
-        """
+    def paint(self, painter, option, index):
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+
+        # 背景
+        if option.state & QStyle.StateFlag.State_Selected:
+            painter.fillRect(option.rect, QColor("#5865F2"))
+        elif option.state & QStyle.StateFlag.State_MouseOver:
+            painter.fillRect(option.rect, QColor("#40444b"))
+
+        # ID文本
+        painter.setPen(QPen(QColor("white")))
+        painter.setFont(option.font)
+        text_rect = option.rect.adjusted(10, 0, -(self.DELETE_SIZE + 8), 0)
+        painter.drawText(
+            text_rect,
+            Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft,
+            index.data(Qt.ItemDataRole.DisplayRole),
         )
-        self.delete_btn.clicked.connect(lambda: self.delete_clicked.emit(self.text))
-        layout.addWidget(self.delete_btn)
 
-    def mousePressEvent(self, event):
-        # 点击文本区域选择该项
-        if event.button() == Qt.MouseButton.LeftButton:
-            self.item_clicked.emit(self.text)
-        super().mousePressEvent(event)
+        # 删除按钮（鼠标悬停时变红）
+        delete_rect = self._delete_rect(option.rect)
+        delete_hovered = False
+        if option.widget is not None:
+            cursor_pos = option.widget.mapFromGlobal(QCursor.pos())
+            delete_hovered = delete_rect.contains(cursor_pos)
+        if delete_hovered:
+            painter.setBrush(QColor(237, 66, 69, 26))
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.drawRoundedRect(delete_rect, 4, 4)
+        delete_font = QFont(option.font)
+        delete_font.setPixelSize(16)
+        delete_font.setBold(True)
+        painter.setFont(delete_font)
+        painter.setPen(QPen(QColor("#ED4245" if delete_hovered else "#72767D")))
+        painter.drawText(delete_rect, Qt.AlignmentFlag.AlignCenter, "×")
+
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        # 点击删除按钮删除该项，点击其他位置选择该项
+        if (
+            event.type() == QEvent.Type.MouseButtonRelease
+            and event.button() == Qt.MouseButton.LeftButton
+        ):
+            text = index.data(Qt.ItemDataRole.DisplayRole)
+            if self._delete_rect(option.rect).contains(event.position().toPoint()):
+                self.delete_clicked.emit(text)
+            else:
+                self.item_clicked.emit(text)
+            return True
+        return super().editorEvent(event, model, option, index)
 
 
 class ClearAllWidget(QWidget):
@@ -433,34 +463,59 @@ class PlayerIDComboBox(QComboBox):
         self.setEditable(True)
         self.setMaxVisibleItems(11)  # 最多显示10个历史+1个清空按钮
 
-        # 创建自定义列表
-        self.list_widget = QListWidget()
-        self.list_widget.setWindowFlags(
+        # 自定义弹出列表：历史记录模型 + 清空按钮
+        # 弹出时按玩家ID与上次内容比较，只增删变化的行
+        self.popup = QFrame()
+        self.popup.setObjectName("PlayerIDPopup")
+        self.popup.setWindowFlags(
             Qt.WindowType.Popup | Qt.WindowType.FramelessWindowHint
         )
-        self.list_widget.setAttribute(Qt.WidgetAttribute.WA_WindowPropagation)
-        self.list_widget.setStyleSheet(
+        self.popup.setAttribute(Qt.WidgetAttribute.WA_WindowPropagation)
+        self.popup.setStyleSheet(
             """
-            QListWidget {
+            #PlayerIDPopup {
                 background-color: #202225;
                 border: 1px solid #5865F2;
                 border-radius: 4px;
-                padding: 4px;
-                outline: none;
             }
-            QListWidget::item {
+            QListView {
                 background-color: transparent;
-                padding: 0;
-                margin: 2px 0;
-            }
-            QListWidget::item:hover {
-                background-color: #40444b;
-            }
-            QListWidget::item:selected {
-                background-color: #5865F2;
+                border: none;
+                outline: none;
             }
         """
         )
+        popup_layout = QVBoxLayout(self.popup)
+        popup_layout.setContentsMargins(4, 4, 4, 4)
+        popup_layout.setSpacing(2)
+
+        self.history_model = KeyedListModel(parent=self)
+        self.history_view = QListView()
+        self.history_view.setModel(self.history_model)
+        self.history_view.setMouseTracking(True)
+        self.history_view.setUniformItemSizes(True)
+        self.history_view.setEditTriggers(QListView.EditTrigger.NoEditTriggers)
+        self.history_view.setVerticalScrollBarPolicy(
+            Qt.ScrollBarPolicy.ScrollBarAlwaysOff
+        )
+        self.history_delegate = HistoryItemDelegate(self.history_view)
+        self.history_delegate.delete_clicked.connect(self._on_delete_item)
+        self.history_delegate.item_clicked.connect(self._on_select_item)
+        self.history_view.setItemDelegate(self.history_delegate)
+        popup_layout.addWidget(self.history_view)
+
+        # 分隔线
+        separator = QFrame()
+        separator.setFixedHeight(1)
+        separator.setStyleSheet("background-color: #40444b;")
+        popup_layout.addWidget(separator)
+
+        # 清空全部按钮
+        self.clear_widget = ClearAllWidget()
+        self.clear_widget.clear_clicked.connect(self._on_clear_all)
+        popup_layout.addWidget(self.clear_widget)
+
+        self.popup.installEventFilter(self)
 
     def _get_parent_history(self):
         """获取父级ContentArea的历史记录
@@ -477,71 +532,40 @@ class PlayerIDComboBox(QComboBox):
 
         return parent._player_id_history
 
-    def _add_history_items(self, history: list):
-        """添加历史记录项到列表
-
-        Args:
-            history: 历史记录列表
+    def _refresh_history(self, history: list) -> bool:
         """
-        for player_id in history[:10]:  # 最多显示10个
-            item = QListWidgetItem(self.list_widget)
-            widget = HistoryItemWidget(player_id)
-            widget.delete_clicked.connect(self._on_delete_item)
-            widget.item_clicked.connect(self._on_select_item)
-            item.setSizeHint(widget.sizeHint())
-            self.list_widget.addItem(item)
-            self.list_widget.setItemWidget(item, widget)
-
-    def _add_separator_and_clear_button(self):
-        """添加分隔线和清空按钮"""
-        # 分隔线
-        separator_item = QListWidgetItem(self.list_widget)
-        separator_widget = QWidget()
-        separator_widget.setFixedHeight(1)
-        separator_widget.setStyleSheet("background-color: #40444b;")
-        separator_item.setSizeHint(QSize(0, 1))
-        self.list_widget.addItem(separator_item)
-        self.list_widget.setItemWidget(separator_item, separator_widget)
+        按当前历史记录更新弹出列表
 
-        # 清空全部按钮
-        clear_item = QListWidgetItem(self.list_widget)
-        clear_widget = ClearAllWidget()
-        clear_widget.clear_clicked.connect(self._on_clear_all)
-        clear_item.setSizeHint(clear_widget.sizeHint())
-        self.list_widget.addItem(clear_item)
-        self.list_widget.setItemWidget(clear_item, clear_widget)
+        Returns:
+            是否还有历史记录
+        """
+        player_ids = list(dict.fromkeys(history[:10]))  # 最多显示10个
+        self.history_model.update_rows([(player_id, player_id) for player_id in player_ids])
+        self.history_view.setFixedHeight(
+            HistoryItemDelegate.ROW_HEIGHT * max(1, len(player_ids))
+        )
+        return bool(player_ids)
 
     def _position_and_show_popup(self):
         """计算位置并显示弹出列表"""
-        self.list_widget.resize(
-            self.width(),
-            min(
-                300, self.list_widget.sizeHintForRow(0) * (self.list_widget.count() + 1)
-            ),
-        )
+        self.popup.resize(self.width(), min(300, self.popup.sizeHint().height()))
         pos = self.mapToGlobal(self.rect().bottomLeft())
-        self.list_widget.move(pos)
-        self.list_widget.show()
-        self.list_widget.installEventFilter(self)
+        self.popup.move(pos)
+        self.popup.show()
 
     def showPopup(self):
-        """显示自定义弹出列表 - 重构后的简化版本"""
+        """显示自定义弹出列表"""
         history = self._get_parent_history()
         if not history:
             return
 
-        self.list_widget.clear()
-        self._add_history_items(history)
-
-        if history:
-            self._add_separator_and_clear_button()
-
+        self._refresh_history(history)
         self._position_and_show_popup()
 
     def _on_select_item(self, text):
         """选择历史记录项"""
         self.setCurrentText(text)
-        self.list_widget.hide()
+        self.popup.hide()
 
     def _on_delete_item(self, text):
         """删除历史记录项"""
@@ -553,11 +577,11 @@ class PlayerIDComboBox(QComboBox):
         if parent and hasattr(parent, "_remove_player_id_from_history"):
             parent._remove_player_id_from_history(text)
             self.item_deleted.emit(text)
-            # 刷新列表
-            self.list_widget.hide()
-            from PyQt6.QtCore import QTimer
-
-            QTimer.singleShot(100, self.showPopup)
+            # 原地刷新列表（只删除这一行），没有剩余记录时关闭
+            if self._refresh_history(parent._player_id_history):
+                self.popup.resize(self.width(), min(300, self.popup.sizeHint().height()))
+            else:
+                self.popup.hide()
 
     def _on_clear_all(self):
         """清空所有历史记录"""
@@ -569,21 +593,22 @@ class PlayerIDComboBox(QComboBox):
         if parent and hasattr(parent, "_clear_player_id_history"):
             parent._clear_player_id_history()
             self.history_cleared.emit()
-            self.list_widget.hide()
+            self._refresh_history([])
+            self.popup.hide()
 
     def eventFilter(self, obj, event):
         """事件过滤器 - 处理点击外部关闭下拉列表"""
-        if obj == self.list_widget:
+        if obj == self.popup:
             if event.type() == QEvent.Type.MouseButtonPress:
-                if not self.list_widget.rect().contains(event.pos()):
-                    self.list_widget.hide()
+                if not self.popup.rect().contains(event.pos()):
+                    self.popup.hide()
                     return True
         return super().eventFilter(obj, event)
 
     def hidePopup(self):
         """隐藏弹出列表"""
-        if hasattr(self, "list_widget"):
-            self.list_widget.hide()
+        if hasattr(self, "popup"):
+            self.popup.hide()
 
     def focusOutEvent(self, event):
         """失去焦点时保存到历史记录"""
@@ -824,13 +849,19 @@ class ContentArea(QFrame):
         self.api_manager = api_manager
 
     def open_api_docs(self):
+        from PyQt6.QtGui import QDesktopServices
+        from PyQt6.QtCore import QUrl
+
         if self.api_manager:
-            from PyQt6.QtGui import QDesktopServices
-            from PyQt6.QtCore import QUrl
-            url = f"http://{self.api_manager.host}:{self.api_manager.port}/docs"
-            QDesktopServices.openUrl(QUrl(url))
+            host, port = self.api_manager.host, self.api_manager.port
         else:
-            print("[WARN] API Manager not initialized")
+            # API 服务尚未加载（未打开过 API 页面），从配置读取地址
+            from config.config_manager import ConfigManager
+
+            config_manager = ConfigManager()
+            host = config_manager.get("api_host", "127.0.0.1")
+            port = config_manager.get("api_port", 8000)
+        QDesktopServices.openUrl(QUrl(f"http://{host}:{port}/docs"))
 
     def add_module(self, widget):
         self.stack.addWidget(widget)
@@ -894,12 +925,6 @@ class DiscordMainWindow(QMainWindow):
     """GMTools - Discord两栏式主窗口"""
 
     logout_signal = pyqtSignal()
-    show_result_signal = pyqtSignal(int, str)  # seq_no, message
-    fill_data_signal = pyqtSignal(dict)  # parsed data
-    fill_pet_data_signal = pyqtSignal(dict)  # pet data
-    fill_recharge_types_signal = pyqtSignal(list)  # recharge types data
-    fill_card_numbers_signal = pyqtSignal(list)  # card numbers data
-    fill_mount_data_signal = pyqtSignal(dict)  # mount data
 
     def __init__(self, client=None, parent=None):
         super().__init__(parent)
@@ -907,6 +932,7 @@ class DiscordMainWindow(QMainWindow):
         self.account_name = ""
         self._connected = False
         self._drag_pos = None
+        self._api_autostart_checked = False
         self.init_ui()
 
     def init_ui(self):
@@ -915,13 +941,14 @@ class DiscordMainWindow(QMainWindow):
         self.setWindowFlag(Qt.WindowType.FramelessWindowHint)
         self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground, False)
 
-        # 连接信号
-        self.show_result_signal.connect(self._show_result_message)
-        self.fill_data_signal.connect(self._fill_character_data)
-        self.fill_pet_data_signal.connect(self._fill_pet_data)
-        self.fill_recharge_types_signal.connect(self._fill_recharge_types)
-        self.fill_card_numbers_signal.connect(self._fill_card_numbers)
-        self.fill_mount_data_signal.connect(self._fill_mount_data)
+        # 服务器响应在工作线程中解析，结果通过信号回到界面线程
+        self.response_pipeline = ResponsePipeline(self)
+        self.response_pipeline.result_ready.connect(self._show_result_message)
+        self.response_pipeline.character_ready.connect(self._fill_character_data)
+        self.response_pipeline.pets_ready.connect(self._fill_pet_data)
+        self.response_pipeline.recharge_types_ready.connect(self._fill_recharge_types)
+        self.response_pipeline.card_numbers_ready.connect(self._fill_card_numbers)
+        self.response_pipeline.mount_ready.connect(self._fill_mount_data)
 
         # 主容器
         central = QWidget()
@@ -1006,59 +1033,91 @@ class DiscordMainWindow(QMainWindow):
         return super().eventFilter(obj, event)
 
     def init_modules(self):
-        """初始化模块（兼容 init_ui/setup_ui）"""
+        """
+        初始化模块页面
+        先为每个功能模块放一个空的占位页，模块在第一次切换到该页面时才导入并创建（_ensure_module）；
+        API 管理器和 API 页面同样延后创建（_ensure_api_manager），启动时不导入 FastAPI
+        """
         self.modules = []
-        module_classes = [
-            AccountRechargeModule,
-            GameModule,
-            CharacterModule,
-            PetModule,
-            GiftModule,
-            EquipmentModule,
-        ]
-        # 欢迎页占 index 0，后续模块从 1 开始
-        for ModuleClass in module_classes:
-            module = ModuleClass(self.client)
-            if hasattr(module, "init_ui") and callable(getattr(module, "init_ui")):
-                module.init_ui()
-            elif hasattr(module, "setup_ui") and callable(getattr(module, "setup_ui")):
-                module.setup_ui()
-            if hasattr(module, "set_main_window"):
-                module.set_main_window(self)
-            module.set_client(self.client)
-            self.content_area.add_module(module)
-            self.modules.append(module)
-
-        # 初始化 API 管理器和页面
-        self.api_manager = APIManager(self.client)
-        self.content_area.set_api_manager(self.api_manager)
-        self.api_service_page = APIServicePage(self.api_manager)
-        self.content_area.add_module(self.api_service_page)
-        if self.api_manager.auto_start:
-            self.api_manager.start_service()
+        self._module_pages = []  # 与 MODULE_PAGES 对应的占位页
+        self._module_instances = {}  # 页面序号 -> 已创建的模块
+        self.api_manager = None
+        self.api_service_page = None
+
+        # 欢迎页占 index 0，后续模块从 1 开始，API 页面在最后
+        for _ in MODULE_PAGES + [("API 服务", None, None)]:
+            page = QWidget()
+            page_layout = QVBoxLayout(page)
+            page_layout.setContentsMargins(0, 0, 0, 0)
+            page_layout.setSpacing(0)
+            self.content_area.add_module(page)
+            self._module_pages.append(page)
+
+    def _ensure_module(self, index: int):
+        """返回第 index 个功能模块，第一次调用时导入并创建"""
+        module = self._module_instances.get(index)
+        if module is not None:
+            return module
+
+        _, module_path, class_name = MODULE_PAGES[index]
+        ModuleClass = getattr(importlib.import_module(module_path), class_name)
+        module = ModuleClass(self.client)
+        if hasattr(module, "init_ui") and callable(getattr(module, "init_ui")):
+            module.init_ui()
+        elif hasattr(module, "setup_ui") and callable(getattr(module, "setup_ui")):
+            module.setup_ui()
+        if hasattr(module, "set_main_window"):
+            module.set_main_window(self)
+        module.set_client(self.client)
+        module._current_account = self.account_name
+        self._module_pages[index].layout().addWidget(module)
+        self._module_instances[index] = module
+        self.modules.append(module)
+        return module
+
+    def _ensure_api_manager(self):
+        """返回 API 管理器和 API 页面，第一次调用时导入 API 服务（FastAPI、数据库迁移等）"""
+        if self.api_manager is None:
+            from modules.api_manager import APIManager
+            from ui.api_service_page import APIServicePage
+
+            self.api_manager = APIManager(self.client)
+            self.content_area.set_api_manager(self.api_manager)
+            self.api_service_page = APIServicePage(self.api_manager)
+            self._module_pages[len(MODULE_PAGES)].layout().addWidget(self.api_service_page)
+        return self.api_manager
+
+    def _auto_start_api_service(self):
+        """配置了自动启动时加载并启动 API 服务"""
+        from config.config_manager import ConfigManager
+
+        if not ConfigManager().get("api_auto_start", False):
+            return
+        api_manager = self._ensure_api_manager()
+        if api_manager.auto_start:
+            api_manager.start_service()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self._api_autostart_checked:
+            self._api_autostart_checked = True
+            # 首帧绘制之后再加载 API 服务（导入 FastAPI 需要较长时间）
+            QTimer.singleShot(100, self._auto_start_api_service)
 
     def on_server_changed(self, index):
         """服务器（模块）切换"""
         if index == -1:  # 主页
             self.content_area.switch_to(0)
             self.content_area.set_breadcrumb("欢迎")
-        else:
-            module_names = [
-                "账号充值",
-                "游戏管理",
-                "角色管理",
-                "宝宝管理",
-                "赠送道具",
-                "定制装备",
-            ]
-            if 0 <= index < len(module_names):
-                name = module_names[index]
-                self.content_area.switch_to(index + 1)  # +1 因为第0个是欢迎页
-                self.content_area.set_breadcrumb(name)
-            elif index == 999: # API 服务
-                # API 页面是最后一个添加的，索引是 len(module_names) + 1
-                self.content_area.switch_to(len(module_names) + 1)
-                self.content_area.set_breadcrumb("API 服务")
+        elif 0 <= index < len(MODULE_PAGES):
+            self._ensure_module(index)
+            self.content_area.switch_to(index + 1)  # +1 因为第0个是欢迎页
+            self.content_area.set_breadcrumb(MODULE_PAGES[index][0])
+        elif index == 999:  # API 服务
+            # API 页面是最后一个添加的，索引是 len(MODULE_PAGES) + 1
+            self._ensure_api_manager()
+            self.content_area.switch_to(len(MODULE_PAGES) + 1)
+            self.content_area.set_breadcrumb("API 服务")
 
     def set_client(self, client):
         self.client = client
@@ -1088,110 +1147,16 @@ class DiscordMainWindow(QMainWindow):
         return bool(pid and pid.isdigit())
 
     def on_receive_data(self, data: dict):
-        """接收服务器数据并显示结果"""
-        from PyQt6.QtCore import QTimer
-
-        seq_no = data.get("seq_no")
-        content = data.get("content", "")
-
-        print(f"[DEBUG] 主窗口收到数据 - 序号: {seq_no}, 内容长度: {len(content)}")
-
-        # 序号10是获取玩家信息的响应，包含复杂数据
-        if seq_no == 10:
-            if content.startswith("{"):
-                # 解析Lua字典格式的数据
-                try:
-                    parsed_data = self._parse_lua_dict(content)
-                    if parsed_data:
-                        # 使用信号跨线程调用数据填充
-                        self.fill_data_signal.emit(parsed_data)
-                except Exception as e:
-                    print(f"[ERROR] 解析角色数据失败: {e}")
-
-        # 序号11是获取宝宝信息的响应，返回数组格式的宝宝数据
-        if seq_no == 11:
-            if content.startswith("{"):
-                # 解析Lua数组格式的数据
-                try:
-                    parsed_data = self._parse_lua_dict(content)
-                    if parsed_data:
-                        # 使用信号跨线程调用宠物数据填充
-                        self.fill_pet_data_signal.emit(parsed_data)
-                        print(
-                            f"[DEBUG] 解析宝宝数据成功，包含 {len(parsed_data) if isinstance(parsed_data, list) else 0} 只宝宝"
-                        )
-                except Exception as e:
-                    print(f"[ERROR] 解析宝宝数据失败: {e}")
-
-        # 序号12是获取充值类型或获取卡号的响应，返回数组格式的数据
-        if seq_no == 12:
-            if content.startswith("{"):
-                # 解析Lua数组格式的数据
-                try:
-                    parsed_data = self._parse_lua_dict(content)
-                    if parsed_data:
-                        # 判断是充值类型还是卡号数据（卡号数据中包含"卡号"键）
-                        if "卡号" in parsed_data or "卡号" in str(parsed_data.keys()):
-                            # 这是获取卡号的响应
-                            card_numbers = []
-                            for key, value in parsed_data.items():
-                                if key != "卡号" and isinstance(value, str):
-                                    # 去掉字符串两端的引号
-                                    cleaned_value = value.strip('"').strip("'")
-                                    card_numbers.append(cleaned_value)
-
-                            # 无论是否有卡号数据，都发送信号更新显示
-                            self.fill_card_numbers_signal.emit(card_numbers)
-                            print(
-                                f"[DEBUG] 解析卡号完成，包含 {len(card_numbers)} 个卡号"
-                            )
-                        else:
-                            # 这是获取充值类型的响应
-                            recharge_types = []
-                            for _, value in parsed_data.items():
-                                if isinstance(value, str):
-                                    # 去掉字符串两端的引号
-                                    cleaned_value = value.strip('"').strip("'")
-                                    recharge_types.append(cleaned_value)
-
-                            # 只有在充值类型列表不为空时才发送信号
-                            if recharge_types:
-                                # 使用信号跨线程调用充值类型数据填充
-                                self.fill_recharge_types_signal.emit(recharge_types)
-                                print(
-                                    f"[DEBUG] 解析充值类型成功，包含 {len(recharge_types)} 个类型"
-                                )
-                            else:
-                                print("[DEBUG] 解析到的充值类型列表为空，跳过填充")
-                except Exception as e:
-                    print(f"[ERROR] 解析seq_no=12数据失败: {e}")
-
-        # 序号14是获取坐骑信息的响应
-        if seq_no == 14:
-            if content.startswith("{"):
-                try:
-                    parsed_data = self._parse_lua_dict(content)
-                    if parsed_data:
-                        self.fill_mount_data_signal.emit(parsed_data)
-                except Exception as e:
-                    print(f"[ERROR] 解析坐骑数据失败: {e}")
-
-        # 清理内容（去掉颜色代码）
-        clean_content = (
-            content.replace("#Y/", "")
-            .replace("#Y", "")
-            .replace("#R/", "")
-            .replace("#R", "")
-        )
-
-        # 使用信号跨线程调用显示消息框
-        self.show_result_signal.emit(seq_no, clean_content)
+        """接收服务器数据（网络线程调用），交给响应流水线解析"""
+        print(f"[DEBUG] 主窗口收到数据 - 序号: {data.get('seq_no')}, 内容长度: {len(data.get('content', ''))}")
+        self.response_pipeline.submit(data)
 
     def _show_result_message(self, seq_no, clean_content):
         """显示结果消息框"""
         # 智能静默模式：如果有活跃的API请求收集器，说明这是API请求的响应，不弹窗
-        import api_main
-        if api_main.dispatcher.has_active_collectors():
+        # API 服务未加载时不可能有收集器，不为此导入 api_main
+        api_main = sys.modules.get("api_main")
+        if api_main is not None and api_main.dispatcher.has_active_collectors():
             print(f"[INFO] (API静默) 收到响应 (序号: {seq_no}): {clean_content}")
             return
 
@@ -1237,111 +1202,12 @@ class DiscordMainWindow(QMainWindow):
         except Exception as e:
             print(f"[ERROR] 显示消息框失败: {e}")
 
-    def _parse_lua_dict(self, lua_str: str) -> dict:
-        """解析Lua字典格式字符串为Python字典"""
-        import re
-
-        try:
-            # 去掉外层大括号
-            if lua_str.startswith("{") and lua_str.endswith("}"):
-                content = lua_str[1:-1]
-            else:
-                content = lua_str
-
-            result = {}
-            self._parse_dict_content(content, result)
-            return result
-        except Exception as e:
-            print(f"[ERROR] 解析Lua字典失败: {e}")
-            return {}
-
-    def _parse_dict_content(self, content: str, result: dict):
-        """递归解析字典内容"""
-        import re
-
-        # 使用栈来追踪大括号深度
-        items = []
-        current_key = None
-        brace_depth = 0
-        in_value = False
-
-        # 按字符遍历，处理嵌套字典
-        i = 0
-        while i < len(content):
-            char = content[i]
-
-            # 跳过空格和逗号
-            if char in " \t,":
-                i += 1
-                continue
-
-            # 遇到等号，开始解析值
-            if char == "=":
-                # 提取键名
-                if current_key is None:
-                    # 获取键名（从最近的分隔符或开头到当前位置）
-                    start = max(
-                        [
-                            idx
-                            for idx in [0]
-                            + [m.end() for m in re.finditer(r"[,]+", content[:i])]
-                        ]
-                        or [0]
-                    )
-                    current_key = content[start:i].strip()
-
-                # 跳过等号和空格
-                i += 1
-                while i < len(content) and content[i] in " \t":
-                    i += 1
-                continue
-
-            # 遇到大括号，增加深度并提取整个字典值
-            if char == "{":
-                if brace_depth == 0:
-                    # 这是值的开始
-                    start = i
-                brace_depth += 1
-            elif char == "}":
-                brace_depth -= 1
-                if brace_depth == 0:
-                    # 这是值的结束
-                    value = content[start : i + 1]
-                    if current_key:
-                        # 递归解析嵌套字典
-                        nested_dict = {}
-                        self._parse_dict_content(value[1:-1], nested_dict)
-                        result[current_key] = nested_dict
-                        current_key = None
-            else:
-                # 普通字符，检查是否为数字或字符串
-                if brace_depth == 0 and current_key:
-                    # 提取值（到下一个分隔符或结束）
-                    match = re.match(r"([^,}]*)", content[i:])
-                    if match:
-                        value = match.group(1).strip()
-                        # 尝试转换为数字
-                        try:
-                            if value.isdigit():
-                                result[current_key] = int(value)
-                            else:
-                                result[current_key] = (
-                                    int(value)
-                                    if value.replace("-", "").isdigit()
-                                    else value
-                                )
-                        except:
-                            result[current_key] = value
-                        current_key = None
-                        i += match.end() - 1
-
-            i += 1
-
-    def _fill_character_data(self, data: dict):
-        """填充角色数据到UI"""
+    def _fill_character_data(self, updates: dict):
+        """
+        填充角色数据到UI
+        updates 由响应流水线生成：{输入框字典属性名: {字段名: 文本}}
+        """
         try:
-            print(f"[DEBUG] 开始填充角色数据，收到数据键: {list(data.keys())}")
-
             # 查找角色管理模块
             character_module = None
             for module in self.modules:
@@ -1353,148 +1219,18 @@ class DiscordMainWindow(QMainWindow):
                 print("[DEBUG] 未找到角色模块")
                 return
 
-            print(f"[DEBUG] 找到角色模块: {character_module.__class__.__name__}")
-
-            # 查找所有QLineEdit
-            all_inputs = character_module.findChildren(QLineEdit)
-
-            # 处理InputRow包装的输入框
-            try:
-                from modules.account_recharge_module import InputRow
-
-                input_rows = character_module.findChildren(InputRow)
-
-                # 合并所有输入框（包括InputRow内部的）
-                all_editable_inputs = []
-                for inp in all_inputs:
-                    all_editable_inputs.append(inp)
-                for row in input_rows:
-                    all_editable_inputs.append(row.input)
-            except:
-                all_editable_inputs = all_inputs
-
-            # 填充角色修炼数据（包括玩家等级）
-            if "修炼" in data:
-                cultivation_data = data["修炼"]
-                print(f"[DEBUG] 处理角色修炼数据: {cultivation_data}")
-
-                # 检查CharacterModule是否有预定义的角色修炼输入框字典
-                if hasattr(character_module, "cultivation_inputs"):
-                    filled_count = 0
-                    for skill_name, value in cultivation_data.items():
-                        if skill_name == "当前":
-                            continue  # 跳过"当前"字段
-                        if skill_name in character_module.cultivation_inputs:
-                            # 处理字典格式的数据（Lua数组格式）
-                            if isinstance(value, dict) and "[1]" in value:
-                                actual_value = value["[1]"]  # 取[1]的值
-                            elif isinstance(value, list) and len(value) >= 1:
-                                actual_value = value[0]  # 取数组第一个值
-                            else:
-                                actual_value = value
-                            input_widget = character_module.cultivation_inputs[
-                                skill_name
-                            ]
-                            input_widget.setText(str(actual_value))
-                            filled_count += 1
-                            print(f"[DEBUG] 填充角色修炼 {skill_name}: {actual_value}")
-                    print(f"[DEBUG] 角色修炼填充完成，成功填充 {filled_count} 项")
-                else:
-                    print("[DEBUG] CharacterModule没有cultivation_inputs属性")
-
-            # 填充召唤兽修炼数据
-            if "bb修炼" in data:
-                pet_cultivation_data = data["bb修炼"]
-                print(f"[DEBUG] 处理召唤兽修炼数据: {pet_cultivation_data}")
-
-                # 先处理玩家等级（在bb修炼中）
-                if "玩家等级" in pet_cultivation_data:
-                    player_level = pet_cultivation_data["玩家等级"]
-                    if isinstance(player_level, dict) and "[1]" in player_level:
-                        level_value = player_level["[1]"]
-                    elif isinstance(player_level, list) and len(player_level) >= 1:
-                        level_value = player_level[0]
-                    else:
-                        level_value = player_level
-
-                    # 将玩家等级填充到召唤兽修炼的"玩家等级"输入框
-                    if (
-                        hasattr(character_module, "pet_cultivation_inputs")
-                        and "玩家等级" in character_module.pet_cultivation_inputs
-                    ):
-                        level_widget = character_module.pet_cultivation_inputs[
-                            "玩家等级"
-                        ]
-                        level_widget.setText(str(level_value))
-                        print(f"[DEBUG] 填充玩家等级: {level_value}")
-
-                # 检查CharacterModule是否有预定义的召唤兽修炼输入框字典
-                if hasattr(character_module, "pet_cultivation_inputs"):
-                    filled_count = 0
-                    for skill_name, value in pet_cultivation_data.items():
-                        if skill_name == "当前":
-                            continue  # 跳过"当前"字段
-                        if skill_name == "玩家等级":
-                            continue  # 玩家等级已经处理过了
-                        if skill_name in character_module.pet_cultivation_inputs:
-                            # 处理字典格式的数据（Lua数组格式）
-                            if isinstance(value, dict) and "[1]" in value:
-                                actual_value = value["[1]"]  # 取[1]的值
-                            elif isinstance(value, list) and len(value) >= 1:
-                                actual_value = value[0]  # 取数组第一个值
-                            else:
-                                actual_value = value
-                            input_widget = character_module.pet_cultivation_inputs[
-                                skill_name
-                            ]
-                            input_widget.setText(str(actual_value))
-                            filled_count += 1
-                            print(
-                                f"[DEBUG] 填充召唤兽修炼 {skill_name}: {actual_value}"
-                            )
-                    print(f"[DEBUG] 召唤兽修炼填充完成，成功填充 {filled_count} 项")
-                else:
-                    print("[DEBUG] CharacterModule没有pet_cultivation_inputs属性")
-
-            # 填充强化技能数据
-            if "强化技能" in data:
-                enhanced_skills = data["强化技能"]
-                print(f"[DEBUG] 处理强化技能数据: {enhanced_skills}")
-
-                # 检查CharacterModule是否有预定义的输入框字典
-                if hasattr(character_module, "enhancement_inputs"):
-                    filled_count = 0
-                    for skill_name, value in enhanced_skills.items():
-                        if skill_name in character_module.enhancement_inputs:
-                            input_widget = character_module.enhancement_inputs[
-                                skill_name
-                            ]
-                            input_widget.setText(str(value))
-                            filled_count += 1
-                            print(f"[DEBUG] 填充强化技能 {skill_name}: {value}")
-                    print(f"[DEBUG] 强化技能填充完成，成功填充 {filled_count} 项")
-                else:
-                    print("[DEBUG] CharacterModule没有enhancement_inputs属性")
-
-            # 填充生活技能数据
-            if "生活技能" in data:
-                life_skills = data["生活技能"]
-                print(f"[DEBUG] 处理生活技能数据: {life_skills}")
-
-                # 检查CharacterModule是否有预定义的生活技能输入框字典
-                if hasattr(character_module, "life_inputs"):
-                    filled_count = 0
-                    for skill_name, value in life_skills.items():
-                        if skill_name in character_module.life_inputs:
-                            input_widget = character_module.life_inputs[skill_name]
-                            input_widget.setText(str(value))
-                            filled_count += 1
-                            print(f"[DEBUG] 填充生活技能 {skill_name}: {value}")
-                    print(f"[DEBUG] 生活技能填充完成，成功填充 {filled_count} 项")
-                else:
-                    print("[DEBUG] CharacterModule没有life_inputs属性")
-
-            print("[DEBUG] 角色数据填充完成")
+            for attr_name, values in updates.items():
+                inputs = getattr(character_module, attr_name, None)
+                if inputs is None:
+                    print(f"[DEBUG] CharacterModule没有{attr_name}属性")
+                    continue
+                filled_count = 0
+                for name, text in values.items():
+                    input_widget = inputs.get(name)
+                    if input_widget is not None:
+                        input_widget.setText(text)
+                        filled_count += 1
+                print(f"[DEBUG] {attr_name} 填充完成，成功填充 {filled_count} 项")
 
         except Exception as e:
             print(f"[ERROR] 填充角色数据失败: {e}")
@@ -1506,111 +1242,17 @@ class DiscordMainWindow(QMainWindow):
                 return module
         return None
 
-    def _process_bracket_key(self, key: str, value: any, pet_list: list):
-        """处理以[数字]格式的键
-
-        Args:
-            key: 键名
-            value: 键值
-            pet_list: 宝宝列表（用于添加数据）
-        """
-        print(f"[DEBUG] 找到宝宝数据: {key} -> {value}")
-        if isinstance(value, dict) and "名称" in value:
-            pet_list.append(value)
-        else:
-            print(f"[DEBUG] 数据格式异常: {value}")
-
-    def _process_digit_key(self, key: str, value: any, pet_list: list):
-        """处理数字键
-
-        Args:
-            key: 键名
-            value: 键值
-            pet_list: 宝宝列表（用于添加数据）
-        """
-        print(f"[DEBUG] 找到数字键数据: {key} -> {value}")
-        if isinstance(value, dict):
-            pet_list.append(value)
-
-    def _parse_pet_dict(self, data: dict) -> list:
-        """解析宝宝字典数据为列表 - 重构后的简化版本
-
-        处理类似 {[2]={...}, [1]={...}} 或 {1={...}, 2={...}} 的格式
-        """
-        pet_list = []
-        
-        # 辅助函数：从键中提取数字用于排序
-        def get_key_number(k):
-            if k.startswith("[") and k.endswith("]"):
-                try:
-                    return int(k[1:-1])
-                except ValueError:
-                    return float('inf')
-            elif k.isdigit():
-                return int(k)
-            return float('inf')
-
-        # 按数字键排序
-        try:
-            sorted_keys = sorted(data.keys(), key=get_key_number)
-        except Exception as e:
-            print(f"[WARN] 排序宝宝数据失败: {e}，使用默认顺序")
-            sorted_keys = data.keys()
-
-        for key in sorted_keys:
-            value = data[key]
-            if key.startswith("[") and key.endswith("]"):
-                self._process_bracket_key(key, value, pet_list)
-            elif key.isdigit():
-                self._process_digit_key(key, value, pet_list)
-
-        print(f"[DEBUG] 解析到 {len(pet_list)} 个宝宝数据 (已排序)")
-        return pet_list
-
-    def _normalize_pet_data(self, data) -> list:
-        """
-        标准化宝宝数据为列表格式
-
-        Args:
-            data: 字典或列表格式的宝宝数据
-
-        Returns:
-            统一的列表格式
-        """
-        if isinstance(data, dict):
-            pet_list = self._parse_pet_dict(data)
-            if pet_list:
-                return pet_list
-            else:
-                print(f"[DEBUG] 未找到有效的宝宝数据，使用原始数据")
-                return [data]
-        elif isinstance(data, list):
-            return data
-        else:
-            return [data]
-
-    def _fill_pet_data(self, data: dict):
-        """填充宝宝数据到UI - 重构后的简化版本"""
+    def _fill_pet_data(self, model):
+        """填充宝宝数据到UI（model 为工作线程中构造好的 PetListModel）"""
         try:
-            print(f"[DEBUG] 开始填充宝宝数据，数据类型: {type(data)}")
-            print(
-                f"[DEBUG] 原始数据键: {list(data.keys()) if isinstance(data, dict) else '不是字典'}"
-            )
-
             # 查找宠物管理模块
             pet_module = self._find_pet_module()
             if not pet_module:
                 print("[DEBUG] 未找到宠物模块")
+                model.deleteLater()
                 return
 
-            print(f"[DEBUG] 找到宠物模块: {pet_module.__class__.__name__}")
-
-            # 标准化数据为列表格式
-            pet_list = self._normalize_pet_data(data)
-            print(f"[DEBUG] 处理宝宝列表，共 {len(pet_list)} 只宝宝")
-
-            # 将宝宝数据传递给宠物模块
-            pet_module.set_pet_data(pet_list)
+            pet_module.set_pet_model(model)
 
         except Exception as e:
             print(f"[ERROR] 填充宝宝数据失败: {e}")
@@ -1690,6 +1332,7 @@ class DiscordMainWindow(QMainWindow):
             print(f"[ERROR] 填充坐骑数据失败: {e}")
 
     def closeEvent(self, event):
+        self.response_pipeline.shutdown()
         if self.client:
             self.client._is_closing = True
             self.client.disconnect()
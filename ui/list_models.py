@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+下拉列表数据模型
+模型的全部行数据在构造时生成（可以在工作线程中构造），界面线程只需 setModel 或增量更新，
+不再 clear 后逐项 addItem
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex
+
+
+def clean_value(value):
+    """去掉字符串值两端的引号"""
+    if isinstance(value, str):
+        return value.strip("\"'")
+    return value
+
+
+class KeyedListModel(QAbstractListModel):
+    """
+    以 key 标识行的列表模型：行数据为 (key, 显示文本)，UserRole 返回 key
+    update_rows() 按 key 与当前内容比较，只对删除、移动、插入和文本变化的行发出信号，
+    视图（以及 QComboBox 的当前选择）不会因为整体重置而重建
+    """
+
+    def __init__(self, rows: Optional[List[Tuple[Any, str]]] = None, parent=None):
+        super().__init__(parent)
+        self._rows: List[Tuple[Any, str]] = list(rows or [])
+
+    def rows(self) -> List[Tuple[Any, str]]:
+        return list(self._rows)
+
+    def key_at(self, row: int):
+        if 0 <= row < len(self._rows):
+            return self._rows[row][0]
+        return None
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self._rows):
+            return None
+        key, text = self._rows[index.row()]
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            return text
+        if role == Qt.ItemDataRole.UserRole:
+            return key
+        return None
+
+    def update_rows(self, rows: List[Tuple[Any, str]]):
+        """增量更新为新的行列表（key 不可重复）"""
+        new_rows = list(rows)
+        new_keys = {key for key, _ in new_rows}
+
+        # 1. 删除不再存在的行（从后往前，相邻的行合并为一次删除）
+        row = len(self._rows) - 1
+        while row >= 0:
+            if self._rows[row][0] in new_keys:
+                row -= 1
+                continue
+            last = row
+            while row > 0 and self._rows[row - 1][0] not in new_keys:
+                row -= 1
+            self.beginRemoveRows(QModelIndex(), row, last)
+            del self._rows[row:last + 1]
+            self.endRemoveRows()
+            row -= 1
+
+        # 2. 按新顺序逐行对齐：位置正确的行只比较文本，其余的从后面移过来或插入
+        for target, (key, text) in enumerate(new_rows):
+            if target < len(self._rows) and self._rows[target][0] == key:
+                if self._rows[target][1] != text:
+                    self._rows[target] = (key, text)
+                    index = self.index(target)
+                    self.dataChanged.emit(index, index)
+                continue
+
+            source = next(
+                (row for row in range(target + 1, len(self._rows)) if self._rows[row][0] == key),
+                None
+            )
+            if source is None:
+                self.beginInsertRows(QModelIndex(), target, target)
+                self._rows.insert(target, (key, text))
+                self.endInsertRows()
+            else:
+                self.beginMoveRows(QModelIndex(), source, source, QModelIndex(), target)
+                old_text = self._rows.pop(source)[1]
+                self._rows.insert(target, (key, text))
+                self.endMoveRows()
+                if old_text != text:
+                    index = self.index(target)
+                    self.dataChanged.emit(index, index)
+
+
+class PetListModel(KeyedListModel):
+    """宝宝选择列表：显示文本为"名称 - Lv.等级 (模型)"，key 为 1 开始的宝宝索引"""
+
+    def __init__(self, pet_data: Optional[Dict[int, dict]] = None, parent=None):
+        self.pet_data = pet_data or {}
+        super().__init__(
+            [
+                (
+                    pet_index,
+                    f"{info.get('名称', f'宝宝{pet_index}')} - Lv.{info.get('等级', 0)} ({info.get('模型', '')})"
+                )
+                for pet_index, info in self.pet_data.items()
+            ],
+            parent
+        )
+
+    @staticmethod
+    def from_pet_list(pet_list: List[dict]) -> 'PetListModel':
+        """由宝宝属性字典列表构造模型（清理字符串值中的引号）"""
+        pet_data = {}
+        for i, pet_info in enumerate(pet_list):
+            pet_data[i + 1] = {key: clean_value(value) for key, value in pet_info.items()}
+        return PetListModel(pet_data)
+
+    def update_from(self, other: 'PetListModel'):
+        """用另一个模型的数据增量更新本模型"""
+        self.pet_data = other.pet_data
+        self.update_rows(other.rows())
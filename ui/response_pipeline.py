@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+服务器响应处理流水线
+网络线程收到的响应交给单个工作线程按顺序处理：解析 Lua 数据、清理字符串、预先生成界面需要的
+模型和文本，再通过信号交给界面线程。界面线程只做 setModel / setText，大账号不会卡住窗口。
+"""
+
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List
+
+from PyQt6.QtCore import QObject, QCoreApplication, pyqtSignal
+
+from ui.list_models import PetListModel
+
+# 值：到下一个逗号或右大括号为止
+_VALUE_PATTERN = re.compile(r"([^,}]*)")
+
+
+def parse_lua_dict(lua_str: str) -> dict:
+    """解析Lua字典格式字符串为Python字典"""
+    try:
+        # 去掉外层大括号
+        if lua_str.startswith("{") and lua_str.endswith("}"):
+            content = lua_str[1:-1]
+        else:
+            content = lua_str
+
+        result = {}
+        _parse_dict_content(content, result)
+        return result
+    except Exception as e:
+        print(f"[ERROR] 解析Lua字典失败: {e}")
+        return {}
+
+
+def _parse_dict_content(content: str, result: dict):
+    """
+    递归解析字典内容
+    键取最近一个逗号之后到等号之间的文本；值从原字符串的当前位置直接匹配，不复制剩余内容，
+    整体为线性复杂度（大账号的宝宝数据有几十万字符）
+    """
+    current_key = None
+    brace_depth = 0
+    start = 0
+
+    # 按字符遍历，处理嵌套字典
+    i = 0
+    length = len(content)
+    while i < length:
+        char = content[i]
+
+        # 跳过空格和逗号
+        if char in " \t,":
+            i += 1
+            continue
+
+        # 遇到等号，开始解析值
+        if char == "=":
+            # 提取键名（从最近的逗号或开头到当前位置）
+            if current_key is None:
+                start = content.rfind(",", 0, i) + 1
+                current_key = content[start:i].strip()
+
+            # 跳过等号和空格
+            i += 1
+            while i < length and content[i] in " \t":
+                i += 1
+            continue
+
+        # 遇到大括号，增加深度并提取整个字典值
+        if char == "{":
+            if brace_depth == 0:
+                # 这是值的开始
+                start = i
+            brace_depth += 1
+        elif char == "}":
+            brace_depth -= 1
+            if brace_depth == 0:
+                # 这是值的结束
+                if current_key:
+                    # 递归解析嵌套字典
+                    nested_dict = {}
+                    _parse_dict_content(content[start + 1:i], nested_dict)
+                    result[current_key] = nested_dict
+                    current_key = None
+        else:
+            # 普通字符，检查是否为数字或字符串
+            if brace_depth == 0 and current_key:
+                # 提取值（到下一个分隔符或结束）
+                match = _VALUE_PATTERN.match(content, i)
+                value = match.group(1).strip()
+                # 尝试转换为数字
+                try:
+                    if value.isdigit():
+                        result[current_key] = int(value)
+                    else:
+                        result[current_key] = (
+                            int(value)
+                            if value.replace("-", "").isdigit()
+                            else value
+                        )
+                except ValueError:
+                    result[current_key] = value
+                current_key = None
+                i = match.end() - 1
+
+        i += 1
+
+
+def normalize_pet_list(data) -> list:
+    """
+    标准化宝宝数据为列表格式
+    处理类似 {[2]={...}, [1]={...}} 或 {1={...}, 2={...}} 的格式，按数字键排序
+    """
+    if isinstance(data, list):
+        return data
+    if not isinstance(data, dict):
+        return [data]
+
+    # 从键中提取数字用于排序
+    def get_key_number(k):
+        if k.startswith("[") and k.endswith("]"):
+            try:
+                return int(k[1:-1])
+            except ValueError:
+                return float('inf')
+        elif k.isdigit():
+            return int(k)
+        return float('inf')
+
+    pet_list = []
+    for key in sorted(data.keys(), key=get_key_number):
+        value = data[key]
+        if key.startswith("[") and key.endswith("]"):
+            if isinstance(value, dict) and "名称" in value:
+                pet_list.append(value)
+            else:
+                print(f"[DEBUG] 数据格式异常: {key}")
+        elif key.isdigit() and isinstance(value, dict):
+            pet_list.append(value)
+
+    if not pet_list:
+        print(f"[DEBUG] 未找到有效的宝宝数据，使用原始数据")
+        return [data]
+    return pet_list
+
+
+def _first_value(value):
+    """修炼数据的值可能是 Lua 数组（[1]=当前值），取第一个元素"""
+    if isinstance(value, dict) and "[1]" in value:
+        return value["[1]"]
+    if isinstance(value, list) and len(value) >= 1:
+        return value[0]
+    return value
+
+
+def build_character_updates(data: dict) -> Dict[str, Dict[str, str]]:
+    """
+    把角色数据转换为界面要填写的文本
+    返回 {CharacterModule 上的输入框字典属性名: {字段名: 文本}}
+    """
+    updates = {}
+
+    # 角色修炼
+    if isinstance(data.get("修炼"), dict):
+        updates["cultivation_inputs"] = {
+            name: str(_first_value(value))
+            for name, value in data["修炼"].items() if name != "当前"
+        }
+
+    # 召唤兽修炼（包含玩家等级）
+    if isinstance(data.get("bb修炼"), dict):
+        updates["pet_cultivation_inputs"] = {
+            name: str(_first_value(value))
+            for name, value in data["bb修炼"].items() if name != "当前"
+        }
+
+    # 强化技能、生活技能
+    if isinstance(data.get("强化技能"), dict):
+        updates["enhancement_inputs"] = {name: str(value) for name, value in data["强化技能"].items()}
+    if isinstance(data.get("生活技能"), dict):
+        updates["life_inputs"] = {name: str(value) for name, value in data["生活技能"].items()}
+
+    return updates
+
+
+def clean_color_codes(content: str) -> str:
+    """去掉颜色代码"""
+    return (
+        content.replace("#Y/", "")
+        .replace("#Y", "")
+        .replace("#R/", "")
+        .replace("#R", "")
+    )
+
+
+class ResponsePipeline(QObject):
+    """
+    响应处理流水线
+    submit() 可在任意线程调用；单个工作线程保证响应按到达顺序处理，信号按顺序送达界面线程
+    """
+
+    character_ready = pyqtSignal(dict)  # {输入框字典属性名: {字段名: 文本}}
+    pets_ready = pyqtSignal(object)  # PetListModel
+    mount_ready = pyqtSignal(dict)  # mount data
+    recharge_types_ready = pyqtSignal(list)  # recharge types data
+    card_numbers_ready = pyqtSignal(list)  # card numbers data
+    result_ready = pyqtSignal(int, str)  # seq_no, message
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="response-parser")
+
+    def submit(self, data: dict):
+        """提交一条服务器响应"""
+        self._executor.submit(self._process, data)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _process(self, data: dict):
+        try:
+            seq_no = data.get("seq_no")
+            content = data.get("content", "")
+            if content.startswith("{"):
+                self._process_data(seq_no, content)
+            # 使用信号跨线程调用显示消息框
+            self.result_ready.emit(seq_no, clean_color_codes(content))
+        except Exception as e:
+            print(f"[ERROR] 处理服务器响应失败: {e}")
+
+    def _process_data(self, seq_no: int, content: str):
+        # 序号10是获取玩家信息的响应，包含复杂数据
+        if seq_no == 10:
+            parsed_data = parse_lua_dict(content)
+            if parsed_data:
+                self.character_ready.emit(build_character_updates(parsed_data))
+
+        # 序号11是获取宝宝信息的响应，返回数组格式的宝宝数据
+        elif seq_no == 11:
+            parsed_data = parse_lua_dict(content)
+            if parsed_data:
+                model = PetListModel.from_pet_list(normalize_pet_list(parsed_data))
+                # 模型在工作线程中创建，交给界面线程之前移到界面线程
+                model.moveToThread(QCoreApplication.instance().thread())
+                self.pets_ready.emit(model)
+                print(f"[DEBUG] 解析宝宝数据成功，包含 {model.rowCount()} 只宝宝")
+
+        # 序号12是获取充值类型或获取卡号的响应，返回数组格式的数据
+        elif seq_no == 12:
+            parsed_data = parse_lua_dict(content)
+            if parsed_data:
+                self._emit_recharge_data(parsed_data)
+
+        # 序号14是获取坐骑信息的响应
+        elif seq_no == 14:
+            parsed_data = parse_lua_dict(content)
+            if parsed_data:
+                self.mount_ready.emit(parsed_data)
+
+    def _emit_recharge_data(self, parsed_data: Dict[str, Any]):
+        # 判断是充值类型还是卡号数据（卡号数据中包含"卡号"键）
+        if any("卡号" in key for key in parsed_data):
+            # 这是获取卡号的响应，无论是否有卡号数据，都发送信号更新显示
+            card_numbers: List[str] = [
+                value.strip('"').strip("'")
+                for key, value in parsed_data.items()
+                if key != "卡号" and isinstance(value, str)
+            ]
+            self.card_numbers_ready.emit(card_numbers)
+            print(f"[DEBUG] 解析卡号完成，包含 {len(card_numbers)} 个卡号")
+        else:
+            # 这是获取充值类型的响应，只有在列表不为空时才更新
+            recharge_types = [
+                value.strip('"').strip("'")
+                for value in parsed_data.values()
+                if isinstance(value, str)
+            ]
+            if recharge_types:
+                self.recharge_types_ready.emit(recharge_types)
+                print(f"[DEBUG] 解析充值类型成功，包含 {len(recharge_types)} 个类型")
+            else:
+                print("[DEBUG] 解析到的充值类型列表为空，跳过填充")
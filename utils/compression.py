@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP 响应压缩
+根据请求的 Accept-Encoding 协商 br / gzip，对超过阈值的响应体压缩；流式响应逐块压缩。
+已设置 Content-Encoding 的响应（例如预先压缩的缓存响应）、gzip 导出文件和 SSE 事件流不做处理。
+
+依赖：brotli（可选）；未安装时只使用 gzip
+"""
+
+import gzip
+import zlib
+from typing import Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 不压缩的内容类型（已压缩的文件、需要实时送达的事件流）
+EXCLUDED_MEDIA_TYPES: Tuple[str, ...] = (
+    "text/event-stream",
+    "application/gzip",
+    "application/zip",
+    "application/octet-stream",
+    "image/",
+    "audio/",
+    "video/",
+)
+
+
+def supported_encodings() -> Tuple[str, ...]:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    从 Accept-Encoding 中选择压缩方式，q 值相同时优先 br
+    客户端不接受任何支持的压缩方式时返回 None
+    """
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding] = q
+
+    best, best_q = None, 0.0
+    for encoding in supported_encodings():
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 4) -> bytes:
+    """一次性压缩完整的响应体"""
+    if encoding == "br":
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+class _StreamCompressor:
+    """流式响应的增量压缩"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+            self._compress = self._compressor.process
+            self._flush = self._compressor.finish
+        else:
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+            self._compress = self._compressor.compress
+            self._flush = self._compressor.flush
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compress(data)
+
+    def finish(self) -> bytes:
+        return self._flush()
+
+
+class CompressionMiddleware:
+    """
+    响应压缩中间件
+        app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(send, encoding, self.minimum_size, self.gzip_level, self.brotli_quality)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    """按响应的第一块数据决定是否压缩：整体压缩、逐块压缩或原样发送"""
+
+    def __init__(self, send, encoding: str, minimum_size: int, gzip_level: int, brotli_quality: int):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self._start_message = None
+        self._mode = None  # None: 等待第一块; "identity" / "stream"
+        self._stream: Optional[_StreamCompressor] = None
+
+    def _should_skip(self, headers: MutableHeaders) -> bool:
+        if "content-encoding" in headers:
+            return True
+        content_type = headers.get("content-type", "")
+        return any(content_type.startswith(media_type) for media_type in EXCLUDED_MEDIA_TYPES)
+
+    async def send(self, message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            # 等待第一块响应体，再决定响应头
+            self._start_message = message
+            return
+        if message_type != "http.response.body":
+            await self._send(message)
+            return
+
+        if self._mode == "identity":
+            await self._send(message)
+            return
+        if self._mode == "stream":
+            body = self._stream.compress(message.get("body", b""))
+            more_body = message.get("more_body", False)
+            if not more_body:
+                body += self._stream.finish()
+            if body or not more_body:
+                await self._send({"type": "http.response.body", "body": body, "more_body": more_body})
+            return
+
+        # 第一块响应体
+        start = self._start_message
+        headers = MutableHeaders(raw=start["headers"])
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self._should_skip(headers) or (not more_body and len(body) < self.minimum_size):
+            self._mode = "identity"
+            await self._send(start)
+            await self._send(message)
+            return
+
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if not more_body:
+            # 完整响应体：整体压缩
+            body = compress(body, self.encoding, self.gzip_level, self.brotli_quality)
+            headers["Content-Length"] = str(len(body))
+            await self._send(start)
+            await self._send({"type": "http.response.body", "body": body})
+            return
+
+        # 流式响应：逐块压缩，长度未知
+        self._mode = "stream"
+        if "content-length" in headers:
+            del headers["content-length"]
+        self._stream = _StreamCompressor(self.encoding, self.gzip_level, self.brotli_quality)
+        await self._send(start)
+        await self.send(message)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSON 序列化和预序列化响应
+- dumps(): 安装 orjson 时使用 orjson，否则使用标准库 json；两者输出相同的紧凑 UTF-8 JSON
+- FastJSONResponse: 作为 FastAPI 的默认响应类
+- PreparedJSON / PreparedJSONCache: 很少变化的目录类数据（权限列表、道具目录）只序列化一次，
+  压缩结果也按编码缓存，之后的请求直接返回缓存的字节
+
+依赖：orjson（可选）
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+from utils.compression import negotiate_encoding, compress
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 非字符串键转为字符串（与 json 一致）；datetime 交给 default 处理，输出格式与 json 的 default=str 一致
+_ORJSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if orjson is not None else 0
+)
+
+
+def _default(value: Any) -> str:
+    return str(value)
+
+
+def dumps(content: Any) -> bytes:
+    """序列化为 UTF-8 JSON 字节"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+        except TypeError:
+            # orjson 不支持的值（例如超过 64 位的整数），交给标准库处理
+            pass
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, default=_default, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """使用 dumps() 序列化的 JSONResponse"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class PreparedJSON:
+    """
+    预先序列化的响应体
+    压缩后的响应体在第一次按该编码请求时生成并缓存；返回的响应已带 Content-Encoding，压缩中间件不会再处理。
+    强 ETag 由响应体内容计算，压缩后的表示在后面附加编码名（"<hash>-br"）
+    """
+
+    def __init__(self, content: Any, minimum_size: int = 1024):
+        self.body = dumps(content)
+        self.digest = hashlib.sha1(self.body).hexdigest()[:20]
+        self.minimum_size = minimum_size
+        self._encoded: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding: str) -> bytes:
+        body = self._encoded.get(encoding)
+        if body is None:
+            with self._lock:
+                body = self._encoded.get(encoding)
+                if body is None:
+                    # 只压缩一次，使用最高压缩级别
+                    body = compress(self.body, encoding, gzip_level=9, brotli_quality=11)
+                    self._encoded[encoding] = body
+        return body
+
+    def etag(self, encoding: Optional[str] = None) -> str:
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+    def matches(self, if_none_match: str) -> bool:
+        """If-None-Match 是否包含本响应体任一表示的 ETag"""
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            if tag == "*" or tag.strip('"').split("-", 1)[0] == self.digest:
+                return True
+        return False
+
+    def encoding_for(self, request: Request) -> Optional[str]:
+        """请求应使用的压缩方式，响应体未达到压缩阈值时返回 None"""
+        if len(self.body) < self.minimum_size:
+            return None
+        return negotiate_encoding(request.headers.get("accept-encoding", ""))
+
+    def response(self, request: Request, headers: Optional[Dict[str, str]] = None,
+                 with_etag: bool = False) -> Response:
+        headers = dict(headers or {})
+        body = self.body
+        encoding = self.encoding_for(request)
+        if len(body) >= self.minimum_size:
+            headers["Vary"] = "Accept-Encoding"
+        if encoding:
+            body = self.encoded(encoding)
+            headers["Content-Encoding"] = encoding
+        if with_etag:
+            headers["ETag"] = self.etag(encoding)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+
+class PreparedJSONCache:
+    """
+    PreparedJSON 缓存（LRU）
+    key 中包含数据版本时旧版本自然不再命中；ttl_seconds 用于兜底其他进程的写入
+    """
+
+    def __init__(self, max_entries: int = 64, ttl_seconds: Optional[float] = None, minimum_size: int = 1024):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.minimum_size = minimum_size
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, build_content: Callable[[], Any]) -> PreparedJSON:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (self.ttl_seconds is None or now - entry[1] <= self.ttl_seconds):
+                self._entries.move_to_end(key)
+                return entry[0]
+
+        # 在锁外构造，避免慢查询阻塞其他 key
+        prepared = PreparedJSON(build_content(), self.minimum_size)
+        with self._lock:
+            self._entries[key] = (prepared, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return prepared
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
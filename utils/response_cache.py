@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+读多写少接口的响应缓存
+缓存 key 为 (数据范围, 范围版本, 路径, 查询参数, 用户等级)，值为预序列化的响应体（PreparedJSON）。
+- 写接口调用 invalidate(范围) 增加该范围的版本号，旧版本的缓存不再命中（之后按 LRU 淘汰）
+- 道具目录等自带版本号的数据通过 register_version() 直接使用其版本
+- 响应带强 ETag（由响应体内容计算），If-None-Match 命中时返回 304
+- 使用游戏连接代理（多工作进程）时，本进程的失效经代理转发给其他工作进程（见 set_invalidation_listener），
+  转发丢失（如与代理断开期间）时由 RESPONSE_CACHE_TTL 兜底；ETag 由内容计算，不同进程之间也不会误返回 304
+"""
+
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from config.settings import RESPONSE_CACHE_TTL, RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_COMPRESSION_MIN_SIZE
+from utils.fast_json import PreparedJSONCache
+
+logger = logging.getLogger(__name__)
+
+# 数据范围
+SCOPE_PERMISSIONS = "permissions"  # 权限列表
+SCOPE_LEVEL_PERMISSIONS = "level_permissions"  # 各等级的权限
+SCOPE_LEVEL_CONFIGS = "level_configs"  # 等级配置（含用户数、激活码数统计）
+SCOPE_ITEM_CATALOG = "item_catalog"  # 道具配置和等级限制
+
+# 响应只能由客户端缓存，每次使用前必须用 ETag 重新验证
+CACHE_CONTROL = "private, no-cache"
+
+
+def activity_scope(activity_id: int) -> Hashable:
+    """单个活动的数据范围（活动信息、奖项和统计）"""
+    return ("activity", activity_id)
+
+
+class ResponseCache:
+    """按数据范围版本失效的响应缓存"""
+
+    def __init__(self, ttl_seconds: float = RESPONSE_CACHE_TTL, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 minimum_size: int = RESPONSE_COMPRESSION_MIN_SIZE):
+        self._entries = PreparedJSONCache(max_entries, ttl_seconds, minimum_size)
+        self._versions: Dict[Hashable, int] = {}
+        self._version_funcs: Dict[Hashable, Callable[[], Hashable]] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "not_modified": 0, "invalidations": 0}
+        # 本进程发起失效时的回调 listener(scope)
+        self._invalidation_listener: Optional[Callable[[Hashable], None]] = None
+
+    def register_version(self, scope: Hashable, version_func: Callable[[], Hashable]):
+        """使用外部版本号的数据范围（例如 ItemCatalog 快照版本）"""
+        self._version_funcs[scope] = version_func
+
+    def version(self, scope: Hashable) -> Hashable:
+        version_func = self._version_funcs.get(scope)
+        if version_func is not None:
+            return version_func()
+        return self._versions.get(scope, 0)
+
+    def set_invalidation_listener(self, listener: Optional[Callable[[Hashable], None]]):
+        """设置失效回调（转发给其他工作进程）"""
+        self._invalidation_listener = listener
+
+    def invalidate(self, scope: Hashable, notify: bool = True):
+        """数据范围发生写入后调用；notify=False 用于应用其他进程转发的失效"""
+        with self._lock:
+            self._versions[scope] = self._versions.get(scope, 0) + 1
+            self._stats["invalidations"] += 1
+        listener = self._invalidation_listener
+        if notify and listener:
+            try:
+                listener(scope)
+            except Exception as e:
+                logger.error(f"响应缓存失效回调失败: {e}")
+
+    def clear(self):
+        """清空全部缓存（与其他工作进程的失效转发中断后调用）"""
+        self._entries.clear()
+
+    def respond(self, request: Request, scope: Hashable, build_content: Callable[[], Any],
+                user_level: Optional[int] = None) -> Response:
+        """
+        返回缓存的响应；未命中时调用 build_content() 构造内容
+        :param user_level: 响应内容与用户等级相关时传入
+        """
+        key = (
+            scope, self.version(scope), request.url.path,
+            tuple(sorted(request.query_params.multi_items())), user_level
+        )
+        built = []
+
+        def build():
+            built.append(True)
+            return build_content()
+
+        prepared = self._entries.get(key, build)
+        with self._lock:
+            self._stats["misses" if built else "hits"] += 1
+
+        if prepared.matches(request.headers.get("if-none-match", "")):
+            with self._lock:
+                self._stats["not_modified"] += 1
+            return Response(status_code=304, headers={
+                "ETag": prepared.etag(prepared.encoding_for(request)),
+                "Cache-Control": CACHE_CONTROL
+            })
+        return prepared.response(request, headers={"Cache-Control": CACHE_CONTROL}, with_etag=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats)
+
+
+# 全局响应缓存
+response_cache = ResponseCache()